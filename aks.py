@@ -1,10 +1,16 @@
 import akshare as ak
 import pandas as pd
 from datetime import datetime
+import os
+import re
+import json
 import time
+import hashlib
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from utils import execute_with_retry
+from retry_policy import call_with_retry
+from rate_limiter import get_limiter
+from columnar_store import save_frame, load_frame, save_arrays, load_arrays
 
 # 公告分类字典
 ANN_CATEGORY_DICT = {
@@ -32,6 +38,24 @@ ANN_CATEGORY_DICT = {
 }
 
 ANN_OUTPUT_COLUMNS = ['名称', '公告日期', '公告分类','公告类型', '公告标题', '网址']
+ANN_DEFAULT_CATEGORY = '其他'
+
+# 公告类型 -> 分类；同一类型出现在多个分类时以字典中靠后的分类为准
+ANN_TYPE_TO_CATEGORY = {symbol: category
+                        for category, symbols in ANN_CATEGORY_DICT.items()
+                        for symbol in symbols}
+
+# 按标题覆盖分类的规则 [(正则, 分类)]，按顺序应用，靠后的规则优先
+ANN_TITLE_RULES = [
+    (re.compile('重大合同'), '重大事项'),
+]
+
+# 概念板块指数日线存储：每个概念一个分区文件，manifest.json 记录已覆盖的日期区间
+CONCEPT_DATA_DIR = './data/npz/concept'
+CONCEPT_MANIFEST_FILE = 'manifest.json'
+CONCEPT_COLUMNS = ['日期', '开盘价', '最高价', '最低价', '收盘价', '成交量', '成交额']
+CONCEPT_MEMBERS_FILE = 'members.npz'
+CONCEPT_MEMBERS_MAX_AGE_DAYS = 7   # 成分股列表超过该天数重新下载
 
 
 
@@ -43,7 +67,36 @@ class AkShare:
         """初始化AkShare类"""
         self.ann_output_columns = ANN_OUTPUT_COLUMNS
         self.ann_category_dict = ANN_CATEGORY_DICT
+        self.concept_data_dir = CONCEPT_DATA_DIR
         
+    @staticmethod
+    def classify_announcements(df: pd.DataFrame,
+                               type_map: dict = None,
+                               title_rules: list = None) -> pd.Series:
+        """
+        公告分类：按公告类型查表，再按标题规则覆盖
+
+        Args:
+            df: 含 公告类型、公告标题 列的公告数据
+            type_map: 公告类型 -> 分类，默认 ANN_TYPE_TO_CATEGORY
+            title_rules: [(编译后的正则, 分类)]，按顺序覆盖，默认 ANN_TITLE_RULES
+
+        Returns:
+            pd.Series: 公告分类，未匹配的为 '其他'
+        """
+        type_map = ANN_TYPE_TO_CATEGORY if type_map is None else type_map
+        title_rules = ANN_TITLE_RULES if title_rules is None else title_rules
+        category = df['公告类型'].map(type_map).fillna(ANN_DEFAULT_CATEGORY)
+        titles = df['公告标题'].fillna('').astype(str)
+        for pattern, rule_category in title_rules:
+            category = category.mask(titles.str.contains(pattern, regex=True), rule_category)
+        return category
+
+    def _fetch_announcements(self, date: str) -> pd.DataFrame:
+        """获取单日全部公告原始数据"""
+        df = call_with_retry('akshare', ak.stock_notice_report, symbol='全部', date=date)
+        return df if df is not None else pd.DataFrame()
+
     def get_announcements(self, date: str) -> pd.DataFrame:
         """
         获取股票公告数据
@@ -60,7 +113,7 @@ class AkShare:
         
         try:
             print(f"正在获取的公告")
-            df = execute_with_retry(ak.stock_notice_report, symbol='全部', date=date)
+            df = self._fetch_announcements(date)
             
             if df.empty:
                 print(f"未获取到{date}的公告数据")
@@ -68,16 +121,8 @@ class AkShare:
 
             print(f"成功获取{len(df)}条公告")
 
-            for category, symbols in self.ann_category_dict.items():
-                for symbol in symbols:
-                    mask = df['公告类型'] == symbol
-                    df.loc[mask, '公告分类'] = category
-
-            df['公告分类'] = df['公告分类'].fillna('其他')
+            df['公告分类'] = self.classify_announcements(df)
             df.sort_values(by='名称', inplace=True)
-            # 重大合同归类为重大事项
-            mask = df['公告标题'].str.contains('重大合同', na=False)
-            df.loc[mask, '公告分类'] = '重大事项'
             
             # 选择输出列
             df = df[self.ann_output_columns]
@@ -91,52 +136,279 @@ class AkShare:
             logging.error(error_msg)
             raise Exception(error_msg)
 
+    def get_announcements_range(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        获取日期范围内的公告数据，按天并发获取，合并后统一分类
+
+        Args:
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+
+        Returns:
+            pd.DataFrame: 公告数据框，按公告日期倒序、名称排序；没有公告的日期会被跳过
+
+        Raises:
+            Exception: 所有日期都获取失败时抛出异常
+        """
+        dates = pd.date_range(start_date, end_date).strftime('%Y%m%d').tolist()
+        frames = []
+        failed = []
+        # 请求速率由 akshare 限流器控制，并发数取突发数
+        with ThreadPoolExecutor(max_workers=get_limiter('akshare').burst) as executor:
+            future_to_date = {executor.submit(self._fetch_announcements, date): date for date in dates}
+            for future in as_completed(future_to_date):
+                date = future_to_date[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    logging.error(f"获取{date}公告数据失败: {e}")
+                    failed.append(date)
+                    continue
+                if not df.empty:
+                    frames.append(df)
+
+        if len(failed) == len(dates):
+            raise Exception(f"获取{start_date}-{end_date}公告数据全部失败")
+        if failed:
+            print(f"以下日期公告获取失败: {sorted(failed)}")
+        if not frames:
+            return pd.DataFrame(columns=self.ann_output_columns)
+
+        df = pd.concat(frames, ignore_index=True)
+        df['公告分类'] = self.classify_announcements(df)
+        df = df.sort_values(by=['公告日期', '名称'], ascending=[False, True], kind='stable')
+        print(f"共获取{len(df)}条公告数据, 日期范围: {start_date}-{end_date}")
+        return df[self.ann_output_columns].reset_index(drop=True)
+
+    def _load_concept_manifest(self) -> dict:
+        """读取概念板块下载进度清单"""
+        path = os.path.join(self.concept_data_dir, CONCEPT_MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {'concepts': {}}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_concept_manifest(self, manifest: dict) -> None:
+        """原子写入进度清单，中断后已完成的概念不会重复下载"""
+        os.makedirs(self.concept_data_dir, exist_ok=True)
+        path = os.path.join(self.concept_data_dir, CONCEPT_MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _concept_fetch_ranges(entry: dict, start_date: str, end_date: str) -> list:
+        """
+        计算概念板块还需要下载的日期区间
+
+        已覆盖 [covered_start, covered_end] 时只下载两端缺失的部分
+        """
+        if not entry:
+            return [(start_date, end_date)]
+        ranges = []
+        covered_start, covered_end = entry['covered_start'], entry['covered_end']
+        if start_date < covered_start:
+            before = (pd.Timestamp(covered_start) - pd.Timedelta(days=1)).strftime('%Y%m%d')
+            ranges.append((start_date, before))
+        if end_date > covered_end:
+            after = (pd.Timestamp(covered_end) + pd.Timedelta(days=1)).strftime('%Y%m%d')
+            ranges.append((after, end_date))
+        return ranges
+
+    @staticmethod
+    def _partition_file(name: str, code: str = None) -> str:
+        """概念板块分区文件名，优先使用板块代码"""
+        key = code or hashlib.md5(name.encode('utf-8')).hexdigest()[:12]
+        return f"concept_{key}.npz"
+
     def _get_single_concept_data(self, name: str, start_date: str, end_date: str) -> pd.DataFrame:
-        """获取单个概念板块数据的辅助函数"""
-        df = execute_with_retry(ak.xx, symbol=name, start_date=start_date, end_date=end_date)
-        df['name'] = name
-        print(f"成功获取{name}概念板块{len(df)}条数据")
-        return df
-    
+        """获取单个概念板块指数日线"""
+        df = call_with_retry('akshare', ak.stock_board_concept_index_ths,
+                             symbol=name, start_date=start_date, end_date=end_date)
+        if df is None or df.empty:
+            return pd.DataFrame(columns=CONCEPT_COLUMNS)
+        df = df.copy()
+        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y%m%d')
+        return df[[col for col in CONCEPT_COLUMNS if col in df.columns]]
+
+    def _fetch_concept(self, name: str, ranges: list) -> pd.DataFrame:
+        """下载一个概念板块的全部缺失区间"""
+        frames = [self._get_single_concept_data(name, start, end) for start, end in ranges]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CONCEPT_COLUMNS)
+
+    def _store_concept_partition(self, entry: dict, new_data: pd.DataFrame) -> int:
+        """把新数据并入概念板块分区，按日期去重（新数据覆盖旧数据），返回分区行数"""
+        path = os.path.join(self.concept_data_dir, entry['file'])
+        existing = load_frame(path)
+        combined = pd.concat([existing, new_data], ignore_index=True) if not existing.empty else new_data
+        combined = (combined.drop_duplicates(subset=['日期'], keep='last')
+                    .sort_values('日期')
+                    .reset_index(drop=True))
+        save_frame(path, combined)
+        return len(combined)
+
     # 获取同花顺概念版块数据
-    def get_concept_board(self, start_date: str, end_date: str) -> pd.DataFrame:
-        """获取同花顺概念版块数据"""
-        df_concept = execute_with_retry(ak.stock_board_concept_name_ths)
+    def update_concept_board(self, start_date: str, end_date: str) -> dict:
+        """
+        增量下载同花顺概念板块指数日线
+
+        每个概念只下载进度清单中尚未覆盖的日期，结果到达后立即写入 data/npz/concept 下的分区文件
+        并更新进度清单，中断后重新运行会从未完成的概念继续
+
+        Args:
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+
+        Returns:
+            dict: {'updated': 更新的概念数, 'skipped': 已是最新的概念数, 'failed': 失败的概念列表}
+        """
+        df_concept = call_with_retry('akshare', ak.stock_board_concept_name_ths)
         if df_concept is None or df_concept.empty:
             print(f"概念板块名称为空")
-            raise Exception(f"概念板块名称为空")  
+            raise Exception(f"概念板块名称为空")
         print(f"概念板块名称数量: {len(df_concept)}")
-      
-        concept_list = df_concept['name'].tolist()       
-        df_all_list = []
-        
-        # 使用线程池并发获取数据，限制并发数为8
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            # 提交所有任务
+
+        manifest = self._load_concept_manifest()
+        concepts = manifest['concepts']
+        codes = df_concept['code'].astype(str) if 'code' in df_concept.columns else [None] * len(df_concept)
+
+        # 当天数据可能尚未收盘，不计入已覆盖区间，下次运行会重新下载
+        today = datetime.now().strftime('%Y%m%d')
+        covered_end = min(end_date, (pd.Timestamp(today) - pd.Timedelta(days=1)).strftime('%Y%m%d'))
+
+        tasks = {}
+        for name, code in zip(df_concept['name'], codes):
+            entry = concepts.get(name)
+            ranges = self._concept_fetch_ranges(entry, start_date, end_date)
+            if ranges:
+                tasks[name] = (entry or {'file': self._partition_file(name, code), 'code': code}, ranges)
+        skipped = len(df_concept) - len(tasks)
+        print(f"需要更新的概念板块: {len(tasks)}，已是最新: {skipped}")
+
+        failed = []
+        # 请求速率由 akshare 限流器控制，并发数取突发数
+        with ThreadPoolExecutor(max_workers=get_limiter('akshare').burst) as executor:
             future_to_name = {
-                executor.submit(self._get_single_concept_data, name, start_date, end_date): name 
-                for name in concept_list
+                executor.submit(self._fetch_concept, name, ranges): name
+                for name, (_, ranges) in tasks.items()
             }
-            
-            # 获取结果
+
+            # 结果到达后立即写入分区并记录进度（只在主线程写文件）
             for future in as_completed(future_to_name):
                 name = future_to_name[future]
+                entry, _ = tasks[name]
                 try:
-                    df = future.result()
-                    df_all_list.append(df)
+                    rows = self._store_concept_partition(entry, future.result())
                 except Exception as e:
                     print(f"获取{name}概念板块数据失败: {e}")
                     logging.error(f"获取{name}概念板块数据失败: {e}")
-        
-        if not df_all_list:
+                    failed.append(name)
+                    continue
+                previous = concepts.get(name)
+                entry.update({
+                    'covered_start': min(start_date, previous['covered_start']) if previous else start_date,
+                    'covered_end': max(covered_end, previous['covered_end']) if previous else covered_end,
+                    'rows': rows,
+                    'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                })
+                concepts[name] = entry
+                self._save_concept_manifest(manifest)
+
+        print(f"概念板块更新完成: 更新{len(tasks) - len(failed)}个，失败{len(failed)}个")
+        if failed and len(failed) == len(tasks):
             raise Exception("所有概念板块数据获取失败")
-            
-        df_all = pd.concat(df_all_list)
-        # 按日期倒排
-        df_all = df_all.sort_values(by='日期', ascending=False)
-        return df_all
-    
-  
+        return {'updated': len(tasks) - len(failed), 'skipped': skipped, 'failed': failed}
+
+    def load_concept_board(self, start_date: str = None, end_date: str = None,
+                           names: list = None, columns: list = None) -> pd.DataFrame:
+        """
+        从分区读取概念板块指数日线
+
+        Args:
+            start_date / end_date: 日期范围 YYYYMMDD
+            names: 概念名称，默认全部
+            columns: 需要的列，默认全部（日期列总会读取）
+
+        Returns:
+            pd.DataFrame: 含 name 列，按日期倒序
+        """
+        concepts = self._load_concept_manifest()['concepts']
+        names = list(concepts) if names is None else [name for name in names if name in concepts]
+        read_columns = None if columns is None else ['日期'] + [col for col in columns if col != '日期']
+        frames = []
+        for name in names:
+            df = load_frame(os.path.join(self.concept_data_dir, concepts[name]['file']), read_columns)
+            if start_date:
+                df = df[df['日期'] >= start_date]
+            if end_date:
+                df = df[df['日期'] <= end_date]
+            if not df.empty:
+                frames.append(df.assign(name=name))
+        if not frames:
+            return pd.DataFrame(columns=(read_columns or CONCEPT_COLUMNS) + ['name'])
+        return pd.concat(frames, ignore_index=True).sort_values(by='日期', ascending=False, kind='stable')
+
+    def _get_concept_members(self, code: str) -> list:
+        """获取单个概念板块的成分股代码"""
+        df = call_with_retry('akshare', ak.stock_board_cons_ths, symbol=code)
+        if df is None or df.empty:
+            return []
+        return df['代码'].astype(str).str.zfill(6).tolist()
+
+    def load_concept_members(self) -> pd.DataFrame:
+        """读取概念板块成分股，列为 concept、code"""
+        arrays = load_arrays(os.path.join(self.concept_data_dir, CONCEPT_MEMBERS_FILE))
+        if not arrays:
+            return pd.DataFrame(columns=['concept', 'code'])
+        return pd.DataFrame({'concept': arrays['concept'], 'code': arrays['code']})
+
+    def update_concept_members(self, max_age_days: int = CONCEPT_MEMBERS_MAX_AGE_DAYS) -> int:
+        """
+        增量更新概念板块成分股，只下载没有成分股或超过 max_age_days 天未更新的概念
+
+        Returns:
+            int: 更新的概念数
+        """
+        manifest = self._load_concept_manifest()
+        concepts = manifest['concepts']
+        cutoff = (datetime.now() - pd.Timedelta(days=max_age_days)).strftime('%Y%m%d')
+        pending = [name for name, entry in concepts.items()
+                   if entry.get('code') and entry.get('members_updated', '') < cutoff]
+        if not pending:
+            return 0
+
+        members = self.load_concept_members()
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=get_limiter('akshare').burst) as executor:
+            future_to_name = {executor.submit(self._get_concept_members, concepts[name]['code']): name
+                              for name in pending}
+            for future in as_completed(future_to_name):
+                name = future_to_name[future]
+                try:
+                    fetched[name] = future.result()
+                except Exception as e:
+                    logging.error(f"获取{name}概念板块成分股失败: {e}")
+
+        if fetched:
+            members = members[~members['concept'].isin(list(fetched))]
+            new_members = pd.DataFrame([(name, code) for name, codes in fetched.items() for code in codes],
+                                       columns=['concept', 'code'])
+            members = pd.concat([members, new_members], ignore_index=True)
+            save_arrays(os.path.join(self.concept_data_dir, CONCEPT_MEMBERS_FILE),
+                        concept=members['concept'].to_numpy(dtype=str),
+                        code=members['code'].to_numpy(dtype=str))
+            today = datetime.now().strftime('%Y%m%d')
+            for name in fetched:
+                concepts[name]['members_updated'] = today
+            self._save_concept_manifest(manifest)
+        print(f"概念板块成分股更新完成: {len(fetched)}/{len(pending)}")
+        return len(fetched)
+
+    def get_concept_board(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """获取同花顺概念版块数据：先增量更新分区，再读取日期范围内的数据"""
+        self.update_concept_board(start_date, end_date)
+        return self.load_concept_board(start_date, end_date)
 
 
 # 使用示例
@@ -0,0 +1,182 @@
+"""
+历史数据回填
+按交易日历回填指定日期区间的异动、行情、涨停、股票池和合并结果
+
+分两个阶段执行：
+1. 下载阶段：各交易日互相独立，使用进程池并行下载，只写入按日期命名的文件
+2. 汇总阶段：按日期升序依次更新板块历史、最新涨停/异动汇总文件，并合并输出结果
+"""
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from log_setup import get_logger
+from trading_calendar import TradingCalendar
+from notification import DingDingRobot
+from utils import check_output_complete
+
+# 配置日志
+logger = get_logger("backfill", "logs", "daily_research.log")
+
+# 全局对象
+trading_calendar = TradingCalendar()
+dingding_robot = DingDingRobot()
+
+# 回填配置
+DEFAULT_MAX_WORKERS = 2          # 同时回填的交易日数，受问财/韭研公社频率限制，不宜过大
+WORKER_STAGGER_SECONDS = 20      # 首批进程错开启动，避免同时发起请求
+DATA_DIR = "./data/csv"
+OUTPUT_BASE_DIR = "./output"
+
+
+def get_required_files(trade_date: str) -> dict:
+    """
+    获取某个交易日回填完成需要的文件
+
+    返回:
+        dict: {'download': 下载阶段文件列表, 'output': 汇总阶段文件列表}
+    """
+    stock_pool_dir = f"{DATA_DIR}/stock_pool/{trade_date}"
+    return {
+        'download': [
+            f"{DATA_DIR}/jygs/jygs_{trade_date}.csv",
+            f"{DATA_DIR}/ths/ths_market_overview_{trade_date}.csv",
+            f"{DATA_DIR}/ths/ths_zt_{trade_date}.csv",
+            f"{stock_pool_dir}/core_stocks.csv",
+            f"{stock_pool_dir}/first_stocks.csv",
+        ],
+        'output': [
+            f"{OUTPUT_BASE_DIR}/{trade_date}/core_stocks.csv",
+            f"{OUTPUT_BASE_DIR}/{trade_date}/first_stocks.csv",
+        ],
+    }
+
+
+def is_stage_complete(trade_date: str, stage: str) -> bool:
+    """判断某个交易日的某个阶段是否已完成"""
+    return all(check_output_complete(path, trade_date) for path in get_required_files(trade_date)[stage])
+
+
+def init_download_worker(max_workers: int) -> None:
+    """下载进程初始化：各进程的限流器互相独立，按进程数分摊上游速率"""
+    from rate_limiter import split_limits
+    split_limits(max_workers)
+
+
+def download_date(trade_date: str, start_delay: float = 0) -> tuple:
+    """
+    下载单个交易日的原始数据（在子进程中执行）
+
+    每个步骤内部会跳过已完整生成的文件，中断后重新运行可以续传
+
+    返回:
+        tuple: (交易日期, 是否成功, 错误信息, 耗时秒数)
+    """
+    # 延迟导入，子进程各自初始化问财、韭研公社等模块
+    from jygs import JygsUtils
+    from wencai import WencaiUtils
+    from stock_pool import StockPool
+
+    if start_delay > 0:
+        time.sleep(start_delay)
+
+    start_time = time.time()
+    try:
+        logger.info(f"[回填] 开始下载{trade_date}数据")
+        JygsUtils.update_daily_data(trading_date=trade_date, update_history=False)
+        WencaiUtils.update_daily_market_overview_data(trade_date=trade_date)
+        WencaiUtils.update_daily_zt_data(trade_date=trade_date, update_latest=False)
+        StockPool().update_stock_pool_data(trade_date=trade_date)
+        elapsed = time.time() - start_time
+        logger.info(f"[回填] {trade_date}数据下载完成, 耗时: {elapsed:.2f}秒")
+        return trade_date, True, '', elapsed
+    except Exception as e:
+        elapsed = time.time() - start_time
+        logger.error(f"[回填] {trade_date}数据下载失败: {e}")
+        return trade_date, False, str(e), elapsed
+
+
+def summarize_date(trade_date: str) -> None:
+    """按日期顺序更新汇总文件并合并输出结果（在主进程中执行）"""
+    from jygs import JygsUtils
+    from wencai import WencaiUtils
+    from merge import merge
+
+    JygsUtils.update_history_data(trade_date)
+    WencaiUtils.update_latest_zt_data(trade_date)
+    merge(trade_date=trade_date, notify=False)
+
+
+def backfill(start_date: str, end_date: str, max_workers: int = DEFAULT_MAX_WORKERS, force: bool = False) -> dict:
+    """
+    回填区间内所有交易日
+
+    Args:
+        start_date: 开始日期 YYYYMMDD
+        end_date: 结束日期 YYYYMMDD
+        max_workers: 并行下载的进程数
+        force: 是否忽略已完成的合并结果重新汇总
+
+    Returns:
+        dict: {'completed': [...], 'skipped': [...], 'failed': {交易日期: 错误信息}}
+    """
+    trade_dates = trading_calendar.get_trading_days_between(start_date, end_date)
+    result = {'completed': [], 'skipped': [], 'failed': {}}
+    if not trade_dates:
+        logger.warning(f"{start_date}至{end_date}没有交易日")
+        return result
+
+    pending = [d for d in trade_dates if force or not is_stage_complete(d, 'output')]
+    result['skipped'] = [d for d in trade_dates if d not in pending]
+    logger.info(f"回填区间{start_date}至{end_date}: 共{len(trade_dates)}个交易日, "
+                f"已完成{len(result['skipped'])}个, 待回填{len(pending)}个")
+
+    # 阶段1: 并行下载
+    to_download = [d for d in pending if not is_stage_complete(d, 'download')]
+    if to_download:
+        workers = min(max_workers, len(to_download))
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_download_worker,
+                                 initargs=(workers,)) as executor:
+            futures = [
+                executor.submit(download_date, d, (i * WORKER_STAGGER_SECONDS) if i < workers else 0)
+                for i, d in enumerate(to_download)
+            ]
+            for future in as_completed(futures):
+                trade_date, ok, error, elapsed = future.result()
+                if not ok:
+                    result['failed'][trade_date] = error
+
+    # 阶段2: 按日期顺序汇总，汇总文件和前一交易日对比依赖日期顺序
+    for trade_date in pending:
+        if trade_date in result['failed']:
+            continue
+        try:
+            summarize_date(trade_date)
+            result['completed'].append(trade_date)
+        except Exception as e:
+            logger.error(f"[回填] {trade_date}汇总失败: {e}")
+            result['failed'][trade_date] = str(e)
+
+    logger.info(f"回填完成: 成功{len(result['completed'])}个, 跳过{len(result['skipped'])}个, "
+                f"失败{len(result['failed'])}个 {sorted(result['failed'])}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按交易日历回填历史数据")
+    parser.add_argument('--start', required=True, help="开始日期 YYYYMMDD")
+    parser.add_argument('--end', default=datetime.now().strftime('%Y%m%d'), help="结束日期 YYYYMMDD，默认今天")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help="并行下载的进程数")
+    parser.add_argument('--force', action='store_true', help="重新汇总已完成的交易日")
+    args = parser.parse_args()
+
+    start_time = datetime.now()
+    result = backfill(args.start, args.end, max_workers=args.workers, force=args.force)
+    msg = (f"历史回填{args.start}至{args.end}完成: 成功{len(result['completed'])}个, "
+           f"跳过{len(result['skipped'])}个, 失败{len(result['failed'])}个, 耗时: {datetime.now() - start_time}")
+    logger.info(msg)
+    dingding_robot.send_message(msg, 'robot3')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+股票池回测
+在本地行情面板（日期 × 股票矩阵）上按历史每个交易日重放股票池构建规则，
+统计入选股票的未来N日收益、胜率和换手率，并支持在多进程中对 alpha/beta/区间 做参数扫描；
+也可回测首板规则（first_board）
+"""
+
+import os
+import time
+import argparse
+import itertools
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from log_setup import get_logger
+from market_panel import MarketPanel, PANEL_PATH
+from stock_pool import StockPoolConfig
+from first_board import FirstBoardDetector, FIRST_BOARD_RULES
+
+logger = get_logger("backtest", "logs", "daily_research.log")
+
+# 配置常量
+RESULT_DIR = "./data/csv/backtest"
+DEFAULT_HORIZON = 5
+DEFAULT_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+TRADING_DAYS_PER_YEAR = 250
+
+# 与问财查询条件保持一致：不筛选时上市天数>5，筛选时上市天数>30且非ST/退市
+MIN_LISTED_DAYS = 5
+MIN_LISTED_DAYS_FILTERED = 30
+
+
+@dataclass(frozen=True)
+class BacktestConfig:
+    """
+    单组回测参数
+
+    - intervals: ((区间天数, 前N名), ...)，对应 StockPoolConfig.INTERVAL_CONFIGS
+    - filters: 市值筛选条件（亿元字符串或 None），对应 StockPoolConfig.CORE_STOCK_CONFIGS
+    - formula: 'log' 与 StockPool.calc_importance 相同；'exp' 为 100*exp(-alpha*排名)*exp(-beta*区间长度)
+    - horizon: 未来收益天数
+    - top_k: 每天按重要度取前K只，0 表示全部入选股票
+    """
+    intervals: tuple = tuple(StockPoolConfig.INTERVAL_CONFIGS)
+    alpha: float = StockPoolConfig.IMPORTANCE_ALPHA
+    beta: float = StockPoolConfig.IMPORTANCE_BETA
+    formula: str = 'log'
+    filters: tuple = tuple(f for f, _ in StockPoolConfig.CORE_STOCK_CONFIGS)
+    horizon: int = DEFAULT_HORIZON
+    top_k: int = 0
+
+
+def importance_score(ranks: np.ndarray, days: int, alpha: float, beta: float, formula: str = 'log') -> np.ndarray:
+    """按区间排名和区间长度计算单个区间贡献的重要度"""
+    ranks = np.asarray(ranks, dtype=np.float64)
+    if formula == 'log':
+        return 100 / (np.log1p(ranks) * np.log1p(days))
+    if formula == 'exp':
+        return 100 * np.exp(-alpha * ranks) * np.exp(-beta * days)
+    raise ValueError(f"不支持的重要度公式: {formula}")
+
+
+class PoolBacktester:
+    """
+    在行情面板上重放股票池规则
+
+    区间涨幅由对数收益前缀和相减得到，每个 (区间, 名次, 筛选条件) 的入选结果只计算一次并缓存，
+    参数扫描中只有重要度和指标需要按参数重算
+    """
+
+    def __init__(self, panel: MarketPanel):
+        self.panel = panel
+        self.dates = panel.dates
+        pct = panel.fields['涨跌幅']
+        self.present = ~np.isnan(pct)
+        log_ret = np.log1p(np.nan_to_num(pct, nan=0.0) / 100)
+        # prefix[t] 为前 t 个交易日的对数收益之和
+        self.prefix = np.vstack([np.zeros((1, pct.shape[1])), np.cumsum(log_ret, axis=0)])
+        self._eligible = {}
+        self._selections = {}
+
+    def window_returns(self, days: int) -> np.ndarray:
+        """截至每个交易日（含）最近 days 天的对数收益，不足 days 天为 NaN"""
+        result = np.full(self.present.shape, np.nan)
+        if days <= len(self.dates):
+            result[days - 1:] = self.prefix[days:] - self.prefix[:-days]
+        return result
+
+    def forward_returns(self, horizon: int) -> np.ndarray:
+        """每个交易日收盘买入、持有 horizon 天后的简单收益，数据不足为 NaN"""
+        result = np.full(self.present.shape, np.nan)
+        if horizon < len(self.dates):
+            result[:-horizon] = np.expm1(self.prefix[horizon + 1:] - self.prefix[1:-horizon])
+        return result
+
+    def eligible(self, use_filter: str = None) -> np.ndarray:
+        """按筛选条件生成可选股票掩码[日期, 股票]"""
+        if use_filter not in self._eligible:
+            fields = self.panel.fields
+            with np.errstate(invalid='ignore'):
+                if use_filter is None:
+                    mask = self.present & (fields['上市天数'] > MIN_LISTED_DAYS) & (fields['市值Z'] > 0)
+                else:
+                    mask = (self.present & ~self.panel.is_st
+                            & (fields['上市天数'] > MIN_LISTED_DAYS_FILTERED)
+                            & (fields['市值Z'] > float(use_filter) * 1e8))
+            self._eligible[use_filter] = mask
+        return self._eligible[use_filter]
+
+    def select(self, days: int, rank: int, use_filter: str = None) -> tuple:
+        """
+        每个交易日区间涨幅前 rank 名
+
+        Returns:
+            tuple: (行号数组, 列号数组, 名次数组)，名次从1开始
+        """
+        key = (days, rank, use_filter)
+        if key not in self._selections:
+            returns = self.window_returns(days)
+            values = np.where(self.eligible(use_filter) & ~np.isnan(returns), returns, -np.inf)
+            k = min(rank, values.shape[1])
+            top = np.argpartition(-values, k - 1, axis=1)[:, :k]
+            top_values = np.take_along_axis(values, top, axis=1)
+            order = np.argsort(-top_values, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_values = np.take_along_axis(top_values, order, axis=1)
+
+            valid = np.isfinite(top_values)
+            rows = np.broadcast_to(np.arange(values.shape[0])[:, None], top.shape)[valid]
+            ranks = np.broadcast_to(np.arange(1, k + 1)[None, :], top.shape)[valid]
+            self._selections[key] = (rows, top[valid], ranks)
+        return self._selections[key]
+
+    def importance(self, config: BacktestConfig) -> np.ndarray:
+        """重要度矩阵[日期, 股票]，不同筛选条件取最大值，与核心股票池的合并逻辑一致"""
+        result = np.zeros(self.present.shape)
+        for use_filter in config.filters:
+            score = np.zeros(self.present.shape)
+            for days, rank in config.intervals:
+                rows, cols, ranks = self.select(days, rank, use_filter)
+                np.add.at(score, (rows, cols), importance_score(ranks, days, config.alpha, config.beta, config.formula))
+            np.maximum(result, score, out=result)
+        return result
+
+    def pool_mask(self, config: BacktestConfig) -> tuple:
+        """入选股票掩码[日期, 股票]及对应重要度"""
+        score = self.importance(config)
+        mask = score > 0
+        if config.top_k and config.top_k < score.shape[1]:
+            threshold = -np.partition(-score, config.top_k - 1, axis=1)[:, config.top_k - 1]
+            mask &= score >= threshold[:, None]
+        return mask, score
+
+    def run(self, config: BacktestConfig, start_date: str = None, end_date: str = None) -> dict:
+        """
+        回测单组参数
+
+        Args:
+            config: 回测参数
+            start_date / end_date: 评估区间 YYYYMMDD（含），默认全部有未来收益的交易日
+
+        Returns:
+            dict: 参数及汇总指标
+        """
+        mask, _ = self.pool_mask(config)
+        forward = self.forward_returns(config.horizon)
+        has_forward = ~np.isnan(forward)
+        picked = mask & has_forward
+
+        in_range = np.ones(len(self.dates), dtype=bool)
+        if start_date:
+            in_range &= self.dates >= start_date
+        if end_date:
+            in_range &= self.dates <= end_date
+        rows = in_range & picked.any(axis=1)
+
+        pool_size = mask.sum(axis=1)
+        n_picked = picked.sum(axis=1)
+        pool_ret = np.where(picked, forward, 0).sum(axis=1) / np.maximum(n_picked, 1)
+        universe = self.present & has_forward
+        bench_ret = np.where(universe, forward, 0).sum(axis=1) / np.maximum(universe.sum(axis=1), 1)
+        excess = pool_ret - bench_ret
+        hits = (picked & (forward > 0)).sum(axis=1)
+
+        # 换手率: 当日股票池中前一交易日不在池中的比例
+        overlap = np.zeros(len(self.dates))
+        overlap[1:] = (mask[1:] & mask[:-1]).sum(axis=1)
+        turnover = 1 - overlap / np.maximum(pool_size, 1)
+        turnover_rows = rows.copy()
+        turnover_rows[0] = False
+
+        summary = {**asdict(config), 'intervals': '|'.join(f"{d}-{r}" for d, r in config.intervals),
+                   'filters': '|'.join(str(f) for f in config.filters)}
+        n_dates = int(rows.sum())
+        if n_dates == 0:
+            return {**summary, '交易日数': 0}
+
+        excess_std = float(excess[rows].std(ddof=1)) if n_dates > 1 else 0.0
+        summary.update({
+            '交易日数': n_dates,
+            '平均入选数': round(float(pool_size[rows].mean()), 2),
+            '平均收益': round(float(pool_ret[rows].mean()) * 100, 3),
+            '基准收益': round(float(bench_ret[rows].mean()) * 100, 3),
+            '超额收益': round(float(excess[rows].mean()) * 100, 3),
+            '超额信息比': round(float(excess[rows].mean()) / excess_std
+                              * float(np.sqrt(TRADING_DAYS_PER_YEAR / config.horizon)), 3) if excess_std > 0 else np.nan,
+            '胜率': round(float(hits[rows].sum()) / max(int(n_picked[rows].sum()), 1) * 100, 2),
+            '日胜率': round(float((excess[rows] > 0).mean()) * 100, 2),
+            '换手率': round(float(turnover[turnover_rows].mean()) * 100, 2) if turnover_rows.any() else np.nan,
+        })
+        return summary
+
+    def daily(self, config: BacktestConfig) -> pd.DataFrame:
+        """单组参数的逐日入选明细，便于和实际股票池核对"""
+        mask, score = self.pool_mask(config)
+        forward = self.forward_returns(config.horizon)
+        rows, cols = np.nonzero(mask)
+        return pd.DataFrame({
+            '交易日期': self.dates[rows],
+            'code': np.asarray(self.panel.codes, dtype=str)[cols],
+            '股票简称': np.asarray(self.panel.names, dtype=str)[cols],
+            '重要度': score[rows, cols].round(2),
+            f'未来{config.horizon}日收益': (forward[rows, cols] * 100).round(2),
+        })
+
+
+def evaluate_first_board(panel: MarketPanel, rules: dict = None, horizons=(1, DEFAULT_HORIZON),
+                         start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """
+    首板规则回测：每条规则在每个交易日检测首板，统计次日起持有N日的收益
+
+    Args:
+        panel: 行情面板
+        rules: {规则名: FirstBoardRule}，默认股票池使用的全量首板和中军首板
+        horizons: 持有天数
+        start_date / end_date: 评估区间 YYYYMMDD（含）
+
+    Returns:
+        pd.DataFrame: 每条规则每个持有天数一行
+    """
+    rules = rules or FIRST_BOARD_RULES
+    detector = FirstBoardDetector(panel)
+    backtester = PoolBacktester(panel)
+    in_range = np.ones(len(panel.dates), dtype=bool)
+    if start_date:
+        in_range &= panel.dates >= start_date
+    if end_date:
+        in_range &= panel.dates <= end_date
+
+    results = []
+    for name, rule in rules.items():
+        flags = detector.flags(rule) & in_range[:, None]
+        for horizon in horizons:
+            forward = backtester.forward_returns(horizon)
+            picked = flags & ~np.isnan(forward)
+            returns = forward[picked]
+            results.append({
+                '规则': name, '当日涨幅': rule.change, '市值下限': rule.min_market_value,
+                '回看天数': rule.lookback, '持有天数': horizon,
+                '交易日数': int(picked.any(axis=1).sum()),
+                '首板次数': int(picked.sum()),
+                '平均收益': round(float(returns.mean()) * 100, 3) if returns.size else np.nan,
+                '胜率': round(float((returns > 0).mean()) * 100, 2) if returns.size else np.nan,
+            })
+    return pd.DataFrame(results)
+
+
+# 进程内的回测对象，进程池初始化时加载一次
+_worker_backtester = None
+
+
+def _init_worker(panel_path: str) -> None:
+    global _worker_backtester
+    _worker_backtester = PoolBacktester(MarketPanel.load(panel_path))
+
+
+def _run_configs(configs: list, start_date: str, end_date: str) -> list:
+    return [_worker_backtester.run(config, start_date, end_date) for config in configs]
+
+
+def build_grid(alphas=(StockPoolConfig.IMPORTANCE_ALPHA,),
+               betas=(StockPoolConfig.IMPORTANCE_BETA,),
+               interval_sets=(tuple(StockPoolConfig.INTERVAL_CONFIGS),),
+               formulas=('log',),
+               horizons=(DEFAULT_HORIZON,),
+               top_ks=(0,)) -> list:
+    """生成参数网格；'log' 公式与 alpha/beta 无关，只保留一组"""
+    configs = []
+    for formula, intervals, horizon, top_k in itertools.product(formulas, interval_sets, horizons, top_ks):
+        pairs = itertools.product(alphas, betas) if formula == 'exp' else [(alphas[0], betas[0])]
+        for alpha, beta in pairs:
+            configs.append(BacktestConfig(intervals=tuple(intervals), alpha=alpha, beta=beta,
+                                          formula=formula, horizon=horizon, top_k=top_k))
+    return configs
+
+
+def sweep(configs: list,
+          start_date: str = None,
+          end_date: str = None,
+          max_workers: int = DEFAULT_MAX_WORKERS,
+          panel_path: str = PANEL_PATH) -> pd.DataFrame:
+    """
+    多进程参数扫描
+
+    同一进程内的参数共享区间收益和入选缓存，参数按区间组合分组后分配给各进程
+
+    Returns:
+        pd.DataFrame: 每组参数一行，按超额收益降序
+    """
+    start_time = time.time()
+    MarketPanel.load_synced(file_path=panel_path)
+
+    groups = {}
+    for config in configs:
+        groups.setdefault((config.intervals, config.filters), []).append(config)
+    chunk_size = max(1, len(configs) // (max_workers * 4))
+    chunks = [group[i:i + chunk_size] for group in groups.values() for i in range(0, len(group), chunk_size)]
+
+    results = []
+    if max_workers <= 1:
+        _init_worker(panel_path)
+        for chunk in chunks:
+            results.extend(_run_configs(chunk, start_date, end_date))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(panel_path,)) as executor:
+            futures = [executor.submit(_run_configs, chunk, start_date, end_date) for chunk in chunks]
+            for future in futures:
+                results.extend(future.result())
+
+    df = pd.DataFrame(results)
+    if '超额收益' in df.columns:
+        df = df.sort_values('超额收益', ascending=False).reset_index(drop=True)
+    logger.info(f"参数扫描完成: {len(configs)}组参数, 耗时: {time.time() - start_time:.2f}秒")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="股票池规则回测")
+    parser.add_argument('--start', help="评估开始日期 YYYYMMDD")
+    parser.add_argument('--end', help="评估结束日期 YYYYMMDD")
+    parser.add_argument('--horizon', type=int, nargs='+', default=[DEFAULT_HORIZON], help="未来收益天数")
+    parser.add_argument('--sweep', action='store_true', help="对 alpha/beta/区间 做参数扫描")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help="并行进程数")
+    parser.add_argument('--first-board', action='store_true', help="回测首板规则")
+    args = parser.parse_args()
+
+    if args.first_board:
+        df = evaluate_first_board(MarketPanel.load_synced(), horizons=args.horizon,
+                                  start_date=args.start, end_date=args.end)
+        os.makedirs(RESULT_DIR, exist_ok=True)
+        file_path = os.path.join(RESULT_DIR, f"first_board_{args.start or 'all'}_{args.end or 'all'}.csv")
+        df.to_csv(file_path, index=False, encoding='utf-8-sig')
+        logger.info(f"首板回测结果已保存: {file_path}")
+        print(df.to_string())
+        return
+
+    if args.sweep:
+        base = StockPoolConfig.INTERVAL_CONFIGS
+        interval_sets = [tuple(base), tuple(base[:3]), tuple(base[2:]),
+                         tuple((d, r * 2) for d, r in base), tuple((d, max(1, r // 2)) for d, r in base)]
+        configs = build_grid(alphas=np.round(np.linspace(0.05, 1.0, 8), 3).tolist(),
+                             betas=np.round(np.linspace(0.0, 0.2, 5), 3).tolist(),
+                             interval_sets=interval_sets,
+                             formulas=('log', 'exp'),
+                             horizons=args.horizon,
+                             top_ks=(0, 10, 20))
+    else:
+        configs = build_grid(horizons=args.horizon)
+
+    df = sweep(configs, args.start, args.end, max_workers=args.workers)
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    file_path = os.path.join(RESULT_DIR, f"backtest_{args.start or 'all'}_{args.end or 'all'}.csv")
+    df.to_csv(file_path, index=False, encoding='utf-8-sig')
+    logger.info(f"回测结果已保存: {file_path}")
+    print(df.head(20).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试
+用合成的全市场数据对每日流水线的热点函数计时，并与基线对比发现性能回退
+"""
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试输入
+在临时工作目录中按真实列名生成全市场行情、涨停、异动、板块历史和资讯数据，
+scale 只放大历史长度（板块历史、累计涨停/异动、重要度输入、资讯条数），单日行情规模不变
+"""
+
+import os
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+
+from fake_upstream.fixtures import SyntheticMarket, HOTSPOTS
+
+# 基准输入配置
+BENCH_TRADE_DATE = '20250627'
+BENCH_STOCK_COUNT = 5500
+HISTORY_DAYS = 250          # 1× 对应一年的交易日
+HOTSPOT_VOCABULARY = 300    # 板块历史中的不同热点名称数量
+HOTSPOTS_PER_DAY = (15, 40)
+INFO_ROWS = 2000            # 1× 的资讯条数
+
+INTERVAL_CONFIGS = [(2, 10), (3, 10), (5, 10), (10, 10), (15, 5)]
+FILTERS = [None, '30', '60', '100', '200']
+
+OVERVIEW_FIELDS = ('上市板块,上市天数,开盘价,最高价,最低价,收盘价,前复权:开盘价,前复权:最高价,前复权:最低价,'
+                   '前复权:收盘价,成交额,成交量,竞价涨幅,竞价金额,竞价量,dde大单净额,实际换手率,自由流通市值,'
+                   '自由流通股,个股热度排名,几天几板')
+ZT_QUERY = '今日涨停,涨跌幅,连续涨停次数,几天几板,涨停时间,涨停类型,涨停原因类别,封单金额,自由流通市值,上市板块'
+
+
+@dataclass
+class BenchInputs:
+    """一个规模下的全部基准输入"""
+    scale: int
+    workdir: str
+    trade_date: str
+    previous_date: str
+    dates: list
+    raw_overview: pd.DataFrame
+    raw_overview_bj: pd.DataFrame
+    raw_zt: pd.DataFrame
+    raw_top: list = field(default_factory=list)
+    jygs_payload: list = None
+    top_rows: pd.DataFrame = None
+    core_pool: pd.DataFrame = None
+    market_overview: pd.DataFrame = None
+    zt_latest: pd.DataFrame = None
+    jygs_latest: pd.DataFrame = None
+    info_rows: pd.DataFrame = None
+    price_panel: object = None
+
+
+def _top_query(days: int, rank: int, use_filter: str) -> str:
+    window = f"最近{days}个交易日的区间涨跌幅从大到小排序前{rank}"
+    if use_filter is None:
+        return f"非新股,上市天数大于5,自由流通市值大于0,{window}"
+    return f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于{use_filter}亿,{window}"
+
+
+def _hotspot_names(rng: np.random.Generator) -> np.ndarray:
+    """生成热点名称，部分名称互相包含，覆盖相似热点合并的路径"""
+    names = list(HOTSPOTS)
+    suffixes = ['应用', '产业链', '概念', '设备', '材料', '服务']
+    while len(names) < HOTSPOT_VOCABULARY:
+        base = names[int(rng.integers(0, len(names)))] if rng.random() < 0.3 else f"主题{len(names):03d}"
+        names.append(f"{base}{suffixes[int(rng.integers(0, len(suffixes)))]}")
+    return np.array(list(dict.fromkeys(names))[:HOTSPOT_VOCABULARY])
+
+
+def build_bk_history(dates: list, seed: int = 0) -> pd.DataFrame:
+    """板块历史 jygs_bk_his：交易日期、热点、股票数量，按日期倒序"""
+    rng = np.random.default_rng(seed)
+    names = _hotspot_names(rng)
+    # 热点热度随时间漂移，形成轮动
+    popularity = rng.gamma(0.6, 1.0, len(names))
+    per_day = rng.integers(HOTSPOTS_PER_DAY[0], HOTSPOTS_PER_DAY[1] + 1, len(dates))
+    frames = []
+    for trade_date, n in zip(dates, per_day):
+        popularity = np.abs(popularity + rng.normal(0, 0.05, len(names)))
+        weights = popularity / popularity.sum()
+        picked = rng.choice(len(names), size=n, replace=False, p=weights)
+        frames.append(pd.DataFrame({
+            '交易日期': trade_date,
+            '热点': names[picked],
+            '股票数量': np.maximum(1, (weights[picked] * 400).astype(int) + rng.integers(0, 5, n)),
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values('交易日期', ascending=False, kind='stable')
+
+
+def build_inputs(workdir: str, scale: int = 1, seed: int = 0) -> BenchInputs:
+    """
+    生成指定规模的基准输入，文件写入 workdir 下与线上相同的相对路径
+
+    需要在 workdir 中运行被测函数（各模块使用 ./data、./output 相对路径）
+    """
+    from wencai import WencaiUtils
+    from stock_pool import StockPool
+
+    rng = np.random.default_rng(seed)
+    market = SyntheticMarket(BENCH_STOCK_COUNT, seed, BENCH_TRADE_DATE)
+    dates = pd.bdate_range(end=BENCH_TRADE_DATE, periods=HISTORY_DAYS * scale).strftime('%Y%m%d').tolist()
+    trade_date, previous_date = dates[-1], dates[-2]
+
+    inputs = BenchInputs(
+        scale=scale,
+        workdir=workdir,
+        trade_date=trade_date,
+        previous_date=previous_date,
+        dates=dates,
+        raw_overview=market.wencai_query(f"A股,非北交所,{OVERVIEW_FIELDS}"),
+        raw_overview_bj=market.wencai_query(f"A股,北交所,{OVERVIEW_FIELDS}"),
+        raw_zt=market.wencai_query(ZT_QUERY),
+        raw_top=[(days, market.wencai_query(_top_query(days, rank, f)))
+                 for f in FILTERS for days, rank in INTERVAL_CONFIGS],
+        jygs_payload=market.jygs_action_field(f"{trade_date[:4]}-{trade_date[4:6]}-{trade_date[6:]}")['data'],
+    )
+
+    # 重要度输入：每天的区间排名结果，按规模复制到多个交易日
+    day_rows = pd.concat([WencaiUtils._normalize_top_stocks(raw, days) for days, raw in inputs.raw_top],
+                         ignore_index=True)
+    inputs.top_rows = pd.concat([day_rows.assign(交易日期=d) for d in dates[-scale:]], ignore_index=True)
+    inputs.core_pool = StockPool.calc_importance(day_rows)
+
+    inputs.market_overview = pd.concat([
+        WencaiUtils._normalize_market_overview(inputs.raw_overview, trade_date),
+        WencaiUtils._normalize_market_overview(inputs.raw_overview_bj, trade_date, is_bj_exchange=True),
+    ], ignore_index=True)
+
+    # 累计涨停/异动：每只股票最近一次记录，历史越长覆盖的股票越多
+    zt_today = WencaiUtils._normalize_zt_stocks(inputs.raw_zt, trade_date)
+    coverage = min(1.0, 0.3 * scale ** 0.5)
+    sample = inputs.market_overview.sample(frac=coverage, random_state=seed)
+    zt_history = zt_today.sample(n=len(sample), replace=True, random_state=seed).reset_index(drop=True)
+    zt_history[['股票简称', 'market_code', 'code']] = sample[['股票简称', 'market_code', 'code']].to_numpy()
+    zt_history['交易日期'] = rng.choice(dates, len(zt_history))
+    inputs.zt_latest = (pd.concat([zt_today, zt_history], ignore_index=True)
+                        .drop_duplicates(subset=['code'], keep='first')
+                        .rename(columns={'交易日期': '涨停日期'}))
+
+    jygs_today = _parse_jygs(inputs.jygs_payload, trade_date)
+    jygs_history = jygs_today.sample(n=len(sample), replace=True, random_state=seed).reset_index(drop=True)
+    jygs_history[['股票简称', 'code']] = sample[['股票简称', 'code']].to_numpy()
+    jygs_history['交易日期'] = rng.choice(dates, len(jygs_history))
+    inputs.jygs_latest = (pd.concat([jygs_today, jygs_history], ignore_index=True)
+                          .drop_duplicates(subset=['code'], keep='first')
+                          .rename(columns={'交易日期': '异动日期'}))
+
+    n_info = INFO_ROWS * scale
+    names = inputs.market_overview['股票简称'].to_numpy()
+    info_types = np.array(['news', 'announcement', 'research_report'])
+    stock_names = names[rng.integers(0, len(names), n_info)]
+    topics = np.array(HOTSPOTS)[rng.integers(0, len(HOTSPOTS), n_info)]
+    inputs.info_rows = pd.DataFrame({
+        'stock_name': stock_names,
+        'info_type': info_types[rng.integers(0, len(info_types), n_info)],
+        'publish_time': pd.to_datetime(rng.choice(dates, n_info)).strftime('%Y-%m-%d 09:30:00'),
+        'source': '合成来源',
+        'title': [f"{s}：{t}业务取得进展{i}" for i, (s, t) in enumerate(zip(stock_names, topics))],
+        'summary': [f"公司在{t}方向的订单和产能持续增长，预计贡献增量收入" for t in topics],
+        'author': '',
+        'url': '',
+    })
+
+    inputs.price_panel = build_price_panel(dates, inputs.market_overview['code'].tolist(), seed)
+
+    _write_files(inputs)
+    return inputs
+
+
+def build_price_panel(dates: list, codes: list, seed: int = 0):
+    """全市场的前复权开高低收行情面板（随机游走），约 3% 的格子为停牌（NaN）"""
+    from market_panel import MarketPanel
+
+    rng = np.random.default_rng(seed)
+    shape = (len(dates), len(codes))
+    pct = rng.normal(0, 2.5, shape).clip(-10, 10)
+    close = 10 * np.cumprod(1 + pct / 100, axis=0)
+    high = close * (1 + rng.uniform(0, 0.03, shape))
+    low = close * (1 - rng.uniform(0, 0.03, shape))
+    open_ = low + (high - low) * rng.random(shape)
+    suspended = rng.random(shape) < 0.03
+    fields = {'涨跌幅': pct, '开盘价_前': open_, '最高价_前': high, '最低价_前': low, '收盘价_前': close}
+    for values in fields.values():
+        values[suspended] = np.nan
+    return MarketPanel(dates=dates, codes=codes, names=codes, fields=fields)
+
+
+def _parse_jygs(payload: list, trade_date: str) -> pd.DataFrame:
+    from jygs import JygsUtils
+    return JygsUtils._parse_action_field(payload, trade_date)
+
+
+def _write_files(inputs: BenchInputs) -> None:
+    """写入被测函数读取的文件"""
+    jygs_dir = os.path.join(inputs.workdir, 'data', 'csv', 'jygs')
+    os.makedirs(jygs_dir, exist_ok=True)
+    build_bk_history(inputs.dates).to_csv(os.path.join(jygs_dir, 'jygs_bk_his.csv'), index=False, encoding='utf-8-sig')
+
+    # 前一交易日的合并结果，供 compare_previous 对比：替换约两成股票
+    previous = inputs.core_pool.copy()
+    replaced = previous.sample(frac=0.2, random_state=1).index
+    others = inputs.market_overview[~inputs.market_overview['code'].isin(previous['code'])]
+    previous.loc[replaced, ['股票简称', 'code']] = others[['股票简称', 'code']].head(len(replaced)).to_numpy()
+    previous['code'] = "'" + previous['code'].astype(str)
+    output_dir = os.path.join(inputs.workdir, 'output', inputs.previous_date)
+    os.makedirs(output_dir, exist_ok=True)
+    previous.to_csv(os.path.join(output_dir, 'core_stocks.csv'), index=False, encoding='utf-8-sig')
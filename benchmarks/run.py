@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+端到端基准测试
+对热点函数计时，结果保存为 JSON，并与基线或上一次运行结果对比，超过阈值视为性能回退
+
+用法:
+    python -m benchmarks.run                         # 1× 规模，与最近一次结果对比
+    python -m benchmarks.run --scale 1 10 100        # 多个历史规模
+    python -m benchmarks.run --save-baseline         # 把本次结果保存为基线
+    python -m benchmarks.run --fail-on-regression    # 有回退时退出码为 1，用于 CI
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+# 基准测试不访问问财，使用 pywencai 替身
+os.environ.setdefault('WENCAI_BACKEND', 'fake')
+
+import pandas as pd
+
+from benchmarks.fixtures import build_inputs, BenchInputs
+
+# 配置常量
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_REPEATS = 5
+DEFAULT_THRESHOLD = 0.15      # 中位数变慢超过 15% 视为回退
+MIN_DELTA_SECONDS = 0.002     # 绝对差值小于 2ms 时忽略，避免微小用例的噪声
+
+
+def _install_calendar(dates: list) -> None:
+    """用基准输入的交易日初始化各模块的交易日历，避免访问网络"""
+    import merge
+    import wencai
+    import jygs
+    import stock_pool
+    trading_days = set(pd.to_datetime(dates))
+    for module in (merge, wencai, jygs, stock_pool):
+        module.trading_calendar._trading_days = trading_days
+
+
+def build_cases(inputs: BenchInputs) -> list:
+    """
+    返回 [(用例名, 函数, 每次计时前的准备函数或None)]
+
+    函数都在 inputs.workdir 中执行
+    """
+    from wencai import WencaiUtils
+    from jygs import JygsUtils
+    from stock_pool import StockPool
+    from merge import MarketData, merge_data, identify_emerging_hotspots, compare_previous
+    from hotspot_cube import HotspotCube, BK_HIS_PATH
+    from info_index import InfoIndex
+    from indicators import compute_indicators
+
+    market_data = MarketData(inputs.market_overview, inputs.zt_latest, inputs.jygs_latest)
+    cube_path = os.path.join(inputs.workdir, 'data', 'npz', 'bench_cube.npz')
+    index_dir = os.path.join(inputs.workdir, 'data', 'index', 'bench')
+    merged = merge_data(inputs.core_pool.copy(), market_data, 'core_stocks', inputs.trade_date)
+    warm_cube = HotspotCube.load_synced(BK_HIS_PATH, cube_path)
+    search_index = InfoIndex(os.path.join(inputs.workdir, 'data', 'index', 'search'))
+    search_index.add_documents(inputs.info_rows, 'core', inputs.trade_date)
+
+    def remove_cube():
+        if os.path.exists(cube_path):
+            os.remove(cube_path)
+
+    def remove_index():
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+    return [
+        ('wencai.normalize_market_overview',
+         lambda: (WencaiUtils._normalize_market_overview(inputs.raw_overview, inputs.trade_date),
+                  WencaiUtils._normalize_market_overview(inputs.raw_overview_bj, inputs.trade_date, True)), None),
+        ('wencai.normalize_zt_stocks',
+         lambda: WencaiUtils._normalize_zt_stocks(inputs.raw_zt, inputs.trade_date), None),
+        ('wencai.normalize_top_stocks',
+         lambda: [WencaiUtils._normalize_top_stocks(raw, days) for days, raw in inputs.raw_top], None),
+        ('jygs.parse_action_field',
+         lambda: JygsUtils._parse_action_field(inputs.jygs_payload, inputs.trade_date), None),
+        ('stock_pool.calc_importance',
+         lambda: StockPool.calc_importance(inputs.top_rows), None),
+        ('merge.merge_data',
+         lambda: merge_data(inputs.core_pool.copy(), market_data, 'core_stocks', inputs.trade_date), None),
+        ('merge.identify_emerging_hotspots',
+         lambda: identify_emerging_hotspots(inputs.trade_date), None),
+        ('merge.compare_previous',
+         lambda: compare_previous(merged, inputs.trade_date), None),
+        ('dashboard.rotation_cold_sync',
+         lambda: HotspotCube.load_synced(BK_HIS_PATH, cube_path).rotation(10, 5, 20), remove_cube),
+        ('dashboard.rotation_warm',
+         lambda: warm_cube.rotation(10, 5, 20), None),
+        ('info_index.add_documents',
+         lambda: InfoIndex(index_dir).add_documents(inputs.info_rows, 'core', inputs.trade_date), remove_index),
+        ('info_index.search',
+         lambda: search_index.search('订单 增长', limit=200), None),
+        ('indicators.compute_indicators',
+         lambda: compute_indicators(inputs.price_panel), None),
+    ]
+
+
+def time_case(func, setup=None, repeats: int = DEFAULT_REPEATS, warmup: int = 1) -> dict:
+    """多次计时，返回中位数、最小值、平均值和标准差（秒）"""
+    timings = []
+    for i in range(warmup + repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'mean_s': statistics.fmean(timings),
+        'stdev_s': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'repeats': repeats,
+    }
+
+
+def run_scale(scale: int, repeats: int, case_filter: str = None, seed: int = 0) -> dict:
+    """在临时目录中生成输入并运行全部用例"""
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix=f'bench_{scale}x_')
+    try:
+        os.chdir(workdir)
+        start = time.perf_counter()
+        inputs = build_inputs(workdir, scale, seed)
+        _install_calendar(inputs.dates)
+        cases = build_cases(inputs)
+        print(f"[{scale}x] 输入生成完成, 耗时: {time.perf_counter() - start:.1f}秒, "
+              f"历史交易日: {len(inputs.dates)}, 行情: {len(inputs.market_overview)}行")
+
+        results = {}
+        for name, func, setup in cases:
+            if case_filter and case_filter not in name:
+                continue
+            result = time_case(func, setup, repeats)
+            results[f"{name}@{scale}x"] = result
+            print(f"  {name:<40} median {result['median_s'] * 1000:10.2f} ms")
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def _latest_result(exclude: str = None) -> str:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith('.json') and f != exclude)
+    return os.path.join(RESULTS_DIR, files[-1]) if files else None
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    对比两次运行的中位数
+
+    Returns:
+        list: [(用例, 本次秒数, 基线秒数, 比值, 状态)]，状态为 ok / regressed / improved / new
+    """
+    rows = []
+    for key, result in current['results'].items():
+        now = result['median_s']
+        before = baseline['results'].get(key, {}).get('median_s') if baseline else None
+        if before is None:
+            rows.append((key, now, None, None, 'new'))
+            continue
+        ratio = now / before if before > 0 else float('inf')
+        status = 'ok'
+        if abs(now - before) >= MIN_DELTA_SECONDS:
+            if ratio > 1 + threshold:
+                status = 'regressed'
+            elif ratio < 1 / (1 + threshold):
+                status = 'improved'
+        rows.append((key, now, before, ratio, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准测试")
+    parser.add_argument('--scale', type=int, nargs='+', default=[1], help="历史规模倍数，如 1 10 100")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help="每个用例的计时次数")
+    parser.add_argument('--filter', help="只运行名称包含该字符串的用例")
+    parser.add_argument('--baseline', help="对比的结果文件，默认基线文件，不存在时使用最近一次结果")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="回退阈值（比例）")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--fail-on-regression', action='store_true', help="有回退时退出码为 1")
+    parser.add_argument('--verbose', action='store_true', help="输出被测模块的日志")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_git_commit()}"
+    current = {
+        'run_id': run_id,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'scales': args.scale,
+        'results': {},
+    }
+    for scale in args.scale:
+        current['results'].update(run_scale(scale, args.repeats, args.filter))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, f"{run_id}.json")
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {result_path}")
+
+    baseline_path = args.baseline or (BASELINE_PATH if os.path.exists(BASELINE_PATH)
+                                      else _latest_result(exclude=os.path.basename(result_path)))
+    baseline = None
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"对比基准: {baseline_path} ({baseline.get('git_commit')})")
+
+    rows = compare(current, baseline, args.threshold)
+    print(f"{'用例':<48}{'本次(ms)':>12}{'基准(ms)':>12}{'比值':>8}  状态")
+    for key, now, before, ratio, status in rows:
+        before_text = f"{before * 1000:12.2f}" if before is not None else f"{'-':>12}"
+        ratio_text = f"{ratio:8.2f}" if ratio is not None else f"{'-':>8}"
+        print(f"{key:<48}{now * 1000:12.2f}{before_text}{ratio_text}  {status}")
+
+    if args.save_baseline:
+        shutil.copyfile(result_path, BASELINE_PATH)
+        print(f"基线已更新: {BASELINE_PATH}")
+
+    regressed = [row[0] for row in rows if row[4] == 'regressed']
+    if regressed:
+        print(f"性能回退: {regressed}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+列式存储工具
+以 .npz 文件按列保存数组/DataFrame，读取时只加载需要的列
+"""
+
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+import logging
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 保存DataFrame时记录列顺序的键
+COLUMNS_KEY = '__columns__'
+
+
+def save_arrays(file_path: str, **arrays) -> None:
+    """
+    原子写入多个数组到 .npz 文件（先写临时文件再替换，避免读到半个文件）
+
+    Args:
+        file_path: 目标文件路径
+        **arrays: 数组名 -> numpy数组
+    """
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, file_path)
+
+
+def load_arrays(file_path: str, keys: list = None) -> dict:
+    """
+    读取 .npz 文件中的数组，keys 为 None 时读取全部
+
+    Returns:
+        dict: 数组名 -> numpy数组；文件不存在时返回空字典
+    """
+    if not os.path.exists(file_path):
+        return {}
+    with np.load(file_path, allow_pickle=False) as data:
+        names = data.files if keys is None else [k for k in keys if k in data.files]
+        return {name: data[name] for name in names}
+
+
+def load_rows(file_path: str, keys: list, row: int) -> dict:
+    """
+    只读取 .npz 文件中若干二维数组的某一行，不加载整个数组
+
+    save_arrays 写入的成员不压缩，直接按成员在文件中的偏移做内存映射
+
+    Returns:
+        dict: 数组名 -> 该行的一维数组；文件不存在时返回空字典
+    """
+    if not os.path.exists(file_path):
+        return {}
+    rows = {}
+    with zipfile.ZipFile(file_path) as archive, open(file_path, 'rb') as f:
+        members = set(archive.namelist())
+        for key in keys:
+            member = f"{key}.npy"
+            if member not in members:
+                continue
+            info = archive.getinfo(member)
+            if info.compress_type != zipfile.ZIP_STORED:
+                with np.load(file_path, allow_pickle=False) as data:
+                    rows[key] = data[key][row]
+                continue
+            # 本地文件头固定30字节，其后是文件名和扩展字段
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            matrix = np.memmap(f, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                               order='F' if fortran_order else 'C')
+            rows[key] = np.array(matrix[row])
+            del matrix
+    return rows
+
+
+def save_frame(file_path: str, df: pd.DataFrame) -> None:
+    """
+    按列保存DataFrame，字符串列转为定长unicode数组
+
+    Args:
+        file_path: 目标文件路径
+        df: 要保存的数据
+    """
+    arrays = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            arrays[col] = series.to_numpy()
+        else:
+            arrays[col] = series.fillna('').astype(str).to_numpy(dtype=str)
+    arrays[COLUMNS_KEY] = np.array([str(col) for col in df.columns], dtype=str)
+    save_arrays(file_path, **arrays)
+
+
+def load_frame(file_path: str, columns: list = None) -> pd.DataFrame:
+    """
+    读取按列保存的DataFrame，只加载指定列
+
+    Args:
+        file_path: 文件路径
+        columns: 需要读取的列，None 表示全部
+
+    Returns:
+        pd.DataFrame: 文件不存在时返回空DataFrame
+    """
+    if not os.path.exists(file_path):
+        return pd.DataFrame(columns=columns or [])
+    with np.load(file_path, allow_pickle=False) as data:
+        all_columns = data[COLUMNS_KEY].tolist() if COLUMNS_KEY in data.files else data.files
+        selected = all_columns if columns is None else [c for c in columns if c in all_columns]
+        return pd.DataFrame({col: data[col] for col in selected}, columns=selected)
@@ -5,6 +5,12 @@ import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
 import os
+import math
+from hotspot_cube import HotspotCube, BK_HIS_PATH, EXCLUDE_HOTSPOTS, is_hotspot_similar
+from table_store import TableStore
+from info_index import InfoIndex, get_current_pool_stocks
+from sector_analytics import SectorPanel, SECTOR_PATH, METRICS as SECTOR_METRICS
+from limit_moves import LimitMoveStats, LIMIT_STATS_DIR, DAILY_FILE, build_ladder, read_limit_file
 # from trading_calendar import TradingCalendar
 
 import warnings
@@ -21,29 +27,14 @@ OUTPUT_PATH = f"./output"
 latest_date = max(os.listdir(OUTPUT_PATH), key=lambda x: x if x.isdigit() else '0')
 BASE_PATH = f"./output/{latest_date}/"
 
-# 日期名称映射
-day_map = {
-    'Monday': '一',
-    'Tuesday': '二', 
-    'Wednesday': '三',
-    'Thursday': '四',
-    'Friday': '五',
-    'Saturday': '六',
-    'Sunday': '日'
-}
+# 全文索引目录
+INFO_INDEX_DIR = "./data/index/info"
 
-def load_data(file_path):
-    """加载数据并进行预处理"""
-    try:
-        df = pd.read_csv(file_path,dtype={'交易日期': str})
-        # 转换日期格式
-        df['交易日期'] = pd.to_datetime(df['交易日期'], format='%Y%m%d')
-        # 重命名列以便后续处理
-        df = df.rename(columns={'交易日期': '日期', '股票数量': '数量'})
-        return df
-    except Exception as e:
-        st.error(f"数据加载失败: {e}")
-        return None
+# 分页配置
+PAGE_SIZE_OPTIONS = [50, 100, 200, 500]
+
+# 股票信息详情展示需要的列
+INFO_DETAIL_COLUMNS = ['stock_name', 'info_type', 'publish_time', 'source', 'author', 'url', 'title', 'summary']
 
 def plot_pie(df, title):
     """绘制热点分布饼状图"""
@@ -61,9 +52,8 @@ def plot_pie(df, title):
     hotspot_counts.columns = ['热点', '股票数量']
     
     # 过滤掉一些通用热点，只保留有意义的热点
-    exclude_hotspots = ['公告', '其他', 'ST板块', '']
     hotspot_counts = hotspot_counts[
-        (~hotspot_counts['热点'].isin(exclude_hotspots)) & 
+        (~hotspot_counts['热点'].isin(EXCLUDE_HOTSPOTS + [''])) & 
         (hotspot_counts['股票数量'] > 1)  # 只显示包含2只以上股票的热点
     ]
     
@@ -98,10 +88,6 @@ def plot_pie(df, title):
     
     st.plotly_chart(fig, use_container_width=True)
 
-def is_hotspot_similar(hotspot_a: str, hotspot_b: str) -> bool:
-    """判断两个热点是否相似"""
-    return (hotspot_a in hotspot_b) or (hotspot_b in hotspot_a)
-
 def unify_similar_hotspots(df):
     """统一相似热点，保留最新日期的热点名称"""
     if df is None or df.empty:
@@ -163,15 +149,6 @@ def unify_similar_hotspots(df):
     
     return df_copy
 
-def filter_data(df):
-    """过滤掉ST板块、其他、公告热点"""
-    if df is None:
-        return None
-    
-    exclude_hotspots = ['ST板块', '其他', '公告']
-    filtered_df = df[~df['热点'].isin(exclude_hotspots)]
-    return filtered_df
-
 def get_latest_jygs_file():
     """获取最新交易日的jygs文件路径"""
     jygs_dir = "./data/csv/jygs/"
@@ -316,15 +293,17 @@ def display_latest_jygs_data():
     except Exception as e:
         st.error(f"加载异动股票数据失败: {e}")
 
-def plot_hotspot_rotation(df):
+@st.cache_resource
+def load_hotspot_cube(mtime: float):
+    """加载热点轮动矩阵，jygs_bk_his 文件更新时间变化后重新同步"""
+    return HotspotCube.load_synced(BK_HIS_PATH)
+
+def plot_hotspot_rotation(cube):
     """绘制热点轮动图表"""
-    if df is None or df.empty:
+    if cube is None or len(cube.dates) == 0:
         st.warning("没有可用的数据")
         return
     
-    # 获取排序后的日期
-    sorted_dates = sorted(df["日期"].unique(), reverse=True)
-    
     # 设置参数选项
     options_m = [1, 2, 3, 5, 10, 15, 20, 25, 30]
     options_n = [1, 2, 3, 5, 10, 15, 20, 25, 30]
@@ -341,67 +320,25 @@ def plot_hotspot_rotation(df):
     with col3:
         k = st.selectbox("图表展示天数:", options_k, index=1)
 
-    # 数据处理逻辑
-    top_dates = sorted_dates[:m]
-    recent_data = df[df['日期'].isin(top_dates)]
-    
-    # 获取每日前N热点
-    top_hotspots_per_date = (
-        recent_data.sort_values(["日期", "数量"], ascending=[False, False])
-        .groupby("日期")
-        .head(n)
-    )
-    
-    # 获取近期高位热点
-    recent_hotspots = top_hotspots_per_date['热点'].unique()
-    
-    # 过滤包含高位热点的所有数据
-    core_hotspots_data = df[df['热点'].isin(recent_hotspots)]
-    
-    # 创建日期和热点的笛卡尔积，补零缺失数据
-    unique_dates = core_hotspots_data["日期"].unique()
-    all_combinations = pd.DataFrame(
-        [(date, hotspot) for date in unique_dates for hotspot in recent_hotspots],
-        columns=["日期", "热点"]
-    )
-    
-    # 合并数据并填充缺失值
-    complete_data = all_combinations.merge(
-        core_hotspots_data, on=["日期", "热点"], how="left"
-    ).fillna({"数量": 0})
-    
-    complete_data["数量"] = complete_data["数量"].astype(int)
-    
-    # 筛选展示天数的数据
-    display_data = complete_data[complete_data['日期'].isin(sorted_dates[:k])]
-    
-    # 创建日期显示格式
-    display_data = display_data.copy()
-    display_data['日期显示'] = (
-        display_data['日期'].dt.strftime('%Y-%m-%d') + 
-        '(' + display_data['日期'].dt.day_name().map(day_map) + ')'
-    )
-    
-    # 按日期排序
-    display_data = display_data.sort_values(by="日期")
+    # 在矩阵上切片：最近m天每日前n名热点的并集，展示最近k天
+    dates, hotspots, counts = cube.rotation(m, n, k)
+    if len(hotspots) == 0:
+        st.warning("没有可用的数据")
+        return
+    date_labels = cube.date_labels(dates)
     
     # 创建折线图
     fig = go.Figure()
     
-    # 按最新日期的股票数量排序热点
-    latest_date = display_data['日期'].max()
-    latest_data = display_data[display_data['日期'] == latest_date]
-    hotspots_sorted = latest_data.sort_values('数量', ascending=False)['热点'].tolist()
-    
-    # 为每个热点创建折线（按排序后的顺序）
-    for hotspot in hotspots_sorted:
-        hotspot_data = display_data[display_data['热点'] == hotspot]
+    # 为每个热点创建折线（已按最新日期的股票数量排序）
+    for i, hotspot in enumerate(hotspots):
+        values = counts[:, i]
         fig.add_trace(go.Scatter(
-            x=hotspot_data['日期显示'],
-            y=hotspot_data['数量'],
+            x=date_labels,
+            y=values,
             mode='lines+markers+text',
             name=hotspot,
-            text=hotspot_data['数量'],
+            text=values,
             textposition='top center',
             line=dict(width=2),
             marker=dict(size=6)
@@ -491,7 +428,7 @@ def plot_hotspot_distribution(df, title="热点分布"):
     
     # 过滤掉不需要的热点
     filtered_df = df_unified[
-        ~df_unified['热点'].isin(['ST板块', '其他', '公告'])
+        ~df_unified['热点'].isin(EXCLUDE_HOTSPOTS)
     ]
     
     # 统计每个热点的股票数量
@@ -534,6 +471,23 @@ def plot_hotspot_distribution(df, title="热点分布"):
     
     st.plotly_chart(fig, use_container_width=True)
 
+def render_pager(total, key):
+    """分页控件，返回 (页码, 每页行数)"""
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("每页行数:", PAGE_SIZE_OPTIONS, index=0, key=f"page_size_{key}")
+    page_count = max(1, math.ceil(total / page_size))
+    with col2:
+        page = st.number_input(
+            f"页码（共{page_count}页）:",
+            min_value=1,
+            max_value=page_count,
+            value=1,
+            step=1,
+            key=f"page_{key}_{page_size}_{page_count}"
+        )
+    return int(page), page_size
+
 def display_csv_data(file_path, title, description="", show_industry_chart=False, show_hotspot_chart=False, enable_filters=False):
     """展示CSV文件数据"""
     if not os.path.exists(file_path):
@@ -541,22 +495,23 @@ def display_csv_data(file_path, title, description="", show_industry_chart=False
         return
     
     try:
-        df = pd.read_csv(file_path,dtype={'交易日期': str,'涨停日期': str,'异动日期': str})
+        columns = TableStore.read_columns(file_path)
         
         # 显示标题和描述
         st.subheader(f"📊 {title}")
         if description:
             st.markdown(description)
         
-        # 筛选功能
+        # 筛选功能：条件下推到列投影上执行，不加载整表
+        filters = {}
         if enable_filters:
             st.markdown("**数据筛选：**")
             col_filter1, col_filter2 = st.columns(2)
             
             with col_filter1:
                 # 热点筛选
-                if '热点' in df.columns:
-                    hotspots = ['全部'] + sorted(df['热点'].unique().tolist())
+                if '热点' in columns:
+                    hotspots = ['全部'] + TableStore.distinct(file_path, '热点')
                     selected_hotspot = st.selectbox(
                         "选择热点类别:",
                         options=hotspots,
@@ -564,11 +519,11 @@ def display_csv_data(file_path, title, description="", show_industry_chart=False
                     )
                     
                     if selected_hotspot != '全部':
-                        df = df[df['热点'] == selected_hotspot]
+                        filters['热点'] = ('eq', selected_hotspot)
             
             with col_filter2:
                 # 市值筛选
-                if '市值Z' in df.columns:
+                if '市值Z' in columns:
                     market_cap_options = ['全部', '>50亿']
                     selected_market_cap = st.selectbox(
                         "选择市值条件:",
@@ -577,47 +532,54 @@ def display_csv_data(file_path, title, description="", show_industry_chart=False
                     )
                     
                     if selected_market_cap == '>50亿':
-                        df = df[df['市值Z'] > 50]
+                        filters['市值Z'] = ('gt', 50)
+        
+        # 统计指标和分布图只需要少量列
+        stat_columns = [col for col in ['交易日期', '异动日期', '热点', '行业', '涨跌幅', '最新涨跌幅', '股票简称']
+                        if col in columns]
+        stats_df = TableStore.filtered(file_path, stat_columns, filters)
         
         # 显示基本统计信息
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("总记录数", len(df))
+            st.metric("总记录数", len(stats_df))
         with col2:
-            if '热点' in df.columns:
-                unique_hotspots = df['热点'].nunique()
+            if '热点' in stats_df.columns:
+                unique_hotspots = stats_df['热点'].nunique()
                 st.metric("热点数量", unique_hotspots)
-            elif '行业' in df.columns:
-                unique_industries = df['行业'].nunique()
+            elif '行业' in stats_df.columns:
+                unique_industries = stats_df['行业'].nunique()
                 st.metric("行业数量", unique_industries)
             else:
-                st.metric("列数", len(df.columns))
+                st.metric("列数", len(columns))
         with col3:
-            if '涨跌幅' in df.columns:
-                avg_change = df['涨跌幅'].mean()
+            if '涨跌幅' in stats_df.columns:
+                avg_change = stats_df['涨跌幅'].mean()
                 st.metric("平均涨跌幅", f"{avg_change:.2f}%")
-            elif '最新涨跌幅' in df.columns:
-                avg_change = df['最新涨跌幅'].mean()
+            elif '最新涨跌幅' in stats_df.columns:
+                avg_change = stats_df['最新涨跌幅'].mean()
                 st.metric("平均涨跌幅", f"{avg_change:.2f}%")
-            elif '股票简称' in df.columns:
-                st.metric("股票数量", len(df))
+            elif '股票简称' in stats_df.columns:
+                st.metric("股票数量", len(stats_df))
         
-        # 显示数据表格
+        # 分页显示数据表格
+        page, page_size = render_pager(len(stats_df), f"csv_{title}")
+        result = TableStore.query(file_path, columns, filters, page=page, page_size=page_size)
         st.dataframe(
-            df, 
+            result.data, 
             use_container_width=True,
             height=400
         )
         
         # 如果需要显示行业分布图
-        if show_industry_chart and '行业' in df.columns and len(df) > 0:
+        if show_industry_chart and '行业' in stats_df.columns and len(stats_df) > 0:
             st.markdown("**行业分布：**")
-            plot_industry_distribution(df, f"{title}行业分布")
+            plot_industry_distribution(stats_df, f"{title}行业分布")
         
         # 如果需要显示热点分布图
-        if show_hotspot_chart and '热点' in df.columns and len(df) > 0:
+        if show_hotspot_chart and '热点' in stats_df.columns and len(stats_df) > 0:
             st.markdown("**热点分布：**")
-            plot_hotspot_distribution(df, f"{title}热点分布")
+            plot_hotspot_distribution(stats_df, f"{title}热点分布")
         
     except Exception as e:
         st.error(f"加载{title}数据失败: {e}")
@@ -629,7 +591,7 @@ def display_stock_info_data(file_path, title, description="", file_type="default
         return
     
     try:
-        df = pd.read_csv(file_path)
+        columns = TableStore.read_columns(file_path)
         
         # 显示标题和描述
         st.subheader(f"📰 {title}")
@@ -637,114 +599,108 @@ def display_stock_info_data(file_path, title, description="", file_type="default
             st.markdown(description)
         
         # 显示基本统计信息
+        stats_df = TableStore.load_columns(file_path, ['stock_name', 'info_type', 'source'])
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("总记录数", len(df))
+            st.metric("总记录数", TableStore.count(file_path))
         with col2:
-            if 'stock_name' in df.columns:
-                unique_stocks = df['stock_name'].nunique()
+            if 'stock_name' in stats_df.columns:
+                unique_stocks = stats_df['stock_name'].nunique()
                 st.metric("股票数量", unique_stocks)
         with col3:
-            if 'info_type' in df.columns:
-                info_type_counts = df['info_type'].value_counts()
+            if 'info_type' in stats_df.columns:
+                info_type_counts = stats_df['info_type'].value_counts()
                 st.metric("信息类型", len(info_type_counts))
         with col4:
-            if 'source' in df.columns:
-                unique_sources = df['source'].nunique()
+            if 'source' in stats_df.columns:
+                unique_sources = stats_df['source'].nunique()
                 st.metric("信息来源", unique_sources)
         
+        filters = {}
         
         # 股票筛选器
-        if 'stock_name' in df.columns:
+        if 'stock_name' in columns:
             st.markdown("**股票筛选：**")
             selected_stocks = st.multiselect(
                 "选择要查看的股票（留空显示全部）:",
-                options=sorted(df['stock_name'].unique()),
+                options=TableStore.distinct(file_path, 'stock_name'),
                 default=[],
                 key=f"stock_select_{file_type}"
             )
-            
-            if selected_stocks:
-                df = df[df['stock_name'].isin(selected_stocks)]
+            filters['stock_name'] = ('isin', selected_stocks)
         
         # 信息类型筛选器
-        if 'info_type' in df.columns:
+        if 'info_type' in columns:
             selected_info_types = st.multiselect(
                 "选择信息类型（留空显示全部）:",
-                options=sorted(df['info_type'].unique()),
+                options=TableStore.distinct(file_path, 'info_type'),
                 default=[],
                 key=f"type_select_{file_type}"
             )
-            
-            if selected_info_types:
-                df = df[df['info_type'].isin(selected_info_types)]
+            filters['info_type'] = ('isin', selected_info_types)
+        
+        total = TableStore.count(file_path, filters)
         
         # 显示过滤后的统计
-        if len(df) > 0:
-            st.info(f"过滤后显示 {len(df)} 条记录")
+        if total > 0:
+            st.info(f"过滤后显示 {total} 条记录")
             
-            # 显示数据表格，优化列显示
+            # 只读取表格展示列，分页显示
             display_columns = ['stock_name', 'info_type', 'publish_time', 'source', 'title']
-            if all(col in df.columns for col in display_columns):
-                display_df = df[display_columns].copy()
+            if not all(col in columns for col in display_columns):
+                display_columns = columns
+            page, page_size = render_pager(total, f"info_{file_type}")
+            result = TableStore.query(
+                file_path, display_columns, filters,
+                page=page, page_size=page_size,
+                label_columns=['stock_name', 'info_type', 'title']
+            )
+            
+            display_df = result.data
+            if 'title' in display_df.columns:
                 # 限制标题长度以便更好显示
-                display_df['title'] = display_df['title'].str[:100] + '...'
-                st.dataframe(
-                    display_df,
-                    use_container_width=True,
-                    height=600
-                )
-            else:
-                st.dataframe(
-                    df,
-                    use_container_width=True,
-                    height=600
-                )
+                display_df = display_df.assign(title=display_df['title'].astype(str).str[:100] + '...')
+            st.dataframe(
+                display_df,
+                use_container_width=True,
+                height=600
+            )
             
-            # 详细信息展开
+            # 详细信息展开：选择器只包含当前页，标签已预先向量化生成
             st.markdown("**详细信息查看：**")
-            if len(df) > 0:
-                # 安全地处理标题显示，避免NaN值导致的错误
-                def safe_format_func(x):
-                    try:
-                        row = df.iloc[x]
-                        stock_name = str(row['stock_name']) if pd.notna(row['stock_name']) else '未知'
-                        info_type = str(row['info_type']) if pd.notna(row['info_type']) else '未知'
-                        title = str(row['title'])[:50] if pd.notna(row['title']) else '无标题'
-                        return f"{stock_name} - {info_type} - {title}..."
-                    except:
-                        return f"记录 {x}"
+            labels = result.labels.to_dict()
+            selected_index = st.selectbox(
+                "选择要查看详细信息的记录:",
+                options=list(result.data.index),
+                format_func=lambda x: labels.get(x, f"记录 {x}"),
+                key=f"detail_select_{file_type}"
+            )
+            
+            # 只读取选中的一行
+            selected_row = (TableStore.read_row(file_path, selected_index, INFO_DETAIL_COLUMNS)
+                            if selected_index is not None else None)
+            if selected_row is not None:
+                st.markdown("**详细内容：**")
                 
-                selected_index = st.selectbox(
-                    "选择要查看详细信息的记录:",
-                    options=range(len(df)),
-                    format_func=safe_format_func,
-                    key=f"detail_select_{file_type}"
-                )
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write(f"**股票名称：** {selected_row.get('stock_name')}")
+                    st.write(f"**信息类型：** {selected_row.get('info_type')}")
+                    st.write(f"**发布时间：** {selected_row.get('publish_time')}")
+                    st.write(f"**来源：** {selected_row.get('source')}")
                 
-                if selected_index is not None:
-                    selected_row = df.iloc[selected_index]
-                    st.markdown("**详细内容：**")
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write(f"**股票名称：** {selected_row['stock_name']}")
-                        st.write(f"**信息类型：** {selected_row['info_type']}")
-                        st.write(f"**发布时间：** {selected_row['publish_time']}")
-                        st.write(f"**来源：** {selected_row['source']}")
-                    
-                    with col2:
-                        if 'author' in selected_row and pd.notna(selected_row['author']):
-                            st.write(f"**作者：** {selected_row['author']}")
-                        if 'url' in selected_row and pd.notna(selected_row['url']):
-                            st.write(f"**链接：** {selected_row['url']}")
-                    
-                    st.markdown("**标题：**")
-                    st.write(selected_row['title'])
-                    
-                    if 'summary' in selected_row and pd.notna(selected_row['summary']):
-                        st.markdown("**摘要：**")
-                        st.write(selected_row['summary'])
+                with col2:
+                    if 'author' in selected_row and pd.notna(selected_row['author']):
+                        st.write(f"**作者：** {selected_row['author']}")
+                    if 'url' in selected_row and pd.notna(selected_row['url']):
+                        st.write(f"**链接：** {selected_row['url']}")
+                
+                st.markdown("**标题：**")
+                st.write(selected_row.get('title'))
+                
+                if 'summary' in selected_row and pd.notna(selected_row['summary']):
+                    st.markdown("**摘要：**")
+                    st.write(selected_row['summary'])
         else:
             st.warning("没有符合筛选条件的数据")
         
@@ -763,7 +719,7 @@ def main():
     st.sidebar.title("📊 导航菜单")
     page = st.sidebar.selectbox(
         "选择页面",
-        ["热点轮动", "股票池数据"]
+        ["热点轮动", "板块强度", "连板梯队", "股票池数据", "信息检索"]
     )
     
     if page == "热点轮动":
@@ -771,29 +727,171 @@ def main():
         st.markdown("---")
         show_hotspot_rotation()
         
+    elif page == "板块强度":
+        st.title("📊 板块强度")
+        st.markdown("---")
+        show_sector_strength()
+        
+    elif page == "连板梯队":
+        st.title("🪜 连板梯队")
+        st.markdown("---")
+        show_limit_moves()
+        
     elif page == "股票池数据":
         st.title("📊 股票池数据")
         st.markdown("---")
         show_stock_pool_data()
+        
+    elif page == "信息检索":
+        st.title("🔍 信息检索")
+        st.markdown("---")
+        show_info_search()
+
+@st.cache_resource
+def load_info_index(manifest_mtime: float):
+    """加载全文索引，索引更新后重新加载"""
+    return InfoIndex()
+
+def show_info_search():
+    """显示股票信息全文检索页面"""
+    manifest_path = os.path.join(INFO_INDEX_DIR, "manifest.json")
+    if not os.path.exists(manifest_path):
+        st.warning("全文索引尚未建立")
+        return
+    
+    index = load_info_index(os.path.getmtime(manifest_path))
+    stats = index.stats()
+    st.caption(f"已索引 {stats['documents']} 条信息，最近入库日期: {stats['latest_ingest_date']}")
+    
+    query = st.text_input("关键词（多个关键词用空格分隔）:", key="info_search_query")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        type_labels = {'research_report': '研报', 'news': '新闻', 'announcement': '公告'}
+        selected_types = st.multiselect(
+            "信息类型（留空为全部）:",
+            options=list(type_labels),
+            format_func=lambda x: type_labels[x],
+            key="info_search_types"
+        )
+    with col2:
+        days = st.selectbox("时间范围（天）:", [7, 30, 90, 180, 365], index=1, key="info_search_days")
+    with col3:
+        pool_scope = st.selectbox("股票范围:", ["全部", "当前高位股票池", "当前低位股票池"], key="info_search_scope")
+    
+    if not query.strip():
+        return
+    
+    stock_names = None
+    if pool_scope == "当前高位股票池":
+        stock_names = get_current_pool_stocks('core_stocks')
+    elif pool_scope == "当前低位股票池":
+        stock_names = get_current_pool_stocks('first_stocks')
+    
+    result = index.search(query, info_types=selected_types or None, days=days, stock_names=stock_names)
+    st.info(f"命中 {len(result)} 条记录")
+    if len(result) > 0:
+        st.dataframe(
+            result[['publish_date', 'stock_name', 'info_type', 'source', 'title', 'summary', 'url']],
+            use_container_width=True,
+            height=600
+        )
+
+@st.cache_resource
+def load_sector_panel(mtime: float):
+    """加载板块强度矩阵，文件更新后重新加载"""
+    return SectorPanel.load(SECTOR_PATH)
+
+def show_sector_strength():
+    """显示板块强度排名页面"""
+    if not os.path.exists(SECTOR_PATH):
+        st.warning("板块强度尚未计算")
+        return
+    
+    sector_panel = load_sector_panel(os.path.getmtime(SECTOR_PATH))
+    if len(sector_panel.dates) == 0:
+        st.warning("没有可用的数据")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        trade_date = st.selectbox("交易日期:", sector_panel.dates[::-1].tolist(), key="sector_date")
+    with col2:
+        sort_by = st.selectbox("排序指标:", [m for m in SECTOR_METRICS if m != '成员数'],
+                               index=SECTOR_METRICS.index('强度分位'), key="sector_sort")
+    with col3:
+        top = st.selectbox("显示数量:", [20, 50, 100, 500], key="sector_top")
+    
+    ranking = sector_panel.ranking(trade_date, sort_by=sort_by, top=top)
+    st.caption(f"共 {sector_panel.shape[1]} 个板块，{sector_panel.shape[0]} 个交易日")
+    st.dataframe(ranking.round(3), use_container_width=True, height=600)
+
+@st.cache_resource
+def load_limit_stats(mtime: float):
+    """加载涨跌停统计，文件更新后重新加载"""
+    return LimitMoveStats.load(LIMIT_STATS_DIR)
+
+def show_limit_moves():
+    """显示连板梯队、晋级率和封板时段分布页面"""
+    daily_path = os.path.join(LIMIT_STATS_DIR, DAILY_FILE)
+    if not os.path.exists(daily_path):
+        st.warning("涨跌停统计尚未计算")
+        return
+    
+    stats = load_limit_stats(os.path.getmtime(daily_path))
+    if not stats.dates:
+        st.warning("没有可用的数据")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        trade_date = st.selectbox("交易日期:", stats.dates[::-1], key="limit_date")
+    with col2:
+        days = st.selectbox("统计天数:", [5, 20, 60, 120], index=1, key="limit_days")
+    
+    day = stats.day(trade_date)
+    metric_cols = st.columns(5)
+    metric_cols[0].metric("涨停", f"{day['涨停数']:.0f}")
+    metric_cols[1].metric("跌停", f"{day['跌停数']:.0f}" if pd.notna(day['跌停数']) else "-")
+    metric_cols[2].metric("炸板率", f"{day['炸板率']:.0%}" if pd.notna(day['炸板率']) else "-")
+    metric_cols[3].metric("最高板", f"{day['最高板']:.0f}")
+    metric_cols[4].metric("晋级率", f"{day['晋级率']:.0%}" if pd.notna(day['晋级率']) else "-")
+    
+    st.subheader("连板梯队")
+    st.dataframe(build_ladder(read_limit_file('zt', trade_date)), use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader(f"近{days}日各高度晋级率")
+        st.dataframe(stats.promotion_rates(trade_date, days).round(3), use_container_width=True)
+    with col2:
+        st.subheader(f"近{days}日首次封板时段")
+        seal = stats.seal_distribution(trade_date, days)
+        st.plotly_chart(px.bar(seal, x='时段', y='涨停数', hover_data=['占比', '开板比例']), use_container_width=True)
+    
+    history = stats.daily[stats.daily['交易日期'].astype(str) <= trade_date].tail(days)
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=history['交易日期'], y=history['炸板率'], name='炸板率'))
+    fig.add_trace(go.Scatter(x=history['交易日期'], y=history['晋级率'], name='晋级率'))
+    fig.update_layout(title="炸板率 / 晋级率", xaxis_type='category', height=350)
+    st.plotly_chart(fig, use_container_width=True)
 
 def show_hotspot_rotation():
     """显示热点轮动页面"""
-    # 数据文件路径
-    data_path = "./data/csv/jygs/jygs_bk_his.csv"
+    if not os.path.exists(BK_HIS_PATH):
+        st.error("无法加载数据，请检查文件路径和格式")
+        return
     
-    # 加载数据
+    # 加载热点轮动矩阵（按天增量同步）
     with st.spinner("正在加载数据..."):
-        raw_data = load_data(data_path)
+        try:
+            cube = load_hotspot_cube(os.path.getmtime(BK_HIS_PATH))
+        except Exception as e:
+            st.error(f"数据加载失败: {e}")
+            cube = None
     
-    if raw_data is not None:
-        # 过滤数据
-        filtered_data = filter_data(raw_data)
-        
-        # 统一相似热点
-        unified_data = unify_similar_hotspots(filtered_data)
-        
+    if cube is not None:
         # 绘制热点轮动图
-        plot_hotspot_rotation(unified_data)
+        plot_hotspot_rotation(cube)
         
         # 添加分隔线
         st.markdown("---")
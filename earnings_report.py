@@ -3,7 +3,7 @@ import akshare as ak
 import os
 from log_setup import get_logger
 from notification import DingDingRobot
-from utils import execute_with_retry
+from retry_policy import call_with_retry
 dingding_robot = DingDingRobot()
 logger = get_logger("earnings_report", "logs", "earnings_report.log")
 DEFAULT_DATA_DIR = './data'
@@ -13,7 +13,7 @@ def main():
         '''
         三季报业绩预增股票20250930
         '''
-        stock_yjyg_em_df = execute_with_retry(ak.stock_yjyg_em, date="20250930")
+        stock_yjyg_em_df = call_with_retry('akshare', ak.stock_yjyg_em, date="20250930")
         cond = (stock_yjyg_em_df['预测指标']=='归属于上市公司股东的净利润') & (stock_yjyg_em_df['预告类型']=='预增')
         stock_yjyg_em_df = stock_yjyg_em_df[cond]
         output_columns = ['股票简称', '业绩变动幅度','预测数值', '公告日期']
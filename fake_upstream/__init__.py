@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+上游替身
+本地模拟问财选股、韭研公社、问财资讯和钉钉接口，用于离线压测和故障演练
+"""
+
+from fake_upstream.config import FakeUpstreamConfig, Behavior
+from fake_upstream.fixtures import SyntheticMarket, fixture_key, load_recorded, save_recorded
+from fake_upstream.server import FakeUpstream, FakeUpstreamServer
+
+__all__ = [
+    'FakeUpstreamConfig', 'Behavior',
+    'SyntheticMarket', 'fixture_key', 'load_recorded', 'save_recorded',
+    'FakeUpstream', 'FakeUpstreamServer',
+]
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+替身服务的行为配置
+延迟、错误率和限流按服务生效，服务端和 pywencai 替身共用
+"""
+
+import os
+import time
+import random
+import threading
+from dataclasses import dataclass, field, replace
+
+from fake_upstream.fixtures import DEFAULT_STOCK_COUNT
+
+SERVICES = ['wencai', 'jygs', 'iwencai', 'dingtalk']
+ENV_PREFIX = 'FAKE_UPSTREAM_'
+
+
+@dataclass
+class FakeUpstreamConfig:
+    """
+    替身服务配置
+
+    - latency_ms / jitter_ms: 每个请求的固定延迟和均匀随机抖动
+    - error_rate: 返回 500 的概率
+    - rate_limit / burst: 令牌桶限流（每秒请求数, 桶容量），rate_limit 为 0 表示不限流，超限返回 429
+    - overrides: {服务名: {字段: 值}}，按服务覆盖上面的参数
+    - seed / stock_count / trade_date: 合成数据的随机种子、股票数量和“今日”日期
+    - fixtures_dir: 录制数据目录，存在对应文件时优先回放
+    """
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    error_rate: float = 0
+    rate_limit: float = 0
+    burst: int = 1
+    overrides: dict = field(default_factory=dict)
+    seed: int = 0
+    stock_count: int = DEFAULT_STOCK_COUNT
+    trade_date: str = None
+    fixtures_dir: str = None
+
+    def for_service(self, service: str) -> 'FakeUpstreamConfig':
+        """合并服务级覆盖后的配置"""
+        return replace(self, **self.overrides.get(service, {}))
+
+    @staticmethod
+    def from_env() -> 'FakeUpstreamConfig':
+        """从 FAKE_UPSTREAM_* 环境变量读取配置，服务级覆盖如 FAKE_UPSTREAM_WENCAI_LATENCY_MS"""
+        casts = {'latency_ms': float, 'jitter_ms': float, 'error_rate': float, 'rate_limit': float,
+                 'burst': int, 'seed': int, 'stock_count': int, 'trade_date': str, 'fixtures_dir': str}
+        values, overrides = {}, {}
+        for name, cast in casts.items():
+            value = os.environ.get(f"{ENV_PREFIX}{name.upper()}")
+            if value:
+                values[name] = cast(value)
+            for service in SERVICES:
+                value = os.environ.get(f"{ENV_PREFIX}{service.upper()}_{name.upper()}")
+                if value:
+                    overrides.setdefault(service, {})[name] = cast(value)
+        return FakeUpstreamConfig(overrides=overrides, **values)
+
+
+class Behavior:
+    """
+    按服务模拟延迟、错误和限流，线程安全；随机数由种子决定，同样的请求序列得到同样的结果
+    """
+
+    def __init__(self, config: FakeUpstreamConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._random = random.Random(config.seed)
+        self._buckets = {}  # 服务名 -> [令牌数, 上次补充时间]
+        self.stats = {}
+
+    def _count(self, service: str, key: str, value: float = 1) -> None:
+        stats = self.stats.setdefault(service, {'requests': 0, 'errors': 0, 'throttled': 0, 'latency_ms': 0.0})
+        stats[key] += value
+
+    def admit(self, service: str) -> tuple:
+        """
+        处理一次请求的限流、延迟和错误注入
+
+        Returns:
+            tuple: (HTTP状态码, 重试等待秒数)；200 表示正常返回
+        """
+        config = self.config.for_service(service)
+        with self._lock:
+            self._count(service, 'requests')
+            if config.rate_limit > 0:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(service, [config.burst, now])
+                tokens = min(config.burst, tokens + (now - last) * config.rate_limit)
+                if tokens < 1:
+                    self._buckets[service] = [tokens, now]
+                    self._count(service, 'throttled')
+                    return 429, (1 - tokens) / config.rate_limit
+                self._buckets[service] = [tokens - 1, now]
+            delay_ms = config.latency_ms + self._random.uniform(0, config.jitter_ms)
+            failed = self._random.random() < config.error_rate
+            self._count(service, 'latency_ms', delay_ms)
+            if failed:
+                self._count(service, 'errors')
+
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        return (500, 0) if failed else (200, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._random = random.Random(self.config.seed)
+            self._buckets.clear()
+            self.stats.clear()
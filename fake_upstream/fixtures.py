@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+合成数据与录制数据
+按随机种子和日期确定性地生成问财选股、韭研公社异动、问财资讯的响应，
+fixtures_dir 中存在录制文件时优先回放录制内容
+"""
+
+import os
+import re
+import json
+import hashlib
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# 合成数据规模
+DEFAULT_STOCK_COUNT = 5000
+BJ_STOCK_RATIO = 0.05
+
+HOTSPOTS = ['人工智能', '机器人', '半导体', '低空经济', '固态电池', '创新药', '算力', '消费电子', '军工', '有色金属']
+BOARDS = ['主板', '创业板', '科创板']
+
+
+def fixture_key(*parts) -> str:
+    """录制文件名使用的请求摘要"""
+    text = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def latest_weekday(now: datetime = None) -> str:
+    """最近一个工作日，作为合成数据的“今日”"""
+    day = now or datetime.now()
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.strftime('%Y%m%d')
+
+
+def trading_minute_text(minute: int) -> str:
+    """开盘后第 minute 个交易分钟对应的时间 HH:MM:00"""
+    total = 9 * 60 + 30 + minute if minute < 120 else 13 * 60 + minute - 120
+    return f"{total // 60:02d}:{total % 60:02d}:00"
+
+
+def parse_query_dates(query: str, latest_date: str) -> tuple:
+    """
+    从问财语句中解析 (区间开始日期, 截止日期)
+
+    支持 'YYYY年MM月DD日'、'YYYYMMDD至YYYYMMDD'、'YYYYMMDD涨跌幅' 三种写法，未指定时为最新日期
+    """
+    match = re.search(r'(\d{4})年(\d{2})月(\d{2})日', query)
+    if match:
+        date = ''.join(match.groups())
+        return date, date
+    ranges = re.findall(r'(\d{8})至(\d{8})', query)
+    singles = re.findall(r'(\d{8})涨跌幅', query)
+    if singles:
+        return (ranges[0][0] if ranges else singles[0]), singles[0]
+    if '最新' in query:
+        return (ranges[0][0] if ranges else latest_date), latest_date
+    if ranges:
+        return ranges[0]
+    return latest_date, latest_date
+
+
+class SyntheticMarket:
+    """
+    确定性的合成A股市场
+
+    股票列表由种子决定，每个交易日的行情由 (种子, 日期) 决定，不同进程生成的数据一致
+    """
+
+    def __init__(self, stock_count: int = DEFAULT_STOCK_COUNT, seed: int = 0, latest_date: str = None):
+        self.seed = seed
+        self.latest_date = latest_date or latest_weekday()
+        rng = np.random.default_rng(seed)
+        bj_count = int(stock_count * BJ_STOCK_RATIO)
+        self.codes = np.array([f"{600000 + i:06d}" if i % 2 else f"{i:06d}" for i in range(stock_count - bj_count)]
+                              + [f"{830000 + i:06d}" for i in range(bj_count)])
+        self.market_codes = np.where(np.char.startswith(self.codes, '6'), '17',
+                                     np.where(np.char.startswith(self.codes, '8'), '151', '33'))
+        self.names = np.array([f"{'ST' if i % 97 == 0 else ''}合成{i:04d}" for i in range(stock_count)])
+        self.is_bj = np.arange(stock_count) >= stock_count - bj_count
+        self.boards = np.where(self.is_bj, '北交所', np.array(BOARDS)[rng.integers(0, len(BOARDS), stock_count)])
+        self.listed_days = rng.integers(10, 8000, stock_count)
+        self.float_shares = rng.uniform(5e7, 5e9, stock_count).round()
+        self.base_price = rng.uniform(3, 150, stock_count).round(2)
+        self.hotspots = np.array(HOTSPOTS)[rng.integers(0, len(HOTSPOTS), stock_count)]
+
+    def _rng(self, *parts) -> np.random.Generator:
+        digest = hashlib.sha1(f"{self.seed}|{'|'.join(map(str, parts))}".encode()).digest()
+        return np.random.default_rng(int.from_bytes(digest[:8], 'little'))
+
+    def day(self, trade_date: str) -> pd.DataFrame:
+        """单个交易日的全市场行情"""
+        rng = self._rng('day', trade_date)
+        n = len(self.codes)
+        limit = np.where(np.isin(self.boards, ['创业板', '科创板']), 20.0, np.where(self.is_bj, 30.0, 10.0))
+        pct = np.clip(rng.standard_t(3, n) * 2.5, -limit, limit).round(2)
+        hit_limit = rng.random(n) < 0.015
+        pct[hit_limit] = limit[hit_limit]
+        prev_close = (self.base_price * np.exp(self._rng('drift', trade_date[:6]).normal(0, 0.1, n))).round(2)
+        close = (prev_close * (1 + pct / 100)).round(2)
+        open_ = (prev_close * (1 + rng.normal(0, 0.01, n))).round(2)
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, n))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, n))
+        volume = (self.float_shares * rng.uniform(0.005, 0.08, n)).round()
+        days_since = (datetime.strptime(trade_date, '%Y%m%d') - datetime.strptime(self.latest_date, '%Y%m%d')).days
+        return pd.DataFrame({
+            'code': self.codes,
+            'market_code': self.market_codes,
+            '股票简称': self.names,
+            '上市板块': self.boards,
+            '上市天数': np.maximum(self.listed_days + days_since, 1),
+            '涨跌幅': pct,
+            '开盘价': open_,
+            '最高价': high.round(2),
+            '最低价': low.round(2),
+            '收盘价': close,
+            '成交量': volume,
+            '成交额': (volume * close).round(),
+            '自由流通股': self.float_shares,
+            '自由流通市值': (self.float_shares * close).round(),
+            '实际换手率': (volume / self.float_shares * 100).round(2),
+            '竞价涨幅': ((open_ / prev_close - 1) * 100).round(2),
+            '竞价量': (volume * rng.uniform(0.01, 0.05, n)).round(),
+            'dde大单净额': (rng.normal(0, 0.05, n) * volume * close).round(),
+            '个股热度排名': rng.permutation(n) + 1,
+            '涨停': pct >= limit - 1e-9,
+            '曾涨停': (pct >= limit - 1e-9) | (rng.random(n) < 0.01),
+            '跌停': pct <= -limit + 1e-9,
+        })
+
+    def window_change(self, start_date: str, end_date: str) -> np.ndarray:
+        """区间累计涨跌幅(%)"""
+        dates = pd.bdate_range(start_date, end_date).strftime('%Y%m%d')
+        log_ret = sum(np.log1p(self.day(d)['涨跌幅'].to_numpy() / 100) for d in dates)
+        return (np.expm1(log_ret) * 100).round(2)
+
+    # ---------------- 问财选股 ----------------
+
+    def wencai_query(self, query: str) -> pd.DataFrame:
+        """按语句关键字生成与问财返回格式一致（含日期后缀）的结果"""
+        start_date, end_date = parse_query_dates(query, self.latest_date)
+        day = self.day(end_date)
+        s = f"[{end_date}]"
+        base = pd.DataFrame({'股票代码': day['code'] + '.' + np.where(day['market_code'] == '17', 'SH', 'SZ'),
+                             '股票简称': day['股票简称'], 'code': day['code'], 'market_code': day['market_code']})
+
+        if '区间涨跌幅' in query:
+            top = int(re.search(r'前(\d+)', query).group(1)) if re.search(r'前(\d+)', query) else 10
+            days = int(re.search(r'最近(\d+)个交易日', query).group(1)) if re.search(r'最近(\d+)个交易日', query) else None
+            if days:
+                start_date = pd.bdate_range(end=end_date, periods=days)[0].strftime('%Y%m%d')
+            mask = self._filter_mask(query, day)
+            change = self.window_change(start_date, end_date)
+            order = np.argsort(-np.where(mask, change, -np.inf), kind='stable')[:min(top, int(mask.sum()))]
+            suffix = f"[{start_date}-{end_date}]"
+            df = base.iloc[order].copy()
+            df[f'区间涨跌幅:前复权{suffix}'] = change[order]
+            df[f'区间涨跌幅:前复权排名{suffix}'] = [f"{i + 1}/{int(mask.sum())}" for i in range(len(order))]
+            df[f'自由流通市值{s}'] = day['自由流通市值'].to_numpy()[order]
+            df[f'上市天数{s}'] = day['上市天数'].to_numpy()[order]
+            return df.reset_index(drop=True)
+
+        if '的次数等于0' in query:
+            threshold = 7 if '大于7%' in query else 9.5
+            mask = self._filter_mask(query, day) & (day['涨跌幅'].to_numpy() > threshold)
+            df = base[mask].copy()
+            df[f'涨跌幅:前复权{s}'] = day['涨跌幅'][mask]
+            df[f'自由流通市值{s}'] = day['自由流通市值'][mask]
+            return df.reset_index(drop=True)
+
+        if '曾涨停' in query:
+            mask = day['曾涨停'].to_numpy()
+            return self._columns(base, day, mask, s, {'涨跌幅:前复权': '涨跌幅', '自由流通市值': '自由流通市值', '上市板块': '上市板块'})
+
+        if '跌停' in query:
+            mask = day['跌停'].to_numpy()
+            df = self._columns(base, day, mask, s, {'涨跌幅:前复权': '涨跌幅', '自由流通市值': '自由流通市值', '上市板块': '上市板块'})
+            return self._limit_details(df, s, '跌停', mask.sum(), end_date)
+
+        if '涨停' in query:
+            mask = day['涨停'].to_numpy()
+            df = self._columns(base, day, mask, s, {'涨跌幅:前复权': '涨跌幅', '自由流通市值': '自由流通市值', '上市板块': '上市板块'})
+            df = self._limit_details(df, s, '涨停', mask.sum(), end_date)
+            df[f'几天几板{s}'] = [f"{b}天{b}板" if b > 1 else '首板涨停' for b in df[f'连续涨停天数{s}']]
+            df[f'涨停原因类别{s}'] = self.hotspots[mask]
+            return df
+
+        if '上市天数' in query:
+            mask = self.is_bj if '非北交所' not in query and '北交所' in query else ~self.is_bj
+            df = self._columns(base, day, mask, s, {
+                '上市板块': '上市板块', '上市天数': '上市天数',
+                '开盘价:不复权': '开盘价', '最高价:不复权': '最高价', '最低价:不复权': '最低价', '收盘价:不复权': '收盘价',
+                '开盘价:前复权': '开盘价', '最高价:前复权': '最高价', '最低价:前复权': '最低价', '收盘价:前复权': '收盘价',
+                '成交额': '成交额', '成交量': '成交量', '竞价涨幅': '竞价涨幅', '竞价量': '竞价量',
+                '实际换手率': '实际换手率', '自由流通市值': '自由流通市值', '自由流通股': '自由流通股',
+                '个股热度排名': '个股热度排名',
+            })
+            df['最新涨跌幅'] = day['涨跌幅'][mask].to_numpy()
+            df[f'竞价金额{s}'] = (day['竞价量'] * day['开盘价'])[mask].round().to_numpy()
+            df[f'几天几板{s}'] = np.where(day['涨停'][mask], '首板涨停', None)
+            if '非北交所' in query:
+                df[f'dde大单净额{s}'] = day['dde大单净额'][mask].to_numpy()
+            return df
+
+        mask = self._filter_mask(query, day)
+        return self._columns(base, day, mask, s, {'涨跌幅:前复权': '涨跌幅', '自由流通市值': '自由流通市值'})
+
+    def _filter_mask(self, query: str, day: pd.DataFrame) -> np.ndarray:
+        mask = np.ones(len(day), dtype=bool)
+        match = re.search(r'自由流通市值大于(\d+)亿', query)
+        if match:
+            mask &= day['自由流通市值'].to_numpy() > int(match.group(1)) * 1e8
+        match = re.search(r'上市天数大于(\d+)', query)
+        if match:
+            mask &= day['上市天数'].to_numpy() > int(match.group(1))
+        if '非ST' in query:
+            mask &= ~np.char.startswith(self.names, 'ST')
+        return mask
+
+    @staticmethod
+    def _columns(base: pd.DataFrame, day: pd.DataFrame, mask: np.ndarray, suffix: str, mapping: dict) -> pd.DataFrame:
+        df = base[mask].copy()
+        for name, source in mapping.items():
+            df[f'{name}{suffix}'] = day[source][mask].to_numpy()
+        return df.reset_index(drop=True)
+
+    def _limit_details(self, df: pd.DataFrame, suffix: str, kind: str, count: int, trade_date: str) -> pd.DataFrame:
+        rng = self._rng(kind, trade_date)
+        first = rng.integers(0, 240, count)
+        last = np.minimum(first + rng.integers(0, 60, count), 239)
+        days_key = '连续涨停天数' if kind == '涨停' else '连续跌停天数'
+        df[f'{days_key}{suffix}'] = np.maximum(rng.geometric(0.6, count), 1)
+        df[f'首次{kind}时间{suffix}'] = [trading_minute_text(m) for m in first]
+        df[f'最终{kind}时间{suffix}'] = [trading_minute_text(m) for m in last]
+        df[f'{kind}类型{suffix}'] = np.where(first == 0, f'一字{kind}', f'放量{kind}')
+        df[f'{kind}封单额{suffix}'] = rng.uniform(1e6, 5e8, count).round()
+        df[f'{kind}开板次数{suffix}'] = rng.integers(0, 4, count)
+        df[f'{kind}封单量占成交量比{suffix}'] = rng.uniform(0, 50, count).round(2)
+        df[f'{kind}封单量占流通a股比{suffix}'] = rng.uniform(0, 5, count).round(2)
+        if kind == '跌停':
+            df[f'跌停原因类型{suffix}'] = '合成跌停原因'
+        return df
+
+    # ---------------- 韭研公社 ----------------
+
+    def jygs_action_field(self, formatted_date: str) -> dict:
+        """韭研公社异动解析 /action/field 响应"""
+        trade_date = formatted_date.replace('-', '')
+        day = self.day(trade_date)
+        limit_up = day[day['涨停']]
+        data = [{'name': '简图', 'list': []}]
+        for hotspot, group in limit_up.groupby(self.hotspots[day['涨停'].to_numpy()], sort=False):
+            data.append({
+                'name': hotspot,
+                'reason': f'{hotspot}方向催化',
+                'list': [{
+                    'name': row['股票简称'],
+                    'code': ('sh' if row['market_code'] == '17' else 'sz') + row['code'],
+                    'article': {'action_info': {
+                        'time': '09:30:00',
+                        'expound': f"{hotspot}+业绩预增\n1、公司主营与{hotspot}相关\n2、合成解析内容",
+                        'shares_range': str(row['涨跌幅'] * 100),
+                        'num': '1天1板',
+                    }},
+                } for _, row in group.iterrows()],
+            })
+        return {'errCode': '0', 'msg': 'success', 'data': data}
+
+    # ---------------- 问财资讯 ----------------
+
+    def iwencai_news(self, stock_name: str, size: int) -> dict:
+        rng = self._rng('news', stock_name)
+        results = [{
+            'title': f"{stock_name}：合成新闻{i + 1}",
+            'summary': f"{stock_name}相关的合成摘要{i + 1}",
+            'publish_source': '合成来源',
+            'score': round(float(rng.random()), 3),
+            'publish_time': (datetime.now() - timedelta(hours=int(rng.integers(0, 48)))).strftime('%Y-%m-%d %H:%M:%S'),
+            'url': f"//news.example.com/{fixture_key(stock_name, i)}.html",
+        } for i in range(int(rng.integers(0, size + 1)))]
+        return {'status_code': 0, 'status_msg': 'ok', 'data': {'results': results}}
+
+    def iwencai_notice(self, stock_name: str, size: int) -> dict:
+        rng = self._rng('notice', stock_name)
+        titles = ['关于股东减持股份计划的公告', '2025年年度业绩预告', '关于签订重大合同的公告', '简式权益变动报告书', '关于回购股份的进展公告']
+        results = [{
+            'title': f"{stock_name}:{titles[int(rng.integers(0, len(titles)))]}",
+            'summary': '合成公告摘要',
+            'publish_time': (datetime.now() - timedelta(days=int(rng.integers(0, 3)))).strftime('%Y-%m-%d %H:%M:%S'),
+        } for _ in range(int(rng.integers(0, size + 1)))]
+        return {'status_code': 0, 'status_msg': 'ok', 'data': {'results': results}}
+
+    def iwencai_reports(self, stock_name: str, perpage: int) -> dict:
+        rng = self._rng('report', stock_name)
+        datas = [{
+            'author_name': '合成分析师',
+            'author_org': '合成证券',
+            'title': f"{stock_name}深度报告{i + 1}",
+            'publish_time': int((datetime.now() - timedelta(days=int(rng.integers(0, 90)))).timestamp()),
+            'view_arguments': [{'view': '业绩有望持续增长', 'argument': '订单饱满'}],
+            'source_url': f"https://report.example.com/{fixture_key(stock_name, i)}.pdf",
+        } for i in range(int(rng.integers(0, min(perpage, 5) + 1)))]
+        return {'data': {'answer': {'components': [{'show_type': 'strip1', 'data': {'datas': datas}}]}}}
+
+
+def load_recorded(fixtures_dir: str, service: str, key: str):
+    """
+    读取录制的响应
+
+    文件路径为 {fixtures_dir}/{service}/{key}.json（HTTP 响应）或 {key}.csv（问财选股结果），不存在返回 None
+    """
+    if not fixtures_dir:
+        return None
+    base = os.path.join(fixtures_dir, service, key)
+    if os.path.exists(f"{base}.json"):
+        with open(f"{base}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if os.path.exists(f"{base}.csv"):
+        return pd.read_csv(f"{base}.csv", dtype={'code': str, 'market_code': str})
+    return None
+
+
+def save_recorded(fixtures_dir: str, service: str, key: str, response) -> str:
+    """录制响应，供之后回放"""
+    os.makedirs(os.path.join(fixtures_dir, service), exist_ok=True)
+    base = os.path.join(fixtures_dir, service, key)
+    if isinstance(response, pd.DataFrame):
+        response.to_csv(f"{base}.csv", index=False, encoding='utf-8-sig')
+        return f"{base}.csv"
+    with open(f"{base}.json", 'w', encoding='utf-8') as f:
+        json.dump(response, f, ensure_ascii=False)
+    return f"{base}.json"
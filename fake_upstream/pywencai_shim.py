@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+pywencai 替身
+接口与 pywencai.get 一致，返回带日期后缀列名的 DataFrame；
+配置了问财地址（UPSTREAM_BASE_URL 或 UPSTREAM_WENCAI_URL）时通过替身 HTTP 服务分页获取，
+否则在进程内生成合成数据，延迟、错误率和限流读取 FAKE_UPSTREAM_* 环境变量
+"""
+
+import math
+import requests
+import pandas as pd
+
+from upstream import get_base_url
+from fake_upstream.config import FakeUpstreamConfig
+from fake_upstream.server import FakeUpstream, DEFAULT_PERPAGE
+
+REQUEST_TIMEOUT_SECONDS = 30
+
+_local_upstream = None
+
+
+def _get_local_upstream() -> FakeUpstream:
+    global _local_upstream
+    if _local_upstream is None:
+        _local_upstream = FakeUpstream(FakeUpstreamConfig.from_env())
+    return _local_upstream
+
+
+def _request_page(query: str, query_type: str, page: int, perpage: int) -> dict:
+    params = {'query': query, 'query_type': query_type, 'page': page, 'perpage': perpage}
+    base_url = get_base_url('wencai')
+    if base_url:
+        response = requests.post(f"{base_url}/query", json=params, timeout=REQUEST_TIMEOUT_SECONDS)
+        status, body = response.status_code, response.json()
+    else:
+        status, body, _ = _get_local_upstream().handle('/wencai/query', params)
+    if status != 200:
+        raise Exception(f"问财请求失败: HTTP {status}, {body.get('msg', '')}")
+    return body
+
+
+def get_page(query: str, page: int = 1, perpage: int = DEFAULT_PERPAGE, query_type: str = 'stock') -> tuple:
+    """
+    获取单页结果
+
+    Returns:
+        tuple: (当前页DataFrame, 总行数)
+    """
+    body = _request_page(query, query_type, page, perpage)
+    return pd.DataFrame(body['data'], columns=body['columns']), int(body['row_count'])
+
+
+def get(query: str, query_type: str = 'stock', loop: bool = False, perpage: int = DEFAULT_PERPAGE, **kwargs) -> pd.DataFrame:
+    """
+    与 pywencai.get 相同：loop 为 False 时只返回第一页，为 True 时依次获取全部分页
+    """
+    df, row_count = get_page(query, 1, perpage, query_type)
+    if not loop:
+        return df
+    frames = [df]
+    for page in range(2, math.ceil(row_count / perpage) + 1):
+        frames.append(get_page(query, page, perpage, query_type)[0])
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else df
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+上游替身 HTTP 服务
+在同一端口上模拟问财选股、韭研公社、问财资讯和钉钉机器人接口，
+配合 upstream.py 的地址配置即可离线运行整条流水线
+
+启动:
+    python -m fake_upstream.server --port 8765 --latency-ms 50 --error-rate 0.02 --rate-limit 5
+    export UPSTREAM_BASE_URL=http://127.0.0.1:8765
+"""
+
+import json
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import logging
+
+from fake_upstream.config import FakeUpstreamConfig, Behavior
+from fake_upstream.fixtures import SyntheticMarket, fixture_key, load_recorded
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_PERPAGE = 100
+MAX_CACHED_QUERIES = 64
+
+
+class FakeUpstream:
+    """请求分发和响应生成，与 HTTP 细节无关，便于在进程内直接调用"""
+
+    def __init__(self, config: FakeUpstreamConfig = None):
+        self.config = config or FakeUpstreamConfig()
+        self.behavior = Behavior(self.config)
+        self.market = SyntheticMarket(self.config.stock_count, self.config.seed, self.config.trade_date)
+        self.messages = []
+        self._query_cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.routes = {
+            '/wencai/query': ('wencai', self.wencai_query),
+            '/jygs/user/login': ('jygs', self.jygs_login),
+            '/jygs/action/field': ('jygs', self.jygs_action_field),
+            '/iwencai/unifiedwap/unified-wap/v1/information/news': ('iwencai', self.iwencai_news),
+            '/iwencai/unifiedwap/unified-wap/v1/information/notice': ('iwencai', self.iwencai_notice),
+            '/iwencai/unifiedwap/unified-wap/result/get-urp-data': ('iwencai', self.iwencai_reports),
+            '/dingtalk/robot/send': ('dingtalk', self.dingtalk_send),
+        }
+
+    def handle(self, path: str, params: dict) -> tuple:
+        """
+        处理一次请求
+
+        Returns:
+            tuple: (HTTP状态码, 响应体dict, 额外响应头dict)
+        """
+        if path not in self.routes:
+            return 404, {'error': f'unknown path: {path}'}, {}
+        service, handler = self.routes[path]
+        status, retry_after = self.behavior.admit(service)
+        if status == 429:
+            return 429, {'errCode': '429', 'msg': 'too many requests'}, {'Retry-After': f"{retry_after:.3f}"}
+        if status != 200:
+            return status, {'errCode': str(status), 'msg': 'injected error'}, {}
+
+        recorded = load_recorded(self.config.fixtures_dir, service, fixture_key(path, params))
+        if isinstance(recorded, dict):
+            return 200, recorded, {}
+        return 200, handler(params), {}
+
+    def _query_frame(self, query: str, query_type: str):
+        """同一语句翻页时复用生成结果"""
+        key = (query, query_type)
+        with self._lock:
+            if key in self._query_cache:
+                self._query_cache.move_to_end(key)
+                return self._query_cache[key]
+        df = load_recorded(self.config.fixtures_dir, 'wencai', fixture_key(query, query_type))
+        if df is None:
+            df = self.market.wencai_query(query)
+        with self._lock:
+            self._query_cache[key] = df
+            while len(self._query_cache) > MAX_CACHED_QUERIES:
+                self._query_cache.popitem(last=False)
+        return df
+
+    def wencai_query(self, params: dict) -> dict:
+        df = self._query_frame(params.get('query', ''), params.get('query_type', 'stock'))
+        page = max(1, int(params.get('page', 1)))
+        perpage = max(1, int(params.get('perpage', DEFAULT_PERPAGE)))
+        page_df = df.iloc[(page - 1) * perpage: page * perpage]
+        return {
+            'code': 0,
+            'row_count': len(df),
+            'page': page,
+            'perpage': perpage,
+            'columns': [str(col) for col in page_df.columns],
+            'data': json.loads(page_df.to_json(orient='values', force_ascii=False)),
+        }
+
+    def jygs_login(self, params: dict) -> dict:
+        return {'errCode': '0', 'msg': 'success', 'data': {'nickname': 'fake_upstream'}}
+
+    def jygs_action_field(self, params: dict) -> dict:
+        return self.market.jygs_action_field(params.get('date', ''))
+
+    def iwencai_news(self, params: dict) -> dict:
+        return self.market.iwencai_news(params.get('query', ''), int(params.get('size', 5)))
+
+    def iwencai_notice(self, params: dict) -> dict:
+        return self.market.iwencai_notice(params.get('query', ''), int(params.get('size', 15)))
+
+    def iwencai_reports(self, params: dict) -> dict:
+        return self.market.iwencai_reports(params.get('w', ''), int(params.get('perpage', 20)))
+
+    def dingtalk_send(self, params: dict) -> dict:
+        with self._lock:
+            self.messages.append(params)
+        return {'errcode': 0, 'errmsg': 'ok'}
+
+    def reset(self) -> None:
+        self.behavior.reset()
+        with self._lock:
+            self.messages.clear()
+
+
+def _make_handler(upstream: FakeUpstream):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _send(self, status: int, body: dict, headers: dict = None) -> None:
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _params(self) -> dict:
+            parsed = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                raw = self.rfile.read(length).decode('utf-8')
+                if raw.lstrip().startswith('{'):
+                    params.update(json.loads(raw))
+                else:
+                    params.update({k: v[-1] for k, v in parse_qs(raw).items()})
+            return params
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            try:
+                status, body, headers = upstream.handle(path, self._params())
+            except Exception as e:
+                logger.exception(f"替身服务处理请求失败: {path}")
+                status, body, headers = 500, {'error': str(e)}, {}
+            self._send(status, body, headers)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/_fake/stats':
+                self._send(200, upstream.behavior.stats)
+            elif path == '/_fake/messages':
+                self._send(200, {'messages': upstream.messages})
+            elif path == '/_fake/reset':
+                upstream.reset()
+                self._send(200, {'ok': True})
+            else:
+                self.do_POST()
+
+    return Handler
+
+
+class FakeUpstreamServer:
+    """
+    在后台线程运行的替身服务
+
+    用法:
+        with FakeUpstreamServer(FakeUpstreamConfig(latency_ms=50)) as server:
+            os.environ['UPSTREAM_BASE_URL'] = server.url
+    """
+
+    def __init__(self, config: FakeUpstreamConfig = None, host: str = '127.0.0.1', port: int = 0):
+        self.upstream = FakeUpstream(config)
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self.upstream))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeUpstreamServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"替身服务已启动: {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'FakeUpstreamServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上游替身服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency-ms', type=float)
+    parser.add_argument('--jitter-ms', type=float)
+    parser.add_argument('--error-rate', type=float)
+    parser.add_argument('--rate-limit', type=float, help="每个服务每秒请求数，0 表示不限流")
+    parser.add_argument('--burst', type=int)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--stock-count', type=int)
+    parser.add_argument('--trade-date', help="合成数据的最新交易日 YYYYMMDD")
+    parser.add_argument('--fixtures-dir', help="录制数据目录")
+    args = parser.parse_args()
+
+    config = FakeUpstreamConfig.from_env()
+    for name in ['latency_ms', 'jitter_ms', 'error_rate', 'rate_limit', 'burst', 'seed',
+                 'stock_count', 'trade_date', 'fixtures_dir']:
+        value = getattr(args, name)
+        if value is not None:
+            setattr(config, name, value)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    server = FakeUpstreamServer(config, args.host, args.port)
+    logger.info(f"替身服务监听 {server.url}, 配置: {config}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+个股特征库
+把每日行情文件 ths_market_overview_YYYYMMDD.csv 中的涨跌幅、换手、竞价和大单数据聚合为跨日期的滚动特征
+（N日涨幅、平均换手、竞价强度Z值、累计大单净额、涨停次数），保存为 日期 × 股票 的矩阵
+
+每个输入只保存最近 STATE_ROWS 天的累计和（环形缓冲），新的一天 = 前一天的累计和 + 当天的值，
+N日窗口 = 两行累计和相减，因此每天的更新量只与股票数有关，与历史长度和窗口长度无关；
+读取时按实际大小分配，追加时容量不够再翻倍；只读某一天的特征时只读取该行
+
+用法:
+    from feature_store import FeatureStore, read_features
+    store = FeatureStore.load_synced()
+    df = read_features('20250110', ['涨幅5', '竞价金额Z'])  # 按 code 关联到其他数据
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import logging
+from columnar_store import save_arrays, load_arrays, load_rows
+from market_panel import OVERVIEW_DIR, OVERVIEW_FILE_PATTERN, ST_KEYWORDS
+from sector_analytics import limit_up_pct, LIMIT_TOLERANCE
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 配置常量
+FEATURE_PATH = "./data/npz/features/feature_store.npz"
+RETURN_WINDOWS = (5, 10, 20)
+TURNOVER_WINDOWS = (5, 20)
+FLOW_WINDOWS = (5, 20)
+LIMIT_WINDOWS = (5, 20)
+AUCTION_WINDOW = 20          # 竞价Z值的回看天数（不含当天）
+MIN_AUCTION_SAMPLES = 5      # 回看期内有效天数不足时竞价Z值为 NaN
+INITIAL_DAY_CAPACITY = 256
+INITIAL_CODE_CAPACITY = 4096
+
+# 累计的输入 -> 是否同时累计平方和（用于Z值）
+ACCUMULATED = {
+    '对数收益': False,
+    '换手Z': False,
+    '大单净额': False,
+    '涨停': False,
+    '竞价涨幅': True,
+    '竞价金额': True,
+}
+INPUT_COLUMNS = ['code', '股票简称', '涨跌幅', '换手Z', '竞价涨幅', '竞价金额', '大单净额']
+
+# 特征列，顺序即保存顺序
+FEATURES = ([f'涨幅{w}' for w in RETURN_WINDOWS] + [f'均换手{w}' for w in TURNOVER_WINDOWS]
+            + ['竞价涨幅Z', '竞价金额Z'] + [f'大单净额{w}' for w in FLOW_WINDOWS]
+            + [f'涨停次数{w}' for w in LIMIT_WINDOWS])
+
+# 环形缓冲的行数：最长窗口，加上竞价Z值从前一天往回看需要的一行
+STATE_ROWS = max(RETURN_WINDOWS + TURNOVER_WINDOWS + FLOW_WINDOWS + LIMIT_WINDOWS + (AUCTION_WINDOW + 1,)) + 1
+
+
+def _state_names() -> list:
+    names = []
+    for name, squared in ACCUMULATED.items():
+        names += [name, f"{name}_n"] + ([f"{name}_sq"] if squared else [])
+    return names
+
+
+STATE_NAMES = _state_names()
+
+
+class FeatureStore:
+    """
+    日期 × 股票 特征矩阵
+
+    - dates: 交易日期(YYYYMMDD)，升序，只能按日期顺序追加（最后一天可以覆盖）
+    - codes / names: 股票代码和最近一次出现的股票简称，列顺序即矩阵列号
+    - features: {特征名: float32 矩阵[日期, 股票]}，前 size 行、前 len(codes) 列有效
+    - state: {累计量名: float64 矩阵[STATE_ROWS, 股票]}，第 t 天的累计和在第 t % STATE_ROWS 行
+    """
+
+    def __init__(self, dates=None, codes=None, names=None, features=None, state=None):
+        self.dates = list(dates) if dates is not None else []
+        self.codes = list(codes) if codes is not None else []
+        self.names = list(names) if names is not None else []
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+        size, n = len(self.dates), len(self.codes)
+
+        # 按实际大小分配，追加时由 _grow 扩容
+        self.features = {}
+        for name in FEATURES:
+            if features and name in features:
+                self.features[name] = np.require(features[name], dtype=np.float32, requirements=['C', 'W'])
+            else:
+                self.features[name] = np.full((size, n), np.nan, dtype=np.float32)
+        self.state = {}
+        for name in STATE_NAMES:
+            if state and name in state:
+                self.state[name] = np.require(state[name], dtype=np.float64, requirements=['C', 'W'])
+            else:
+                self.state[name] = np.zeros((STATE_ROWS, n), dtype=np.float64)
+
+    @property
+    def size(self) -> int:
+        return len(self.dates)
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.dates), len(self.codes)
+
+    def matrix(self, name: str) -> np.ndarray:
+        """特征矩阵的有效部分[日期, 股票]（视图）"""
+        return self.features[name][:self.size, :len(self.codes)]
+
+    def _grow(self, days: int, codes: int) -> None:
+        """容量不够时按翻倍扩容（不小于初始容量）"""
+        day_capacity, code_capacity = next(iter(self.features.values())).shape
+        new_days, new_codes = day_capacity, code_capacity
+        if days > day_capacity:
+            new_days = max(days, day_capacity * 2, INITIAL_DAY_CAPACITY)
+        if codes > code_capacity:
+            new_codes = max(codes, code_capacity * 2, INITIAL_CODE_CAPACITY)
+        if (new_days, new_codes) == (day_capacity, code_capacity):
+            return
+        for name, matrix in self.features.items():
+            grown = np.full((new_days, new_codes), np.nan, dtype=np.float32)
+            grown[:day_capacity, :code_capacity] = matrix
+            self.features[name] = grown
+        if new_codes != code_capacity:
+            for name, matrix in self.state.items():
+                grown = np.zeros((STATE_ROWS, new_codes), dtype=np.float64)
+                grown[:, :code_capacity] = matrix
+                self.state[name] = grown
+
+    def _columns_of(self, codes: list) -> np.ndarray:
+        """查找或新增股票所在列，新股票的累计和为0"""
+        for code in dict.fromkeys(codes):
+            if code not in self._code_index:
+                self._code_index[code] = len(self.codes)
+                self.codes.append(code)
+                self.names.append('')
+        self._grow(self.size + 1, len(self.codes))
+        return np.array([self._code_index[code] for code in codes], dtype=np.int64)
+
+    def _daily_values(self, day_df: pd.DataFrame, cols: np.ndarray) -> dict:
+        """当天各累计输入的值（按列对齐，无行情为 NaN）"""
+        n = len(self.codes)
+
+        def column(name: str) -> np.ndarray:
+            values = np.full(n, np.nan)
+            if name in day_df.columns:
+                values[cols] = pd.to_numeric(day_df[name], errors='coerce').to_numpy(dtype=np.float64)
+            return values
+
+        pct = column('涨跌幅')
+        names = day_df['股票简称'].fillna('').astype(str) if '股票简称' in day_df.columns else pd.Series('', index=day_df.index)
+        is_st = np.zeros(n, dtype=bool)
+        is_st[cols] = names.str.contains('|'.join(ST_KEYWORDS), regex=True).to_numpy()
+        limit = limit_up_pct(np.array(self.codes, dtype=str), is_st[None, :])[0]
+        with np.errstate(invalid='ignore'):
+            limit_hit = np.where(np.isnan(pct), np.nan, (pct >= limit - LIMIT_TOLERANCE).astype(np.float64))
+        return {
+            '对数收益': np.log1p(pct / 100),
+            '换手Z': column('换手Z'),
+            '大单净额': column('大单净额'),
+            '涨停': limit_hit,
+            '竞价涨幅': column('竞价涨幅'),
+            '竞价金额': column('竞价金额'),
+        }
+
+    def _window(self, name: str, end: int, days: int) -> np.ndarray:
+        """截至第 end 天（含）最近 days 天的累计量，历史不足时从第一天算起"""
+        n = len(self.codes)
+        current = self.state[name][end % STATE_ROWS, :n]
+        if end - days < 0:
+            return current.copy()
+        return current - self.state[name][(end - days) % STATE_ROWS, :n]
+
+    def append_day(self, trade_date: str, day_df: pd.DataFrame) -> None:
+        """
+        追加一个交易日：累计和在前一天的基础上加上当天的值，再用窗口两端的累计和相减得到当天的特征
+
+        Args:
+            trade_date: 交易日期 YYYYMMDD，等于最后一天时覆盖最后一天
+            day_df: 当日行情数据，包含 code、股票简称 及 INPUT_COLUMNS 中的列
+
+        Raises:
+            Exception: 日期早于最后一天（由 sync 整体重建）
+        """
+        if self.dates and trade_date < self.dates[-1]:
+            raise Exception(f"特征库只能按日期顺序追加: {trade_date} 早于最后一天 {self.dates[-1]}")
+        if self.dates and trade_date == self.dates[-1]:
+            self.dates.pop()
+
+        day_df = day_df.drop_duplicates(subset=['code'], keep='last')
+        codes = day_df['code'].astype(str).str.zfill(6).tolist()
+        cols = self._columns_of(codes)
+        n = len(self.codes)
+        t = self.size
+        row, prev = t % STATE_ROWS, (t - 1) % STATE_ROWS
+
+        for name, values in self._daily_values(day_df, cols).items():
+            present = ~np.isnan(values)
+            increments = {name: np.where(present, values, 0.0), f"{name}_n": present.astype(np.float64)}
+            if ACCUMULATED[name]:
+                increments[f"{name}_sq"] = np.where(present, values * values, 0.0)
+            for state_name, increment in increments.items():
+                base = self.state[state_name][prev, :n] if t > 0 else 0.0
+                self.state[state_name][row, :n] = base + increment
+
+        features = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for w in RETURN_WINDOWS:
+                # 窗口内每天都有行情才计算涨幅
+                complete = self._window('对数收益_n', t, w) == w
+                features[f'涨幅{w}'] = np.where(complete, np.expm1(self._window('对数收益', t, w)) * 100, np.nan)
+            for w in TURNOVER_WINDOWS:
+                features[f'均换手{w}'] = self._window('换手Z', t, w) / self._window('换手Z_n', t, w)
+            for name in ('竞价涨幅', '竞价金额'):
+                today = self.state[name][row, :n] - (self.state[name][prev, :n] if t > 0 else 0.0)
+                today_n = self.state[f"{name}_n"][row, :n] - (self.state[f"{name}_n"][prev, :n] if t > 0 else 0.0)
+                if t > 0:
+                    total = self._window(name, t - 1, AUCTION_WINDOW)
+                    squares = self._window(f"{name}_sq", t - 1, AUCTION_WINDOW)
+                    count = self._window(f"{name}_n", t - 1, AUCTION_WINDOW)
+                else:
+                    total = squares = count = np.zeros(n)
+                mean = total / count
+                std = np.sqrt(np.maximum(squares - count * mean * mean, 0) / (count - 1))
+                valid = (count >= MIN_AUCTION_SAMPLES) & (std > 0) & (today_n > 0)
+                features[f'{name}Z'] = np.where(valid, (today - mean) / std, np.nan)
+            for w in FLOW_WINDOWS:
+                count = self._window('大单净额_n', t, w)
+                features[f'大单净额{w}'] = np.where(count > 0, self._window('大单净额', t, w), np.nan)
+            for w in LIMIT_WINDOWS:
+                count = self._window('涨停_n', t, w)
+                features[f'涨停次数{w}'] = np.where(count > 0, self._window('涨停', t, w), np.nan)
+
+        for name in FEATURES:
+            self.features[name][t, :] = np.nan
+            self.features[name][t, :n] = features[name]
+        self.dates.append(trade_date)
+
+        names = day_df['股票简称'].fillna('').astype(str) if '股票简称' in day_df.columns else None
+        if names is not None:
+            for col, name in zip(cols, names):
+                self.names[col] = name
+
+    def features_on(self, trade_date: str = None, columns: list = None) -> pd.DataFrame:
+        """
+        某个交易日的特征，每只当日有特征的股票一行，用于按 code 关联
+
+        Returns:
+            pd.DataFrame: code、股票简称 及特征列；没有该交易日时为空表
+        """
+        columns = columns or FEATURES
+        if not self.dates or (trade_date is not None and trade_date not in self.dates):
+            return pd.DataFrame(columns=['code', '股票简称'] + columns)
+        t = self.size - 1 if trade_date is None else self.dates.index(trade_date)
+        n = len(self.codes)
+        return _feature_frame(self.codes, self.names, {name: self.features[name][t, :n] for name in columns})
+
+    def sync(self, overview_dir: str = OVERVIEW_DIR) -> int:
+        """
+        把目录中比最后一天新的每日行情文件按日期顺序追加；发现中间缺失的交易日时整体重建
+
+        Returns:
+            int: 追加的交易日数量
+        """
+        if not os.path.isdir(overview_dir):
+            return 0
+        files = sorted(match.group(1) for match in map(OVERVIEW_FILE_PATTERN.match, os.listdir(overview_dir)) if match)
+        known = set(self.dates)
+        last = self.dates[-1] if self.dates else ''
+        if any(date not in known and date < last for date in files):
+            logger.warning("特征库中间缺少交易日，重建特征库")
+            self.__init__()
+            last = ''
+        pending = [date for date in files if date > last]
+        for trade_date in pending:
+            self.append_day(trade_date, self._read_day(overview_dir, trade_date))
+        if pending:
+            logger.info(f"特征库增量更新{len(pending)}个交易日, 当前规模: {self.shape}")
+        return len(pending)
+
+    @staticmethod
+    def _read_day(overview_dir: str, trade_date: str) -> pd.DataFrame:
+        file_path = os.path.join(overview_dir, f"ths_market_overview_{trade_date}.csv")
+        return pd.read_csv(file_path, dtype={'code': str}, usecols=lambda col: col in INPUT_COLUMNS)
+
+    def save(self, file_path: str = FEATURE_PATH) -> None:
+        """保存有效部分到 .npz 文件"""
+        n = len(self.codes)
+        arrays = {f"feature_{i}": self.matrix(name) for i, name in enumerate(FEATURES)}
+        arrays.update({f"state_{i}": self.state[name][:, :n] for i, name in enumerate(STATE_NAMES)})
+        save_arrays(
+            file_path,
+            dates=np.array(self.dates, dtype='<U8'),
+            codes=np.array(self.codes, dtype=str),
+            names=np.array(self.names, dtype=str),
+            feature_names=np.array(FEATURES, dtype=str),
+            state_names=np.array(STATE_NAMES, dtype=str),
+            state_rows=np.array(STATE_ROWS),
+            **arrays,
+        )
+
+    @staticmethod
+    def load(file_path: str = FEATURE_PATH) -> 'FeatureStore':
+        """读取特征库，文件不存在或特征定义已变化时返回空库（下次同步时重建）"""
+        arrays = load_arrays(file_path)
+        if not arrays:
+            return FeatureStore()
+        if (arrays['feature_names'].tolist() != FEATURES or arrays['state_names'].tolist() != STATE_NAMES
+                or int(arrays['state_rows']) != STATE_ROWS):
+            logger.warning("特征定义已变化，重建特征库")
+            return FeatureStore()
+        return FeatureStore(
+            dates=arrays['dates'].tolist(),
+            codes=arrays['codes'].tolist(),
+            names=arrays['names'].tolist(),
+            features={name: arrays[f"feature_{i}"] for i, name in enumerate(FEATURES)},
+            state={name: arrays[f"state_{i}"] for i, name in enumerate(STATE_NAMES)},
+        )
+
+    @staticmethod
+    def load_synced(overview_dir: str = OVERVIEW_DIR, file_path: str = FEATURE_PATH) -> 'FeatureStore':
+        """读取特征库并与每日行情文件同步"""
+        store = FeatureStore.load(file_path)
+        if store.sync(overview_dir):
+            store.save(file_path)
+        return store
+
+
+def _feature_frame(codes: list, names: list, values: dict) -> pd.DataFrame:
+    """某一天的特征行转为 code、股票简称 + 特征列，去掉当天没有任何特征的股票"""
+    df = pd.DataFrame({name: row.astype(np.float64) for name, row in values.items()})
+    df.insert(0, '股票简称', names)
+    df.insert(0, 'code', codes)
+    return df.dropna(subset=list(values), how='all').reset_index(drop=True)
+
+
+def update_feature_store(trade_date: str, overview_dir: str = OVERVIEW_DIR,
+                         file_path: str = FEATURE_PATH) -> FeatureStore:
+    """
+    每日入口：同步新的行情文件；当日已在特征库中时用当日文件重新计算最后一天（行情文件可能在收盘后重新生成）
+
+    Args:
+        trade_date: 交易日期 YYYYMMDD
+    """
+    try:
+        store = FeatureStore.load(file_path)
+        appended = store.sync(overview_dir)
+        if not appended and store.dates and store.dates[-1] == trade_date:
+            store.append_day(trade_date, FeatureStore._read_day(overview_dir, trade_date))
+            appended = 1
+        if appended:
+            store.save(file_path)
+        logger.info(f"特征库更新完成, 当前规模: {store.shape}")
+        return store
+    except Exception as e:
+        logger.error(f"更新特征库失败: {e}")
+        raise
+
+
+def read_features(trade_date: str = None, columns: list = None, file_path: str = FEATURE_PATH):
+    """读取某个交易日的特征用于关联（只读取该交易日一行），特征库中没有该交易日时返回 None"""
+    columns = columns or FEATURES
+    meta = load_arrays(file_path, ['dates', 'codes', 'names', 'feature_names'])
+    if not meta or meta['feature_names'].tolist() != FEATURES:
+        return None
+    dates = meta['dates'].tolist()
+    if not dates or (trade_date is not None and trade_date not in dates):
+        return None
+    t = len(dates) - 1 if trade_date is None else dates.index(trade_date)
+    keys = {name: f"feature_{FEATURES.index(name)}" for name in columns}
+    rows = load_rows(file_path, list(keys.values()), t)
+    df = _feature_frame(meta['codes'].tolist(), meta['names'].tolist(),
+                        {name: rows[key] for name, key in keys.items()})
+    return df if not df.empty else None
+
+
+if __name__ == "__main__":
+    store = FeatureStore.load_synced()
+    print(f"特征库: {store.shape}, 最新交易日: {store.dates[-1:] or None}")
+    print(store.features_on().head(20))
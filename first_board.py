@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+首板检测
+在本地行情面板（日期 × 股票的涨跌幅、市值Z矩阵）上识别首板：当日涨幅超过阈值，且之前 lookback 个交易日
+内没有一天涨幅超过涨停阈值。前 lookback 天的涨停次数由累计和相减得到，一次计算出所有交易日的结果，
+可用于当日股票池，也可直接对历史上每个交易日回测首板规则
+
+与问财查询的对应关系（StockPool 的两种首板股票池）:
+    全量首板: 涨跌幅>9.5%，之前10个交易日涨幅超过9.5%的次数等于0
+    中军首板: 自由流通市值>100亿，涨跌幅>7%，之前10个交易日涨幅超过9.5%的次数等于0
+"""
+
+import numpy as np
+import pandas as pd
+import logging
+from dataclasses import dataclass
+from market_panel import MarketPanel
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+FIRST_BOARD_LOOKBACK = 10   # 当日之前的回看交易日数（问财查询 k=11 含当日）
+FIRST_BOARD_LIMIT = 9.5     # 回看期内视为涨停的涨幅(%)
+OUTPUT_COLUMNS = ['交易日期', '股票简称', '涨跌幅', '市值Z', 'market_code', 'code']
+
+
+@dataclass(frozen=True)
+class FirstBoardRule:
+    """
+    首板规则
+
+    - change: 当日涨幅下限(%)
+    - min_market_value: 自由流通市值下限（亿元）；为0时仍要求市值大于0（与问财条件“自由流通市值大于0”一致，缺失市值的股票不计入）
+    - lookback: 当日之前的回看交易日数
+    - limit: 回看期内视为涨停的涨幅(%)
+    """
+    change: float = FIRST_BOARD_LIMIT
+    min_market_value: float = 0
+    lookback: int = FIRST_BOARD_LOOKBACK
+    limit: float = FIRST_BOARD_LIMIT
+
+
+# StockPool 使用的两种首板规则
+FIRST_BOARD_RULES = {
+    'all': FirstBoardRule(),
+    'zj': FirstBoardRule(change=7, min_market_value=100),
+}
+
+
+class FirstBoardDetector:
+    """
+    行情面板上的首板检测器
+
+    每个涨停阈值的累计涨停次数只计算一次并缓存，不同回看长度和当日阈值的规则共用
+    """
+
+    def __init__(self, panel: MarketPanel):
+        self.panel = panel
+        self.pct = panel.fields['涨跌幅']
+        self.market_value = panel.fields['市值Z']
+        self._prefix = {}
+
+    def _limit_prefix(self, limit: float) -> np.ndarray:
+        """prefix[t] 为前 t 个交易日涨幅超过 limit 的次数，形状 (日期数+1, 股票数)"""
+        if limit not in self._prefix:
+            with np.errstate(invalid='ignore'):
+                hits = (self.pct > limit).astype(np.int32)
+            prefix = np.zeros((hits.shape[0] + 1, hits.shape[1]), dtype=np.int32)
+            np.cumsum(hits, axis=0, out=prefix[1:])
+            self._prefix[limit] = prefix
+        return self._prefix[limit]
+
+    def prior_limit_counts(self, lookback: int, limit: float = FIRST_BOARD_LIMIT) -> np.ndarray:
+        """
+        每个交易日之前 lookback 个交易日（不含当日）涨幅超过 limit 的次数[日期, 股票]，
+        历史不足 lookback 天的交易日为 -1
+        """
+        prefix = self._limit_prefix(limit)
+        counts = np.full(self.pct.shape, -1, dtype=np.int32)
+        if lookback < len(self.panel.dates):
+            counts[lookback:] = prefix[lookback:-1] - prefix[:-lookback - 1]
+        return counts
+
+    def flags(self, rule: FirstBoardRule = FIRST_BOARD_RULES['all']) -> np.ndarray:
+        """所有交易日的首板掩码[日期, 股票]"""
+        with np.errstate(invalid='ignore'):
+            mask = (self.pct > rule.change) & (self.market_value > rule.min_market_value * 1e8)
+        return mask & (self.prior_limit_counts(rule.lookback, rule.limit) == 0)
+
+    def detect(self, trade_date: str, rule: FirstBoardRule = FIRST_BOARD_RULES['all']) -> pd.DataFrame:
+        """
+        指定交易日的首板股票，按市值Z降序，列与 WencaiUtils.get_first_breakout_stocks 一致
+
+        Raises:
+            Exception: 面板中没有该交易日或之前的历史不足 lookback 天
+        """
+        pos = int(np.searchsorted(self.panel.dates, trade_date))
+        if pos >= len(self.panel.dates) or self.panel.dates[pos] != trade_date:
+            raise Exception(f"行情面板中没有交易日{trade_date}")
+        if pos < rule.lookback:
+            raise Exception(f"行情面板中{trade_date}之前只有{pos}个交易日，不足{rule.lookback}天")
+
+        with np.errstate(invalid='ignore'):
+            row = (self.pct[pos] > rule.change) & (self.market_value[pos] > rule.min_market_value * 1e8)
+        prefix = self._limit_prefix(rule.limit)
+        row &= (prefix[pos] - prefix[pos - rule.lookback]) == 0
+        cols = np.flatnonzero(row)
+
+        df = pd.DataFrame({
+            '交易日期': trade_date,
+            '股票简称': np.asarray(self.panel.names, dtype=object)[cols],
+            '涨跌幅': self.pct[pos, cols].round(2),
+            '市值Z': self.market_value[pos, cols].astype(np.int64),
+            'market_code': np.asarray(self.panel.market_codes, dtype=object)[cols],
+            'code': np.asarray(self.panel.codes, dtype=object)[cols],
+        }, columns=OUTPUT_COLUMNS)
+        return df.sort_values('市值Z', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+对冲请求模块
+按上游记录最近的请求耗时，请求超过历史耗时的 P95 仍未返回时再发出一次相同的请求，
+取先返回的结果并取消另一个，用于削减个别卡住的请求造成的长尾耗时
+
+用法:
+    from hedging import hedged_call
+    response = hedged_call('iwencai', session.post, url, data=data)
+
+- 默认关闭，通过环境变量 HEDGE_UPSTREAMS="iwencai,jygs,wencai_page" 按上游开启（"*" 表示全部）
+- 耗时样本不足 HEDGE_MIN_SAMPLES 时不对冲，只记录耗时
+- 对冲次数不超过请求数的 HEDGE_MAX_RATIO，且对冲请求需要立即从该上游的限流器拿到令牌，拿不到就继续等待原请求
+- 已开始执行的请求无法中断，落后的请求在后台跑完后结果被丢弃
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from rate_limiter import get_limiter
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+HEDGE_UPSTREAMS_ENV = 'HEDGE_UPSTREAMS'
+HEDGE_PERCENTILE = 95      # 超过历史耗时的该分位数后发出对冲请求
+HEDGE_HISTORY_SIZE = 200   # 每个上游保留的耗时样本数
+HEDGE_MIN_SAMPLES = 20     # 样本数达到后才开始对冲
+HEDGE_MIN_DELAY = 0.2      # 对冲等待时间下限（秒），避免耗时都很短时频繁对冲
+HEDGE_MAX_RATIO = 0.1      # 对冲次数占请求数的上限
+HEDGE_BURST = 2            # 对冲额度最多累积的次数
+HEDGE_WORKERS = 32         # 执行请求的线程数
+
+
+def _parse_upstreams(text: str) -> set:
+    return {name.strip() for name in (text or '').split(',') if name.strip()}
+
+
+class Hedger:
+    """
+    单个上游的对冲器
+
+    每个请求累积 HEDGE_MAX_RATIO 次对冲额度（最多 HEDGE_BURST 次），发出对冲请求消耗一次，
+    因此长期来看对冲请求不超过请求数的 HEDGE_MAX_RATIO
+    """
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.latencies = deque(maxlen=HEDGE_HISTORY_SIZE)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._credit = 0.0
+        self._lock = threading.Lock()
+
+    def deadline(self):
+        """发出对冲请求前等待的秒数，样本不足时返回 None（不对冲）"""
+        with self._lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            samples = np.fromiter(self.latencies, dtype=float, count=len(self.latencies))
+        return max(HEDGE_MIN_DELAY, float(np.percentile(samples, HEDGE_PERCENTILE)))
+
+    def _start(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._credit = min(HEDGE_BURST, self._credit + HEDGE_MAX_RATIO)
+
+    def _take_hedge(self) -> bool:
+        """申请一次对冲：额度和上游限流令牌都满足时才放行"""
+        with self._lock:
+            if self._credit < 1:
+                return False
+            if not get_limiter(self.upstream).try_acquire():
+                return False
+            self._credit -= 1
+            self.hedges += 1
+            return True
+
+    def _record(self, latency: float) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+
+    def call(self, func, *args, **kwargs):
+        """
+        执行请求，超过对冲等待时间仍未返回时发出一次相同的请求，返回先成功的结果
+
+        两个请求都失败时抛出原请求的异常
+        """
+        self._start()
+        delay = self.deadline()
+        start = time.monotonic()
+        primary = _executor.submit(func, *args, **kwargs)
+        if delay is None:
+            result = primary.result()
+            self._record(time.monotonic() - start)
+            return result
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_hedge():
+            result = primary.result()
+            self._record(time.monotonic() - start)
+            return result
+
+        func_name = getattr(func, '__name__', str(func))
+        logger.info(f"{self.upstream}.{func_name} 超过{delay:.2f}秒未返回，发出对冲请求")
+        hedge = _executor.submit(func, *args, **kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    continue
+                for other in pending:
+                    other.cancel()
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                    logger.info(f"{self.upstream}.{func_name} 对冲请求先返回")
+                # 记录的是原请求发出到拿到结果的耗时，即调用方实际等待的时间
+                self._record(time.monotonic() - start)
+                return future.result()
+        return primary.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'upstream': self.upstream, 'requests': self.requests,
+                    'hedges': self.hedges, 'hedge_wins': self.hedge_wins}
+
+
+_enabled = _parse_upstreams(os.environ.get(HEDGE_UPSTREAMS_ENV, ''))
+_hedgers = {}
+_registry_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+
+
+def is_enabled(upstream: str) -> bool:
+    return '*' in _enabled or upstream in _enabled
+
+
+def configure(upstreams) -> None:
+    """设置开启对冲的上游，覆盖环境变量 HEDGE_UPSTREAMS"""
+    global _enabled
+    _enabled = _parse_upstreams(upstreams) if isinstance(upstreams, str) else set(upstreams)
+
+
+def get_hedger(upstream: str) -> Hedger:
+    """获取上游的对冲器（按需创建，同名共享）"""
+    with _registry_lock:
+        hedger = _hedgers.get(upstream)
+        if hedger is None:
+            hedger = Hedger(upstream)
+            _hedgers[upstream] = hedger
+        return hedger
+
+
+def hedged_call(upstream: str, func, *args, **kwargs):
+    """
+    按上游执行请求，该上游开启对冲时慢请求会发出一次重复请求，未开启时直接调用
+
+    Args:
+        upstream: 上游名称，同时也是对冲请求申请令牌的限流器名称
+        func: 要执行的请求，必须可以安全地重复执行（只读查询）
+        *args, **kwargs: 函数参数
+
+    Returns:
+        先成功返回的结果
+    """
+    if not is_enabled(upstream):
+        return func(*args, **kwargs)
+    return get_hedger(upstream).call(func, *args, **kwargs)
+
+
+def hedge_stats() -> list:
+    """各上游的请求数、对冲次数和对冲请求先返回的次数"""
+    with _registry_lock:
+        hedgers = list(_hedgers.values())
+    return [hedger.stats() for hedger in hedgers]
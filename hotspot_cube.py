@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+热点轮动立方体
+把 jygs_bk_his 物化为 日期 × 规范热点 的稠密计数矩阵，按天增量刷新，
+热点轮动图的 m/n/k 参数直接在矩阵上切片
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import logging
+from columnar_store import save_arrays, load_arrays
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 配置常量
+BK_HIS_PATH = "./data/csv/jygs/jygs_bk_his.csv"
+CUBE_PATH = "./data/npz/jygs/hotspot_cube.npz"
+EXCLUDE_HOTSPOTS = ['ST板块', '其他', '公告']
+
+WEEKDAY_NAMES = ['一', '二', '三', '四', '五', '六', '日']
+
+
+def is_hotspot_similar(hotspot_a: str, hotspot_b: str) -> bool:
+    """判断两个热点是否相似"""
+    return (hotspot_a in hotspot_b) or (hotspot_b in hotspot_a)
+
+
+class HotspotCube:
+    """
+    日期 × 规范热点 计数矩阵
+
+    - dates: 交易日期(YYYYMMDD)，升序
+    - raw_names / raw_groups / raw_last_dates: 原始热点名称、所属规范热点列号、最近出现日期
+    - counts: int32 矩阵 [日期, 规范热点]
+    规范热点的展示名称取组内最近出现的原始热点名称，与 unify_similar_hotspots 一致
+    """
+
+    def __init__(self, dates=None, raw_names=None, raw_groups=None, raw_last_dates=None, counts=None):
+        self.dates = np.asarray(dates if dates is not None else [], dtype='<U8')
+        self.raw_names = list(raw_names) if raw_names is not None else []
+        self.raw_groups = list(int(g) for g in raw_groups) if raw_groups is not None else []
+        self.raw_last_dates = list(raw_last_dates) if raw_last_dates is not None else []
+        n_groups = (max(self.raw_groups) + 1) if self.raw_groups else 0
+        self.counts = (np.asarray(counts, dtype=np.int32) if counts is not None
+                       else np.zeros((len(self.dates), n_groups), dtype=np.int32))
+        self._raw_index = {name: i for i, name in enumerate(self.raw_names)}
+        self._labels = None
+
+    @property
+    def n_groups(self) -> int:
+        return self.counts.shape[1]
+
+    @property
+    def labels(self) -> np.ndarray:
+        """每个规范热点的展示名称（组内最近出现的原始名称）"""
+        if self._labels is None:
+            labels = [''] * self.n_groups
+            latest = [''] * self.n_groups
+            for name, group, last_date in zip(self.raw_names, self.raw_groups, self.raw_last_dates):
+                if last_date > latest[group]:
+                    latest[group] = last_date
+                    labels[group] = name
+            self._labels = np.array(labels, dtype=str)
+        return self._labels
+
+    def date_labels(self, dates: np.ndarray = None) -> list:
+        """生成 'YYYY-MM-DD(周X)' 形式的日期展示文本"""
+        dates = self.dates if dates is None else dates
+        stamps = pd.to_datetime(pd.Series(dates), format='%Y%m%d')
+        return [f"{ts.strftime('%Y-%m-%d')}({WEEKDAY_NAMES[ts.weekday()]})" for ts in stamps]
+
+    def _group_of(self, hotspot: str) -> int:
+        """查找或创建原始热点所属的规范热点列"""
+        idx = self._raw_index.get(hotspot)
+        if idx is not None:
+            return self.raw_groups[idx]
+
+        group = None
+        for name, raw_group in zip(self.raw_names, self.raw_groups):
+            if is_hotspot_similar(hotspot, name):
+                group = raw_group
+                break
+        if group is None:
+            group = self.n_groups
+            self.counts = np.hstack([self.counts, np.zeros((len(self.dates), 1), dtype=np.int32)])
+
+        self._raw_index[hotspot] = len(self.raw_names)
+        self.raw_names.append(hotspot)
+        self.raw_groups.append(group)
+        self.raw_last_dates.append('')
+        return group
+
+    def update_day(self, trade_date: str, day_df: pd.DataFrame) -> None:
+        """
+        写入（或覆盖）单个交易日的热点计数
+
+        Args:
+            trade_date: 交易日期 YYYYMMDD
+            day_df: 当日数据，包含 热点、股票数量 列
+        """
+        day_df = day_df[~day_df['热点'].isin(EXCLUDE_HOTSPOTS)]
+        groups = np.array([self._group_of(h) for h in day_df['热点']], dtype=np.int64)
+        row = np.zeros(self.n_groups, dtype=np.int32)
+        if len(groups):
+            np.add.at(row, groups, day_df['股票数量'].to_numpy(dtype=np.int32))
+
+        for hotspot in day_df['热点']:
+            idx = self._raw_index[hotspot]
+            if trade_date > self.raw_last_dates[idx]:
+                self.raw_last_dates[idx] = trade_date
+
+        pos = int(np.searchsorted(self.dates, trade_date))
+        if pos < len(self.dates) and self.dates[pos] == trade_date:
+            self.counts[pos] = row
+        else:
+            self.dates = np.insert(self.dates, pos, trade_date)
+            self.counts = np.insert(self.counts, pos, row, axis=0)
+        self._labels = None
+
+    def sync(self, bk_df: pd.DataFrame, refresh_latest: bool = True) -> int:
+        """
+        将 jygs_bk_his 中尚未物化的交易日增量写入矩阵
+
+        Args:
+            bk_df: 板块历史数据，包含 交易日期、热点、股票数量 列
+            refresh_latest: 是否重算矩阵中最新一天（当天数据可能被重新抓取覆盖）
+
+        Returns:
+            int: 写入的交易日数量
+        """
+        known = set(self.dates.tolist())
+        if refresh_latest and len(self.dates):
+            known.discard(self.dates[-1])
+        pending = bk_df[~bk_df['交易日期'].isin(known)]
+        updated = 0
+        for trade_date, day_df in pending.groupby('交易日期', sort=True):
+            self.update_day(trade_date, day_df)
+            updated += 1
+        if updated:
+            logger.info(f"热点轮动矩阵增量更新{updated}个交易日, 当前规模: {self.counts.shape}")
+        return updated
+
+    def rotation(self, m: int, n: int, k: int):
+        """
+        热点轮动切片
+
+        Args:
+            m: 热点聚合最近天数
+            n: 每天取前N名热点
+            k: 图表展示天数
+
+        Returns:
+            tuple: (展示日期数组升序, 热点名称数组, 计数矩阵[日期, 热点])，
+                   热点按展示区间最后一天的数量降序排列
+        """
+        if len(self.dates) == 0 or self.n_groups == 0:
+            return np.array([], dtype=str), np.array([], dtype=str), np.zeros((0, 0), dtype=np.int32)
+
+        recent = self.counts[-m:]
+        top_idx = np.argsort(-recent, axis=1, kind='stable')[:, :n]
+        top_mask = np.take_along_axis(recent, top_idx, axis=1) > 0
+        selected = np.unique(top_idx[top_mask])
+
+        window = self.counts[-k:, selected]
+        row_mask = window.any(axis=1)
+        window = window[row_mask]
+        dates = self.dates[-k:][row_mask]
+        if len(dates) == 0:
+            return dates, np.array([], dtype=str), window
+
+        order = np.argsort(-window[-1], kind='stable')
+        return dates, self.labels[selected][order], window[:, order]
+
+    def save(self, file_path: str = CUBE_PATH) -> None:
+        """保存矩阵到 .npz 文件"""
+        save_arrays(
+            file_path,
+            dates=self.dates,
+            raw_names=np.array(self.raw_names, dtype=str),
+            raw_groups=np.array(self.raw_groups, dtype=np.int32),
+            raw_last_dates=np.array(self.raw_last_dates, dtype='<U8'),
+            counts=self.counts,
+        )
+
+    @staticmethod
+    def load(file_path: str = CUBE_PATH) -> 'HotspotCube':
+        """读取矩阵，文件不存在时返回空矩阵"""
+        arrays = load_arrays(file_path)
+        if not arrays:
+            return HotspotCube()
+        return HotspotCube(
+            dates=arrays['dates'],
+            raw_names=arrays['raw_names'].tolist(),
+            raw_groups=arrays['raw_groups'].tolist(),
+            raw_last_dates=arrays['raw_last_dates'].tolist(),
+            counts=arrays['counts'],
+        )
+
+    @staticmethod
+    def load_synced(bk_path: str = BK_HIS_PATH, file_path: str = CUBE_PATH) -> 'HotspotCube':
+        """读取矩阵并与 jygs_bk_his 同步，只补齐缺失的交易日"""
+        cube = HotspotCube.load(file_path)
+        if not os.path.exists(bk_path):
+            return cube
+        bk_df = pd.read_csv(bk_path, dtype={'交易日期': str, '热点': str})
+        if cube.sync(bk_df, refresh_latest=False):
+            cube.save(file_path)
+        return cube
+
+    @staticmethod
+    def update_daily(trade_date: str, day_df: pd.DataFrame, file_path: str = CUBE_PATH,
+                     bk_path: str = BK_HIS_PATH) -> None:
+        """jygs_bk_his 新增一天时调用，增量刷新矩阵；矩阵文件不存在时先用 bk_path 的板块历史建立"""
+        if not os.path.exists(file_path) and os.path.exists(bk_path):
+            cube = HotspotCube.load_synced(bk_path, file_path)
+        else:
+            cube = HotspotCube.load(file_path)
+        cube.update_day(trade_date, day_df)
+        cube.save(file_path)
+        logger.info(f"热点轮动矩阵已更新{trade_date}, 当前规模: {cube.counts.shape}")
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""
+技术指标
+在 日期 × 股票 的稠密矩阵上计算均线、ATR、N日最高/最低价、RSI 和波动率，一次调用算出全市场所有交易日的结果
+
+- 滚动窗口按矩阵的行（交易日）计算，窗口内的 NaN（停牌、未上市）被忽略，有效值少于 min_periods 时结果为 NaN，
+  与 pandas 的 rolling(window, min_periods) 一致
+- 滚动和/均值/标准差用累计和相减，滚动最高/最低用倍增窗口合并，计算量与窗口长度基本无关
+- ATR、RSI 使用 Wilder 平滑，与 pandas 的 ewm(alpha=1/n, adjust=False, ignore_na=True) 一致，
+  是逐日递推的计算：安装了 numba 时编译执行，否则按交易日循环、每次处理一整行
+- 计算后端由环境变量 INDICATOR_BACKEND 选择: auto（默认，有 numba 时使用）、numba、numpy
+
+用法:
+    from market_panel import MarketPanel
+    from indicators import compute_indicators, indicator_frame
+    panel = MarketPanel.load_synced()
+    values = compute_indicators(panel)                # {'MA5': 矩阵[日期, 股票], 'ATR14': ..., ...}
+    df = indicator_frame(panel, values, '20250110')   # 单日截面，按 code 关联到其他数据
+"""
+
+import os
+import logging
+import warnings
+import numpy as np
+import pandas as pd
+from market_panel import MarketPanel
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 配置常量
+BACKEND_ENV = 'INDICATOR_BACKEND'
+MA_WINDOWS = (5, 10, 20, 60)
+RANGE_WINDOWS = (20, 60)       # N日最高价/最低价
+ATR_WINDOW = 14
+RSI_WINDOW = 14
+VOLATILITY_WINDOW = 20
+TRADING_DAYS_PER_YEAR = 252
+ADJUST_TOLERANCE = 0.005       # 相邻两天前复权价与涨跌幅对不上超过该比例时视为发生了除权
+
+PRICE_FIELDS = {'open': '开盘价_前', 'high': '最高价_前', 'low': '最低价_前', 'close': '收盘价_前'}
+# 以价格为单位的指标名前缀，截面换回当日复权基准时需要缩放
+PRICE_INDICATORS = ('MA', '最高', '最低', 'ATR')
+
+
+def _as_float(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def _min_periods(window: int, min_periods) -> int:
+    if window < 1:
+        raise ValueError(f"窗口长度必须为正数: {window}")
+    return window if min_periods is None else max(1, int(min_periods))
+
+
+def _window_diff(prefix: np.ndarray, window: int) -> np.ndarray:
+    """prefix 为带一行零的累计和（行数 = 日期数 + 1），返回每个交易日结尾的 window 日窗口内的和"""
+    out = prefix[1:].copy()
+    if window < len(out):
+        out[window:] -= prefix[1:len(out) - window + 1]
+    return out
+
+
+def rolling_count(values: np.ndarray, window: int) -> np.ndarray:
+    """每个交易日结尾的 window 日窗口内的有效值个数"""
+    valid = ~np.isnan(_as_float(values))
+    prefix = np.zeros((valid.shape[0] + 1,) + valid.shape[1:], dtype=np.int64)
+    np.cumsum(valid, axis=0, out=prefix[1:])
+    return _window_diff(prefix, window)
+
+
+def _rolling_sums(values: np.ndarray, window: int, squares: bool = False):
+    """窗口内有效值的个数、和（及平方和）"""
+    values = _as_float(values)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    shape = (values.shape[0] + 1,) + values.shape[1:]
+    counts = np.zeros(shape, dtype=np.int64)
+    np.cumsum(valid, axis=0, out=counts[1:])
+    sums = np.zeros(shape)
+    np.cumsum(filled, axis=0, out=sums[1:])
+    result = [_window_diff(counts, window), _window_diff(sums, window)]
+    if squares:
+        sq = np.zeros(shape)
+        np.cumsum(filled * filled, axis=0, out=sq[1:])
+        result.append(_window_diff(sq, window))
+    return result
+
+
+def rolling_sum(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """滚动求和，忽略 NaN"""
+    min_periods = _min_periods(window, min_periods)
+    counts, sums = _rolling_sums(values, window)
+    return np.where(counts >= min_periods, sums, np.nan)
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """滚动均值，忽略 NaN"""
+    min_periods = _min_periods(window, min_periods)
+    counts, sums = _rolling_sums(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts >= min_periods, sums / counts, np.nan)
+
+
+def rolling_std(values: np.ndarray, window: int, min_periods: int = None, ddof: int = 1) -> np.ndarray:
+    """
+    滚动标准差，忽略 NaN
+
+    先减去每列的均值再累计平方和，避免价格等数值较大的序列相减时损失精度
+    """
+    min_periods = _min_periods(window, min_periods)
+    values = _as_float(values)
+    with warnings.catch_warnings():
+        # 全为 NaN 的列
+        warnings.simplefilter('ignore', RuntimeWarning)
+        center = np.nanmean(values, axis=0)
+    center = np.where(np.isnan(center), 0.0, center)
+    counts, sums, squares = _rolling_sums(values - center, window, squares=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums * sums / counts) / (counts - ddof)
+    variance = np.maximum(variance, 0.0)
+    return np.where((counts >= min_periods) & (counts > ddof), np.sqrt(variance), np.nan)
+
+
+def _rolling_extreme_numpy(values: np.ndarray, window: int, reduce) -> np.ndarray:
+    """
+    倍增窗口: spans[k] 为长度 2^k 的窗口的极值，长度 w 的窗口由两个长度 2^k (2^k <= w) 的窗口重叠覆盖，
+    计算量为 O(日期数 × 股票数 × log w)。reduce 为 np.fmax/np.fmin，会跳过 NaN
+    """
+    span = values.copy()
+    length = 1
+    while length * 2 <= window:
+        shifted = np.full_like(span, np.nan)
+        shifted[length:] = span[:-length]
+        span = reduce(span, shifted)
+        length *= 2
+    if length == window:
+        return span
+    shifted = np.full_like(span, np.nan)
+    offset = window - length
+    shifted[offset:] = span[:-offset]
+    return reduce(span, shifted)
+
+
+def _ewm_numpy(values: np.ndarray, alpha: float) -> np.ndarray:
+    """逐交易日递推，每次处理一整行；NaN 不参与递推，该日沿用之前的值"""
+    out = np.full_like(values, np.nan)
+    state = np.full(values.shape[1:], np.nan)
+    for t in range(values.shape[0]):
+        row = values[t]
+        valid = ~np.isnan(row)
+        fresh = valid & np.isnan(state)
+        update = valid & ~fresh
+        state[fresh] = row[fresh]
+        state[update] += alpha * (row[update] - state[update])
+        out[t] = state
+    return out
+
+
+def _build_numba_kernels():
+    """编译 numba 版本的递推和滚动极值，没有安装 numba 时返回 None"""
+    try:
+        import numba
+    except ImportError:
+        return None
+
+    @numba.njit(cache=True)
+    def ewm(values, alpha):
+        rows, cols = values.shape
+        out = np.empty_like(values)
+        state = np.full(cols, np.nan)
+        for t in range(rows):
+            for j in range(cols):
+                x = values[t, j]
+                if not np.isnan(x):
+                    if np.isnan(state[j]):
+                        state[j] = x
+                    else:
+                        state[j] += alpha * (x - state[j])
+                out[t, j] = state[j]
+        return out
+
+    @numba.njit(cache=True, parallel=True)
+    def rolling_extreme(columns, window, sign):
+        # columns 为转置后的矩阵[股票, 日期]，每列用单调队列求滚动极值；sign=1 求最大值，-1 求最小值
+        cols, rows = columns.shape
+        out = np.empty((cols, rows))
+        for j in numba.prange(cols):
+            queue = np.empty(rows, dtype=np.int64)
+            head = 0
+            tail = 0
+            for t in range(rows):
+                x = columns[j, t]
+                if not np.isnan(x):
+                    while tail > head and sign * columns[j, queue[tail - 1]] <= sign * x:
+                        tail -= 1
+                    queue[tail] = t
+                    tail += 1
+                while tail > head and queue[head] <= t - window:
+                    head += 1
+                out[j, t] = columns[j, queue[head]] if tail > head else np.nan
+        return out
+
+    return {'ewm': ewm, 'rolling_extreme': rolling_extreme}
+
+
+_kernels = None
+_kernels_loaded = False
+
+
+def get_backend() -> str:
+    """当前使用的计算后端: 'numba' 或 'numpy'"""
+    global _kernels, _kernels_loaded
+    choice = os.environ.get(BACKEND_ENV, 'auto').strip().lower()
+    if choice == 'numpy':
+        return 'numpy'
+    if not _kernels_loaded:
+        _kernels = _build_numba_kernels()
+        _kernels_loaded = True
+        if _kernels is None and choice == 'numba':
+            logger.warning(f"{BACKEND_ENV}=numba 但没有安装 numba，使用 numpy 计算技术指标")
+    return 'numba' if _kernels is not None else 'numpy'
+
+
+def _rolling_extreme(values: np.ndarray, window: int, min_periods, maximum: bool) -> np.ndarray:
+    min_periods = _min_periods(window, min_periods)
+    values = _as_float(values)
+    if values.ndim == 1:
+        return _rolling_extreme(values[:, None], window, min_periods, maximum)[:, 0]
+    if get_backend() == 'numba':
+        columns = np.ascontiguousarray(values.T)
+        out = _kernels['rolling_extreme'](columns, window, 1.0 if maximum else -1.0).T
+    else:
+        out = _rolling_extreme_numpy(values, window, np.fmax if maximum else np.fmin)
+    if min_periods > 1:
+        out = np.where(rolling_count(values, window) >= min_periods, out, np.nan)
+    return np.ascontiguousarray(out)
+
+
+def rolling_max(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """滚动最大值，忽略 NaN"""
+    return _rolling_extreme(values, window, min_periods, True)
+
+
+def rolling_min(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """滚动最小值，忽略 NaN"""
+    return _rolling_extreme(values, window, min_periods, False)
+
+
+def wilder_mean(values: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """
+    Wilder 平滑（alpha = 1/window 的指数移动平均），NaN 不参与递推，
+    累计有效值少于 min_periods（默认 window）时为 NaN
+    """
+    min_periods = _min_periods(window, min_periods)
+    values = _as_float(values)
+    if values.ndim == 1:
+        return wilder_mean(values[:, None], window, min_periods)[:, 0]
+    values = np.ascontiguousarray(values)
+    if get_backend() == 'numba':
+        out = _kernels['ewm'](values, 1.0 / window)
+    else:
+        out = _ewm_numpy(values, 1.0 / window)
+    observed = np.cumsum(~np.isnan(values), axis=0)
+    out[observed < min_periods] = np.nan
+    return out
+
+
+def previous_valid(values: np.ndarray) -> np.ndarray:
+    """每个交易日之前最近一个有效值（停牌日跳过），之前没有有效值时为 NaN"""
+    values = _as_float(values)
+    rows = np.arange(values.shape[0]).reshape((-1,) + (1,) * (values.ndim - 1))
+    last = np.where(~np.isnan(values), rows, -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    previous = np.full(values.shape, -1, dtype=np.int64)
+    previous[1:] = last[:-1]
+    out = np.take_along_axis(values, np.maximum(previous, 0), axis=0)
+    out[previous < 0] = np.nan
+    return out
+
+
+def moving_average(close: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """N日均线"""
+    return rolling_mean(close, window, min_periods)
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """真实波幅: max(最高-最低, |最高-前收|, |最低-前收|)，前收取停牌前最后一个收盘价"""
+    high, low = _as_float(high), _as_float(low)
+    prev_close = previous_valid(close)
+    with np.errstate(invalid='ignore'):
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    tr[np.isnan(high) | np.isnan(low)] = np.nan
+    return tr
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = ATR_WINDOW) -> np.ndarray:
+    """平均真实波幅（Wilder 平滑）"""
+    return wilder_mean(true_range(high, low, close), window)
+
+
+def highest(high: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """N日最高价"""
+    return rolling_max(high, window, min_periods)
+
+
+def lowest(low: np.ndarray, window: int, min_periods: int = None) -> np.ndarray:
+    """N日最低价"""
+    return rolling_min(low, window, min_periods)
+
+
+def rsi(close: np.ndarray, window: int = RSI_WINDOW) -> np.ndarray:
+    """相对强弱指标，涨幅和跌幅分别做 Wilder 平滑；窗口内没有涨跌时为 NaN"""
+    close = _as_float(close)
+    with np.errstate(invalid='ignore'):
+        delta = close - previous_valid(close)
+        gain = wilder_mean(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), window)
+        loss = wilder_mean(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), window)
+        total = gain + loss
+        return np.where(total > 0, 100.0 * gain / np.where(total > 0, total, 1.0), np.nan)
+
+
+def volatility(close: np.ndarray, window: int = VOLATILITY_WINDOW, annualize: bool = True,
+               min_periods: int = None) -> np.ndarray:
+    """N日对数收益率的标准差，annualize 时按每年 TRADING_DAYS_PER_YEAR 个交易日年化"""
+    close = _as_float(close)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.log(close / previous_valid(close))
+    std = rolling_std(returns, window, min_periods)
+    return std * np.sqrt(TRADING_DAYS_PER_YEAR) if annualize else std
+
+
+def adjustment_factors(close: np.ndarray, pct: np.ndarray, tolerance: float = ADJUST_TOLERANCE) -> np.ndarray:
+    """
+    把各日行情文件中的前复权价统一到最后一个交易日的复权基准的乘数[日期, 股票]
+
+    每日行情文件中的前复权价以当天为基准，之后发生除权时旧文件中的价格不会更新。
+    当天收盘价 / (1 + 涨跌幅) 即按当天基准的前收，与前一个有效收盘价之比就是这次除权的比例，
+    该日之前的价格都乘以这个比例；比例偏离 1 不超过 tolerance 时视为价格四舍五入的误差
+    """
+    close, pct = _as_float(close), _as_float(pct)
+    prev_close = previous_valid(close)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = close / (1 + pct / 100) / prev_close
+    ratio[~np.isfinite(ratio) | (ratio <= 0) | (np.abs(ratio - 1) <= tolerance)] = 1.0
+    # factors[s] = 之后所有交易日的除权比例之积
+    factors = np.ones_like(ratio)
+    if len(ratio) > 1:
+        factors[:-1] = np.cumprod(ratio[:0:-1], axis=0)[::-1]
+    return factors
+
+
+def panel_prices(panel: MarketPanel, adjust: bool = True) -> dict:
+    """
+    行情面板中的开高低收矩阵 {'open', 'high', 'low', 'close'}
+
+    Args:
+        panel: 行情面板
+        adjust: 是否用涨跌幅把各日的前复权价拼接到同一复权基准，不拼接时除权日前后的价格不连续
+    """
+    prices = {key: panel.fields[name] for key, name in PRICE_FIELDS.items()}
+    if adjust:
+        factors = adjustment_factors(prices['close'], panel.fields['涨跌幅'])
+        prices = {key: values * factors for key, values in prices.items()}
+    return prices
+
+
+def compute_indicators(panel: MarketPanel, adjust: bool = True, ma_windows=MA_WINDOWS,
+                       range_windows=RANGE_WINDOWS, atr_window: int = ATR_WINDOW,
+                       rsi_window: int = RSI_WINDOW, volatility_window: int = VOLATILITY_WINDOW) -> dict:
+    """
+    计算全市场所有交易日的技术指标
+
+    Returns:
+        dict: 指标名 -> 矩阵[日期, 股票]，指标名如 MA5、最高20、最低20、ATR14、RSI14、波动率20
+    """
+    prices = panel_prices(panel, adjust)
+    close = prices['close']
+    values = {}
+    for window in ma_windows:
+        values[f'MA{window}'] = moving_average(close, window)
+    for window in range_windows:
+        values[f'最高{window}'] = highest(prices['high'], window)
+        values[f'最低{window}'] = lowest(prices['low'], window)
+    values[f'ATR{atr_window}'] = atr(prices['high'], prices['low'], close, atr_window)
+    values[f'RSI{rsi_window}'] = rsi(close, rsi_window)
+    values[f'波动率{volatility_window}'] = volatility(close, volatility_window)
+    return values
+
+
+def indicator_frame(panel: MarketPanel, values: dict, trade_date: str = None, columns: list = None,
+                    adjust: bool = True) -> pd.DataFrame:
+    """
+    单个交易日的指标截面，每只股票一行，包含 code、收盘价_前 和指标列
+
+    Args:
+        panel: 计算指标用的行情面板
+        values: compute_indicators 的结果
+        trade_date: 交易日期，默认最后一个交易日
+        columns: 需要的指标，默认全部
+        adjust: 与 compute_indicators 的参数一致；复权拼接后的价格以最后一个交易日为基准，
+            价格类指标（均线、最高/最低、ATR）会换回该日的基准，以便与该日行情直接比较
+
+    Raises:
+        Exception: 面板中没有该交易日
+    """
+    if not len(panel.dates):
+        raise Exception("行情面板为空")
+    trade_date = trade_date or str(panel.dates[-1])
+    pos = int(np.searchsorted(panel.dates, trade_date))
+    if pos >= len(panel.dates) or panel.dates[pos] != trade_date:
+        raise Exception(f"行情面板中没有交易日{trade_date}")
+    columns = list(values) if columns is None else columns
+    present = np.flatnonzero(panel.present()[pos])
+    close = panel.fields[PRICE_FIELDS['close']]
+
+    scale = np.ones(len(present))
+    if adjust:
+        scale = 1.0 / adjustment_factors(close, panel.fields['涨跌幅'])[pos, present]
+
+    data = {'code': np.asarray(panel.codes, dtype=object)[present], '收盘价_前': close[pos, present]}
+    for name in columns:
+        row = values[name][pos, present]
+        data[name] = row * scale if name.startswith(PRICE_INDICATORS) else row
+    return pd.DataFrame(data)
+
+if __name__ == "__main__":
+    import time
+    panel = MarketPanel.load_synced()
+    start = time.perf_counter()
+    values = compute_indicators(panel)
+    print(f"行情面板: {panel.shape}, 后端: {get_backend()}, 计算{len(values)}个指标耗时{time.perf_counter() - start:.2f}秒")
+    print(indicator_frame(panel, values).head(20))
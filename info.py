@@ -8,12 +8,20 @@ import pandas as pd
 from trading_calendar import TradingCalendar
 from log_setup import get_logger
 from notification import DingDingRobot
+from info_index import update_info_index
+from upstream import get_base_url
+from retry_policy import call_with_retry, should_retry_run, FatalError
+from hedging import hedged_call
 
 
 trading_calendar = TradingCalendar()
 dingding_robot = DingDingRobot()
 logger = get_logger("info", "logs", "daily_research.log")
 
+# 问财资讯接口地址
+IWENCAI_BASE_URL = get_base_url('iwencai')
+REQUEST_TIMEOUT = 15  # 秒
+
 class StockInfo:
     """
     股票信息获取类
@@ -26,6 +34,15 @@ class StockInfo:
             'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36',
         }
     
+    def _post(self, url, data):
+        """发送请求，HTTP错误抛出异常以便按状态码重试；开启对冲时慢请求会再发一次，取先返回的结果"""
+        return hedged_call('iwencai', self._post_once, url, data)
+
+    def _post_once(self, url, data):
+        response = requests.post(url, cookies=None, headers=self.headers, data=data, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response
+
     def clean_html_tags(self, text):
         """清理HTML标签"""
         if not text:
@@ -93,12 +110,8 @@ class StockInfo:
             return result
 
         try:
-            response = requests.post(
-                'https://www.iwencai.com/unifiedwap/unified-wap/v1/information/news',
-                cookies=None,
-                headers=self.headers,
-                data=data,
-            )
+            response = call_with_retry('iwencai', self._post,
+                                       f'{IWENCAI_BASE_URL}/unifiedwap/unified-wap/v1/information/news', data)
 
             response_data = response.json()
             # print(response_data)
@@ -139,12 +152,8 @@ class StockInfo:
         }
 
         try:
-            response = requests.post(
-                'https://www.iwencai.com/unifiedwap/unified-wap/v1/information/notice',
-                cookies=None,
-                headers=self.headers,
-                data=data,
-            )
+            response = call_with_retry('iwencai', self._post,
+                                       f'{IWENCAI_BASE_URL}/unifiedwap/unified-wap/v1/information/notice', data)
 
             response_data = response.json()
             
@@ -245,12 +254,8 @@ class StockInfo:
             return extracted_reports
 
         try:
-            response = requests.post(
-                'https://www.iwencai.com/unifiedwap/unified-wap/result/get-urp-data',
-                cookies=None,
-                headers=self.headers,
-                data=data,
-            )
+            response = call_with_retry('iwencai', self._post,
+                                       f'{IWENCAI_BASE_URL}/unifiedwap/unified-wap/result/get-urp-data', data)
             
             json_data = response.json()
             reports = extract_report_info(json_data)
@@ -396,16 +401,14 @@ class StockInfo:
         # 获取三种信息
         print(f"正在获取 {stock_name} 的信息...")
         
+        # 请求间隔由 rate_limiter 中 iwencai 的速率控制
         news_data = self.get_news(stock_name, **news_params)
         print(f"  - 新闻获取完成")
-        time.sleep(1)
         
         announcement_data = self.get_announcements(stock_name, **announcement_params)
         print(f"  - 公告获取完成")
-        time.sleep(1)
         research_data = self.get_research_reports(stock_name, **research_params)
         print(f"  - 研报获取完成")
-        time.sleep(1)
         # 转换为DataFrame格式
         df_rows = []
         df_rows.extend(self._convert_news_to_df(news_data, stock_name))
@@ -492,7 +495,6 @@ def process_stock_pool(stock_pool, output_filename, pool_name):
                 logger.warning(f'{stock} 没有获取到任何数据')
                 failed_stocks.append(stock)
                 
-            time.sleep(2)  # 避免请求过于频繁
             
         except Exception as e:
             logger.error(f"处理股票 {stock} 时出错: {e}")
@@ -571,7 +573,7 @@ def get_stock_info():
                 core_stocks = pd.read_csv(core_stocks_file)
                 if '股票简称' not in core_stocks.columns:
                     logger.error(f"核心股票池文件缺少'股票简称'列: {core_stocks.columns.tolist()}")
-                    raise ValueError(f"核心股票池文件缺少'股票简称'列")
+                    raise FatalError(f"核心股票池文件缺少'股票简称'列")
                 
                 core_stocks_list = core_stocks['股票简称'].unique().tolist()
                 logger.info(f"核心股票池共有 {len(core_stocks_list)} 只股票")
@@ -597,7 +599,7 @@ def get_stock_info():
                 first_stocks = pd.read_csv(first_stocks_file)
                 if '股票简称' not in first_stocks.columns:
                     logger.error(f"首板股票池文件缺少'股票简称'列: {first_stocks.columns.tolist()}")
-                    raise ValueError(f"首板股票池文件缺少'股票简称'列")
+                    raise FatalError(f"首板股票池文件缺少'股票简称'列")
                 
                 first_stocks_list = first_stocks['股票简称'].unique().tolist()
                 logger.info(f"首板股票池共有 {len(first_stocks_list)} 只股票")
@@ -610,6 +612,12 @@ def get_stock_info():
                 dingding_robot.send_message(f"处理首板股票池失败: {e}", 'robot3')
                 raise
 
+            # 3. 增量更新全文索引，失败不影响主流程
+            try:
+                update_info_index(latest_date)
+            except Exception as e:
+                logger.warning(f"更新股票信息索引失败: {e}")
+
             # 执行完成，发送成功通知
             end_time = datetime.datetime.now()
             duration = end_time - start_time
@@ -621,7 +629,7 @@ def get_stock_info():
         except Exception as e:
             logger.error(f"股票信息获取执行失败: {e}")
             
-            if retry_count == MAX_RETRIES - 1:
+            if retry_count == MAX_RETRIES - 1 or not should_retry_run(e):
                 # 最后一次重试失败
                 end_time = datetime.datetime.now()
                 duration = end_time - start_time
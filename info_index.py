@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+股票信息全文索引
+对 info.py 每日生成的新闻、公告、研报建立持久化的增量倒排索引，
+中文按字符二元组切分，英文数字按整词切分，倒排表按段保存在磁盘上
+"""
+
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from columnar_store import save_arrays, load_arrays
+from security_master import get_security_master
+from log_setup import get_logger
+
+logger = get_logger("info_index", "logs", "daily_research.log")
+
+# 配置常量
+INDEX_DIR = "./data/index/info"
+OUTPUT_BASE_DIR = "./output"
+MANIFEST_FILE = "manifest.json"
+FINGERPRINT_FILE = "fingerprints.npz"
+MAX_TERM_LENGTH = 16
+
+# 索引的文本字段和保存的文档字段
+TEXT_FIELDS = ['title', 'summary']
+DOC_FIELDS = ['stock_name', 'info_type', 'publish_time', 'source', 'title', 'summary', 'author', 'url']
+
+CJK_PATTERN = re.compile(r'[一-鿿]+')
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str, unigrams: bool = True) -> list:
+    """
+    中文单字 + 二元组 + 英文数字整词切分
+
+    索引时 unigrams=True，每个汉字也作为词元，保证单字查询能命中多字片段中的字；
+    查询时 unigrams=False，多字关键词只用二元组求交，单字关键词用单字词元
+    """
+    if not text:
+        return []
+    text = str(text).lower()
+    tokens = []
+    for run in CJK_PATTERN.findall(text):
+        if len(run) == 1 or unigrams:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(word[:MAX_TERM_LENGTH] for word in WORD_PATTERN.findall(text))
+    return tokens
+
+
+def normalize_publish_date(publish_time: str, ingest_date: str) -> int:
+    """
+    把发布时间统一为 YYYYMMDD 整数
+
+    支持 'YYYY-MM-DD[ HH:MM:SS]'、'MM月DD日'（年份取入库日期）和秒级时间戳，
+    无法解析时使用入库日期
+    """
+    text = str(publish_time or '').strip()
+    match = re.match(r'(\d{4})-(\d{1,2})-(\d{1,2})', text)
+    if match:
+        return int(f"{match.group(1)}{int(match.group(2)):02d}{int(match.group(3)):02d}")
+    match = re.match(r'(\d{1,2})月(\d{1,2})日', text)
+    if match:
+        return int(f"{ingest_date[:4]}{int(match.group(1)):02d}{int(match.group(2)):02d}")
+    if text.isdigit() and len(text) >= 10:
+        return int(pd.Timestamp(int(text[:10]), unit='s').strftime('%Y%m%d'))
+    return int(ingest_date)
+
+
+def _fingerprint(row: dict, pool: str) -> int:
+    """文档指纹，用于增量去重；同一条资讯出现在多个股票池时每个股票池各索引一次"""
+    key = '|'.join([str(row.get(field, '')) for field in ('stock_name', 'info_type', 'title', 'publish_time')]
+                   + [str(pool)])
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class InfoIndex:
+    """
+    股票信息倒排索引
+
+    每次入库生成一个段：
+    - seg_XXXXX.npz: 词元数组(升序)、偏移量、文档号倒排表，以及用于过滤的文档元数据
+    - seg_XXXXX.csv: 文档原文
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self._manifest = None
+        self._segments = {}
+        self._segment_docs = {}
+
+    # ------------------------------------------------------------------ 元数据
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            path = os.path.join(self.index_dir, MANIFEST_FILE)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+            else:
+                self._manifest = {'next_doc_id': 0, 'segments': []}
+        return self._manifest
+
+    def _save_manifest(self) -> None:
+        path = os.path.join(self.index_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _load_fingerprints(self) -> np.ndarray:
+        arrays = load_arrays(os.path.join(self.index_dir, FINGERPRINT_FILE))
+        return arrays.get('fingerprints', np.array([], dtype=np.int64))
+
+    # ------------------------------------------------------------------ 写入
+    def add_documents(self, df: pd.DataFrame, pool: str, ingest_date: str) -> int:
+        """
+        增量写入文档，已索引过的文档（按股票、类型、标题、发布时间、股票池去重）会被跳过
+
+        Args:
+            df: info.py 输出格式的数据
+            pool: 股票池名称，如 'core'、'first'
+            ingest_date: 入库日期 YYYYMMDD
+
+        Returns:
+            int: 新增文档数
+        """
+        if df is None or df.empty:
+            return 0
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        docs = df.reindex(columns=DOC_FIELDS).fillna('').astype(str)
+        records = docs.to_dict('records')
+        fingerprints = np.array([_fingerprint(r, pool) for r in records], dtype=np.int64)
+
+        known = self._load_fingerprints()
+        _, first_idx = np.unique(fingerprints, return_index=True)
+        keep = np.zeros(len(records), dtype=bool)
+        keep[first_idx] = True
+        keep &= ~np.isin(fingerprints, known)
+        if not keep.any():
+            logger.info(f"{pool}股票信息无新增文档, 跳过索引")
+            return 0
+
+        docs = docs[keep].reset_index(drop=True)
+        start_id = self.manifest['next_doc_id']
+        doc_ids = np.arange(start_id, start_id + len(docs), dtype=np.int32)
+
+        # 生成 (词元, 文档号) 对并排序去重
+        terms, term_docs = [], []
+        text = (docs['title'] + ' ' + docs['summary']).tolist()
+        for doc_id, content in zip(doc_ids, text):
+            tokens = set(tokenize(content))
+            terms.extend(tokens)
+            term_docs.extend([doc_id] * len(tokens))
+        terms = np.array(terms, dtype=f'<U{MAX_TERM_LENGTH}')
+        term_docs = np.array(term_docs, dtype=np.int32)
+        order = np.lexsort((term_docs, terms))
+        terms, term_docs = terms[order], term_docs[order]
+        unique_terms, term_starts = np.unique(terms, return_index=True)
+        offsets = np.append(term_starts, len(terms)).astype(np.int64)
+
+        segment = f"seg_{len(self.manifest['segments']):05d}"
+        docs.insert(0, 'doc_id', doc_ids)
+        docs['pool'] = pool
+        docs['ingest_date'] = ingest_date
+        docs.to_csv(os.path.join(self.index_dir, f"{segment}.csv"), index=False, encoding='utf-8-sig')
+        save_arrays(
+            os.path.join(self.index_dir, f"{segment}.npz"),
+            terms=unique_terms,
+            offsets=offsets,
+            postings=term_docs,
+            doc_ids=doc_ids,
+            stock_names=docs['stock_name'].to_numpy(dtype=str),
+            sids=get_security_master().lookup_names(docs['stock_name'].tolist(), as_of=ingest_date),
+            info_types=docs['info_type'].to_numpy(dtype=str),
+            pools=docs['pool'].to_numpy(dtype=str),
+            publish_dates=np.array([normalize_publish_date(t, ingest_date) for t in docs['publish_time']],
+                                   dtype=np.int32),
+        )
+        save_arrays(os.path.join(self.index_dir, FINGERPRINT_FILE),
+                    fingerprints=np.concatenate([known, fingerprints[keep]]))
+
+        self.manifest['segments'].append({
+            'name': segment,
+            'pool': pool,
+            'ingest_date': ingest_date,
+            'doc_count': len(docs),
+            'min_doc_id': int(start_id),
+        })
+        self.manifest['next_doc_id'] = int(start_id + len(docs))
+        self._save_manifest()
+        logger.info(f"{pool}股票信息索引完成, 新增文档: {len(docs)}, 词元数: {len(unique_terms)}, 段: {segment}")
+        return len(docs)
+
+    def add_file(self, file_path: str, pool: str, ingest_date: str) -> int:
+        """索引 info.py 输出的CSV文件"""
+        if not os.path.exists(file_path):
+            logger.warning(f"索引文件不存在: {file_path}")
+            return 0
+        return self.add_documents(pd.read_csv(file_path, dtype=str), pool, ingest_date)
+
+    # ------------------------------------------------------------------ 查询
+    def _segment(self, name: str) -> dict:
+        if name not in self._segments:
+            self._segments[name] = load_arrays(os.path.join(self.index_dir, f"{name}.npz"))
+        return self._segments[name]
+
+    def _docs(self, name: str) -> pd.DataFrame:
+        if name not in self._segment_docs:
+            df = pd.read_csv(os.path.join(self.index_dir, f"{name}.csv"), dtype=str, keep_default_na=False)
+            df['doc_id'] = df['doc_id'].astype(np.int32)
+            self._segment_docs[name] = df.set_index('doc_id', drop=False)
+        return self._segment_docs[name]
+
+    @staticmethod
+    def _postings(segment: dict, term: str) -> np.ndarray:
+        terms = segment['terms']
+        pos = int(np.searchsorted(terms, term))
+        if pos >= len(terms) or terms[pos] != term:
+            return np.array([], dtype=np.int32)
+        offsets = segment['offsets']
+        return segment['postings'][offsets[pos]:offsets[pos + 1]]
+
+    def search(self,
+               query: str,
+               info_types: list = None,
+               start_date: str = None,
+               end_date: str = None,
+               days: int = None,
+               stock_names: list = None,
+               sids: list = None,
+               pools: list = None,
+               limit: int = 200) -> pd.DataFrame:
+        """
+        全文检索
+
+        Args:
+            query: 查询文本，多个关键词用空格分隔（与关系）
+            info_types: 信息类型过滤，如 ['research_report']
+            start_date / end_date: 发布日期范围 YYYYMMDD
+            days: 最近N天（按自然日，从 end_date 或今天往前），与 start_date 二选一
+            stock_names: 股票简称过滤，按证券编号匹配，股票改名前的文档也会命中
+            sids: 证券编号过滤
+            pools: 股票池过滤，如 ['core']
+            limit: 最多返回条数
+
+        Returns:
+            pd.DataFrame: 命中文档，按发布日期倒序
+        """
+        keywords = [k.lower() for k in str(query or '').split() if k.strip()]
+        if not keywords:
+            return pd.DataFrame(columns=['doc_id'] + DOC_FIELDS + ['pool', 'ingest_date', 'publish_date'])
+
+        end_int = int(end_date) if end_date else int(pd.Timestamp.now().strftime('%Y%m%d'))
+        if days is not None and start_date is None:
+            start_date = (pd.Timestamp(str(end_int)) - pd.Timedelta(days=days)).strftime('%Y%m%d')
+        start_int = int(start_date) if start_date else 0
+
+        query_terms = sorted({term for keyword in keywords for term in tokenize(keyword, unigrams=False)})
+        wanted_sids = None
+        if stock_names is not None or sids is not None:
+            wanted_sids = np.asarray(list(sids or []), dtype=np.int32)
+            if stock_names is not None:
+                named = get_security_master().lookup_names(list(stock_names))
+                wanted_sids = np.concatenate([wanted_sids, named[named >= 0]])
+        results = []
+        for seg_info in reversed(self.manifest['segments']):
+            if pools and seg_info['pool'] not in pools:
+                continue
+            segment = self._segment(seg_info['name'])
+
+            # 倒排表求交，按文档频率从小到大依次求交
+            candidates = None
+            for postings in sorted((self._postings(segment, t) for t in query_terms), key=len):
+                candidates = postings if candidates is None else np.intersect1d(candidates, postings,
+                                                                                assume_unique=True)
+                if len(candidates) == 0:
+                    break
+            if candidates is None or len(candidates) == 0:
+                continue
+
+            # 元数据过滤
+            rows = candidates - seg_info['min_doc_id']
+            mask = ((segment['publish_dates'][rows] >= start_int) &
+                    (segment['publish_dates'][rows] <= end_int))
+            if info_types:
+                mask &= np.isin(segment['info_types'][rows], info_types)
+            if wanted_sids is not None:
+                stock_mask = np.isin(segment['sids'][rows], wanted_sids)
+                if stock_names is not None:
+                    # 证券主表中查不到的简称仍按字符串匹配
+                    stock_mask |= np.isin(segment['stock_names'][rows], list(stock_names))
+                mask &= stock_mask
+            if pools:
+                mask &= np.isin(segment['pools'][rows], pools)
+            rows = rows[mask]
+            if len(rows) == 0:
+                continue
+
+            # 短语校验：二元组命中不代表原文连续出现
+            docs = self._docs(seg_info['name']).loc[candidates[mask]]
+            content = (docs['title'] + ' ' + docs['summary']).str.lower()
+            phrase_mask = np.ones(len(docs), dtype=bool)
+            for keyword in keywords:
+                phrase_mask &= content.str.contains(keyword, regex=False).to_numpy()
+            docs = docs[phrase_mask].copy()
+            docs['publish_date'] = segment['publish_dates'][rows[phrase_mask]]
+            results.append(docs)
+
+        if not results:
+            return pd.DataFrame(columns=['doc_id'] + DOC_FIELDS + ['pool', 'ingest_date', 'publish_date'])
+        result = pd.concat(results, ignore_index=True)
+        result = result.sort_values(['publish_date', 'doc_id'], ascending=False).head(limit)
+        return result.reset_index(drop=True)
+
+    def stats(self) -> dict:
+        """索引概况"""
+        segments = self.manifest['segments']
+        return {
+            'segments': len(segments),
+            'documents': int(sum(s['doc_count'] for s in segments)),
+            'latest_ingest_date': segments[-1]['ingest_date'] if segments else None,
+        }
+
+
+def get_current_pool_stocks(prefix: str = 'core_stocks') -> list:
+    """读取 output 目录下最新交易日股票池的股票简称"""
+    if not os.path.exists(OUTPUT_BASE_DIR):
+        return []
+    dates = [d for d in os.listdir(OUTPUT_BASE_DIR) if d.isdigit() and len(d) == 8]
+    if not dates:
+        return []
+    file_path = os.path.join(OUTPUT_BASE_DIR, max(dates), f"{prefix}.csv")
+    if not os.path.exists(file_path):
+        return []
+    return pd.read_csv(file_path, usecols=['股票简称'])['股票简称'].dropna().unique().tolist()
+
+
+def update_info_index(ingest_date: str, base_dir: str = OUTPUT_BASE_DIR) -> int:
+    """把当日的 core_info.csv 和 first_info.csv 增量写入索引"""
+    index = InfoIndex()
+    added = 0
+    for pool, filename in [('core', 'core_info.csv'), ('first', 'first_info.csv')]:
+        added += index.add_file(os.path.join(base_dir, filename), pool, ingest_date)
+    logger.info(f"股票信息索引更新完成, 新增文档: {added}, 索引概况: {index.stats()}")
+    return added
+
+
+if __name__ == "__main__":
+    # 示例：最近30天核心股票池中提到固态电池的研报
+    idx = InfoIndex()
+    print(idx.search('固态电池', info_types=['research_report'], days=30,
+                     stock_names=get_current_pool_stocks()))
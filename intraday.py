@@ -0,0 +1,285 @@
+"""
+盘中监控
+交易时段内每隔N分钟轮询问财精简行情（热度排名前N）和涨停、跌停、炸板数据，
+与内存中的上一次快照比较，只输出变化：新涨停/回封、炸板、新跌停、热度排名跃升，
+变化追加写入 output/{date}/intraday_log.csv 并推送钉钉
+
+快照以股票代码为下标保存为数组，每次轮询只做数组比较，不重新处理全市场数据；
+某个数据源获取失败时沿用上一次的状态，不会产生虚假的变化
+"""
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from log_setup import get_logger
+from trading_calendar import TradingCalendar
+from notification import DingDingRobot
+from retry_policy import call_with_retry
+from wencai import WencaiUtils
+
+# 配置日志
+logger = get_logger("intraday", "logs", "daily_research.log")
+
+# 全局对象
+trading_calendar = TradingCalendar()
+dingding_robot = DingDingRobot()
+
+# 盘中监控配置
+DEFAULT_INTERVAL_MINUTES = 1
+DEFAULT_ROBOT = 'robot2'
+TRADING_SESSIONS = [('09:30', '11:30'), ('13:00', '15:00')]
+OUTPUT_BASE_DIR = "./output"
+INTRADAY_LOG_FILE = "intraday_log.csv"
+LOG_COLUMNS = ['时间', '事件', 'code', '股票简称', '原值', '新值']
+
+HEAT_TOP_N = 200        # 精简行情只查询热度排名前200
+HEAT_ALERT_RANK = 50    # 新进入热度前50时提醒
+HEAT_JUMP = 100         # 热度排名一次上升不少于100名时提醒
+HEAT_MISSING = np.iinfo(np.int32).max  # 不在热度前N
+MAX_MESSAGE_ITEMS = 20  # 每类事件在钉钉消息中最多列出的股票数
+
+
+class IntradaySnapshot:
+    """
+    盘中快照
+
+    - codes / names: 股票代码和简称，列表顺序即数组下标，新出现的股票追加到末尾
+    - heat: int32 热度排名，不在前 HEAT_TOP_N 为 HEAT_MISSING
+    - is_zt / is_dt: 当前是否涨停/跌停
+    - touched: 当日是否曾经涨停（涨停或炸板数据中出现过），用于区分新涨停和回封
+    """
+
+    def __init__(self):
+        self.codes = []
+        self.names = []
+        self._code_index = {}
+        self.heat = np.full(0, HEAT_MISSING, dtype=np.int32)
+        self.is_zt = np.zeros(0, dtype=bool)
+        self.is_dt = np.zeros(0, dtype=bool)
+        self.touched = np.zeros(0, dtype=bool)
+        # 已获取过至少一次的数据源，首次获取只建立基准，不产生变化
+        self.loaded = set()
+
+    def _positions(self, df: pd.DataFrame) -> np.ndarray:
+        """查找或新增股票所在下标，同时更新简称"""
+        codes = df['code'].tolist()
+        names = df['股票简称'].tolist()
+        positions = np.empty(len(codes), dtype=np.int64)
+        for i, (code, name) in enumerate(zip(codes, names)):
+            pos = self._code_index.get(code)
+            if pos is None:
+                pos = len(self.codes)
+                self._code_index[code] = pos
+                self.codes.append(code)
+                self.names.append(name)
+            else:
+                self.names[pos] = name
+            positions[i] = pos
+
+        grow = len(self.codes) - len(self.heat)
+        if grow > 0:
+            self.heat = np.concatenate([self.heat, np.full(grow, HEAT_MISSING, dtype=np.int32)])
+            self.is_zt = np.concatenate([self.is_zt, np.zeros(grow, dtype=bool)])
+            self.is_dt = np.concatenate([self.is_dt, np.zeros(grow, dtype=bool)])
+            self.touched = np.concatenate([self.touched, np.zeros(grow, dtype=bool)])
+        return positions
+
+    def _mask(self, df: pd.DataFrame) -> np.ndarray:
+        """数据中出现的股票标记为 True"""
+        positions = self._positions(df)
+        mask = np.zeros(len(self.codes), dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _events(self, event: str, idx: np.ndarray, old=None, new=None) -> list:
+        return [{'事件': event, 'code': self.codes[i], '股票简称': self.names[i],
+                 '原值': None if old is None else old[k], '新值': None if new is None else new[k]}
+                for k, i in enumerate(idx)]
+
+    def update(self, overview: pd.DataFrame = None, zt: pd.DataFrame = None,
+               dt: pd.DataFrame = None, zb: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        用本次轮询的数据更新快照并返回变化
+
+        Args:
+            overview: 精简行情（含热度排名），None 表示本次获取失败
+            zt / dt / zb: 涨停、跌停、炸板数据，None 表示本次获取失败
+
+        Returns:
+            pd.DataFrame: 变化列表，列为 事件、code、股票简称、原值、新值
+        """
+        events = []
+
+        if zb is not None:
+            positions = self._positions(zb)
+            self.touched[positions] = True
+            self.loaded.add('zb')
+
+        if zt is not None:
+            new_zt = self._mask(zt)
+            if 'zt' in self.loaded:
+                added = np.flatnonzero(new_zt & ~self.is_zt)
+                reseal = self.touched[added]
+                events += self._events('回封', added[reseal])
+                events += self._events('新涨停', added[~reseal])
+                # 炸板数据获取失败时也按涨停消失判断炸板
+                events += self._events('炸板', np.flatnonzero(self.is_zt & ~new_zt))
+            self.is_zt = new_zt
+            self.touched |= new_zt
+            self.loaded.add('zt')
+
+        if dt is not None:
+            new_dt = self._mask(dt)
+            if 'dt' in self.loaded:
+                events += self._events('新跌停', np.flatnonzero(new_dt & ~self.is_dt))
+                events += self._events('跌停打开', np.flatnonzero(self.is_dt & ~new_dt))
+            self.is_dt = new_dt
+            self.loaded.add('dt')
+
+        if overview is not None:
+            positions = self._positions(overview)
+            new_heat = np.full(len(self.codes), HEAT_MISSING, dtype=np.int32)
+            new_heat[positions] = overview['热度排名'].to_numpy(dtype=np.int32)
+            if 'overview' in self.loaded:
+                old_heat = self.heat
+                entered = (new_heat <= HEAT_ALERT_RANK) & (old_heat > HEAT_ALERT_RANK)
+                jumped = (old_heat != HEAT_MISSING) & (old_heat.astype(np.int64) - new_heat >= HEAT_JUMP)
+                idx = np.flatnonzero(entered | jumped)
+                idx = idx[np.argsort(new_heat[idx], kind='stable')]
+                old_values = np.where(old_heat[idx] == HEAT_MISSING, -1, old_heat[idx])
+                events += self._events('热度跃升', idx, old_values.tolist(), new_heat[idx].tolist())
+            self.heat = new_heat
+            self.loaded.add('overview')
+
+        df = pd.DataFrame(events, columns=LOG_COLUMNS[1:])
+        df[['原值', '新值']] = df[['原值', '新值']].astype('Int64')
+        df.insert(0, '时间', datetime.now().strftime('%H:%M:%S'))
+        return df
+
+
+def fetch_sources() -> dict:
+    """获取本次轮询的各数据源，失败的数据源为 None"""
+    sources = {
+        'overview': (WencaiUtils.get_intraday_overview, {'top_n': HEAT_TOP_N}),
+        'zt': (WencaiUtils.get_zt_stocks, {}),
+        'dt': (WencaiUtils.get_dt_stocks, {}),
+        'zb': (WencaiUtils.get_zb_stocks, {}),
+    }
+    result = {}
+    for name, (func, kwargs) in sources.items():
+        try:
+            result[name] = call_with_retry('wencai', func, **kwargs)
+        except Exception as e:
+            logger.warning(f"盘中数据 {name} 获取失败，沿用上一次快照: {e}")
+            result[name] = None
+    return result
+
+
+def append_intraday_log(events: pd.DataFrame, trade_date: str) -> None:
+    """把变化追加写入当日盘中日志"""
+    output_dir = f"{OUTPUT_BASE_DIR}/{trade_date}"
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, INTRADAY_LOG_FILE)
+    events.to_csv(file_path, mode='a', header=not os.path.exists(file_path),
+                  index=False, encoding='utf-8-sig')
+
+
+def build_intraday_message(events: pd.DataFrame) -> str:
+    """把变化整理为钉钉消息，每类事件一行"""
+    lines = [f"盘中异动 {events['时间'].iloc[0]}"]
+    for event, group in events.groupby('事件', sort=False):
+        if event == '热度跃升':
+            items = [f"{row.股票简称}({'>' + str(HEAT_TOP_N) if row.原值 == -1 else row.原值}→{row.新值})"
+                     for row in group.head(MAX_MESSAGE_ITEMS).itertuples()]
+        else:
+            items = group['股票简称'].head(MAX_MESSAGE_ITEMS).tolist()
+        more = f" 等{len(group)}只" if len(group) > MAX_MESSAGE_ITEMS else ""
+        lines.append(f"{event}: {'、'.join(items)}{more}")
+    return "\n".join(lines)
+
+
+def poll_once(snapshot: IntradaySnapshot, trade_date: str, robot: str = DEFAULT_ROBOT) -> pd.DataFrame:
+    """轮询一次：获取数据、计算变化、写日志并推送"""
+    start_time = time.time()
+    events = snapshot.update(**fetch_sources())
+    logger.info(f"盘中轮询完成, 变化{len(events)}条, 耗时: {time.time() - start_time:.2f}秒")
+    if events.empty:
+        return events
+    append_intraday_log(events, trade_date)
+    try:
+        dingding_robot.send_message(build_intraday_message(events), robot)
+    except Exception as e:
+        logger.error(f"盘中异动推送失败: {e}")
+    return events
+
+
+def _session_bounds(now: datetime) -> list:
+    return [(datetime.combine(now.date(), datetime.strptime(start, '%H:%M').time()),
+             datetime.combine(now.date(), datetime.strptime(end, '%H:%M').time()))
+            for start, end in TRADING_SESSIONS]
+
+
+def in_trading_session(now: datetime) -> bool:
+    """是否处于连续竞价时段"""
+    return any(start <= now <= end for start, end in _session_bounds(now))
+
+
+def seconds_until_next_poll(now: datetime, interval_minutes: int):
+    """
+    距下一次轮询的秒数：交易时段内对齐到下一个 interval 整分钟，
+    时段外等到下一个时段开始；当日收盘后返回 None
+    """
+    for start, end in _session_bounds(now):
+        if now < start:
+            return (start - now).total_seconds()
+        if now < end:
+            minute = (now.minute // interval_minutes + 1) * interval_minutes
+            next_time = now.replace(minute=0, second=0, microsecond=0) + timedelta(minutes=minute)
+            return (min(next_time, end) - now).total_seconds()
+    return None
+
+
+def watch(interval_minutes: int = DEFAULT_INTERVAL_MINUTES, robot: str = DEFAULT_ROBOT, once: bool = False) -> None:
+    """
+    盘中监控主循环，收盘后退出
+
+    Args:
+        interval_minutes: 轮询间隔（分钟）
+        robot: 推送的钉钉机器人
+        once: 只轮询一次（用于手动检查）
+    """
+    trade_date = datetime.now().strftime('%Y%m%d')
+    if not trading_calendar.is_trading_day(trade_date):
+        logger.warning(f"今天 {trade_date} 不是交易日，跳过盘中监控")
+        return
+
+    logger.info(f"开始盘中监控, 轮询间隔: {interval_minutes}分钟")
+    snapshot = IntradaySnapshot()
+    while True:
+        if once or in_trading_session(datetime.now()):
+            try:
+                poll_once(snapshot, trade_date, robot)
+            except Exception as e:
+                logger.error(f"盘中轮询失败: {e}")
+        if once:
+            return
+        wait = seconds_until_next_poll(datetime.now(), interval_minutes)
+        if wait is None:
+            logger.info("已收盘，盘中监控结束")
+            return
+        time.sleep(max(wait, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="盘中监控：轮询涨停、跌停、炸板和热度排名的变化")
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL_MINUTES, help="轮询间隔（分钟）")
+    parser.add_argument('--robot', default=DEFAULT_ROBOT, help="推送的钉钉机器人")
+    parser.add_argument('--once', action='store_true', help="只轮询一次")
+    args = parser.parse_args()
+    watch(max(1, args.interval), args.robot, args.once)
+
+
+if __name__ == "__main__":
+    main()
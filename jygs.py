@@ -5,6 +5,7 @@
 
 import requests
 import os
+import re
 import pandas as pd
 from trading_calendar import TradingCalendar
 import time
@@ -12,8 +13,13 @@ from random import randint
 import execjs
 from typing import Optional
 from log_setup import get_logger
-from utils import execute_with_retry, check_file_exists_after_time
+from utils import check_output_complete
+from retry_policy import call_with_retry
+from hedging import hedged_call
 from notification import DingDingRobot
+from hotspot_cube import HotspotCube
+from security_master import latest_per_security
+from upstream import get_base_url
 from datetime import datetime
 # 设置日志记录器
 logger = get_logger("jygs", "logs", "daily_research.log")
@@ -23,7 +29,7 @@ class JygsUtils:
     """韭研公社API工具类"""
     
     # API配置
-    BASE_URL = "https://app.jiuyangongshe.com/jystock-app/api/v1"
+    BASE_URL = get_base_url('jygs')
     REFERER_URL = "https://www.jiuyangongshe.com/"
     JS_FILE_PATH = "./js/jygs.js"
     
@@ -82,6 +88,7 @@ class JygsUtils:
                 headers=headers,
                 json=json_data,
             )
+            response.raise_for_status()
             result = response.json()
             if result.get('errCode') == '0':
                 logger.info(f"登录成功: {result['data']['nickname']}")
@@ -93,6 +100,32 @@ class JygsUtils:
             logger.error(f"获取登录会话失败: {e}")
             raise
     
+    @staticmethod
+    def _parse_action_field(data: list, trading_date: str) -> pd.DataFrame:
+        """把 /action/field 返回的 data 列表展开为每只股票一行"""
+        stocks_data = []
+        for item in data[1:]:  # 跳过第一个元素
+            hotspot_name = item['name']
+            hotspot_reason = item.get('reason', '')
+            
+            for stock in item['list']:
+                action_info = stock['article']['action_info']
+                expound_parts = action_info['expound'].split('\n')
+                stocks_data.append({
+                    '股票简称': stock['name'],
+                    'code': stock['code'][2:].zfill(6),  # 去掉前缀并确保6位字符串格式
+                    'zt_time': action_info['time'],
+                    '异动原因': expound_parts[0],
+                    '解析': '\n'.join(expound_parts[1:]) if len(expound_parts) > 1 else '',
+                    '热点': hotspot_name,
+                    '热点导火索': hotspot_reason,
+                    '交易日期': trading_date,
+                    'shares_range': round(float(action_info['shares_range'])/ 100,2),
+                    'num': action_info['num']
+                })
+        
+        return pd.DataFrame(stocks_data)
+
     @staticmethod
     def _get_single_date_data(session: requests.Session, trading_date: str = None) -> pd.DataFrame:
         """获取指定交易日的异动解析数据"""
@@ -110,11 +143,13 @@ class JygsUtils:
             
             json_data = {'date': formatted_date, 'pc': 1}
             
-            response = session.post(
+            response = hedged_call(
+                'jygs', session.post,
                 f'{JygsUtils.BASE_URL}/action/field',
                 headers=headers,
                 json=json_data,
             )
+            response.raise_for_status()
             
             result = response.json()
             data = result.get('data')
@@ -123,29 +158,7 @@ class JygsUtils:
                 logger.warning(f"{formatted_date}无异动数据")
                 return pd.DataFrame()
             
-            # 处理股票数据
-            stocks_data = []
-            for item in data[1:]:  # 跳过第一个元素
-                hotspot_name = item['name']
-                hotspot_reason = item.get('reason', '')
-                
-                for stock in item['list']:
-                    action_info = stock['article']['action_info']
-                    expound_parts = action_info['expound'].split('\n')
-                    stocks_data.append({
-                        '股票简称': stock['name'],
-                        'code': stock['code'][2:].zfill(6),  # 去掉前缀并确保6位字符串格式
-                        'zt_time': action_info['time'],
-                        '异动原因': expound_parts[0],
-                        '解析': '\n'.join(expound_parts[1:]) if len(expound_parts) > 1 else '',
-                        '热点': hotspot_name,
-                        '热点导火索': hotspot_reason,
-                        '交易日期': trading_date,
-                        'shares_range': round(float(action_info['shares_range'])/ 100,2),
-                        'num': action_info['num']
-                    })
-            
-            df = pd.DataFrame(stocks_data)
+            df = JygsUtils._parse_action_field(data, trading_date)
             logger.info(f"获取到{len(df)}条股票异动数据")
             return df
             
@@ -202,6 +215,12 @@ class JygsUtils:
             combined_bk_df.to_csv(bk_his_file, index=False, encoding='utf-8-sig')
             logger.info(f"追加板块统计到: {bk_his_file}，共{len(hotspot_stats)}个热点")
             
+            # 增量刷新热点轮动矩阵，失败不影响主流程
+            try:
+                HotspotCube.update_daily(trading_date, hotspot_stats, bk_path=bk_his_file)
+            except Exception as e:
+                logger.warning(f"更新热点轮动矩阵失败: {e}")
+            
         except Exception as e:
             logger.error(f"保存{trading_date}板块统计失败: {e}")
             raise
@@ -214,7 +233,7 @@ class JygsUtils:
             
             if os.path.exists(latest_file):
                 # 读取现有数据
-                existing_df = pd.read_csv(latest_file, dtype={'交易日期': str})
+                existing_df = pd.read_csv(latest_file, dtype={'code': str, '交易日期': str})
                 
                 # 获取新数据中的日期
                 new_dates = set(new_data['交易日期'].unique())
@@ -226,8 +245,8 @@ class JygsUtils:
                 # 合并数据
                 combined_df = pd.concat([existing_df, new_data], ignore_index=True)
                 
-                # 对每只股票只保留最新日期的记录
-                latest_df = combined_df.sort_values('交易日期', ascending=False).groupby('股票简称').first().reset_index()
+                # 对每只股票只保留最新日期的记录（按证券编号，改名前后视为同一只股票）
+                latest_df = latest_per_security(combined_df)
             else:
                 latest_df = new_data
             
@@ -243,8 +262,17 @@ class JygsUtils:
             raise
 
     @staticmethod
-    def update_daily_data(trading_date: str = None, data_dir: str = None, session: requests.Session = None) -> None:
-        """保存每日异动数据的主入口函数"""
+    def update_daily_data(trading_date: str = None, data_dir: str = None, session: requests.Session = None,
+                          update_history: bool = True) -> None:
+        """
+        保存每日异动数据的主入口函数
+        
+        Args:
+            trading_date: 交易日期，默认最新交易日
+            data_dir: 数据目录
+            session: 已登录的会话，为空时自动登录
+            update_history: 是否同时更新板块历史和最新异动汇总文件；并行回填时关闭，由回填流程按日期顺序更新
+        """
         try:
             if trading_date is None:
                 trading_date = trading_calendar.get_default_trade_date()
@@ -255,14 +283,14 @@ class JygsUtils:
             
             # 检查文件是否已存在且是16点后生成的
             file_path = os.path.join(data_dir, f"jygs_{trading_date}.csv")
-            if check_file_exists_after_time(file_path, cutoff_hour=16):
+            if check_output_complete(file_path, trading_date, cutoff_hour=16):
                 logger.info(f"文件 {file_path} 已存在且在16点后生成，跳过重复生成")
                 return
             elif os.path.exists(file_path):
                 logger.info(f"文件 {file_path} 存在但在16点前生成，将重新生成")
         
-            session = session or execute_with_retry(JygsUtils._get_session)
-            df = execute_with_retry(JygsUtils._get_single_date_data, session = session, trading_date = trading_date)
+            session = session or call_with_retry('jygs', JygsUtils._get_session)
+            df = call_with_retry('jygs', JygsUtils._get_single_date_data, session = session, trading_date = trading_date)
             
             if df.empty:
                 logger.error(f"{trading_date}无异动数据，跳过保存")
@@ -273,11 +301,12 @@ class JygsUtils:
             # 1. 保存异动个股数据到文件
             JygsUtils._update_stocks_data(df, trading_date, data_dir)
             
-            # 2. 保存异动热点板块统计信息
-            JygsUtils._update_bk_data(df, trading_date, data_dir)
-            
-            # 3. 更新最新异动个股数据文件
-            JygsUtils._update_latest_stocks_data(df, data_dir)
+            if update_history:
+                # 2. 保存异动热点板块统计信息
+                JygsUtils._update_bk_data(df, trading_date, data_dir)
+                
+                # 3. 更新最新异动个股数据文件
+                JygsUtils._update_latest_stocks_data(df, data_dir)
             
             logger.info(f"完成异动数据保存")
             
@@ -289,9 +318,34 @@ class JygsUtils:
                 session.close()
 
     @staticmethod
-    def read_stocks_data(prefix: str = 'jygs') -> pd.DataFrame:
-        """读取最新异动数据"""
-        return pd.read_csv(os.path.join(JygsUtils.DATA_DIR, f"{prefix}.csv"), dtype={'code': str, '交易日期': str})
+    def update_history_data(trading_date: str, data_dir: str = None) -> None:
+        """用已保存的当日异动文件更新板块历史和最新异动汇总文件（回填时按日期顺序调用）"""
+        data_dir = data_dir or JygsUtils.DATA_DIR
+        df = pd.read_csv(os.path.join(data_dir, f"jygs_{trading_date}.csv"), dtype={'code': str, '交易日期': str})
+        JygsUtils._update_bk_data(df, trading_date, data_dir)
+        JygsUtils._update_latest_stocks_data(df, data_dir)
+
+    @staticmethod
+    def read_stocks_data(prefix: str = 'jygs', as_of: str = None) -> pd.DataFrame:
+        """
+        读取最新异动数据（每只股票最近一次异动记录）
+        
+        Args:
+            as_of: 截止交易日期；汇总文件比该日期新时，用不晚于该日期的每日异动文件重建，用于回填历史数据
+        """
+        dtype = {'code': str, '交易日期': str}
+        latest_df = pd.read_csv(os.path.join(JygsUtils.DATA_DIR, f"{prefix}.csv"), dtype=dtype)
+        if as_of is None or latest_df['交易日期'].max() <= as_of:
+            return latest_df
+        
+        daily_files = [f for f in os.listdir(JygsUtils.DATA_DIR)
+                       if re.fullmatch(r'jygs_\d{8}\.csv', f) and f[5:13] <= as_of]
+        if not daily_files:
+            logger.warning(f"{as_of}及之前没有每日异动文件, 返回空数据")
+            return latest_df.iloc[0:0]
+        daily_df = pd.concat([pd.read_csv(os.path.join(JygsUtils.DATA_DIR, f), dtype=dtype) for f in daily_files],
+                             ignore_index=True)
+        return latest_per_security(daily_df)
     @staticmethod
     def read_bk_data(prefix: str = 'jygs_bk_his') -> pd.DataFrame:
         """读取热点板块统计信息"""
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+涨跌停统计
+基于每日保存的涨停、跌停、炸板数据（ths_zt/ths_dt/ths_zb_YYYYMMDD.csv）统计连板梯队、
+各高度的晋级率和炸板率、首次封板时段分布，按交易日逐日增量追加，不重算历史
+
+保存三张长表（.npz 列式存储）：
+- limit_daily: 每个交易日一行的汇总
+- limit_ladder: 交易日 × 连板高度，当日该高度涨停数、前一日该高度的晋级/炸板情况
+- limit_seal: 交易日 × 首次封板时段，涨停数和开板数
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+import logging
+from columnar_store import save_frame, load_frame
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 配置常量
+LIMIT_DATA_DIR = "./data/csv/ths"
+LIMIT_STATS_DIR = "./data/npz/limit"
+DAILY_FILE = "limit_daily.npz"
+LADDER_FILE = "limit_ladder.npz"
+SEAL_FILE = "limit_seal.npz"
+ZT_FILE_PATTERN = re.compile(r'^ths_zt_(\d{8})\.csv$')
+
+HISTORY_DAYS = 20  # 晋级率、炸板率默认统计的交易日数
+
+# 首次封板时段：按 HH:MM:SS 字符串切分，开盘即封板视为一字/秒板；时间缺失或格式不对的归入最后的“未知”
+SEAL_TIME_EDGES = ['09:30:01', '10:00:00', '13:00:00', '14:00:00']
+SEAL_TIME_LABELS = ['开盘', '10点前', '上午', '13-14点', '14点后', '未知']
+SEAL_TIME_PATTERN = r'^\d{2}:\d{2}:\d{2}$'
+
+DAILY_COLUMNS = ['交易日期', '涨停数', '跌停数', '炸板数', '曾涨停数', '炸板率',
+                 '最高板', '连板数', '昨日涨停数', '晋级数', '晋级率']
+LADDER_COLUMNS = ['交易日期', '连板', '涨停数', '昨日数', '晋级数', '昨日炸板数']
+SEAL_COLUMNS = ['交易日期', '时段', '涨停数', '开板数']
+
+
+def read_limit_file(kind: str, trade_date: str, data_dir: str = LIMIT_DATA_DIR):
+    """读取某日的涨停(zt)、跌停(dt)或炸板(zb)数据，文件不存在返回 None"""
+    file_path = os.path.join(data_dir, f"ths_{kind}_{trade_date}.csv")
+    if not os.path.exists(file_path):
+        return None
+    return pd.read_csv(file_path, dtype={'code': str, 'market_code': str, '交易日期': str})
+
+
+def seal_time_bucket(times: pd.Series) -> np.ndarray:
+    """首次封板时间（HH:MM:SS）所属时段的下标，缺失或无法解析的时间为“未知”时段"""
+    text = times.fillna('').astype(str).str.strip().str.zfill(8)
+    valid = text.str.match(SEAL_TIME_PATTERN).to_numpy(dtype=bool)
+    bucket = np.searchsorted(np.array(SEAL_TIME_EDGES), text.to_numpy(dtype=str), side='right')
+    return np.where(valid, bucket, len(SEAL_TIME_LABELS) - 1)
+
+
+def build_ladder(zt: pd.DataFrame) -> pd.DataFrame:
+    """
+    连板梯队：按连板高度从高到低列出涨停股票
+
+    Returns:
+        pd.DataFrame: 连板、数量、股票（顿号分隔的股票简称）
+    """
+    if zt is None or zt.empty:
+        return pd.DataFrame(columns=['连板', '数量', '股票'])
+    ladder = (zt.sort_values('首次涨停时间', kind='stable')
+              .groupby('连板', sort=False)['股票简称']
+              .agg(数量='size', 股票='、'.join)
+              .reset_index()
+              .sort_values('连板', ascending=False, kind='stable'))
+    return ladder.reset_index(drop=True)
+
+
+def compute_day_stats(trade_date: str, zt: pd.DataFrame, prev_zt: pd.DataFrame = None,
+                      dt: pd.DataFrame = None, zb: pd.DataFrame = None) -> tuple:
+    """
+    计算单个交易日的统计
+
+    Args:
+        trade_date: 交易日期
+        zt: 当日涨停（code、连板、开板次数、首次涨停时间）
+        prev_zt: 前一交易日涨停，None 时晋级相关指标为空
+        dt: 当日跌停，None 时跌停数为空
+        zb: 当日曾涨停（炸板查询结果），None 时炸板相关指标为空
+
+    Returns:
+        tuple: (daily 单行 DataFrame, ladder DataFrame, seal DataFrame)
+    """
+    zt_codes = zt['code'].to_numpy(dtype=str)
+    heights = zt['连板'].to_numpy(dtype=np.int64)
+
+    # 炸板：曾涨停但收盘未封住
+    broken_codes = None
+    if zb is not None:
+        broken_codes = np.setdiff1d(zb['code'].to_numpy(dtype=str), zt_codes)
+
+    # 昨日各高度的涨停股今天的去向
+    ladder = pd.DataFrame({'连板': heights}).groupby('连板').size().rename('涨停数').to_frame()
+    promoted_count = np.nan
+    prev_count = np.nan
+    if prev_zt is not None:
+        prev = pd.DataFrame({'code': prev_zt['code'].to_numpy(dtype=str),
+                             '连板': prev_zt['连板'].to_numpy(dtype=np.int64)})
+        today_height = pd.Series(heights, index=zt_codes)
+        today_height = today_height[~today_height.index.duplicated()]
+        next_height = today_height.reindex(prev['code']).to_numpy()
+        prev['晋级'] = next_height == prev['连板'].to_numpy() + 1
+        prev['炸板'] = np.isin(prev['code'], broken_codes) if broken_codes is not None else np.nan
+        grouped = prev.groupby('连板').agg(昨日数=('code', 'size'), 晋级数=('晋级', 'sum'), 昨日炸板数=('炸板', 'sum'))
+        if broken_codes is None:
+            grouped['昨日炸板数'] = np.nan
+        ladder = ladder.join(grouped, how='outer')
+        prev_count = len(prev)
+        promoted_count = int(prev['晋级'].sum())
+    ladder = ladder.reset_index()
+    ladder.insert(0, '交易日期', trade_date)
+    ladder = ladder.reindex(columns=LADDER_COLUMNS)
+    ladder['涨停数'] = ladder['涨停数'].fillna(0)
+
+    touched = len(zt) + len(broken_codes) if broken_codes is not None else np.nan
+    daily = pd.DataFrame([{
+        '交易日期': trade_date,
+        '涨停数': len(zt),
+        '跌停数': len(dt) if dt is not None else np.nan,
+        '炸板数': len(broken_codes) if broken_codes is not None else np.nan,
+        '曾涨停数': touched,
+        '炸板率': len(broken_codes) / touched if broken_codes is not None and touched else np.nan,
+        '最高板': int(heights.max()) if len(heights) else 0,
+        '连板数': int((heights >= 2).sum()),
+        '昨日涨停数': prev_count,
+        '晋级数': promoted_count,
+        '晋级率': promoted_count / prev_count if prev_count else np.nan,
+    }], columns=DAILY_COLUMNS)
+
+    bucket = (seal_time_bucket(zt['首次涨停时间']) if '首次涨停时间' in zt.columns
+              else np.full(len(zt), len(SEAL_TIME_LABELS) - 1))
+    opened = zt['开板次数'].fillna(0).to_numpy() > 0 if '开板次数' in zt.columns else np.zeros(len(zt), dtype=bool)
+    seal = pd.DataFrame({
+        '交易日期': trade_date,
+        '时段': SEAL_TIME_LABELS,
+        '涨停数': np.bincount(bucket, minlength=len(SEAL_TIME_LABELS)),
+        '开板数': np.bincount(bucket, weights=opened, minlength=len(SEAL_TIME_LABELS)).astype(int),
+    }, columns=SEAL_COLUMNS)
+    return daily, ladder, seal
+
+
+class LimitMoveStats:
+    """涨跌停统计长表，按交易日增量追加"""
+
+    def __init__(self, daily: pd.DataFrame = None, ladder: pd.DataFrame = None, seal: pd.DataFrame = None):
+        self.daily = daily if daily is not None else pd.DataFrame(columns=DAILY_COLUMNS)
+        self.ladder = ladder if ladder is not None else pd.DataFrame(columns=LADDER_COLUMNS)
+        self.seal = seal if seal is not None else pd.DataFrame(columns=SEAL_COLUMNS)
+
+    @property
+    def dates(self) -> list:
+        return self.daily['交易日期'].astype(str).tolist()
+
+    def add_day(self, trade_date: str, zt: pd.DataFrame, prev_zt: pd.DataFrame = None,
+                dt: pd.DataFrame = None, zb: pd.DataFrame = None) -> None:
+        """写入（或覆盖）单个交易日的统计"""
+        daily, ladder, seal = compute_day_stats(trade_date, zt, prev_zt, dt, zb)
+        self.daily = self._replace(self.daily, daily, trade_date)
+        self.ladder = self._replace(self.ladder, ladder, trade_date)
+        self.seal = self._replace(self.seal, seal, trade_date)
+
+    @staticmethod
+    def _replace(table: pd.DataFrame, rows: pd.DataFrame, trade_date: str) -> pd.DataFrame:
+        kept = table[table['交易日期'].astype(str) != trade_date]
+        frames = [frame for frame in (kept, rows) if not frame.empty]
+        if not frames:
+            return rows
+        return pd.concat(frames, ignore_index=True).sort_values('交易日期', kind='stable').reset_index(drop=True)
+
+    def _window(self, table: pd.DataFrame, end_date: str = None, days: int = HISTORY_DAYS) -> pd.DataFrame:
+        """截止 end_date 的最近 days 个交易日"""
+        dates = [d for d in self.dates if end_date is None or d <= end_date][-days:]
+        return table[table['交易日期'].astype(str).isin(dates)]
+
+    def promotion_rates(self, end_date: str = None, days: int = HISTORY_DAYS) -> pd.DataFrame:
+        """
+        各连板高度 N 晋级到 N+1 的比例和次日炸板比例（最近 days 个交易日合计）
+
+        Returns:
+            pd.DataFrame: 连板、样本数、晋级数、晋级率、炸板数、炸板率
+        """
+        window = self._window(self.ladder, end_date, days).dropna(subset=['昨日数'])
+        # 没有炸板数据的交易日不计入炸板率的分母
+        window = window.assign(炸板样本数=window['昨日数'].where(window['昨日炸板数'].notna()))
+        grouped = window.groupby('连板').agg(样本数=('昨日数', 'sum'), 晋级数=('晋级数', 'sum'),
+                                           炸板数=('昨日炸板数', 'sum'), 炸板样本数=('炸板样本数', 'sum'))
+        grouped = grouped[grouped['样本数'] > 0]
+        grouped['晋级率'] = grouped['晋级数'] / grouped['样本数']
+        grouped['炸板率'] = grouped['炸板数'] / grouped['炸板样本数'].replace(0, np.nan)
+        grouped = grouped.reset_index().astype({'连板': int, '样本数': int, '晋级数': int})
+        return grouped[['连板', '样本数', '晋级数', '晋级率', '炸板数', '炸板率']]
+
+    def seal_distribution(self, end_date: str = None, days: int = HISTORY_DAYS) -> pd.DataFrame:
+        """首次封板时段分布（最近 days 个交易日合计），含占比和开板比例"""
+        window = self._window(self.seal, end_date, days)
+        grouped = (window.groupby('时段')[['涨停数', '开板数']].sum()
+                   .reindex(SEAL_TIME_LABELS, fill_value=0))
+        total = grouped['涨停数'].sum()
+        grouped['占比'] = grouped['涨停数'] / total if total else np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grouped['开板比例'] = grouped['开板数'] / grouped['涨停数'].replace(0, np.nan)
+        return grouped.reset_index()
+
+    def day(self, trade_date: str = None) -> dict:
+        """某个交易日的汇总，默认最新一天；没有该日时返回空字典"""
+        rows = self.daily if trade_date is None else self.daily[self.daily['交易日期'].astype(str) == trade_date]
+        return rows.iloc[-1].to_dict() if not rows.empty else {}
+
+    def save(self, stats_dir: str = LIMIT_STATS_DIR) -> None:
+        """保存三张长表"""
+        save_frame(os.path.join(stats_dir, DAILY_FILE), self.daily)
+        save_frame(os.path.join(stats_dir, LADDER_FILE), self.ladder)
+        save_frame(os.path.join(stats_dir, SEAL_FILE), self.seal)
+
+    @staticmethod
+    def load(stats_dir: str = LIMIT_STATS_DIR) -> 'LimitMoveStats':
+        """读取统计，文件不存在时返回空统计"""
+        tables = []
+        for file_name in (DAILY_FILE, LADDER_FILE, SEAL_FILE):
+            file_path = os.path.join(stats_dir, file_name)
+            tables.append(load_frame(file_path) if os.path.exists(file_path) else None)
+        return LimitMoveStats(*tables)
+
+
+def update_limit_stats(trade_date: str = None, data_dir: str = LIMIT_DATA_DIR,
+                       stats_dir: str = LIMIT_STATS_DIR) -> LimitMoveStats:
+    """
+    把尚未统计的交易日逐日追加到统计中，trade_date 当天总是重新统计（数据可能在盘后刷新）
+
+    Args:
+        trade_date: 截止交易日期，默认目录中最新的涨停文件
+        data_dir: 每日涨跌停文件目录
+        stats_dir: 统计保存目录
+
+    Returns:
+        LimitMoveStats: 更新后的统计
+    """
+    stats = LimitMoveStats.load(stats_dir)
+    if not os.path.isdir(data_dir):
+        return stats
+    zt_dates = sorted(match.group(1) for match in map(ZT_FILE_PATTERN.match, os.listdir(data_dir)) if match)
+    if trade_date is not None:
+        zt_dates = [d for d in zt_dates if d <= trade_date]
+    known = set(stats.dates)
+    pending = [i for i, d in enumerate(zt_dates) if d not in known or d == trade_date]
+    if not pending:
+        logger.info("涨跌停统计已是最新")
+        return stats
+
+    cache = {}
+
+    def read_zt(date):
+        if date not in cache:
+            cache[date] = read_limit_file('zt', date, data_dir)
+        return cache[date]
+
+    for i in pending:
+        date = zt_dates[i]
+        prev_zt = read_zt(zt_dates[i - 1]) if i > 0 else None
+        stats.add_day(date, read_zt(date), prev_zt,
+                      read_limit_file('dt', date, data_dir), read_limit_file('zb', date, data_dir))
+        if i > 0:
+            cache.pop(zt_dates[i - 1], None)
+    stats.save(stats_dir)
+    logger.info(f"涨跌停统计更新{len(pending)}个交易日, 共{len(stats.dates)}个交易日")
+    return stats
+
+
+def update_limit_moves(trade_date: str) -> LimitMoveStats:
+    """
+    每日入口：保存当日跌停和炸板数据，再增量更新涨跌停统计
+
+    Args:
+        trade_date: 交易日期 YYYYMMDD
+    """
+    from wencai import WencaiUtils
+
+    try:
+        WencaiUtils.update_daily_dt_zb_data(trade_date=trade_date)
+        return update_limit_stats(trade_date)
+    except Exception as e:
+        logger.error(f"更新涨跌停统计失败: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    stats = update_limit_stats()
+    print(f"涨跌停统计: {len(stats.dates)}个交易日")
+    print(pd.DataFrame([stats.day()]))
+    print(stats.promotion_rates())
+    print(stats.seal_distribution())
@@ -13,6 +13,11 @@ from notification import DingDingRobot
 from merge import merge
 from utils import check_file_exists_after_time
 from info import get_stock_info
+from memory_profile import memory_stage, profiler
+from retry_policy import reset_run_state, should_retry_run
+from sector_analytics import update_sector_strength
+from limit_moves import update_limit_moves
+from feature_store import update_feature_store
 
 # 配置日志
 logger = get_logger("main", "logs", "daily_research.log")
@@ -55,6 +60,19 @@ def check_result_files_exist(trading_date: str) -> bool:
     return True
 
 
+def report_memory_profile(trading_date: str) -> None:
+    """保存内存分析报告（MEMORY_PROFILE=1 时），有阶段超出预算时发送告警"""
+    try:
+        profiler.save_report(trading_date)
+        over_budget = profiler.over_budget()
+        if over_budget:
+            details = "\n".join(f"{record.name}: 峰值RSS {record.rss_peak / 1024 / 1024:.0f}MB，"
+                                f"预算 {record.budget_mb:.0f}MB" for record in over_budget)
+            dingding_robot.send_message(f"每日任务内存超出预算:\n{details}", 'robot3')
+    except Exception as e:
+        logger.error(f"内存分析报告处理失败: {e}")
+
+
 def main():
     """
     主函数，包含重试机制
@@ -63,6 +81,8 @@ def main():
     trading_date = trading_calendar.get_default_trade_date()
     today = datetime.now().strftime('%Y%m%d')
     start_time = datetime.now()
+    # 每次运行使用新的重试预算和熔断器，整轮重跑之间共享
+    reset_run_state()
     
     for retry_count in range(MAX_RETRIES):
         try:
@@ -86,7 +106,8 @@ def main():
             # 1. 更新韭研公社每日数据
             try:
                 logger.info("开始更新韭研公社每日数据")
-                JygsUtils.update_daily_data(trading_date=trading_date)
+                with memory_stage('jygs'):
+                    JygsUtils.update_daily_data(trading_date=trading_date)
                 logger.info("韭研公社每日数据更新完成")
             except Exception as e:
                 logger.error(f"更新韭研公社每日数据失败: {e}")
@@ -96,7 +117,10 @@ def main():
             # 2. 更新同花顺每日数据
             try:
                 logger.info("开始更新同花顺行情数据")
-                WencaiUtils.update_daily_market_overview_data()
+                # 问财切换到当日数据后再开始全市场下载
+                WencaiUtils.wait_until_ready(trading_date)
+                with memory_stage('wencai_overview'):
+                    WencaiUtils.update_daily_market_overview_data()
                 logger.info("同花顺行情数据更新完成")
             except Exception as e:
                 logger.error(f"更新同花顺行情数据失败: {e}")
@@ -106,37 +130,68 @@ def main():
             # 3. 更新涨停数据  
             try:
                 logger.info("开始更新同花顺涨停数据")
-                WencaiUtils.update_daily_zt_data()
+                with memory_stage('wencai_zt'):
+                    WencaiUtils.update_daily_zt_data()
                 logger.info("同花顺涨停数据更新完成")
             except Exception as e:
                 logger.error(f"更新同花顺涨停数据失败: {e}")
                 dingding_robot.send_message(f"更新同花顺涨停数据失败: {e}", 'robot3')
                 raise
 
-            # 4. 更新股票池数据
+            # 4. 更新跌停、炸板数据和连板统计，失败不影响主流程
+            try:
+                logger.info("开始更新涨跌停统计")
+                with memory_stage('limit_moves'):
+                    update_limit_moves(trading_date)
+                logger.info("涨跌停统计更新完成")
+            except Exception as e:
+                logger.warning(f"更新涨跌停统计失败: {e}")
+
+            # 5. 更新个股特征库，失败不影响主流程
+            try:
+                logger.info("开始更新个股特征库")
+                with memory_stage('feature_store'):
+                    update_feature_store(trading_date)
+                logger.info("个股特征库更新完成")
+            except Exception as e:
+                logger.warning(f"更新个股特征库失败: {e}")
+
+            # 6. 更新股票池数据
             try:
                 logger.info("开始更新股票池数据")
-                stock_pool.update_stock_pool_data()
+                with memory_stage('stock_pool'):
+                    stock_pool.update_stock_pool_data()
                 logger.info("股票池数据更新完成")
             except Exception as e:
                 logger.error(f"更新股票池数据失败: {e}")
                 dingding_robot.send_message(f"更新股票池数据失败: {e}", 'robot3')
                 raise
 
-            # 5. 合并数据
+            # 7. 更新板块强度，失败不影响主流程
+            try:
+                logger.info("开始更新板块强度")
+                with memory_stage('sector_strength'):
+                    update_sector_strength(trading_date)
+                logger.info("板块强度更新完成")
+            except Exception as e:
+                logger.warning(f"更新板块强度失败: {e}")
+
+            # 8. 合并数据
             try:
                 logger.info("开始合并数据")
-                merge()
+                with memory_stage('merge'):
+                    merge()
                 logger.info("数据合并完成")
             except Exception as e:
                 logger.error(f"合并数据失败: {e}")
                 dingding_robot.send_message(f"合并数据失败: {e}", 'robot3')
                 raise
             
-            # 6. 获取股票信息
+            # 9. 获取股票信息
             try:
                 logger.info("开始获取股票信息")
-                get_stock_info()
+                with memory_stage('stock_info'):
+                    get_stock_info()
                 logger.info("股票信息获取完成")
             except Exception as e:
                 logger.error(f"获取股票信息失败: {e}")
@@ -149,19 +204,23 @@ def main():
             success_msg = f"主流程执行完成！耗时: {duration}"
             logger.info(success_msg)
             dingding_robot.send_message(success_msg, 'robot3')
+            report_memory_profile(trading_date)
             return
             
         except Exception as e:
             logger.error(f"主流程执行失败: {e}")
             
-            if retry_count == MAX_RETRIES - 1:
-                # 最后一次重试失败
+            # 致命错误（编程错误、文件缺失等）重跑也无济于事，直接结束
+            if retry_count == MAX_RETRIES - 1 or not should_retry_run(e):
+                # 最后一次重试失败或不可重试
                 end_time = datetime.now()
                 duration = end_time - start_time
-                final_error_msg = f"主流程在{MAX_RETRIES}次重试后仍然失败: {e}，总耗时: {duration}"
+                final_error_msg = f"主流程在第{retry_count + 1}次执行后失败，不再重试: {e}，总耗时: {duration}"
                 logger.error(final_error_msg)
                 dingding_robot.send_message(final_error_msg, 'robot3')
+                report_memory_profile(trading_date)
                 raise
+            profiler.reset()
         time.sleep(RETRY_INTERVAL)
 
 
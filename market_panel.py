@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+行情面板
+把每日行情文件 ths_market_overview_YYYYMMDD.csv 物化为 日期 × 股票 的稠密矩阵，
+按缺失的交易日增量同步，供回测等需要跨日期数组运算的模块使用
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+import logging
+from columnar_store import save_arrays, load_arrays
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 配置常量
+OVERVIEW_DIR = "./data/csv/ths"
+PANEL_PATH = "./data/npz/ths/market_panel.npz"
+OVERVIEW_FILE_PATTERN = re.compile(r'^ths_market_overview_(\d{8})\.csv$')
+
+# 物化的数值列，缺失值为 NaN
+PANEL_FIELDS = ['涨跌幅', '开盘价_前', '最高价_前', '最低价_前', '收盘价_前', '市值Z', '上市天数', '成交额', '换手Z']
+
+# 名称包含这些关键字的股票视为 ST/退市股
+ST_KEYWORDS = ['ST', '退']
+
+
+class MarketPanel:
+    """
+    日期 × 股票 行情矩阵
+
+    - dates: 交易日期(YYYYMMDD)，升序
+    - codes / names / market_codes: 股票代码及最近一次出现的股票简称和市场代码，列顺序即矩阵列号
+    - fields: {字段名: float64 矩阵[日期, 股票]}，当日无行情为 NaN
+    - is_st: bool 矩阵[日期, 股票]，当日简称是否为 ST/退市股
+    """
+
+    def __init__(self, dates=None, codes=None, names=None, fields=None, is_st=None, market_codes=None):
+        self.dates = np.asarray(dates if dates is not None else [], dtype='<U8')
+        self.codes = list(codes) if codes is not None else []
+        self.names = list(names) if names is not None else []
+        self.market_codes = list(market_codes) if market_codes is not None else [''] * len(self.codes)
+        shape = (len(self.dates), len(self.codes))
+        self.fields = {name: np.asarray(fields[name], dtype=np.float64) if fields and name in fields
+                       else np.full(shape, np.nan) for name in PANEL_FIELDS}
+        self.is_st = np.asarray(is_st, dtype=bool) if is_st is not None else np.zeros(shape, dtype=bool)
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.dates), len(self.codes)
+
+    def present(self) -> np.ndarray:
+        """当日是否有行情记录"""
+        return ~np.isnan(self.fields['涨跌幅'])
+
+    def _columns_of(self, codes: list) -> np.ndarray:
+        """查找或新增股票所在列"""
+        new_codes = [code for code in dict.fromkeys(codes) if code not in self._code_index]
+        if new_codes:
+            for code in new_codes:
+                self._code_index[code] = len(self.codes)
+                self.codes.append(code)
+                self.names.append('')
+                self.market_codes.append('')
+            pad = ((0, 0), (0, len(new_codes)))
+            for name in PANEL_FIELDS:
+                self.fields[name] = np.pad(self.fields[name], pad, constant_values=np.nan)
+            self.is_st = np.pad(self.is_st, pad, constant_values=False)
+        return np.array([self._code_index[code] for code in codes], dtype=np.int64)
+
+    def update_day(self, trade_date: str, day_df: pd.DataFrame) -> None:
+        """
+        写入（或覆盖）单个交易日的行情
+
+        Args:
+            trade_date: 交易日期 YYYYMMDD
+            day_df: 当日行情数据，包含 code、股票简称 及 PANEL_FIELDS 中的列
+        """
+        day_df = day_df.drop_duplicates(subset=['code'], keep='last')
+        codes = day_df['code'].astype(str).str.zfill(6).tolist()
+        cols = self._columns_of(codes)
+
+        pos = int(np.searchsorted(self.dates, trade_date))
+        if not (pos < len(self.dates) and self.dates[pos] == trade_date):
+            self.dates = np.insert(self.dates, pos, trade_date)
+            for name in PANEL_FIELDS:
+                self.fields[name] = np.insert(self.fields[name], pos, np.nan, axis=0)
+            self.is_st = np.insert(self.is_st, pos, False, axis=0)
+
+        for name in PANEL_FIELDS:
+            row = np.full(len(self.codes), np.nan)
+            if name in day_df.columns:
+                row[cols] = pd.to_numeric(day_df[name], errors='coerce').to_numpy(dtype=np.float64)
+            self.fields[name][pos] = row
+
+        names = day_df['股票简称'].fillna('').astype(str) if '股票简称' in day_df.columns else pd.Series('', index=day_df.index)
+        st_row = np.zeros(len(self.codes), dtype=bool)
+        st_row[cols] = names.str.contains('|'.join(ST_KEYWORDS), regex=True).to_numpy()
+        self.is_st[pos] = st_row
+
+        # 只有最新一天才刷新股票简称和市场代码
+        if pos == len(self.dates) - 1:
+            for col, name in zip(cols, names):
+                self.names[col] = name
+        if 'market_code' in day_df.columns:
+            for col, market_code in zip(cols, day_df['market_code'].fillna('').astype(str)):
+                if pos == len(self.dates) - 1 or not self.market_codes[col]:
+                    self.market_codes[col] = market_code
+
+    def sync(self, overview_dir: str = OVERVIEW_DIR) -> int:
+        """
+        把目录中尚未物化的每日行情文件增量写入矩阵
+
+        Returns:
+            int: 写入的交易日数量
+        """
+        if not os.path.isdir(overview_dir):
+            return 0
+        known = set(self.dates.tolist())
+        pending = sorted(
+            match.group(1) for match in map(OVERVIEW_FILE_PATTERN.match, os.listdir(overview_dir))
+            if match and match.group(1) not in known
+        )
+        usecols = ['code', '股票简称', 'market_code'] + PANEL_FIELDS
+        for trade_date in pending:
+            file_path = os.path.join(overview_dir, f"ths_market_overview_{trade_date}.csv")
+            try:
+                day_df = pd.read_csv(file_path, dtype={'code': str, 'market_code': str},
+                                     usecols=lambda col: col in usecols)
+            except Exception as e:
+                logger.warning(f"读取行情文件失败，跳过: {file_path}, {e}")
+                continue
+            self.update_day(trade_date, day_df)
+        if pending:
+            logger.info(f"行情面板增量更新{len(pending)}个交易日, 当前规模: {self.shape}")
+        return len(pending)
+
+    def save(self, file_path: str = PANEL_PATH) -> None:
+        """保存矩阵到 .npz 文件"""
+        arrays = {f"field_{i}": self.fields[name] for i, name in enumerate(PANEL_FIELDS)}
+        save_arrays(
+            file_path,
+            dates=self.dates,
+            codes=np.array(self.codes, dtype=str),
+            names=np.array(self.names, dtype=str),
+            market_codes=np.array(self.market_codes, dtype=str),
+            field_names=np.array(PANEL_FIELDS, dtype=str),
+            is_st=self.is_st,
+            **arrays,
+        )
+
+    @staticmethod
+    def load(file_path: str = PANEL_PATH) -> 'MarketPanel':
+        """读取矩阵，文件不存在或物化的列已变化时返回空矩阵（下次同步时重建）"""
+        arrays = load_arrays(file_path)
+        if not arrays:
+            return MarketPanel()
+        field_names = arrays['field_names'].tolist()
+        if field_names != PANEL_FIELDS:
+            # 新增的列在已物化的交易日上只能是 NaN，重新读取全部行情文件
+            logger.warning(f"行情面板的列已变化，重建行情面板: {field_names} -> {PANEL_FIELDS}")
+            return MarketPanel()
+        fields = {name: arrays[f"field_{i}"] for i, name in enumerate(field_names)}
+        return MarketPanel(
+            dates=arrays['dates'],
+            codes=arrays['codes'].tolist(),
+            names=arrays['names'].tolist(),
+            fields=fields,
+            is_st=arrays['is_st'],
+            # 早期保存的矩阵没有市场代码，出现新的交易日时补齐
+            market_codes=arrays['market_codes'].tolist() if 'market_codes' in arrays else None,
+        )
+
+    @staticmethod
+    def load_synced(overview_dir: str = OVERVIEW_DIR, file_path: str = PANEL_PATH) -> 'MarketPanel':
+        """读取矩阵并与每日行情文件同步，只补齐缺失的交易日"""
+        panel = MarketPanel.load(file_path)
+        if panel.sync(overview_dir):
+            panel.save(file_path)
+        return panel
+
+
+if __name__ == "__main__":
+    panel = MarketPanel.load_synced()
+    print(f"行情面板: {panel.shape}, 日期范围: {panel.dates[:1]} - {panel.dates[-1:]}")
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+内存分析模块
+按阶段记录 Python 分配峰值（tracemalloc）和进程 RSS 峰值（后台采样），输出每阶段峰值报告，
+并按阶段检查内存预算，超出时告警
+
+默认关闭，设置环境变量开启:
+    MEMORY_PROFILE=1                       开启分析
+    MEMORY_BUDGETS="merge=1500,wencai_zt=600"  覆盖阶段预算（MB，按峰值 RSS 判断）
+    MEMORY_SAMPLE_INTERVAL=0.05            RSS 采样间隔（秒）
+    MEMORY_TOP_ALLOCATIONS=5               每阶段记录的分配热点数量，0 表示不做快照对比
+
+用法:
+    from memory_profile import memory_stage, profiler
+    with memory_stage('merge'):
+        ...
+    profiler.save_report(trade_date)
+"""
+
+import os
+import time
+import threading
+import tracemalloc
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 配置常量
+OUTPUT_BASE_DIR = "./output"
+REPORT_FILE = "memory_profile.csv"
+DEFAULT_SAMPLE_INTERVAL = 0.05
+DEFAULT_TOP_ALLOCATIONS = 5
+TRACEMALLOC_FRAMES = 1
+MIN_ALLOCATION_BYTES = 64 * 1024   # 小于该增量的分配位置不计入热点
+MB = 1024 * 1024
+
+# 阶段预算（MB，按阶段内峰值 RSS 判断），未列出的阶段不检查
+DEFAULT_STAGE_BUDGETS_MB = {
+    'jygs': 600,
+    'wencai_overview': 1200,
+    'wencai_zt': 800,
+    'stock_pool': 1000,
+    'merge': 1500,
+    'stock_info': 800,
+}
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss() -> int:
+    """当前进程常驻内存（字节），非 Linux 平台退化为历史峰值"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def parse_budgets(text: str) -> dict:
+    """解析 'stage=MB,stage=MB' 格式的预算配置"""
+    budgets = {}
+    for item in (text or '').split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            budgets[name.strip()] = float(value)
+        except ValueError:
+            logger.warning(f"忽略无效的内存预算配置: {item}")
+    return budgets
+
+
+@dataclass
+class StageRecord:
+    """单个阶段的内存记录（字节）"""
+    name: str
+    depth: int
+    start_time: float = 0.0
+    duration: float = 0.0
+    rss_start: int = 0
+    rss_end: int = 0
+    rss_peak: int = 0
+    py_start: int = 0
+    py_end: int = 0
+    py_peak: int = 0
+    budget_mb: float = None
+    top_allocations: list = field(default_factory=list)
+    _snapshot: object = None
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget_mb is not None and self.rss_peak / MB > self.budget_mb
+
+    def to_row(self) -> dict:
+        return {
+            '阶段': f"{'  ' * self.depth}{self.name}",
+            '耗时秒': round(self.duration, 2),
+            '起始RSS_MB': round(self.rss_start / MB, 1),
+            '结束RSS_MB': round(self.rss_end / MB, 1),
+            '峰值RSS_MB': round(self.rss_peak / MB, 1),
+            'RSS增量_MB': round((self.rss_peak - self.rss_start) / MB, 1),
+            'Python峰值_MB': round((self.py_peak - self.py_start) / MB, 1),
+            'Python净增_MB': round((self.py_end - self.py_start) / MB, 1),
+            '预算_MB': self.budget_mb,
+            '超预算': self.over_budget,
+            '主要分配': '; '.join(self.top_allocations),
+        }
+
+
+class MemoryProfiler:
+    """
+    分阶段内存分析器
+
+    阶段可以嵌套；tracemalloc 的峰值是全局的，进入和退出阶段时先把当前峰值并入所有未结束的阶段再重置，
+    因此外层阶段的峰值包含内层阶段
+    """
+
+    def __init__(self,
+                 enabled: bool = False,
+                 budgets: dict = None,
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+                 top_allocations: int = DEFAULT_TOP_ALLOCATIONS):
+        self.enabled = enabled
+        self.budgets = dict(DEFAULT_STAGE_BUDGETS_MB if budgets is None else budgets)
+        self.sample_interval = sample_interval
+        self.top_allocations = top_allocations
+        self.records = []
+        self._open = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop_event = threading.Event()
+        self._owns_tracing = False
+
+    @classmethod
+    def from_env(cls) -> 'MemoryProfiler':
+        """从环境变量创建分析器"""
+        enabled = os.environ.get('MEMORY_PROFILE', '').lower() in ('1', 'true', 'yes')
+        budgets = dict(DEFAULT_STAGE_BUDGETS_MB)
+        budgets.update(parse_budgets(os.environ.get('MEMORY_BUDGETS', '')))
+        return cls(
+            enabled=enabled,
+            budgets=budgets,
+            sample_interval=float(os.environ.get('MEMORY_SAMPLE_INTERVAL', DEFAULT_SAMPLE_INTERVAL)),
+            top_allocations=int(os.environ.get('MEMORY_TOP_ALLOCATIONS', DEFAULT_TOP_ALLOCATIONS)),
+        )
+
+    # ------------------------------------------------------------------ 采样
+    def _fold_peaks(self) -> None:
+        """把当前 tracemalloc 峰值和 RSS 并入所有未结束的阶段，然后重置峰值"""
+        _, py_peak = tracemalloc.get_traced_memory()
+        rss = current_rss()
+        with self._lock:
+            for record in self._open:
+                record.py_peak = max(record.py_peak, py_peak)
+                record.rss_peak = max(record.rss_peak, rss)
+        tracemalloc.reset_peak()
+
+    def _sample_loop(self) -> None:
+        while not self._stop_event.wait(self.sample_interval):
+            rss = current_rss()
+            with self._lock:
+                for record in self._open:
+                    if rss > record.rss_peak:
+                        record.rss_peak = rss
+
+    def _start_sampler(self) -> None:
+        # 只停止自己开启的 tracemalloc，外部已开启时保持原状
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._owns_tracing = True
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name='memory-sampler', daemon=True)
+        self._sampler.start()
+
+    def _stop_sampler(self) -> None:
+        self._stop_event.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    # ------------------------------------------------------------------ 阶段
+    @contextmanager
+    def stage(self, name: str):
+        """记录一个阶段的内存，未开启时不做任何事"""
+        if not self.enabled:
+            yield
+            return
+
+        if not self._open:
+            self._start_sampler()
+        try:
+            self._fold_peaks()
+            record = StageRecord(name=name, depth=len(self._open), budget_mb=self.budgets.get(name))
+            record.start_time = time.perf_counter()
+            record.rss_start = record.rss_peak = current_rss()
+            record.py_start, _ = tracemalloc.get_traced_memory()
+            record.py_peak = record.py_start
+            if self.top_allocations > 0:
+                record._snapshot = tracemalloc.take_snapshot()
+            with self._lock:
+                self._open.append(record)
+                self.records.append(record)
+
+            try:
+                yield
+            finally:
+                self._fold_peaks()
+                with self._lock:
+                    self._open.remove(record)
+                record.duration = time.perf_counter() - record.start_time
+                record.rss_end = current_rss()
+                record.py_end, _ = tracemalloc.get_traced_memory()
+                if record._snapshot is not None:
+                    record.top_allocations = self._top_allocations(record._snapshot)
+                    record._snapshot = None
+                self._log_record(record)
+        finally:
+            # 最外层阶段结束（或进入阶段失败）时停止采样和 tracemalloc，阶段之外不再承担跟踪开销
+            if not self._open:
+                self._stop_sampler()
+
+    def _top_allocations(self, start_snapshot) -> list:
+        """阶段结束时仍存活的内存中，增长最多的分配位置"""
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        stats = snapshot.compare_to(start_snapshot, 'lineno')
+        stats = [stat for stat in stats if stat.size_diff >= MIN_ALLOCATION_BYTES][:self.top_allocations]
+        return [f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno} "
+                f"+{stat.size_diff / MB:.1f}MB" for stat in stats]
+
+    def _log_record(self, record: StageRecord) -> None:
+        logger.info(f"内存[{record.name}] 峰值RSS: {record.rss_peak / MB:.1f}MB "
+                    f"(+{(record.rss_peak - record.rss_start) / MB:.1f}MB), "
+                    f"Python峰值: +{(record.py_peak - record.py_start) / MB:.1f}MB, "
+                    f"耗时: {record.duration:.1f}秒")
+        if record.over_budget:
+            logger.warning(f"阶段 {record.name} 峰值RSS {record.rss_peak / MB:.1f}MB "
+                           f"超出预算 {record.budget_mb:.0f}MB")
+
+    # ------------------------------------------------------------------ 报告
+    def over_budget(self) -> list:
+        """超出预算的阶段记录"""
+        return [record for record in self.records if record.over_budget]
+
+    def report(self) -> pd.DataFrame:
+        """按阶段开始顺序输出的内存报告"""
+        return pd.DataFrame([record.to_row() for record in self.records])
+
+    def save_report(self, trade_date: str, output_dir: str = OUTPUT_BASE_DIR) -> str:
+        """
+        保存报告到 output/{trade_date}/memory_profile.csv
+
+        Returns:
+            str: 报告路径，未开启或没有记录时返回None
+        """
+        if not self.enabled or not self.records:
+            return None
+        try:
+            report_dir = os.path.join(output_dir, trade_date)
+            os.makedirs(report_dir, exist_ok=True)
+            path = os.path.join(report_dir, REPORT_FILE)
+            self.report().to_csv(path, index=False, encoding='utf-8-sig')
+            logger.info(f"内存分析报告已保存: {path}")
+            return path
+        except Exception as e:
+            logger.error(f"保存内存分析报告失败: {e}")
+            raise
+
+    def reset(self) -> None:
+        """清空已有记录，用于主流程重试"""
+        self.records = []
+
+
+# 全局分析器，各模块通过 memory_stage 标记阶段
+profiler = MemoryProfiler.from_env()
+
+
+def memory_stage(name: str):
+    """标记一个内存分析阶段"""
+    return profiler.stage(name)
@@ -14,6 +14,11 @@ from jygs import JygsUtils
 from log_setup import get_logger
 from trading_calendar import TradingCalendar
 from notification import DingDingRobot
+from memory_profile import memory_stage
+from sector_analytics import SectorPanel
+from limit_moves import LimitMoveStats, HISTORY_DAYS, build_ladder, read_limit_file
+from feature_store import read_features
+from security_master import get_security_master, attach_security_ids, SID_COLUMN
 
 # 配置常量
 OUTPUT_BASE_DIR = './output'
@@ -27,6 +32,9 @@ ZT_COLUMNS = ['code', 'market_code', '涨停日期', '连板', '涨停封单额'
 
 JYGS_COLUMNS = ['code', '异动日期', '热点', '热点导火索', '异动原因', '解析']
 
+# 从特征库关联的滚动特征（特征库中没有当日数据时不关联）
+FEATURE_COLUMNS = ['涨幅5', '涨幅20', '均换手5', '竞价金额Z', '大单净额5', '涨停次数20']
+
 # 数值型列（需要填充为0）
 NUMERIC_COLUMNS = ['市值Z', '成交额', '竞价金额', '大单净额', '涨停封单额', 
                   '热度排名', '竞换手Z', '连板', '开板次数', '封成量比', '封流量比']
@@ -40,7 +48,8 @@ AMOUNT_CONVERSION = {
     '成交额': (1e8, 1),     # 转换为亿元，保留1位小数
     '大单净额': (1e8, 2),   # 转换为亿元，保留2位小数
     '涨停封单额': (1e8, 2), # 转换为亿元，保留2位小数
-    '竞价金额': (1e8, 2)    # 转换为亿元，保留2位小数
+    '竞价金额': (1e8, 2),   # 转换为亿元，保留2位小数
+    '大单净额5': (1e8, 2)   # 转换为亿元，保留2位小数
 }
 
 # 配置日志
@@ -173,10 +182,13 @@ def compare_previous(current_merged_df: pd.DataFrame, date_str: str = None) -> s
     logger.info(msg)
     return msg
 
-def load_all_data() -> Optional[Tuple]:
+def load_all_data(date_str: str = None) -> Optional[Tuple]:
     """
     加载所有市场数据，包括股票池、行情数据、涨停数据和异动数据
     
+    Args:
+        date_str: 交易日期，默认最新交易日；历史日期时涨停和异动数据截止到该日期
+    
     Returns:
         Optional[Tuple]: 包含所有数据DataFrame的元组，如果加载失败则返回None
             - core_stocks_data: 核心股票池数据
@@ -189,33 +201,35 @@ def load_all_data() -> Optional[Tuple]:
     """
     try:
         logger.info("开始加载市场数据...")
+        if date_str is None:
+            date_str = trading_calendar.get_default_trade_date()
         
         # 创建股票池实例，避免重复创建
         stock_pool_manager = StockPool()
         
         logger.info("1.正在读取核心股票池数据...")
-        core_stocks_data = stock_pool_manager.read_stock_pool_data(prefix='core_stocks')
+        core_stocks_data = stock_pool_manager.read_stock_pool_data(date_str, prefix='core_stocks')
         if core_stocks_data is None or core_stocks_data.empty:
             logger.error("核心股票池数据为空")
             raise Exception("核心股票池数据为空")
         logger.info(f"核心股票池数据量: {len(core_stocks_data)}")
 
         logger.info("2.正在读取首板股票池数据...")
-        first_board_stocks_data = stock_pool_manager.read_stock_pool_data(prefix='first_stocks')
+        first_board_stocks_data = stock_pool_manager.read_stock_pool_data(date_str, prefix='first_stocks')
         if first_board_stocks_data is None or first_board_stocks_data.empty:
             logger.error("首板股票池数据为空")
             raise Exception("首板股票池数据为空")
         logger.info(f"首板股票池数据量: {len(first_board_stocks_data)}")
         
         logger.info("3. 正在读取市场行情数据...")
-        market_overview_data = WencaiUtils.read_market_overview_data()
+        market_overview_data = WencaiUtils.read_market_overview_data(date_str)
         if market_overview_data is None or market_overview_data.empty:
             logger.error("市场行情数据为空")
             raise Exception("市场行情数据为空")
         logger.info(f"市场行情数据量: {len(market_overview_data)}")
         
         logger.info("4.正在读取更新后的涨停数据...")
-        zt_stocks_data = WencaiUtils.read_latest_zt_stocks()
+        zt_stocks_data = WencaiUtils.read_latest_zt_stocks(as_of=date_str)
         if zt_stocks_data is None or zt_stocks_data.empty:
             logger.error("涨停股票数据为空")
             raise Exception("涨停股票数据为空")
@@ -223,7 +237,7 @@ def load_all_data() -> Optional[Tuple]:
         zt_stocks_data.rename(columns={'交易日期': '涨停日期'}, inplace=True)
         
         logger.info("5.正在读取更新后的异动数据...")
-        jygs_data = JygsUtils.read_stocks_data()
+        jygs_data = JygsUtils.read_stocks_data(as_of=date_str)
         if jygs_data is None or jygs_data.empty:
             logger.error("异动股票数据为空")
             raise Exception("异动股票数据为空")
@@ -272,40 +286,46 @@ def clean_data(merged_data: pd.DataFrame) -> pd.DataFrame:
 
 
 class MarketData:
-    """市场数据封装类"""
-    def __init__(self, market_overview: pd.DataFrame, zt_stocks: pd.DataFrame, jygs: pd.DataFrame):
-        self.market_overview = market_overview
-        self.zt_stocks = zt_stocks
-        self.jygs = jygs
+    """市场数据封装类，各数据集带有证券编号（sid）列，按 sid 关联"""
+    def __init__(self, market_overview: pd.DataFrame, zt_stocks: pd.DataFrame, jygs: pd.DataFrame,
+                 features: pd.DataFrame = None):
+        master = get_security_master()
+        self.market_overview = _with_security_ids(market_overview, master, intern=True)
+        self.zt_stocks = _with_security_ids(zt_stocks, master, intern=True)
+        self.jygs = _with_security_ids(jygs, master)
+        self.features = _with_security_ids(features, master)
+
+def _with_security_ids(df: Optional[pd.DataFrame], master, intern: bool = False) -> Optional[pd.DataFrame]:
+    """增加 sid 列；有 market_code 的数据为新股票分配 sid，否则按代码查找"""
+    if df is None:
+        return None
+    return attach_security_ids(df, intern=intern, master=master)
 
 def _get_available_columns(columns: list, df: pd.DataFrame) -> list:
     """获取DataFrame中实际存在的列"""
     return [col for col in columns if col in df.columns]
 
+def _join_columns(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """关联用的右表：sid 加上数据列（代码列由股票池提供），去掉查不到 sid 的行"""
+    value_columns = [col for col in _get_available_columns(columns, df) if col not in ('code', 'market_code')]
+    return df.loc[df[SID_COLUMN] >= 0, [SID_COLUMN] + value_columns]
+
 def _merge_market_data(stock_pool_data: pd.DataFrame, market_data: MarketData) -> pd.DataFrame:
     """合并市场数据"""
+    merged_data = attach_security_ids(stock_pool_data, intern=True)
+
     # 逐步合并数据
-    merged_data = pd.merge(
-        stock_pool_data, 
-        market_data.market_overview[_get_available_columns(MARKET_COLUMNS, market_data.market_overview)], 
-        on=['code', 'market_code'], 
-        how='left'
-    )
-    
-    merged_data = pd.merge(
-        merged_data, 
-        market_data.zt_stocks[_get_available_columns(ZT_COLUMNS, market_data.zt_stocks)], 
-        on=['code', 'market_code'], 
-        how='left'
-    )
-    
-    merged_data = pd.merge(
-        merged_data, 
-        market_data.jygs[_get_available_columns(JYGS_COLUMNS, market_data.jygs)], 
-        on=['code'], 
-        how='left'
-    )
-    
+    merged_data = pd.merge(merged_data, _join_columns(market_data.market_overview, MARKET_COLUMNS),
+                           on=SID_COLUMN, how='left')
+    merged_data = pd.merge(merged_data, _join_columns(market_data.zt_stocks, ZT_COLUMNS),
+                           on=SID_COLUMN, how='left')
+    merged_data = pd.merge(merged_data, _join_columns(market_data.jygs, JYGS_COLUMNS),
+                           on=SID_COLUMN, how='left')
+
+    if market_data.features is not None:
+        merged_data = pd.merge(merged_data, _join_columns(market_data.features, FEATURE_COLUMNS).round(2),
+                               on=SID_COLUMN, how='left')
+
     return merged_data
 
 def _format_data_columns(merged_data: pd.DataFrame) -> pd.DataFrame:
@@ -318,8 +338,8 @@ def _format_data_columns(merged_data: pd.DataFrame) -> pd.DataFrame:
         merged_data['区间信息'] = merged_data['区间信息'].apply(lambda x: f"'{x}")
     
     # 删除不需要的列
-    if 'market_code' in merged_data.columns:
-        merged_data.drop(columns=['market_code'], inplace=True)
+    merged_data.drop(columns=[col for col in ('market_code', SID_COLUMN) if col in merged_data.columns],
+                     inplace=True)
     
     return merged_data
 
@@ -392,10 +412,16 @@ def identify_emerging_hotspots(date_str: str = None, lookback_days: int = 10) ->
             logger.error("板块历史数据为空")
             raise Exception("板块历史数据为空")
             
-        trading_dates = bk_historical_data['交易日期'].unique()
-        if len(trading_dates) == 0 or date_str != trading_dates[0]:
+        if date_str is None:
+            date_str = trading_calendar.get_default_trade_date()
+        
+        # 板块历史按日期倒序，从指定交易日开始回看（回填历史日期时不一定是第一天）
+        trading_dates = np.sort(bk_historical_data['交易日期'].unique())[::-1]
+        date_positions = np.flatnonzero(trading_dates == date_str)
+        if len(date_positions) == 0:
             logger.error("没有找到交易日期的板块数据")
             raise Exception("没有找到交易日期的板块数据")
+        trading_dates = trading_dates[date_positions[0]:]
         
         # 获取过去N个交易日的日期范围
         past_trading_dates = trading_dates[1:lookback_days+1] if len(trading_dates) > lookback_days else trading_dates[1:]
@@ -499,50 +525,122 @@ def generate_report(merged_first_board_data: pd.DataFrame,
         return f"📊 今日新兴热点分析\n❌ 生成报告时发生错误: {e}"
 
 
-def merge():
-    """合并股票池数据、市场数据、涨停数据和异动数据"""
+def build_sector_strength_message(date_str: str, top: int = 5) -> str:
+    """板块强度前N名，板块强度矩阵中没有该交易日时返回空字符串"""
+    try:
+        ranking = SectorPanel.load().ranking(date_str, top=top)
+    except Exception as e:
+        logger.warning(f"读取板块强度失败: {e}")
+        return ""
+    if ranking.empty:
+        return ""
+    lines = [f"📈 板块强度前{len(ranking)}"]
+    for _, row in ranking.iterrows():
+        lines.append(f"{row['板块']}: 5日{row['涨幅5']:+.1f}%, 上涨占比{row['上涨占比']:.0%}, "
+                     f"涨停占比{row['涨停占比']:.0%}, 成交额Z {row['成交额Z']:.1f}")
+    return "\n".join(lines)
+
+
+def build_limit_moves_message(date_str: str, max_names: int = 8) -> str:
+    """连板梯队、炸板率和近期晋级率，统计中没有该交易日时返回空字符串"""
+    try:
+        stats = LimitMoveStats.load()
+        day = stats.day(date_str)
+        if not day:
+            return ""
+        ladder = build_ladder(read_limit_file('zt', date_str))
+        rates = stats.promotion_rates(date_str).set_index('连板')
+    except Exception as e:
+        logger.warning(f"读取涨跌停统计失败: {e}")
+        return ""
+
+    summary = [f"涨停{day['涨停数']:.0f}只"]
+    if pd.notna(day['跌停数']):
+        summary.append(f"跌停{day['跌停数']:.0f}只")
+    if pd.notna(day['炸板率']):
+        summary.append(f"炸板{day['炸板数']:.0f}只(炸板率{day['炸板率']:.0%})")
+    if pd.notna(day['晋级率']):
+        summary.append(f"昨日涨停晋级率{day['晋级率']:.0%}")
+    lines = [f"🪜 连板梯队（最高{day['最高板']:.0f}板）", ", ".join(summary)]
+    for _, row in ladder[ladder['连板'] >= 2].iterrows():
+        names = row['股票'].split('、')
+        more = f" 等{len(names)}只" if len(names) > max_names else ""
+        lines.append(f"{row['连板']}板: {'、'.join(names[:max_names])}{more}")
+    rate_text = [f"{height}进{height + 1} {rates.loc[height, '晋级率']:.0%}"
+                 for height in range(1, 5) if height in rates.index]
+    if rate_text:
+        lines.append(f"近{HISTORY_DAYS}日晋级率: {', '.join(rate_text)}")
+    return "\n".join(lines)
+
+
+def merge(trade_date: str = None, notify: bool = True):
+    """
+    合并股票池数据、市场数据、涨停数据和异动数据
+    
+    Args:
+        trade_date: 交易日期，默认最新交易日
+        notify: 是否发送钉钉通知，回填历史数据时关闭
+    """
     try:
         logger.info("开始执行合并数据主流程")
         
         # 获取当前交易日期
-        current_date = trading_calendar.get_default_trade_date()
+        current_date = trade_date or trading_calendar.get_default_trade_date()
         logger.info(f"当前交易日期: {current_date}")
         
         # 步骤1: 加载所有数据
         logger.info("加载股票池和市场数据...")
-        loaded_data = load_all_data()
+        with memory_stage('merge.load'):
+            loaded_data = load_all_data(current_date)
         (core_stocks_data, first_board_stocks_data, 
          market_overview_data, zt_stocks_data, jygs_data) = loaded_data
-        market_data = MarketData(market_overview_data, zt_stocks_data, jygs_data)
+        try:
+            features = read_features(current_date, FEATURE_COLUMNS)
+        except Exception as e:
+            logger.warning(f"读取特征库失败，不关联滚动特征: {e}")
+            features = None
+        market_data = MarketData(market_overview_data, zt_stocks_data, jygs_data, features)
 
         # 步骤2: 合并核心股票池数据
         logger.info("合并核心股票池数据...")
-        merged_core_data = merge_data(core_stocks_data, market_data, 'core_stocks', current_date)
+        with memory_stage('merge.core'):
+            merged_core_data = merge_data(core_stocks_data, market_data, 'core_stocks', current_date)
         if merged_core_data is None:
             raise Exception("核心股票池数据合并失败")
 
         # 步骤3: 核心股票池对比分析
         logger.info("核心股票池对比分析...")
         comparison_msg = compare_previous(merged_core_data, current_date)
-        dingding_robot.send_message(comparison_msg, 'robot3')
+        if notify:
+            dingding_robot.send_message(comparison_msg, 'robot3')
 
         # 步骤4: 合并首板股票池数据
         logger.info("合并首板股票池数据...")
-        merged_first_board_data = merge_data(first_board_stocks_data, market_data, 'first_stocks', current_date)
+        with memory_stage('merge.first'):
+            merged_first_board_data = merge_data(first_board_stocks_data, market_data, 'first_stocks', current_date)
         if merged_first_board_data is None:
             raise Exception("首板股票池数据合并失败")
 
         # 步骤5: 识别新兴热点并生成报告
         logger.info("识别新兴热点...")
-        emerging_hotspots = identify_emerging_hotspots(date_str=current_date)
+        with memory_stage('merge.hotspots'):
+            emerging_hotspots = identify_emerging_hotspots(date_str=current_date)
         hotspots_report_msg = generate_report(merged_first_board_data, emerging_hotspots, current_date)
-        dingding_robot.send_message(hotspots_report_msg, 'robot3')
+        sector_msg = build_sector_strength_message(current_date)
+        if sector_msg:
+            hotspots_report_msg = f"{hotspots_report_msg}\n\n{sector_msg}"
+        limit_msg = build_limit_moves_message(current_date)
+        if limit_msg:
+            hotspots_report_msg = f"{hotspots_report_msg}\n\n{limit_msg}"
+        if notify:
+            dingding_robot.send_message(hotspots_report_msg, 'robot3')
 
         logger.info("合并数据主流程执行完成")
     
     except Exception as e:
         logger.error(f"程序执行失败: {e}")
-        dingding_robot.send_message(f"每日数据处理失败: {e}", 'robot3')
+        if notify:
+            dingding_robot.send_message(f"每日数据处理失败: {e}", 'robot3')
         raise
 
 
@@ -8,6 +8,8 @@ from datetime import datetime
 import requests
 import json
 import logging
+from upstream import get_base_url
+from rate_limiter import get_limiter
 
 # 使用标准的logger命名方式，会自动继承主脚本的日志配置
 logger = logging.getLogger(__name__)
@@ -39,6 +41,11 @@ DINGDING_ROBOTS = {
 # 默认机器人设置
 DEFAULT_ROBOT = 'robot3'
 
+# 钉钉接口地址
+DINGTALK_BASE_URL = get_base_url('dingtalk')
+# 钉钉限流错误码：发送速度太快
+DINGTALK_THROTTLED_ERRCODE = 130101
+
 
 class DingDingRobot:
     """
@@ -76,11 +83,20 @@ class DingDingRobot:
             }
             
             headers = {'Content-Type': 'application/json; charset=utf-8'}
-            url = f'https://oapi.dingtalk.com/robot/send?access_token={robot_config["token"]}'
+            url = f'{DINGTALK_BASE_URL}/robot/send?access_token={robot_config["token"]}'
             body = json.dumps(msg)
             
+            limiter = get_limiter('dingtalk')
+            limiter.acquire()
             response = requests.post(url, data=body, headers=headers)
+            if response.status_code == 429:
+                limiter.penalize()
             response.raise_for_status()
+            result = response.json() if response.content else {}
+            if result.get('errcode') == DINGTALK_THROTTLED_ERRCODE:
+                limiter.penalize(retry_after=60)
+                raise Exception(f"发送过于频繁: {result.get('errmsg')}")
+            limiter.reward()
             
             logger.info(f'{robot_config["name"]}消息发送成功')
             
@@ -5,6 +5,7 @@ import os
 import time
 from datetime import datetime
 from wencai import WencaiUtils
+from retry_policy import call_with_retry
 from log_setup import get_logger
 from notification import DingDingRobot
 
@@ -39,7 +40,7 @@ def main():
             # 1. 更新美股数据
             try:
                 logger.info("开始更新美股数据")
-                us_stocks = WencaiUtils.get_us_top_stocks()
+                us_stocks = call_with_retry('wencai', WencaiUtils.get_us_top_stocks)
                 us_stocks.to_csv(os.path.join(OUTPUT_BASE_DIR, "us_stocks.csv"), index=False)
                 logger.info("美股数据更新完成")
             except Exception as e:
@@ -50,7 +51,7 @@ def main():
             # 2. 更新港股数据
             try:
                 logger.info("开始更新港股数据")
-                hk_stocks = WencaiUtils.get_hk_top_stocks()
+                hk_stocks = call_with_retry('wencai', WencaiUtils.get_hk_top_stocks)
                 hk_stocks.to_csv(os.path.join(OUTPUT_BASE_DIR, "hk_stocks.csv"), index=False)
                 logger.info("港股数据更新完成")
             except Exception as e:
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+限流模块
+按上游共享的令牌桶限流器，线程和 asyncio 均可使用，遇到 429 或错误响应时自动降速，恢复后逐步提速
+
+用法:
+    from rate_limiter import get_limiter
+    get_limiter('iwencai').acquire()           # 线程中阻塞等待
+    await get_limiter('iwencai').acquire_async()  # 协程中等待
+
+retry_policy.call_with_retry 每次尝试前都会按上游名称申请令牌并反馈结果，通过它调用的请求无需单独限流。
+速率可通过环境变量覆盖: RATE_LIMITS="wencai=0.5:2,iwencai=2:4"（每秒请求数:突发数）
+"""
+
+import os
+import time
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 各上游的默认速率 (每秒请求数, 突发数)
+DEFAULT_RATE_LIMITS = {
+    'wencai': (1 / 3, 1),      # 问财选股，原先每次查询间隔3秒
+    'wencai_page': (8.0, 8),   # 问财选股分页，同一查询的各页并发获取
+    'iwencai': (1.0, 1),       # 问财资讯（新闻、公告、研报）
+    'jygs': (1.0, 2),          # 韭研公社
+    'akshare': (4.0, 8),       # akshare 数据源
+    'dingtalk': (1 / 3, 5),    # 钉钉机器人每分钟最多20条
+    'default': (2.0, 2),
+}
+
+DECREASE_FACTOR = 0.5   # 限流或错误时速率减半
+INCREASE_STEP = 0.1     # 每次成功恢复基础速率的10%
+MIN_RATE_RATIO = 0.125  # 最低降到基础速率的1/8
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    申请令牌时直接预留（令牌数可以为负，表示排队中的请求），锁只在计算等待时间时持有，
+    等待在锁外进行，因此线程和协程可以共用同一个桶
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.min_rate = rate * MIN_RATE_RATIO
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """按当前速率补充令牌，调用方需持有锁；修改速率前必须先补充"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, tokens: float = 1.0) -> float:
+        """预留令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """阻塞直到获得令牌，返回等待的秒数"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """有足够令牌且未暂停时立即取走并返回 True，否则不预留、返回 False"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens < tokens or now < self._blocked_until:
+                return False
+            self._tokens -= tokens
+            return True
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """协程版本的 acquire"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after: float = None) -> None:
+        """收到 429 或错误响应：速率减半，有 Retry-After 时在此之前暂停发放令牌"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+        if self.rate < old_rate or retry_after:
+            logger.warning(f"上游 {self.name} 降速: {old_rate:.3f} -> {self.rate:.3f} 次/秒"
+                           + (f"，暂停{retry_after:.1f}秒" if retry_after else ""))
+
+    def reward(self) -> None:
+        """请求成功：逐步恢复到基础速率"""
+        if self.rate >= self.base_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.base_rate, self.rate + self.base_rate * INCREASE_STEP)
+
+
+def parse_rate_limits(text: str) -> dict:
+    """解析 'name=rps:burst,...' 格式的限流配置"""
+    limits = {}
+    for item in (text or '').split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            rate, _, burst = value.partition(':')
+            limits[name.strip()] = (float(rate), int(burst) if burst else 1)
+        except ValueError:
+            logger.warning(f"忽略无效的限流配置: {item}")
+    return limits
+
+
+_limits = dict(DEFAULT_RATE_LIMITS)
+_limits.update(parse_rate_limits(os.environ.get('RATE_LIMITS', '')))
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> TokenBucket:
+    """获取上游的限流器（按需创建，同名共享）"""
+    with _registry_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            rate, burst = _limits.get(name, _limits['default'])
+            limiter = TokenBucket(name, rate, burst)
+            _limiters[name] = limiter
+        return limiter
+
+
+def configure(name: str, rate: float, burst: int = 1) -> TokenBucket:
+    """修改上游的速率，已创建的限流器会被替换"""
+    with _registry_lock:
+        _limits[name] = (rate, burst)
+        limiter = TokenBucket(name, rate, burst)
+        _limiters[name] = limiter
+        return limiter
+
+
+def split_limits(workers: int) -> None:
+    """
+    多个进程共用上游额度时调用（每个进程各调用一次），每个进程只使用 1/workers 的速率和突发数，
+    合计不超过单进程的限制；已创建的限流器会被替换
+    """
+    if workers <= 1:
+        return
+    with _registry_lock:
+        for name, (rate, burst) in list(_limits.items()):
+            _limits[name] = (rate / workers, max(1, int(burst) // workers))
+        _limiters.clear()
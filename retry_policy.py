@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+重试策略模块
+按上游区分的重试策略：异常分类（可重试/限流/致命）、指数退避加随机抖动、熔断器和每次运行的全局重试预算
+
+用法:
+    from retry_policy import call_with_retry
+    df = call_with_retry('wencai', WencaiUtils.get_zt_stocks, trade_date=trade_date)
+
+- 致命错误（代码加载错误、本地文件缺失、调用方抛出的 FatalError、4xx 请求错误）不重试，直接抛出；
+  其他异常（包括上游返回异常内容引起的 KeyError、TypeError 等）按可重试处理
+- 上游数据未就绪（NotReadyError）不重试、不计入熔断和预算，直接抛出，由调用方等待就绪后重跑
+- 限流（429、“频繁”）按更长的最小间隔退避，并优先使用 Retry-After
+- 同一上游连续失败达到阈值后熔断，冷却期内的调用直接抛出 CircuitOpenError，冷却后放行一次探测
+- 一次运行内所有上游共享重试预算，预算耗尽后每次调用只尝试一次
+- 每次尝试前按上游名称申请限流令牌，限流和可重试错误会让该上游降速
+"""
+
+import os
+import time
+import random
+import threading
+import logging
+from dataclasses import dataclass
+from rate_limiter import get_limiter
+
+logger = logging.getLogger(__name__)
+
+# 异常类别
+RETRYABLE = 'retryable'
+RATE_LIMITED = 'rate_limited'
+FATAL = 'fatal'
+NOT_READY = 'not_ready'
+
+# 每次运行的全局重试次数（不含首次尝试），可通过环境变量 RETRY_BUDGET 覆盖
+DEFAULT_RETRY_BUDGET = 30
+
+# 代码加载和本地环境错误，重试无意义；KeyError、TypeError 等可能由上游偶发的异常内容引起，不在此列，
+# 确定不可重试的解析错误由调用方抛出 FatalError
+FATAL_EXCEPTIONS = (
+    NameError, ImportError, SyntaxError, NotImplementedError,
+    FileNotFoundError, PermissionError, IsADirectoryError,
+)
+RATE_LIMIT_KEYWORDS = ('429', 'Too Many Requests', '频繁', '限流')
+
+
+class CircuitOpenError(Exception):
+    """上游处于熔断状态，调用被直接拒绝"""
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"上游 {upstream} 已熔断，{retry_in:.0f}秒后允许探测")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+class FatalError(Exception):
+    """调用方明确标记为不可重试的错误"""
+
+
+class NotReadyError(Exception):
+    """上游数据尚未就绪：立即重试没有意义，但等待后整轮重跑可以成功"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    单个上游的重试策略
+
+    第 n 次重试的等待时间在 [0, min(max_delay, base_delay * multiplier^n)] 内均匀抖动（full jitter），
+    限流时不少于 rate_limit_delay
+    """
+    max_attempts: int = 3
+    base_delay: float = 2.0
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    rate_limit_delay: float = 10.0
+    failure_threshold: int = 5       # 连续失败多少次后熔断
+    reset_timeout: float = 300.0     # 熔断冷却时间（秒）
+
+    def backoff(self, retry_index: int, kind: str, retry_after: float = None) -> float:
+        """计算第 retry_index 次重试（从0开始）前的等待秒数"""
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** retry_index)
+        delay = random.uniform(0, cap)
+        if kind == RATE_LIMITED:
+            delay = max(delay, retry_after if retry_after is not None else self.rate_limit_delay)
+        return min(delay, max(self.max_delay, retry_after or 0))
+
+
+# 各上游的默认策略
+POLICIES = {
+    'wencai': RetryPolicy(max_attempts=3, base_delay=3.0, max_delay=60.0, rate_limit_delay=20.0),
+    'jygs': RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0),
+    'iwencai': RetryPolicy(max_attempts=2, base_delay=1.0, max_delay=10.0, failure_threshold=8),
+    'akshare': RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0),
+    'default': RetryPolicy(),
+}
+
+
+def _status_code(exc: BaseException):
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    return status if status is not None else getattr(exc, 'status_code', None)
+
+
+def _retry_after(exc: BaseException):
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        value = headers.get('Retry-After')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: BaseException) -> str:
+    """
+    异常分类
+
+    Returns:
+        str: RETRYABLE / RATE_LIMITED / FATAL / NOT_READY
+    """
+    if isinstance(exc, FatalError):
+        return FATAL
+    if isinstance(exc, NotReadyError):
+        return NOT_READY
+    if isinstance(exc, CircuitOpenError):
+        return RETRYABLE
+    status = _status_code(exc)
+    if status is not None:
+        if status == 429:
+            return RATE_LIMITED
+        if 400 <= status < 500 and status not in (408, 425):
+            return FATAL
+        return RETRYABLE
+    message = str(exc)
+    if any(keyword in message for keyword in RATE_LIMIT_KEYWORDS):
+        return RATE_LIMITED
+    if isinstance(exc, FATAL_EXCEPTIONS):
+        return FATAL
+    return RETRYABLE
+
+
+class CircuitBreaker:
+    """
+    单个上游的熔断器
+
+    closed: 正常放行；连续失败达到阈值后转为 open
+    open: 冷却期内拒绝调用；冷却结束后转为 half_open
+    half_open: 只放行一次探测，成功则关闭，失败则重新熔断
+    """
+
+    def __init__(self, upstream: str, failure_threshold: int, reset_timeout: float):
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """调用前检查，熔断中抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == 'closed':
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == 'open' and elapsed >= self.reset_timeout:
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                logger.info(f"上游 {self.upstream} 熔断冷却结束，放行一次探测")
+                return
+            raise CircuitOpenError(self.upstream, max(0.0, self.reset_timeout - elapsed))
+
+    def release_probe(self) -> None:
+        """探测调用既不算成功也不算失败（如致命错误）时归还探测名额，下一次调用可以重新探测"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"上游 {self.upstream} 探测成功，熔断关闭")
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"上游 {self.upstream} 连续失败{self.failures}次，熔断{self.reset_timeout:.0f}秒")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class RetryBudget:
+    """一次运行内所有上游共享的重试次数预算"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """申请一次重试，预算耗尽返回False"""
+        with self._lock:
+            if self.used >= self.total:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.total - self.used)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_budget = RetryBudget(int(os.environ.get('RETRY_BUDGET', DEFAULT_RETRY_BUDGET)))
+# 便于测试时替换
+_sleep = time.sleep
+
+
+def get_policy(upstream: str) -> RetryPolicy:
+    return POLICIES.get(upstream, POLICIES['default'])
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """获取上游的熔断器（按需创建）"""
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            policy = get_policy(upstream)
+            breaker = CircuitBreaker(upstream, policy.failure_threshold, policy.reset_timeout)
+            _breakers[upstream] = breaker
+        return breaker
+
+
+def get_budget() -> RetryBudget:
+    return _budget
+
+
+def reset_run_state(budget: int = None) -> None:
+    """开始新的一次运行：重置重试预算和熔断器"""
+    global _budget
+    total = budget if budget is not None else int(os.environ.get('RETRY_BUDGET', DEFAULT_RETRY_BUDGET))
+    _budget = RetryBudget(total)
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def call_with_retry(upstream: str, func, *args, policy: RetryPolicy = None, **kwargs):
+    """
+    按上游的重试策略执行函数
+
+    Args:
+        upstream: 上游名称，如 'wencai'、'jygs'、'iwencai'、'akshare'
+        func: 要执行的函数
+        policy: 覆盖默认策略
+        *args, **kwargs: 函数参数
+
+    Returns:
+        函数执行结果
+
+    Raises:
+        CircuitOpenError: 上游处于熔断状态
+        最后一次失败的异常（致命错误、重试次数或预算耗尽）
+    """
+    policy = policy or get_policy(upstream)
+    breaker = get_breaker(upstream)
+    limiter = get_limiter(upstream)
+    func_name = getattr(func, '__name__', str(func))
+
+    for attempt in range(policy.max_attempts):
+        breaker.before_call()
+        limiter.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == FATAL:
+                # 致命错误不计入熔断，但半开状态下的探测名额必须归还，否则之后的调用会一直被拒绝
+                breaker.release_probe()
+                logger.error(f"{upstream}.{func_name} 出现不可重试错误: {e}")
+                raise
+            if kind == NOT_READY:
+                # 数据未就绪不是上游故障，不计入熔断、不消耗预算，由 wait_until_ready 等待
+                breaker.release_probe()
+                logger.warning(f"{upstream}.{func_name} 数据未就绪，不重试: {e}")
+                raise
+            breaker.record_failure()
+            limiter.penalize(_retry_after(e) if kind == RATE_LIMITED else None)
+            if attempt == policy.max_attempts - 1:
+                logger.error(f"{upstream}.{func_name} 尝试{policy.max_attempts}次后仍失败: {e}")
+                raise
+            if not _budget.acquire():
+                logger.error(f"重试预算已耗尽({_budget.total}次)，{upstream}.{func_name} 不再重试: {e}")
+                raise
+            delay = policy.backoff(attempt, kind, _retry_after(e))
+            logger.warning(f"{upstream}.{func_name} 第{attempt + 1}次尝试失败({kind})，"
+                           f"{delay:.1f}秒后重试，剩余预算{_budget.remaining}: {e}")
+            _sleep(delay)
+            continue
+
+        breaker.record_success()
+        limiter.reward()
+        if attempt > 0:
+            logger.info(f"{upstream}.{func_name} 在第{attempt + 1}次尝试后成功执行")
+        return result
+
+
+def should_retry_run(exc: BaseException) -> bool:
+    """整轮流程失败后是否值得在冷却后重跑：致命错误直接放弃，数据未就绪等待后重跑"""
+    return classify_error(exc) != FATAL
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+板块强度分析
+用本地保存的同花顺概念板块日线和每日行情面板，在 日期 × 板块 矩阵上向量化计算区间涨幅、
+上涨/涨停占比、成交额Z值和相对强度分位，按新交易日增量追加保存
+"""
+
+import numpy as np
+import pandas as pd
+import logging
+from columnar_store import save_arrays, load_arrays
+from market_panel import MarketPanel
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 配置常量
+SECTOR_PATH = "./data/npz/sector/sector_panel.npz"
+RETURN_WINDOWS = (1, 5, 20)
+TURNOVER_WINDOW = 20      # 成交额Z值的回看天数（不含当天）
+STRENGTH_WINDOW = 5       # 相对强度按该区间涨幅排名
+CONCEPT_HISTORY_DAYS = 60  # 每日更新时下载的概念板块日线天数（自然日）
+
+# 指标列，顺序即保存顺序
+METRICS = [f'涨幅{w}' for w in RETURN_WINDOWS] + ['成交额Z', '上涨占比', '涨停占比', '强度分位', '成员数']
+
+# 涨停幅度（%）与容差；ST 为 5%，科创板/创业板 20%，北交所 30%
+LIMIT_TOLERANCE = 0.05
+
+
+def limit_up_pct(codes: np.ndarray, is_st: np.ndarray) -> np.ndarray:
+    """
+    按代码前缀和 ST 标记计算每只股票的涨停幅度
+
+    Args:
+        codes: 股票代码数组 [股票]
+        is_st: bool 矩阵 [日期, 股票]
+
+    Returns:
+        np.ndarray: float 矩阵 [日期, 股票]
+    """
+    codes = np.asarray(codes, dtype=str)
+    base = np.full(len(codes), 10.0)
+    base[np.char.startswith(codes, '30') | np.char.startswith(codes, '68')] = 20.0
+    base[np.char.startswith(codes, '8') | np.char.startswith(codes, '4') | np.char.startswith(codes, '92')] = 30.0
+    return np.where(is_st & (base == 10.0), 5.0, base[None, :])
+
+
+def rolling_returns(close: np.ndarray, window: int) -> np.ndarray:
+    """区间涨幅（%），前 window 行为 NaN"""
+    result = np.full(close.shape, np.nan)
+    if len(close) > window:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[window:] = (close[window:] / close[:-window] - 1) * 100
+    return result
+
+
+def turnover_zscore(amount: np.ndarray, window: int = TURNOVER_WINDOW) -> np.ndarray:
+    """当天成交额相对前 window 天均值的Z值"""
+    frame = pd.DataFrame(amount)
+    history = frame.shift(1).rolling(window, min_periods=max(2, window // 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (frame - history.mean()) / history.std()
+    return z.replace([np.inf, -np.inf], np.nan).to_numpy()
+
+
+def membership_matrix(members: pd.DataFrame, sectors: list, codes: list) -> np.ndarray:
+    """成分股矩阵 float32 [板块, 股票]"""
+    matrix = np.zeros((len(sectors), len(codes)), dtype=np.float32)
+    if members is None or members.empty:
+        return matrix
+    sector_index = {name: i for i, name in enumerate(sectors)}
+    code_index = {code: i for i, code in enumerate(codes)}
+    rows = members['concept'].map(sector_index)
+    cols = members['code'].map(code_index)
+    valid = rows.notna() & cols.notna()
+    matrix[rows[valid].astype(int).to_numpy(), cols[valid].astype(int).to_numpy()] = 1.0
+    return matrix
+
+
+def breadth(panel: MarketPanel, dates: np.ndarray, membership: np.ndarray) -> tuple:
+    """
+    按板块统计上涨占比、涨停占比和当日有行情的成员数
+
+    Args:
+        panel: 行情面板
+        dates: 板块矩阵的日期
+        membership: 成分股矩阵 [板块, 面板股票]
+
+    Returns:
+        tuple: (上涨占比, 涨停占比, 成员数)，均为 [日期, 板块]，行情面板缺失的日期为 NaN
+    """
+    shape = (len(dates), membership.shape[0])
+    up_ratio, zt_ratio, counts = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    if len(panel.dates) == 0 or membership.shape[1] == 0:
+        return up_ratio, zt_ratio, counts
+
+    pos = np.searchsorted(panel.dates, dates)
+    found = (pos < len(panel.dates)) & (panel.dates[np.minimum(pos, len(panel.dates) - 1)] == dates)
+    rows = pos[found]
+    change = panel.fields['涨跌幅'][rows]
+    present = ~np.isnan(change)
+    limit = limit_up_pct(panel.codes, panel.is_st[rows])
+    up = (np.nan_to_num(change) > 0).astype(np.float32)
+    zt = (np.nan_to_num(change) >= limit - LIMIT_TOLERANCE).astype(np.float32)
+
+    member_t = membership.T
+    n = present.astype(np.float32) @ member_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        up_ratio[found] = np.where(n > 0, (up @ member_t) / n, np.nan)
+        zt_ratio[found] = np.where(n > 0, (zt @ member_t) / n, np.nan)
+    counts[found] = n
+    return up_ratio, zt_ratio, counts
+
+
+def compute_metrics(close: np.ndarray, amount: np.ndarray, dates: np.ndarray,
+                    panel: MarketPanel, membership: np.ndarray) -> dict:
+    """在 日期 × 板块 矩阵上计算全部指标"""
+    metrics = {f'涨幅{w}': rolling_returns(close, w) for w in RETURN_WINDOWS}
+    metrics['成交额Z'] = turnover_zscore(amount)
+    metrics['上涨占比'], metrics['涨停占比'], metrics['成员数'] = breadth(panel, dates, membership)
+    metrics['强度分位'] = pd.DataFrame(metrics[f'涨幅{STRENGTH_WINDOW}']).rank(axis=1, pct=True).to_numpy()
+    return metrics
+
+
+class SectorPanel:
+    """
+    日期 × 板块 指标矩阵
+
+    - dates: 交易日期(YYYYMMDD)，升序
+    - sectors: 板块名称，列顺序即矩阵列号
+    - metrics: {指标名: float64 矩阵[日期, 板块]}
+    """
+
+    def __init__(self, dates=None, sectors=None, metrics=None):
+        self.dates = np.asarray(dates if dates is not None else [], dtype='<U8')
+        self.sectors = list(sectors) if sectors is not None else []
+        shape = (len(self.dates), len(self.sectors))
+        self.metrics = {name: np.asarray(metrics[name], dtype=np.float64) if metrics and name in metrics
+                        else np.full(shape, np.nan) for name in METRICS}
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.dates), len(self.sectors)
+
+    def append(self, dates: np.ndarray, sectors: list, metrics: dict) -> None:
+        """追加（或覆盖）若干交易日的指标，板块按名称对齐，新板块的历史为 NaN"""
+        new_sectors = [name for name in sectors if name not in set(self.sectors)]
+        if new_sectors:
+            pad = ((0, 0), (0, len(new_sectors)))
+            for name in METRICS:
+                self.metrics[name] = np.pad(self.metrics[name], pad, constant_values=np.nan)
+            self.sectors.extend(new_sectors)
+
+        sector_index = {name: i for i, name in enumerate(self.sectors)}
+        cols = np.array([sector_index[name] for name in sectors], dtype=np.int64)
+        keep = ~np.isin(self.dates, dates)
+        for name in METRICS:
+            block = np.full((len(dates), len(self.sectors)), np.nan)
+            block[:, cols] = metrics[name]
+            self.metrics[name] = np.concatenate([self.metrics[name][keep], block])
+        self.dates = np.concatenate([self.dates[keep], np.asarray(dates, dtype='<U8')])
+
+        order = np.argsort(self.dates, kind='stable')
+        self.dates = self.dates[order]
+        for name in METRICS:
+            self.metrics[name] = self.metrics[name][order]
+
+    def ranking(self, trade_date: str = None, sort_by: str = '强度分位', top: int = None) -> pd.DataFrame:
+        """
+        某个交易日的板块指标排名
+
+        Args:
+            trade_date: 交易日期，默认最新
+            sort_by: 排序指标
+            top: 只返回前N个板块
+
+        Returns:
+            pd.DataFrame: 每个板块一行，按 sort_by 降序
+        """
+        if len(self.dates) == 0:
+            return pd.DataFrame(columns=['板块'] + METRICS)
+        row = len(self.dates) - 1 if trade_date is None else int(np.searchsorted(self.dates, trade_date))
+        if row >= len(self.dates) or (trade_date is not None and self.dates[row] != trade_date):
+            return pd.DataFrame(columns=['板块'] + METRICS)
+        df = pd.DataFrame({name: self.metrics[name][row] for name in METRICS})
+        df.insert(0, '板块', self.sectors)
+        df = df.dropna(subset=[sort_by]).sort_values(sort_by, ascending=False).reset_index(drop=True)
+        return df.head(top) if top else df
+
+    def save(self, file_path: str = SECTOR_PATH) -> None:
+        """保存矩阵到 .npz 文件"""
+        arrays = {f"metric_{i}": self.metrics[name] for i, name in enumerate(METRICS)}
+        save_arrays(
+            file_path,
+            dates=self.dates,
+            sectors=np.array(self.sectors, dtype=str),
+            metric_names=np.array(METRICS, dtype=str),
+            **arrays,
+        )
+
+    @staticmethod
+    def load(file_path: str = SECTOR_PATH) -> 'SectorPanel':
+        """读取矩阵，文件不存在时返回空矩阵"""
+        arrays = load_arrays(file_path)
+        if not arrays:
+            return SectorPanel()
+        metric_names = arrays['metric_names'].tolist()
+        metrics = {name: arrays[f"metric_{i}"] for i, name in enumerate(metric_names)}
+        return SectorPanel(dates=arrays['dates'], sectors=arrays['sectors'].tolist(), metrics=metrics)
+
+
+def update_sector_panel(concept_df: pd.DataFrame,
+                        members: pd.DataFrame,
+                        panel: MarketPanel,
+                        file_path: str = SECTOR_PATH) -> SectorPanel:
+    """
+    用概念板块日线增量更新板块指标
+
+    只计算已保存的最后一个交易日及之后的日期（最后一天可能是盘中数据，重新计算），
+    为滚动窗口额外带上足够的历史行
+
+    Args:
+        concept_df: 概念板块日线，含 name、日期、收盘价、成交额（AkShare.load_concept_board）
+        members: 概念板块成分股，含 concept、code（AkShare.load_concept_members）
+        panel: 行情面板
+        file_path: 指标矩阵文件
+
+    Returns:
+        SectorPanel: 更新后的指标矩阵
+    """
+    sector_panel = SectorPanel.load(file_path)
+    if concept_df is None or concept_df.empty:
+        logger.warning("概念板块日线为空，跳过板块强度更新")
+        return sector_panel
+
+    close_frame = concept_df.pivot_table(index='日期', columns='name', values='收盘价', aggfunc='last').sort_index()
+    amount_frame = (concept_df.pivot_table(index='日期', columns='name', values='成交额', aggfunc='last')
+                    .reindex(index=close_frame.index, columns=close_frame.columns))
+    dates = close_frame.index.to_numpy(dtype='<U8')
+
+    last_date = sector_panel.dates[-1] if len(sector_panel.dates) else ''
+    first_new = int(np.searchsorted(dates, last_date)) if last_date else 0
+    if first_new >= len(dates):
+        logger.info("板块强度已是最新")
+        return sector_panel
+
+    lookback = max(max(RETURN_WINDOWS), TURNOVER_WINDOW + 1)
+    start = max(0, first_new - lookback)
+    sectors = close_frame.columns.tolist()
+    membership = membership_matrix(members, sectors, panel.codes)
+    metrics = compute_metrics(close_frame.to_numpy()[start:], amount_frame.to_numpy()[start:],
+                              dates[start:], panel, membership)
+
+    offset = first_new - start
+    sector_panel.append(dates[first_new:], sectors, {name: values[offset:] for name, values in metrics.items()})
+    sector_panel.save(file_path)
+    logger.info(f"板块强度更新{len(dates) - first_new}个交易日, 当前规模: {sector_panel.shape}")
+    return sector_panel
+
+
+def update_sector_strength(trade_date: str, file_path: str = SECTOR_PATH) -> SectorPanel:
+    """
+    每日入口：增量下载概念板块日线和成分股，同步行情面板，再更新板块指标
+
+    Args:
+        trade_date: 交易日期 YYYYMMDD
+    """
+    from aks import AkShare
+
+    try:
+        akshare = AkShare()
+        start_date = (pd.Timestamp(trade_date) - pd.Timedelta(days=CONCEPT_HISTORY_DAYS)).strftime('%Y%m%d')
+        akshare.update_concept_board(start_date, trade_date)
+        akshare.update_concept_members()
+
+        stored = SectorPanel.load(file_path)
+        # 只读取滚动窗口需要的历史
+        read_from = start_date
+        if len(stored.dates):
+            read_from = min(stored.dates[-1], trade_date)
+            read_from = (pd.Timestamp(read_from) - pd.Timedelta(days=CONCEPT_HISTORY_DAYS)).strftime('%Y%m%d')
+        concept_df = akshare.load_concept_board(read_from, trade_date, columns=['收盘价', '成交额'])
+        return update_sector_panel(concept_df, akshare.load_concept_members(), MarketPanel.load_synced(), file_path)
+    except Exception as e:
+        logger.error(f"更新板块强度失败: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    sector_panel = SectorPanel.load()
+    print(f"板块强度矩阵: {sector_panel.shape}")
+    print(sector_panel.ranking(top=20))
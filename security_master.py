@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+证券主表
+把每只股票的 (market_code, code) 映射为稳定的 int32 编号（sid），并记录股票简称的变更历史，
+用于跨数据集的关联、分组和成员判断：按整数关联比按字符串快，且股票改名后不会被拆成两只、
+两只股票先后用同一个简称时也不会被合并成一只
+
+- sid 按首次出现的顺序分配，只增不改，保存在 ./data/npz/security_master.npz
+- 每日行情文件 ths_market_overview_YYYYMMDD.csv 按交易日增量同步，顺带记录当日简称
+- 没有 market_code 的数据（韭研公社异动、特征库）按 6 位代码查找，资讯按股票简称（别名）查找
+
+用法:
+    from security_master import get_security_master, attach_security_ids, latest_per_security
+    master = get_security_master()
+    sids = master.intern(df['market_code'], df['code'])          # 新股票会分配新的 sid
+    df = attach_security_ids(df)                                 # 增加 sid 列，查不到为 -1
+    sids = master.lookup_names(['贵州茅台'], as_of='20250110')    # 按简称（含曾用名）查找
+"""
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+import logging
+from columnar_store import save_arrays, load_arrays
+from market_panel import OVERVIEW_DIR, OVERVIEW_FILE_PATTERN
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 配置常量
+MASTER_PATH = "./data/npz/security_master.npz"
+SID_COLUMN = 'sid'
+UNKNOWN_SID = -1
+
+
+def _code_text(value) -> str:
+    """代码转为字符串，去掉空白和读 CSV 时产生的 '.0' 后缀，缺失为空字符串"""
+    if isinstance(value, str):
+        text = value.strip()
+    elif value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    elif isinstance(value, float) and value.is_integer():
+        text = str(int(value))
+    else:
+        text = str(value).strip()
+    return text[:-2] if text.endswith('.0') else text
+
+
+# 原始值 -> 规范化后的代码，代码总数有限，缓存后每次规范化只需查字典
+_code_cache = {}
+_market_code_cache = {}
+
+
+def _normalize(values, cache: dict, width: int) -> np.ndarray:
+    series = pd.Series(np.asarray(values, dtype=object).ravel(), dtype=object)
+    for value in series[~series.isin(cache.keys())].unique():
+        text = _code_text(value)
+        if text:
+            cache[value] = text.zfill(width)
+    return series.map(cache).fillna('').to_numpy(dtype=object)
+
+
+def normalize_codes(codes) -> np.ndarray:
+    """股票代码统一为 6 位字符串，缺失为空字符串"""
+    return _normalize(codes, _code_cache, 6)
+
+
+def _normalize_market_codes(market_codes) -> np.ndarray:
+    return _normalize(market_codes, _market_code_cache, 0)
+
+
+class SecurityMaster:
+    """
+    证券主表
+
+    - market_codes / codes: 第 sid 只股票的市场代码和代码
+    - 简称历史: 每条记录为 (sid, 简称, 首次出现日期, 最近出现日期)，日期为 int32 的 YYYYMMDD，
+      同一股票的当前简称为最近出现日期最大的记录
+    """
+
+    def __init__(self, market_codes=None, codes=None, name_sids=None, names=None,
+                 first_dates=None, last_dates=None, synced_dates=None):
+        self.market_codes = list(market_codes) if market_codes is not None else []
+        self.codes = list(codes) if codes is not None else []
+        self.name_sids = list(name_sids) if name_sids is not None else []
+        self.names = list(names) if names is not None else []
+        self.first_dates = np.asarray(first_dates if first_dates is not None else [], dtype=np.int32)
+        self.last_dates = np.asarray(last_dates if last_dates is not None else [], dtype=np.int32)
+        self.synced_dates = set(synced_dates) if synced_dates is not None else set()
+        self.dirty = False
+        self._lock = threading.RLock()
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        """重建查找索引"""
+        self._key_index = pd.Index([f"{m}.{c}" for m, c in zip(self.market_codes, self.codes)])
+        self._code_index = None
+        self._name_records = None
+        self._record_of = {(sid, name): i for i, (sid, name) in enumerate(zip(self.name_sids, self.names))}
+        self._current_record = np.full(len(self.codes), -1, dtype=np.int64)
+        self._current_name = np.full(len(self.codes), '', dtype=object)
+        for i, sid in enumerate(self.name_sids):
+            current = self._current_record[sid]
+            if current < 0 or self.last_dates[i] >= self.last_dates[current]:
+                self._current_record[sid] = i
+                self._current_name[sid] = self.names[i]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    # ------------------------------------------------------------------ 编号
+    def lookup(self, market_codes, codes) -> np.ndarray:
+        """按 (market_code, code) 查找 sid，缺少 market_code 的行只按代码查找，查不到为 -1"""
+        market_codes = _normalize_market_codes(market_codes)
+        codes = normalize_codes(codes)
+        with self._lock:
+            sids = self._key_index.get_indexer(market_codes + '.' + codes)
+        no_market = (market_codes == '') & (codes != '')
+        if no_market.any():
+            sids[no_market] = self.lookup_codes(codes[no_market])
+        sids[codes == ''] = UNKNOWN_SID
+        return sids.astype(np.int32)
+
+    def intern(self, market_codes, codes) -> np.ndarray:
+        """
+        按 (market_code, code) 查找 sid，新股票按出现顺序分配新的 sid；
+        缺少 market_code 的行只按代码查找，代码缺失的行为 -1
+        """
+        market_codes = _normalize_market_codes(market_codes)
+        codes = normalize_codes(codes)
+        keys = market_codes + '.' + codes
+        with self._lock:
+            sids = self._key_index.get_indexer(keys)
+            missing = (sids < 0) & (codes != '') & (market_codes != '')
+            if missing.any():
+                _, first = np.unique(keys[missing], return_index=True)
+                rows = np.sort(np.flatnonzero(missing)[first])
+                self.market_codes.extend(market_codes[rows].tolist())
+                self.codes.extend(codes[rows].tolist())
+                self._key_index = self._key_index.append(pd.Index(keys[rows]))
+                self._current_record = np.pad(self._current_record, (0, len(rows)), constant_values=-1)
+                self._current_name = np.concatenate([self._current_name, np.full(len(rows), '', dtype=object)])
+                self._code_index = None
+                self.dirty = True
+                sids = self._key_index.get_indexer(keys)
+        no_market = (market_codes == '') & (codes != '')
+        if no_market.any():
+            sids[no_market] = self.lookup_codes(codes[no_market])
+        sids[codes == ''] = UNKNOWN_SID
+        return sids.astype(np.int32)
+
+    def lookup_codes(self, codes) -> np.ndarray:
+        """只按 6 位代码查找 sid（不同市场有同一代码时视为查不到），查不到为 -1"""
+        with self._lock:
+            if self._code_index is None:
+                codes_series = pd.Series(self.codes, dtype=object)
+                unique = ~codes_series.duplicated(keep=False)
+                self._code_index = (pd.Index(codes_series[unique].to_numpy()),
+                                    np.flatnonzero(unique.to_numpy()))
+            index, sids = self._code_index
+            positions = index.get_indexer(normalize_codes(codes))
+        return np.where(positions >= 0, sids[positions], UNKNOWN_SID).astype(np.int32)
+
+    # ------------------------------------------------------------------ 简称
+    def observe_names(self, sids, names, trade_date: str) -> None:
+        """记录股票在某个交易日使用的简称"""
+        sids = np.asarray(sids, dtype=np.int64)
+        names = pd.Series(names, dtype=object).fillna('').astype(str).to_numpy(dtype=object)
+        keep = (sids >= 0) & (names != '')
+        sids, names = sids[keep], names[keep]
+        date = int(trade_date)
+        with self._lock:
+            # 大部分股票的简称与当前简称相同，直接更新当前记录；新股票和改名的股票逐个查找或新增记录
+            current = self._current_record[sids]
+            records = np.where((current >= 0) & (self._current_name[sids] == names), current, -1)
+            for row in np.flatnonzero(records < 0):
+                key = (int(sids[row]), names[row])
+                record = self._record_of.get(key)
+                if record is None:
+                    record = len(self.names)
+                    self._record_of[key] = record
+                    self.name_sids.append(key[0])
+                    self.names.append(key[1])
+                    self.first_dates = np.append(self.first_dates, np.int32(date))
+                    self.last_dates = np.append(self.last_dates, np.int32(date))
+                    self._name_records = None
+                    self.dirty = True
+                records[row] = record
+
+            first, last = self.first_dates[records], self.last_dates[records]
+            if (first > date).any() or (last < date).any():
+                self.first_dates[records] = np.minimum(first, date)
+                self.last_dates[records] = np.maximum(last, date)
+                self.dirty = True
+            current = self._current_record[sids]
+            newer = (current < 0) | (self.last_dates[records] >= self.last_dates[np.maximum(current, 0)])
+            self._current_record[sids[newer]] = records[newer]
+            self._current_name[sids[newer]] = names[newer]
+
+    def current_names(self, sids) -> np.ndarray:
+        """sid 对应的当前简称，未知为空字符串"""
+        sids = np.asarray(sids, dtype=np.int64)
+        with self._lock:
+            names = np.array(self.names + [''], dtype=object)
+            valid = (sids >= 0) & (sids < len(self._current_record))
+            records = np.full(len(sids), len(self.names), dtype=np.int64)
+            records[valid] = self._current_record[sids[valid]]
+            records[records < 0] = len(self.names)
+        return names[records]
+
+    def name_history(self, sid: int) -> pd.DataFrame:
+        """股票的简称变更历史，按首次出现日期升序"""
+        with self._lock:
+            rows = [i for i, s in enumerate(self.name_sids) if s == sid]
+            df = pd.DataFrame({
+                '股票简称': [self.names[i] for i in rows],
+                '首次日期': self.first_dates[rows].astype(str),
+                '最近日期': self.last_dates[rows].astype(str),
+            })
+        return df.sort_values('首次日期').reset_index(drop=True)
+
+    def lookup_names(self, names, as_of: str = None) -> np.ndarray:
+        """
+        按简称（含曾用名）查找 sid，查不到为 -1
+
+        同一简称先后属于多只股票时: 指定 as_of 则取该日使用此简称的股票，该日没有股票使用时取之前最近使用的；
+        未指定时取最近使用此简称的股票
+        """
+        with self._lock:
+            if self._name_records is None:
+                records = {}
+                for i, name in enumerate(self.names):
+                    records.setdefault(name, []).append(i)
+                self._name_records = records
+            result = np.full(len(names), UNKNOWN_SID, dtype=np.int32)
+            for pos, name in enumerate(names):
+                candidates = self._name_records.get(name)
+                if not candidates:
+                    continue
+                if as_of is not None:
+                    as_of = int(as_of)
+                    active = [i for i in candidates if self.first_dates[i] <= as_of <= self.last_dates[i]]
+                    earlier = [i for i in candidates if self.last_dates[i] < as_of]
+                    candidates = active or earlier or candidates
+                best = max(candidates, key=lambda i: self.last_dates[i])
+                result[pos] = self.name_sids[best]
+        return result
+
+    # ------------------------------------------------------------------ 同步与存储
+    def sync(self, overview_dir: str = OVERVIEW_DIR) -> int:
+        """
+        把尚未同步的每日行情文件中的股票和简称写入主表
+
+        Returns:
+            int: 同步的交易日数量
+        """
+        if not os.path.isdir(overview_dir):
+            return 0
+        pending = sorted(
+            match.group(1) for match in map(OVERVIEW_FILE_PATTERN.match, os.listdir(overview_dir))
+            if match and match.group(1) not in self.synced_dates
+        )
+        for trade_date in pending:
+            file_path = os.path.join(overview_dir, f"ths_market_overview_{trade_date}.csv")
+            try:
+                day_df = pd.read_csv(file_path, dtype={'code': str, 'market_code': str},
+                                     usecols=['code', 'market_code', '股票简称'])
+            except Exception as e:
+                logger.warning(f"读取行情文件失败，跳过: {file_path}, {e}")
+                continue
+            sids = self.intern(day_df['market_code'], day_df['code'])
+            self.observe_names(sids, day_df['股票简称'], trade_date)
+            self.synced_dates.add(trade_date)
+            self.dirty = True
+        if pending:
+            logger.info(f"证券主表增量同步{len(pending)}个交易日, 股票数: {len(self)}")
+        return len(pending)
+
+    def save(self, file_path: str = MASTER_PATH) -> None:
+        """保存主表到 .npz 文件"""
+        with self._lock:
+            save_arrays(
+                file_path,
+                market_codes=np.array(self.market_codes, dtype=str),
+                codes=np.array(self.codes, dtype=str),
+                name_sids=np.array(self.name_sids, dtype=np.int32),
+                names=np.array(self.names, dtype=str),
+                first_dates=self.first_dates,
+                last_dates=self.last_dates,
+                synced_dates=np.array(sorted(self.synced_dates), dtype='<U8'),
+            )
+            self.dirty = False
+
+    def save_if_dirty(self, file_path: str = MASTER_PATH) -> None:
+        if self.dirty:
+            self.save(file_path)
+
+    @staticmethod
+    def load(file_path: str = MASTER_PATH) -> 'SecurityMaster':
+        """读取主表，文件不存在时返回空表"""
+        arrays = load_arrays(file_path)
+        if not arrays:
+            return SecurityMaster()
+        return SecurityMaster(
+            market_codes=arrays['market_codes'].tolist(),
+            codes=arrays['codes'].tolist(),
+            name_sids=arrays['name_sids'].tolist(),
+            names=arrays['names'].tolist(),
+            first_dates=arrays['first_dates'],
+            last_dates=arrays['last_dates'],
+            synced_dates=arrays['synced_dates'].tolist(),
+        )
+
+    @staticmethod
+    def load_synced(overview_dir: str = OVERVIEW_DIR, file_path: str = MASTER_PATH) -> 'SecurityMaster':
+        """读取主表并与每日行情文件同步"""
+        master = SecurityMaster.load(file_path)
+        master.sync(overview_dir)
+        master.save_if_dirty(file_path)
+        return master
+
+
+_master = None
+_master_lock = threading.Lock()
+
+
+def get_security_master() -> SecurityMaster:
+    """进程内共享的证券主表（首次调用时读取并同步）"""
+    global _master
+    with _master_lock:
+        if _master is None:
+            _master = SecurityMaster.load_synced()
+        return _master
+
+
+def attach_security_ids(df: pd.DataFrame, intern: bool = False, trade_date: str = None,
+                        master: SecurityMaster = None) -> pd.DataFrame:
+    """
+    返回增加了 sid 列的副本
+
+    有 market_code 列时按 (market_code, code) 查找，否则只按 code 查找，都没有时按股票简称查找
+
+    Args:
+        df: 数据
+        intern: 有 market_code 时是否为新股票分配 sid（并保存主表）
+        trade_date: 按简称查找时的日期；intern 时同时记录当日简称
+        master: 证券主表，默认进程内共享的主表
+    """
+    master = master or get_security_master()
+    df = df.copy()
+    if 'code' in df.columns and 'market_code' in df.columns:
+        if intern:
+            sids = master.intern(df['market_code'], df['code'])
+            if trade_date and '股票简称' in df.columns:
+                master.observe_names(sids, df['股票简称'], trade_date)
+            master.save_if_dirty()
+        else:
+            sids = master.lookup(df['market_code'], df['code'])
+    elif 'code' in df.columns:
+        sids = master.lookup_codes(df['code'])
+    elif '股票简称' in df.columns:
+        sids = master.lookup_names(df['股票简称'].fillna('').astype(str).tolist(), as_of=trade_date)
+    else:
+        raise ValueError(f"无法确定证券编号，缺少 code/股票简称 列: {df.columns.tolist()}")
+    df[SID_COLUMN] = sids
+    return df
+
+
+def security_keys(df: pd.DataFrame, master: SecurityMaster = None) -> np.ndarray:
+    """
+    每行的分组键: 能确定 sid 时为 sid；查不到的行（主表中还没有的股票）按股票简称分组，没有简称时各自一组，键为负数
+    """
+    sids = attach_security_ids(df, master=master)[SID_COLUMN].to_numpy(dtype=np.int64)
+    unknown = sids < 0
+    if unknown.any():
+        if '股票简称' in df.columns:
+            groups, _ = pd.factorize(df['股票简称'].to_numpy()[unknown])
+        else:
+            groups = np.arange(unknown.sum())
+        sids[unknown] = -2 - groups
+    return sids
+
+
+def latest_per_security(df: pd.DataFrame, date_column: str = '交易日期',
+                        master: SecurityMaster = None) -> pd.DataFrame:
+    """每只股票只保留日期最新的一条记录（按 sid 分组，改名前后的记录视为同一只股票），按日期倒序"""
+    keys = security_keys(df, master)
+    order = np.argsort(df[date_column].to_numpy(dtype=str), kind='stable')[::-1]
+    ordered = df.iloc[order]
+    latest = ordered[~pd.Series(keys[order]).duplicated().to_numpy()]
+    return latest.reset_index(drop=True)
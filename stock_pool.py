@@ -1,4 +1,3 @@
-import pywencai
 import re
 import pandas as pd
 import numpy as np
@@ -8,17 +7,22 @@ from datetime import datetime, timedelta
 from log_setup import get_logger
 from trading_calendar import TradingCalendar
 from notification import DingDingRobot
-from wencai import WencaiUtils
-from utils import execute_with_retry, check_file_exists_after_time
+from wencai import WencaiUtils, planner
+from utils import check_output_complete
+from retry_policy import call_with_retry, RetryPolicy
+from market_panel import MarketPanel
+from first_board import FirstBoardDetector, FIRST_BOARD_RULES
 import warnings
 warnings.filterwarnings("ignore")
 
 
 class StockPoolConfig:
     """股票池配置类"""
-    # 重试配置
+    # 重试配置：指数退避加随机抖动，第n次重试最多等待 RETRY_BASE_DELAY * 2^n 秒
     MAX_RETRY_COUNT = 3
-    RETRY_BASE_DELAY = 2  # 基础等待时间，实际等待时间为 (attempt + 1) * BASE_DELAY
+    RETRY_BASE_DELAY = 2
+    RETRY_POLICY = RetryPolicy(max_attempts=MAX_RETRY_COUNT, base_delay=RETRY_BASE_DELAY, max_delay=60.0,
+                               rate_limit_delay=20.0)
     
     # 区间配置 [(天数, 排名)]
     INTERVAL_CONFIGS = [
@@ -39,10 +43,24 @@ class StockPoolConfig:
     TXT_SUBDIR = 'txt'
     DATA_FILE_PREFIX = 'stock_pool'
 
-    # 查询等待时间
-    QUERY_SLEEP_SECONDS = 3
+    # 查询间隔由 rate_limiter 中 wencai 的速率控制
     MAIN_RETRY_SLEEP_SECONDS = 10
     
+    # 各区间的排名只查询一次，深度按最严格的筛选条件需要的前N名估算，仍不够时加倍深度重新查询
+    WINDOW_DEPTH_PER_RANK = 20    # 还没有通过率时，最严格筛选每需要1名取20名
+    WINDOW_DEPTH_MARGIN = 1.5     # 按前面区间的通过率估算深度时的余量
+    WINDOW_DEPTH_STEP = 100       # 深度取问财每页行数的整数倍
+    WINDOW_MAX_DEPTH = 8000
+
+    # 筛选条件 -> (上市天数下限, 自由流通市值下限(亿), 是否剔除ST和退市股)，在区间排名上本地筛选
+    FILTER_THRESHOLDS = {
+        None: (5, 0, False),
+        '30': (30, 30, True),
+        '60': (30, 60, True),
+        '100': (30, 100, True),
+        '200': (30, 200, True),
+    }
+
     # 股票池配置：(筛选条件, 描述)
     CORE_STOCK_CONFIGS = [
         (None, "全量股票池数据"),
@@ -225,29 +243,107 @@ class StockPool:
         
         return grouped_df[["交易日期", "股票简称", "市值Z", "market_code", "code", "区间信息", "重要度"]]
 
-    def get_muti_top_stocks(self, selected=None):
+    @staticmethod
+    def filter_mask(ranking: pd.DataFrame, selected=None) -> np.ndarray:
+        """区间排名中满足筛选条件的行"""
+        min_listed_days, min_market_value, exclude_st = StockPoolConfig.FILTER_THRESHOLDS[selected]
+        mask = ranking['上市天数'].to_numpy() > min_listed_days
+        mask &= ranking['市值Z'].to_numpy() > min_market_value * 1e8
+        if exclude_st:
+            names = ranking['股票简称'].astype(str)
+            mask &= ~(names.str.contains('ST', regex=False) | names.str.contains('退', regex=False)).to_numpy()
+        return mask
+
+    @staticmethod
+    def select_top(ranking: pd.DataFrame, selected=None, rank: int = 10) -> pd.DataFrame:
+        """
+        在区间排名上按筛选条件取前 rank 名，区间排名改为筛选后的名次（与问财带筛选条件查询的结果一致）
+        """
+        rows = np.flatnonzero(StockPool.filter_mask(ranking, selected))
+        k = min(rank, len(rows))
+        if k == 0:
+            return ranking.iloc[:0]
+        change = ranking['区间涨幅'].to_numpy()[rows]
+        top = np.argpartition(-change, k - 1)[:k]
+        # 前k名按涨幅降序，涨幅相同按全市场排名
+        top = top[np.lexsort((ranking['区间排名'].to_numpy()[rows[top]], -change[top]))]
+        df = ranking.iloc[rows[top]].copy()
+        df['区间排名'] = np.arange(1, k + 1)
+        return df.drop(columns=['上市天数']).reset_index(drop=True)
+
+    @staticmethod
+    def window_depth(rank: int, pass_ratio: float = None) -> int:
+        """
+        区间排名的查询深度：最严格筛选需要前 rank 名，按其通过率（前面区间实测，未知时用默认倍数）估算
+
+        Args:
+            rank: 需要的前N名
+            pass_ratio: 区间排名中通过最严格筛选的比例
+        """
+        if pass_ratio:
+            depth = rank / pass_ratio * StockPoolConfig.WINDOW_DEPTH_MARGIN
+        else:
+            depth = rank * StockPoolConfig.WINDOW_DEPTH_PER_RANK
+        step = StockPoolConfig.WINDOW_DEPTH_STEP
+        return int(min(max(step, -(-depth // step) * step), StockPoolConfig.WINDOW_MAX_DEPTH))
+
+    def get_window_rankings(self, trade_date: str = None, selections=None) -> dict:
+        """
+        每个区间只查询一次区间涨幅排名，深度需保证每种筛选条件下都有足够的前N名
+
+        Args:
+            trade_date: 交易日期，默认最新交易日
+            selections: 需要覆盖的筛选条件，默认 CORE_STOCK_CONFIGS 中的全部
+
+        Returns:
+            dict: 区间天数 -> 区间涨幅排名
+        """
+        if selections is None:
+            selections = [selected for selected, _ in StockPoolConfig.CORE_STOCK_CONFIGS]
+        rankings = {}
+        pass_ratio = None
+        for days, rank in StockPoolConfig.INTERVAL_CONFIGS:
+            depth = StockPool.window_depth(rank, pass_ratio)
+            while True:
+                ranking = call_with_retry('wencai', WencaiUtils.get_window_ranking,
+                                          policy=StockPoolConfig.RETRY_POLICY,
+                                          days=days, depth=depth, trade_date=trade_date)
+                if not StockPool._validate_dataframe(ranking, f'{days}日区间排名'):
+                    raise Exception(f'{days}日区间排名获取失败')
+                covered = min(int(StockPool.filter_mask(ranking, selected).sum()) for selected in selections)
+                # 返回行数不足深度说明已取到全部股票
+                if covered >= rank or len(ranking) < depth or depth >= StockPoolConfig.WINDOW_MAX_DEPTH:
+                    break
+                depth = min(depth * 2, StockPoolConfig.WINDOW_MAX_DEPTH)
+                logger.info(f"{days}日区间排名深度不足(最严格筛选只有{covered}只)，加深到{depth}")
+            if covered and len(ranking):
+                pass_ratio = covered / len(ranking)
+            rankings[days] = ranking
+        return rankings
+
+    def get_muti_top_stocks(self, selected=None, trade_date: str = None, rankings: dict = None):
         """
         获取股票池数据，通过多个时间区间组合计算重要度
         
         Args:
             selected: 是否使用筛选条件（非ST、非退市等）
+            trade_date: 交易日期，默认最新交易日
+            rankings: 已获取的各区间排名，为空时按本筛选条件获取
         
         Returns:
             按重要度排序的股票池DataFrame
         """
         try:
+            if rankings is None:
+                rankings = self.get_window_rankings(trade_date, selections=[selected])
             all_df = []
             # 使用配置类中的区间设置
             for days, rank in StockPoolConfig.INTERVAL_CONFIGS:
                 logger.info(f'========== selected: {selected}  {days}-{rank} ===========')
-                df = execute_with_retry(WencaiUtils.get_top_stocks, 
-                                       max_retry_count=StockPoolConfig.MAX_RETRY_COUNT,
-                                       retry_base_delay=StockPoolConfig.RETRY_BASE_DELAY,
-                                       days=days, rank=rank, use_filters=selected)
+                df = StockPool.select_top(rankings[days], selected, rank)
                 if not StockPool._validate_dataframe(df, f'{(days,rank)}获取数据'):
                     raise Exception(f'{(days,rank)}获取数据失败')
                 all_df.append(df)
-                time.sleep(StockPoolConfig.QUERY_SLEEP_SECONDS)
             
             df_all = pd.concat(all_df)
             df = StockPool.calc_importance(df_all, 
@@ -259,21 +355,26 @@ class StockPool:
             return None
 
 
-    def get_core_stocks_data(self) -> pd.DataFrame:
+    def get_core_stocks_data(self, trade_date: str = None) -> pd.DataFrame:
         """
         获取所有核心股票池数据
         
+        Args:
+            trade_date: 交易日期，默认最新交易日
+        
         Returns:
             包含所有股票池DataFrame的列表
         """
         try:
             data_list = []
+            # 各区间排名只查询一次，各筛选条件在本地切出
+            rankings = self.get_window_rankings(trade_date)
             
             for i, (selected, description) in enumerate(StockPoolConfig.CORE_STOCK_CONFIGS, 1):
                 step_name = "步骤1" if selected is None else f"步骤2.{i-1}"
                 logger.info(f" ------------ {step_name}: 获取{description} ------------")
                 
-                data = self.get_muti_top_stocks(selected=selected)
+                data = self.get_muti_top_stocks(selected=selected, trade_date=trade_date, rankings=rankings)
                 if not StockPool._validate_dataframe(data, description):
                     return None  # 任何一个获取失败就返回None
                 
@@ -297,23 +398,55 @@ class StockPool:
             logger.error(f"获取核心股票池数据失败: {e}")
             return None
 
-    def get_first_breakout_stocks(self):
+    def detect_first_breakout_stocks(self, trade_date: str = None):
+        """
+        在本地行情面板上检测全量首板和中军首板
+
+        Returns:
+            tuple: (全量首板, 中军首板)；面板缺少当日或回看期内的交易日时返回 None
         """
-        获取首板股票池数据
+        trade_date = trade_date or trading_calendar.get_default_trade_date()
+        panel = MarketPanel.load_synced()
+        lookback = max(rule.lookback for rule in FIRST_BOARD_RULES.values())
+        expected = trading_calendar.get_recent_trading_days(k=lookback + 1, end_date=trade_date)
+        pos = int(np.searchsorted(panel.dates, trade_date))
+        window = panel.dates[max(0, pos - lookback):pos + 1].tolist()
+        if window != expected:
+            logger.info(f"行情面板缺少{trade_date}或之前{lookback}个交易日的数据，无法本地检测首板")
+            return None
+        detector = FirstBoardDetector(panel)
+        return detector.detect(trade_date, FIRST_BOARD_RULES['all']), detector.detect(trade_date, FIRST_BOARD_RULES['zj'])
+
+    def get_first_breakout_stocks(self, trade_date: str = None):
+        """
+        获取首板股票池数据，优先在本地行情面板上检测，面板数据不全时查询问财
+        
+        Args:
+            trade_date: 交易日期，默认最新交易日
         """
         try:
             logger.info("开始获取所有的首板股票池数据")
-            df = execute_with_retry(WencaiUtils.get_first_breakout_stocks, 
-                                   k=11,
-                                   use_filters=False)
+            detected = None
+            try:
+                detected = self.detect_first_breakout_stocks(trade_date)
+            except Exception as e:
+                logger.warning(f"本地检测首板失败，改为查询问财: {e}")
+
+            if detected is not None:
+                df, df_zj = detected
+                logger.info(f"本地检测首板完成, 所有首板: {len(df)}, 自由流通市值大于100亿的首板: {len(df_zj)}")
+            else:
+                df = call_with_retry('wencai', WencaiUtils.get_first_breakout_stocks,
+                                     k=11,
+                                     use_filters=False,
+                                     trade_date=trade_date)
+                df_zj = call_with_retry('wencai', WencaiUtils.get_first_breakout_stocks,
+                                        k=11,
+                                        use_filters=True,
+                                        trade_date=trade_date)
             if not StockPool._validate_dataframe(df, "获取所有首板股票池数据"):
                 raise Exception("获取所有首板股票池数据失败")
             logger.info(f"所有首板股票池数据量: {len(df)}")
-            
-            logger.info("开始获取自由流通市值大于100亿的首板股票池数据")
-            df_zj = execute_with_retry(WencaiUtils.get_first_breakout_stocks, 
-                                   k=11,
-                                   use_filters=True)
             if not StockPool._validate_dataframe(df_zj, "获取自由流通市值大于100亿的首板股票池数据"):
                 raise Exception("获取自由流通市值大于100亿的首板股票池数据失败")
             logger.info(f"自由流通市值大于100亿的首板股票池数据量: {len(df_zj)}")
@@ -327,10 +460,18 @@ class StockPool:
             logger.error(f"获取首板股票池数据失败: {e}")
             return None
 
-    def update_stock_pool_data(self):
+    def update_stock_pool_data(self, trade_date: str = None):
+        """
+        获取并保存核心股票池和首板股票池数据
+        
+        Args:
+            trade_date: 交易日期，默认最新交易日；历史日期用于回填
+        """
         try:
             logger.info("开始执行股票池数据获取任务...")
-            trade_date = trading_calendar.get_default_trade_date()
+            trade_date = trade_date or trading_calendar.get_default_trade_date()
+            # 查询规划器的缓存只在一次运行内复用，重试和回填的每个交易日都重新查询
+            planner.clear()
             
             # 检查目标文件是否已存在且在16点后生成
             base_path = f"{StockPoolConfig.DATA_SAVE_DIR}/{StockPoolConfig.CSV_SUBDIR}/stock_pool/{trade_date}"
@@ -340,7 +481,7 @@ class StockPool:
             all_files_exist = True
             for filename in required_files:
                 file_path = os.path.join(base_path, filename)
-                if not check_file_exists_after_time(file_path, cutoff_hour=16):
+                if not check_output_complete(file_path, trade_date, cutoff_hour=16):
                     all_files_exist = False
                     break
             
@@ -349,14 +490,14 @@ class StockPool:
                 return
             
             # 步骤1: 获取核心股票池数据
-            core_df = self.get_core_stocks_data()
+            core_df = self.get_core_stocks_data(trade_date=trade_date)
             if not StockPool._validate_dataframe(core_df, "核心股票池数据收集"):
                 raise Exception("核心股票池数据收集失败")
             logger.info(f"核心股票池数据获取成功, 数据量: {core_df.shape}")
 
             # 步骤2: 获取并保存首板股票池数据
             logger.info("------------ 步骤2: 获取首板股票池数据------------")
-            first_stocks_df = self.get_first_breakout_stocks()
+            first_stocks_df = self.get_first_breakout_stocks(trade_date=trade_date)
             if not StockPool._validate_dataframe(first_stocks_df, "首板股票池数据收集"):
                 raise Exception("首板股票池数据收集失败")
             logger.info(f"首板股票池数据获取成功, 数据量: {first_stocks_df.shape}")
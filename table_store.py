@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+表格分页与列投影模块
+只读取需要展示的列，在缓存的投影数据上做筛选和分页，供仪表板使用
+"""
+
+import os
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import logging
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 缓存的投影数量上限
+MAX_CACHE_ENTRIES = 32
+
+# 默认按字符串读取的列
+STRING_DTYPES = {'交易日期': str, '涨停日期': str, '异动日期': str, 'code': str, 'market_code': str}
+
+
+@dataclass
+class TablePage:
+    """分页查询结果"""
+    data: pd.DataFrame      # 当前页数据，索引为原文件行号
+    total: int              # 筛选后总行数
+    page: int               # 当前页码（从1开始）
+    page_count: int         # 总页数
+    labels: pd.Series = None  # 当前页的详情选择标签，索引与 data 一致
+
+
+class TableStore:
+    """CSV表格的列投影读取、筛选和分页"""
+
+    _cache: 'OrderedDict[tuple, pd.DataFrame]' = OrderedDict()
+
+    @staticmethod
+    def read_columns(file_path: str) -> list:
+        """只读取表头，返回文件中的列名"""
+        return pd.read_csv(file_path, nrows=0).columns.tolist()
+
+    @staticmethod
+    def load_columns(file_path: str, columns: list = None) -> pd.DataFrame:
+        """
+        读取指定列，按 (文件路径, 修改时间, 列) 缓存，文件更新后自动失效
+
+        Args:
+            file_path: CSV文件路径
+            columns: 需要读取的列，None 表示全部列；文件中不存在的列会被忽略
+
+        Returns:
+            pd.DataFrame: 索引为原文件行号
+        """
+        mtime = os.path.getmtime(file_path)
+        if columns is not None:
+            available = set(TableStore.read_columns(file_path))
+            columns = [col for col in columns if col in available]
+        key = (os.path.abspath(file_path), mtime, tuple(columns) if columns is not None else None)
+
+        cached = TableStore._cache.get(key)
+        if cached is not None:
+            TableStore._cache.move_to_end(key)
+            return cached
+
+        dtype = {col: t for col, t in STRING_DTYPES.items() if columns is None or col in columns}
+        df = pd.read_csv(file_path, usecols=columns, dtype=dtype)
+        if columns is not None:
+            df = df[columns]
+
+        TableStore._cache[key] = df
+        while len(TableStore._cache) > MAX_CACHE_ENTRIES:
+            TableStore._cache.popitem(last=False)
+        logger.debug(f"读取{file_path}列投影: {columns}, 行数: {len(df)}")
+        return df
+
+    @staticmethod
+    def distinct(file_path: str, column: str) -> list:
+        """返回某列去重排序后的取值，用于筛选器选项"""
+        df = TableStore.load_columns(file_path, [column])
+        if column not in df.columns:
+            return []
+        return sorted(df[column].dropna().astype(str).unique().tolist())
+
+    @staticmethod
+    def build_mask(df: pd.DataFrame, filters: dict = None) -> np.ndarray:
+        """
+        根据筛选条件生成布尔掩码
+
+        Args:
+            filters: {列名: (操作, 值)}，操作支持 'eq'、'gt'、'isin'；
+                     值为 None 或空列表时忽略该条件
+        """
+        mask = np.ones(len(df), dtype=bool)
+        for col, (op, value) in (filters or {}).items():
+            if col not in df.columns or value is None or (op == 'isin' and len(value) == 0):
+                continue
+            if op == 'eq':
+                mask &= (df[col] == value).to_numpy()
+            elif op == 'gt':
+                mask &= (pd.to_numeric(df[col], errors='coerce') > value).to_numpy()
+            elif op == 'isin':
+                mask &= df[col].isin(value).to_numpy()
+            else:
+                raise ValueError(f"不支持的筛选操作: {op}")
+        return mask
+
+    @staticmethod
+    def build_labels(df: pd.DataFrame, label_columns: list, max_len: int = 50) -> pd.Series:
+        """
+        向量化生成详情选择标签，形如 'A - B - C...'
+
+        Args:
+            label_columns: 参与拼接的列，最后一列截断到 max_len 个字符
+        """
+        parts = []
+        for i, col in enumerate(label_columns):
+            values = df[col].fillna('未知').astype(str) if col in df.columns else pd.Series('未知', index=df.index)
+            if i == len(label_columns) - 1:
+                values = values.str[:max_len] + '...'
+            parts.append(values)
+        labels = parts[0]
+        for values in parts[1:]:
+            labels = labels + ' - ' + values
+        return labels
+
+    @staticmethod
+    def query(file_path: str,
+              columns: list = None,
+              filters: dict = None,
+              page: int = 1,
+              page_size: int = 50,
+              label_columns: list = None) -> TablePage:
+        """
+        在列投影上筛选并分页
+
+        Args:
+            file_path: CSV文件路径
+            columns: 需要展示的列
+            filters: 筛选条件，参见 build_mask；筛选列会自动加入读取列
+            page: 页码，从1开始
+            page_size: 每页行数
+            label_columns: 需要生成详情标签时传入参与拼接的列
+
+        Returns:
+            TablePage: 当前页数据、总行数和标签
+        """
+        read_columns = None
+        if columns is not None:
+            extra = [col for col in list(filters or {}) + list(label_columns or []) if col not in columns]
+            read_columns = list(columns) + list(dict.fromkeys(extra))
+
+        df = TableStore.load_columns(file_path, read_columns)
+        mask = TableStore.build_mask(df, filters)
+        positions = np.flatnonzero(mask)
+
+        total = len(positions)
+        page_count = max(1, math.ceil(total / page_size))
+        page = min(max(1, int(page)), page_count)
+        page_positions = positions[(page - 1) * page_size: page * page_size]
+
+        page_df = df.iloc[page_positions]
+        labels = TableStore.build_labels(page_df, label_columns) if label_columns else None
+        if columns is not None:
+            page_df = page_df[[col for col in columns if col in page_df.columns]]
+
+        return TablePage(data=page_df, total=total, page=page, page_count=page_count, labels=labels)
+
+    @staticmethod
+    def read_row(file_path: str, row: int, columns: list = None) -> pd.Series:
+        """
+        只读取一行的指定列，用于详情展示（不缓存，其他行解析后即丢弃）
+
+        Args:
+            file_path: CSV文件路径
+            row: 原文件行号（与 load_columns/query 返回的索引一致）
+            columns: 需要读取的列，None 表示全部列；文件中不存在的列会被忽略
+
+        Returns:
+            pd.Series: 该行数据，行号超出范围时返回 None
+        """
+        if columns is not None:
+            available = set(TableStore.read_columns(file_path))
+            columns = [col for col in columns if col in available]
+        dtype = {col: t for col, t in STRING_DTYPES.items() if columns is None or col in columns}
+        df = pd.read_csv(file_path, usecols=columns, dtype=dtype, skiprows=range(1, int(row) + 1), nrows=1)
+        if df.empty:
+            return None
+        if columns is not None:
+            df = df[columns]
+        return df.iloc[0].rename(row)
+
+    @staticmethod
+    def count(file_path: str, filters: dict = None) -> int:
+        """返回筛选后的总行数，只读取筛选列"""
+        columns = list(filters or {}) or TableStore.read_columns(file_path)[:1]
+        df = TableStore.load_columns(file_path, columns)
+        return int(TableStore.build_mask(df, filters).sum())
+
+    @staticmethod
+    def filtered(file_path: str, columns: list, filters: dict = None) -> pd.DataFrame:
+        """返回筛选后的列投影（不分页），用于统计指标和分布图"""
+        read_columns = list(dict.fromkeys(list(columns) + list(filters or {})))
+        df = TableStore.load_columns(file_path, read_columns or TableStore.read_columns(file_path)[:1])
+        return df[TableStore.build_mask(df, filters)]
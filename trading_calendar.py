@@ -110,12 +110,13 @@ class TradingCalendar:
         logger.warning(f"在{max_days_back}天内未找到前一交易日")
         return None
     
-    def get_recent_trading_days(self, k: int = 30) -> list:
+    def get_recent_trading_days(self, k: int = 30, end_date=None) -> list:
         """
         获取最近的交易日列表
         
         参数:
             k: 需要获取的交易日天数
+            end_date: 截止日期(含)，支持字符串(YYYYMMDD)、datetime对象或pandas.Timestamp，默认今天
             
         返回:
             交易日字符串列表，格式为YYYYMMDD，按日期升序排列
@@ -125,9 +126,14 @@ class TradingCalendar:
         # 获取所有交易日并排序
         sorted_trading_days = sorted(list(self._trading_days), reverse=True)
         
-        # 过滤掉未来日期，只保留今天及以前的交易日
-        today = pd.Timestamp.now().normalize()
-        valid_trading_days = [day for day in sorted_trading_days if day <= today]
+        # 过滤掉截止日期之后的日期，只保留截止日期及以前的交易日
+        if end_date is None:
+            end_day = pd.Timestamp.now().normalize()
+        elif isinstance(end_date, str) and len(end_date) == 8:
+            end_day = pd.Timestamp(f"{end_date[:4]}-{end_date[4:6]}-{end_date[6:8]}")
+        else:
+            end_day = pd.Timestamp(end_date).normalize()
+        valid_trading_days = [day for day in sorted_trading_days if day <= end_day]
         
         # 取前k天
         recent_days = valid_trading_days[:k]
@@ -138,6 +144,27 @@ class TradingCalendar:
         logger.info(f"获取最近{k}个交易日: {len(result)}天")
         return result
     
+    def get_trading_days_between(self, start_date: str, end_date: str) -> list:
+        """
+        获取区间内的交易日列表
+        
+        参数:
+            start_date: 开始日期(含)，格式YYYYMMDD
+            end_date: 结束日期(含)，格式YYYYMMDD，不会超过今天
+            
+        返回:
+            交易日字符串列表，格式为YYYYMMDD，按日期升序排列
+        """
+        self._ensure_calendar_loaded()
+        
+        start_day = pd.Timestamp(f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:8]}")
+        end_day = min(pd.Timestamp(f"{end_date[:4]}-{end_date[4:6]}-{end_date[6:8]}"),
+                      pd.Timestamp.now().normalize())
+        result = sorted(day.strftime('%Y%m%d') for day in self._trading_days if start_day <= day <= end_day)
+        
+        logger.info(f"获取{start_date}至{end_date}的交易日: {len(result)}天")
+        return result
+    
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+上游服务地址配置
+韭研公社、问财资讯、钉钉和问财选股的访问地址统一从这里读取，
+通过环境变量切换到本地的 fake_upstream 服务做离线压测
+
+环境变量:
+    UPSTREAM_BASE_URL: 所有上游统一指向的地址，各服务挂在 {地址}/{服务名} 下
+    UPSTREAM_<服务名>_URL: 单个服务的地址，优先级高于 UPSTREAM_BASE_URL
+    WENCAI_BACKEND: 'pywencai'（默认）或 'fake'；为 'fake' 或配置了问财地址时使用 pywencai 替身
+"""
+
+import os
+import importlib
+import logging
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+# 线上默认地址
+DEFAULT_BASE_URLS = {
+    'jygs': 'https://app.jiuyangongshe.com/jystock-app/api/v1',
+    'iwencai': 'https://www.iwencai.com',
+    'dingtalk': 'https://oapi.dingtalk.com',
+    'wencai': '',  # 线上问财选股直接使用 pywencai 包
+}
+
+BASE_URL_ENV = 'UPSTREAM_BASE_URL'
+WENCAI_BACKEND_ENV = 'WENCAI_BACKEND'
+
+
+def get_base_url(service: str) -> str:
+    """
+    获取上游服务地址（不带末尾斜杠）
+
+    Args:
+        service: 服务名，DEFAULT_BASE_URLS 中的键
+    """
+    if service not in DEFAULT_BASE_URLS:
+        raise ValueError(f"未知的上游服务: {service}, 可用的服务: {list(DEFAULT_BASE_URLS)}")
+    url = os.environ.get(f"UPSTREAM_{service.upper()}_URL")
+    if not url and os.environ.get(BASE_URL_ENV):
+        url = f"{os.environ[BASE_URL_ENV].rstrip('/')}/{service}"
+    return (url or DEFAULT_BASE_URLS[service]).rstrip('/')
+
+
+def is_fake_wencai() -> bool:
+    """问财选股是否使用替身"""
+    return os.environ.get(WENCAI_BACKEND_ENV, 'pywencai') == 'fake' or bool(get_base_url('wencai'))
+
+
+def load_pywencai():
+    """返回 pywencai 模块或接口相同的替身模块"""
+    if is_fake_wencai():
+        logger.info(f"问财选股使用替身: {get_base_url('wencai') or '进程内合成数据'}")
+        return importlib.import_module('fake_upstream.pywencai_shim')
+    return importlib.import_module('pywencai')
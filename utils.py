@@ -7,20 +7,21 @@
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
-import time
+from dataclasses import replace
 
 # 使用标准的logger命名方式，会自动继承主脚本的日志配置
 logger = logging.getLogger(__name__)
 
 
-def execute_with_retry(func, max_retry_count=3, retry_base_delay=3, *args, **kwargs):
+def execute_with_retry(func, max_retry_count=3, retry_base_delay=3, *args, upstream='default', **kwargs):
     """
-    带重试机制的函数包装器
+    带重试机制的函数包装器，保留给旧脚本使用，新代码请直接使用 retry_policy.call_with_retry
     
     Args:
         func: 要执行的函数
-        max_retry_count: 最大重试次数，默认3次
-        retry_base_delay: 基础等待时间，实际等待时间为 (attempt + 1) * retry_base_delay，默认2秒
+        max_retry_count: 最大尝试次数，默认3次
+        retry_base_delay: 指数退避的基础等待时间，默认3秒
+        upstream: 上游名称，决定使用哪个熔断器
         *args, **kwargs: 函数参数
     
     Returns:
@@ -29,32 +30,9 @@ def execute_with_retry(func, max_retry_count=3, retry_base_delay=3, *args, **kwa
     Raises:
         最后一次失败的异常
     """
-    last_exception = None
-    func_name = getattr(func, '__name__', str(func))
-    
-    logger.info(f"开始执行函数 {func_name}, 最大重试次数: {max_retry_count}")
-    
-    for i in range(max_retry_count):
-        try:
-            logger.debug(f"第{i + 1}次尝试执行 {func_name}")
-            result = func(*args, **kwargs)
-            
-            if i > 0:
-                logger.info(f"函数 {func_name} 在第{i + 1}次尝试后成功执行")
-            
-            return result
-            
-        except Exception as e:
-            last_exception = e
-            if i < max_retry_count - 1:  # 不是最后一次尝试
-                wait_time = (i + 1) * retry_base_delay
-                logger.warning(f"函数 {func_name} 第{i + 1}次尝试失败，{wait_time}秒后重试: {e}")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"函数 {func_name} 重试{max_retry_count}次后仍失败: {e}")
-    
-    # 所有重试都失败了，抛出最后的异常
-    raise last_exception
+    from retry_policy import call_with_retry, get_policy
+    policy = replace(get_policy(upstream), max_attempts=max_retry_count, base_delay=retry_base_delay)
+    return call_with_retry(upstream, func, *args, policy=policy, **kwargs)
 
 
 def check_file_exists_after_time(file_path: str, cutoff_hour: int = 16) -> bool:
@@ -92,6 +70,35 @@ def check_file_exists_after_time(file_path: str, cutoff_hour: int = 16) -> bool:
         return False
 
 
+def check_output_complete(file_path: str, trade_date: str = None, cutoff_hour: int = 16) -> bool:
+    """
+    检查某个交易日的结果文件是否已完整生成
+    
+    文件须在该交易日收盘后(交易日当天 cutoff_hour 点之后)写入；历史交易日回填时写入的文件满足该条件，
+    交易日当天收盘前中断留下的文件不满足，会重新生成
+    
+    Args:
+        file_path: 文件路径
+        trade_date: 文件对应的交易日期 YYYYMMDD，未指定时按文件修改当天的截止时间判断
+        cutoff_hour: 截止时间点(小时)，默认16点
+    
+    Returns:
+        bool: 文件已完整生成返回True，否则返回False
+    """
+    import os
+    
+    if trade_date is None:
+        return check_file_exists_after_time(file_path, cutoff_hour=cutoff_hour)
+    if not os.path.exists(file_path):
+        return False
+    try:
+        file_datetime = datetime.fromtimestamp(os.path.getmtime(file_path))
+    except OSError as e:
+        logger.warning(f"获取文件时间失败: {file_path}, 错误: {e}")
+        return False
+    cutoff_time = datetime.strptime(trade_date, '%Y%m%d').replace(hour=cutoff_hour)
+    return file_datetime >= cutoff_time
+
 
 if __name__ == "__main__":
     # 测试工具函数
@@ -3,7 +3,6 @@
 用于统一管理所有与问财接口交互的函数
 """
 
-import pywencai
 import pandas as pd
 import numpy as np
 import re
@@ -13,16 +12,72 @@ import os
 from typing import Optional
 import logging
 from log_setup import get_logger
-from utils import execute_with_retry, check_file_exists_after_time
+from utils import check_output_complete
+from retry_policy import call_with_retry, NotReadyError
+from rate_limiter import get_limiter
 from notification import DingDingRobot
 from trading_calendar import TradingCalendar
+from upstream import load_pywencai
+from wencai_client import fetch_normalized
+from wencai_planner import WencaiRequest, QueryPlanner
+from security_master import latest_per_security
 # 配置常量
 DEFAULT_DATA_DIR = "./data/csv"
 
+# 涨停、跌停、炸板数据的输出列（当日没有跌停/炸板时保存只有表头的文件）
+ZT_OUTPUT_COLUMNS = [
+    '交易日期', '股票简称', '上市板块', '市值Z', '涨跌幅', '连板', '几天几板',
+    '首次涨停时间', '涨停类型', '涨停原因类别', '涨停封单额', '最终涨停时间',
+    '开板次数', '封成量比', '封流量比', 'market_code', 'code'
+]
+DT_OUTPUT_COLUMNS = [
+    '交易日期', '股票简称', '上市板块', '市值Z', '涨跌幅', '连板',
+    '首次跌停时间', '跌停类型', '跌停原因类型', '跌停封单额', '最终跌停时间',
+    '开板次数', '封成量比', '封流量比', 'market_code', 'code'
+]
+ZB_OUTPUT_COLUMNS = ['交易日期', '股票简称', '涨跌幅', '市值Z', '上市板块', 'market_code', 'code']
+
+# 数据就绪探测：只取一行，通过列名中的日期后缀判断问财是否已切换到目标交易日的数据
+READY_PROBE_QUERY = "A股,今日涨跌幅从大到小排名前1"
+READY_POLL_INTERVAL = 60          # 首次等待间隔（秒）
+READY_POLL_MAX_INTERVAL = 600     # 最大等待间隔（秒）
+READY_POLL_MULTIPLIER = 1.5
+READY_TIMEOUT = 2 * 60 * 60       # 最长等待时间（秒）
+
+# 首板查询：全量首板（涨幅>9.5%）和中军首板（自由流通市值>100亿且涨幅>7%）合并为一条查询，阈值在本地判断
+FIRST_BREAKOUT_LIMIT = 9.5
+FIRST_BREAKOUT_ZJ_CHANGE = 7
+FIRST_BREAKOUT_ZJ_MARKET_VALUE = 100 * 1e8
+FIRST_BREAKOUT_FIELDS = ('自由流通市值',)
+
+# 区间涨幅排名：股票池各市值档位由同一份排名在本地筛选
+WINDOW_RANKING_FIELDS = ('自由流通市值', '上市天数')
+WINDOW_RANKING_COLUMNS = ['交易日期', '股票简称', '区间长度', '区间涨幅', '区间排名', '市值Z', '上市天数',
+                          'market_code', 'code']
+
+# 问财选股后端，可通过 WENCAI_BACKEND / UPSTREAM_BASE_URL 切换为本地替身
+pywencai = load_pywencai()
+
 dingding_robot = DingDingRobot()
 logger = get_logger("wencai", "logs", "daily_research.log")
 trading_calendar = TradingCalendar()
 
+# 已确认数据就绪的交易日，同一进程内不再重复探测
+_ready_dates = set()
+
+# 问财查询规划器：条件相同的请求合并为一条查询，一次运行内复用已执行查询的结果（股票池每次运行开始时清空）
+planner = QueryPlanner(lambda query_text, query_type: WencaiUtils._fetch_planned(query_text, query_type))
+
+
+class DataNotReadyError(NotReadyError):
+    """问财尚未切换到目标交易日的数据（call_with_retry 不重试，由 wait_until_ready 等待）"""
+
+    def __init__(self, trade_date: str, data_date: Optional[str]):
+        super().__init__(f"问财数据尚未就绪: 目标交易日{trade_date}, 当前数据日期{data_date}")
+        self.trade_date = trade_date
+        self.data_date = data_date
+
+
 class WencaiUtils:
     """问财API工具类"""
     
@@ -41,6 +96,88 @@ class WencaiUtils:
                 return date_range_match.group(1).split('-')[1]
         return None
 
+    @staticmethod
+    def is_latest_trade_date(trade_date: Optional[str]) -> bool:
+        """判断是否为默认(最新)交易日，None 视为最新交易日"""
+        return trade_date is None or trade_date == trading_calendar.get_default_trade_date()
+
+    @staticmethod
+    def get_day_text(trade_date: Optional[str]) -> str:
+        """
+        生成问财查询语句中的日期描述
+        最新交易日返回'今日'，历史交易日返回'YYYY年MM月DD日'，用于回填历史数据
+        """
+        if WencaiUtils.is_latest_trade_date(trade_date):
+            return '今日'
+        return f"{trade_date[:4]}年{trade_date[4:6]}月{trade_date[6:8]}日"
+
+    @staticmethod
+    def probe_data_date() -> Optional[str]:
+        """用一行的小查询探测问财当前数据所在的交易日"""
+        get_limiter('wencai').acquire()
+        df = pywencai.get(query=READY_PROBE_QUERY, query_type='stock', loop=False, perpage=1)
+        if df is None or len(df.columns) == 0:
+            return None
+        return WencaiUtils.extract_trade_date(df)
+
+    @staticmethod
+    def ensure_data_ready(trade_date: Optional[str] = None) -> str:
+        """
+        大查询前的就绪检查：历史交易日直接放行，最新交易日探测一次，未就绪时抛出 DataNotReadyError
+
+        Returns:
+            str: 目标交易日（None 时为默认交易日）
+
+        Raises:
+            DataNotReadyError: 问财尚未切换到目标交易日
+        """
+        if not WencaiUtils.is_latest_trade_date(trade_date):
+            return trade_date
+        trade_date = trade_date or trading_calendar.get_default_trade_date()
+        if trade_date in _ready_dates:
+            return trade_date
+        data_date = WencaiUtils.probe_data_date()
+        if data_date != trade_date:
+            raise DataNotReadyError(trade_date, data_date)
+        _ready_dates.add(trade_date)
+        logger.info(f"问财数据已就绪: {trade_date}")
+        return trade_date
+
+    @staticmethod
+    def wait_until_ready(trade_date: Optional[str] = None, timeout: float = READY_TIMEOUT) -> None:
+        """
+        等待问财切换到目标交易日的数据，探测间隔按 READY_POLL_MULTIPLIER 逐步拉长
+
+        Args:
+            trade_date: 交易日期，默认最新交易日
+            timeout: 最长等待秒数
+
+        Raises:
+            DataNotReadyError: 超时仍未就绪
+        """
+        deadline = time.monotonic() + timeout
+        interval = READY_POLL_INTERVAL
+        while True:
+            try:
+                WencaiUtils.ensure_data_ready(trade_date)
+                return
+            except DataNotReadyError as e:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.error(f"等待{timeout / 60:.0f}分钟后{e}")
+                    raise
+                wait = min(interval, remaining)
+                logger.info(f"{e}，{wait:.0f}秒后再次探测")
+            except Exception as e:
+                # 探测请求本身失败（网络、限流），按同样的间隔重试
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise
+                wait = min(interval, remaining)
+                logger.warning(f"探测问财数据日期失败，{wait:.0f}秒后重试: {e}")
+            time.sleep(wait)
+            interval = min(interval * READY_POLL_MULTIPLIER, READY_POLL_MAX_INTERVAL)
+
     @staticmethod
     def remove_date_suffix(df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -114,7 +251,304 @@ class WencaiUtils:
         return df.rename(columns=column_mapping)
 
     @staticmethod
-    def get_top_stocks(days: int = 5, rank: int = 5, use_filters: str = None) -> pd.DataFrame:
+    def _normalize_top_stocks(raw_df: pd.DataFrame, days: int) -> pd.DataFrame:
+        """规范化区间涨幅排名结果"""
+        df = raw_df.copy()
+        df['交易日期'] = WencaiUtils.extract_trade_date(df)
+        df = WencaiUtils.remove_date_suffix(df)
+        
+        # 重命名列
+        column_mapping = {
+            '区间涨跌幅:前复权': '区间涨幅', 
+            '区间涨跌幅:前复权排名': '区间排名',
+            '自由流通市值': '市值Z'
+        }
+        df.rename(columns=column_mapping, inplace=True)
+
+        df = WencaiUtils.clean_dataframe(df, ['市值Z','区间涨幅','区间排名','market_code', 'code'])
+
+        # 添加区间长度
+        df['区间长度'] = days            
+        # 数据类型转换
+        # 处理排名列（格式：1/4532 -> 1）
+        df['区间排名'] = (df['区间排名']
+                        .astype(str)
+                        .str.split('/')
+                        .str[0]
+                        .astype(int))
+        # 处理数值列
+        if '区间涨幅' in df.columns:
+            df['区间涨幅'] = df['区间涨幅'].astype(float).round(2)
+        
+        # 处理字符串列
+        for col in ['market_code', 'code']:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+                
+        for col in ['市值Z']:
+            if col in df.columns:
+                df[col] = df[col].astype(float).astype(int)
+        
+        # 选择需要的列
+        required_columns = ['交易日期', '股票简称', '区间长度', '区间涨幅', '区间排名','市值Z', 'market_code', 'code']
+        return df[required_columns]
+
+    @staticmethod
+    def _normalize_market_overview(raw_df: pd.DataFrame, trade_date: str = None, is_bj_exchange: bool = False) -> pd.DataFrame:
+        """规范化市场全景数据：列名映射、类型转换和衍生指标"""
+        df = raw_df.copy()
+        extract_trade_date = WencaiUtils.extract_trade_date(df)
+        if trade_date is None:
+            trade_date = trading_calendar.get_default_trade_date()            
+        if trade_date and trade_date != extract_trade_date:
+            raise Exception(f"获取行情数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")
+
+        df = WencaiUtils.remove_date_suffix(df)
+        # 列名映射
+        if is_bj_exchange:
+            df['dde大单净额'] = 0
+        column_mapping = {
+            '开盘价:前复权': '开盘价_前',
+            '收盘价:前复权': '收盘价_前',
+            '最高价:前复权': '最高价_前',
+            '最低价:前复权': '最低价_前',
+            '开盘价:不复权': '开盘价',
+            '收盘价:不复权': '收盘价',
+            '最高价:不复权': '最高价',
+            '最低价:不复权': '最低价',
+            '最新涨跌幅': '涨跌幅',
+            '自由流通市值': '市值Z',
+            '实际换手率': '换手Z',
+            'dde大单净额': '大单净额',
+            '个股热度排名': '热度排名'
+        }
+        df.rename(columns=column_mapping, inplace=True)
+        
+        # 定义数据类型处理列
+        int_columns = ['市值Z', '上市天数', '大单净额', '热度排名', '自由流通股', 
+                      '成交量', '成交额', '竞价量', '竞价金额']
+        float_columns = ['涨跌幅', '竞价涨幅', '换手Z', 
+                       '开盘价', '最高价', '最低价', '收盘价',
+                       '开盘价_前', '最高价_前', '最低价_前', '收盘价_前']
+        str_columns = ['market_code', 'code']
+        
+        # 数据清洗
+        df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
+        
+        # 数据类型转换
+        for col in int_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).astype(int)
+                
+        for col in float_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).round(2)
+                
+        for col in str_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+
+        # 几天几板
+        df['几天几板'] = df['几天几板'].fillna('其他')
+        
+        # 添加交易日期
+        df['交易日期'] = trade_date
+        
+        # 计算衍生指标
+        # 竞价换手率 = 竞价量 / 自由流通股 * 100
+        df['竞换手Z'] = df.apply(
+            lambda x: round(x['竞价量'] / x['自由流通股'] * 100, 3) 
+            if x['自由流通股'] > 0 else -1000, 
+            axis=1
+        )
+        
+        # 实体涨幅 = (收盘价 / 开盘价 - 1) * 100
+        df['实体涨幅'] = df.apply(
+            lambda x: round((x['收盘价'] / x['开盘价'] - 1) * 100, 2) 
+            if x['开盘价'] > 0 else -1000, 
+            axis=1
+        )
+        
+        # 选择输出列
+        output_columns = [
+            '交易日期', '股票简称', '涨跌幅', '实体涨幅', '大单净额', '热度排名',
+            '开盘价', '最高价', '最低价', '收盘价',
+            '成交额', '成交量', '市值Z', '换手Z',
+            '竞价涨幅', '竞价金额', '竞价量', '竞换手Z',
+            '开盘价_前', '最高价_前', '最低价_前', '收盘价_前',
+            '上市板块', '上市天数', '几天几板',
+            'market_code', 'code'
+        ]
+        
+        return df[output_columns]
+
+    @staticmethod
+    def _normalize_zt_stocks(raw_df: pd.DataFrame, trade_date: str = None) -> pd.DataFrame:
+        """规范化涨停股票数据"""
+        df = raw_df.copy()
+        extract_trade_date = WencaiUtils.extract_trade_date(df)
+        if trade_date is None:
+            trade_date = trading_calendar.get_default_trade_date()
+        if trade_date and trade_date != extract_trade_date:
+            raise Exception(f"获取涨停股票数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")
+
+        df = WencaiUtils.remove_date_suffix(df)
+        
+        # 列名映射
+        column_mapping = {
+            '涨跌幅:前复权': '涨跌幅',
+            '自由流通市值': '市值Z',
+            '连续涨停天数': '连板',
+            '涨停开板次数': '开板次数',
+            '涨停封单量占成交量比': '封成量比',
+            '涨停封单量占流通a股比': '封流量比'
+        }
+        df.rename(columns=column_mapping, inplace=True)
+        
+        # 定义数据类型处理列
+        int_columns = ['市值Z', '涨停封单额', '连板', '开板次数']
+        float_columns = ['涨跌幅', '封成量比', '封流量比']
+        str_columns = ['market_code', 'code']
+        
+        # 数据清洗
+        df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
+        
+        # 数据类型转换
+        for col in int_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).astype(int)
+                
+        for col in float_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).round(2)
+                
+        for col in str_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        
+        # 添加交易日期
+        df['交易日期'] = trade_date
+        
+        # 选择输出列
+        return df[ZT_OUTPUT_COLUMNS]
+
+    @staticmethod
+    def _normalize_dt_stocks(raw_df: pd.DataFrame, trade_date: str = None) -> pd.DataFrame:
+        """规范化跌停股票数据"""
+        df = raw_df.copy()
+        extract_trade_date = WencaiUtils.extract_trade_date(df)
+        if trade_date is None:
+            trade_date = trading_calendar.get_default_trade_date()            
+        if trade_date and trade_date != extract_trade_date:
+            raise Exception(f"获取跌停股票数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")
+        df = WencaiUtils.remove_date_suffix(df)
+        
+        # 列名映射
+        column_mapping = {
+            '涨跌幅:前复权': '涨跌幅',
+            '自由流通市值': '市值Z',
+            '连续跌停天数': '连板',
+            '跌停开板次数': '开板次数',
+            '跌停封单量占成交量比': '封成量比',
+            '跌停封单量占流通a股比': '封流量比'
+        }
+        df.rename(columns=column_mapping, inplace=True)
+        
+        # 定义数据类型处理列
+        int_columns = ['市值Z', '跌停封单额', '连板', '开板次数']
+        float_columns = ['涨跌幅', '封成量比', '封流量比']
+        str_columns = ['market_code', 'code']
+        
+        # 数据清洗
+        df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
+        
+        # 数据类型转换
+        for col in int_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).astype(int)
+                
+        for col in float_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).round(2)
+                
+        for col in str_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        
+        # 添加交易日期
+        df['交易日期'] = trade_date
+        
+        # 选择输出列
+        return df[DT_OUTPUT_COLUMNS]
+
+    @staticmethod
+    def _normalize_zb_stocks(raw_df: pd.DataFrame, trade_date: str = None) -> pd.DataFrame:
+        """规范化炸板股票数据"""
+        df = raw_df.copy()
+        extract_trade_date = WencaiUtils.extract_trade_date(df)
+        if trade_date is None:
+            trade_date = trading_calendar.get_default_trade_date()            
+        if trade_date and trade_date != extract_trade_date:
+            raise Exception(f"获取炸板股票数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")    
+        df = WencaiUtils.remove_date_suffix(df)
+        
+        # 列名映射
+        column_mapping = {
+            '涨跌幅:前复权': '涨跌幅',
+            '自由流通市值': '市值Z'
+        }
+        df.rename(columns=column_mapping, inplace=True)
+        
+        # 定义数据类型处理列
+        int_columns = ['市值Z']
+        float_columns = ['涨跌幅']
+        str_columns = ['market_code', 'code']
+        
+        # 数据清洗
+        df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
+        
+        # 数据类型转换
+        for col in int_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).astype(int)
+                
+        for col in float_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(float).round(2)
+                
+        for col in str_columns:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        
+        # 添加交易日期
+        df['交易日期'] = trade_date
+        
+        # 选择输出列
+        return df[ZB_OUTPUT_COLUMNS]
+
+    @staticmethod
+    def _normalize_intraday_overview(raw_df: pd.DataFrame) -> pd.DataFrame:
+        """规范化盘中精简行情数据"""
+        df = WencaiUtils.remove_date_suffix(raw_df)
+        df = df.rename(columns={'最新涨跌幅': '涨跌幅', '个股热度排名': '热度排名'})
+        df = WencaiUtils.clean_dataframe(df, ['热度排名', 'code'])
+        df['热度排名'] = df['热度排名'].astype(float).astype(int)
+        df['涨跌幅'] = pd.to_numeric(df['涨跌幅'], errors='coerce').round(2)
+        df['code'] = df['code'].astype(str)
+        return df[['股票简称', '涨跌幅', '热度排名', 'market_code', 'code']]
+
+    @staticmethod
+    def get_window_text(days: int, trade_date: str = None) -> str:
+        """区间描述：最新交易日使用"最近N个交易日"，历史日期使用明确的起止日期"""
+        if WencaiUtils.is_latest_trade_date(trade_date):
+            return f"最近{days}个交易日的区间涨跌幅"
+        window_dates = trading_calendar.get_recent_trading_days(k=days, end_date=trade_date)
+        if len(window_dates) != days:
+            raise Exception(f"获取{trade_date}前{days}个交易日失败")
+        return f"{window_dates[0]}至{window_dates[-1]}的区间涨跌幅"
+
+    @staticmethod
+    def get_top_stocks(days: int = 5, rank: int = 5, use_filters: str = None, trade_date: str = None) -> pd.DataFrame:
         """
         获取指定天数内涨幅排名前N的股票数据
         
@@ -122,6 +556,7 @@ class WencaiUtils:
             days: 统计天数
             rank: 取前N名
             use_filters: 是否使用筛选条件（非ST、非退市、上市时间>30天、流通市值>100亿）
+            trade_date: 区间截止交易日，默认最新交易日；历史日期用于回填
         
         Returns:
             处理后的股票数据DataFrame
@@ -129,98 +564,142 @@ class WencaiUtils:
         logger.info(f"开始获取{days}日内前{rank}名股票数据, 使用筛选: {use_filters}")
         start_time = time.time()
         
+        window_text = WencaiUtils.get_window_text(days, trade_date)
+        
         # 构建查询语句
         if use_filters == '30':
-            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于30亿,最近{days}个交易日的区间涨跌幅从大到小排序前{rank}"
+            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于30亿,{window_text}从大到小排序前{rank}"
         elif use_filters == '60':
-            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于60亿,最近{days}个交易日的区间涨跌幅从大到小排序前{rank}"
+            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于60亿,{window_text}从大到小排序前{rank}"
         elif use_filters == '100':
-            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于100亿,最近{days}个交易日的区间涨跌幅从大到小排序前{rank}"
+            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于100亿,{window_text}从大到小排序前{rank}"
         elif use_filters == '200':
-            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于200亿,最近{days}个交易日的区间涨跌幅从大到小排序前{rank}"
+            query_text = f"非新股,非ST,股票简称不包含退,上市天数大于30,自由流通市值大于200亿,{window_text}从大到小排序前{rank}"
         else:
-            query_text = f"非新股,上市天数大于5,自由流通市值大于0,最近{days}个交易日的区间涨跌幅从大到小排序前{rank}"
+            query_text = f"非新股,上市天数大于5,自由流通市值大于0,{window_text}从大到小排序前{rank}"
         
         logger.info(f"查询语句: {query_text}")
         
         try:
-            # 调用问财API获取数据
-            raw_df = pywencai.get(query=query_text, query_type='stock')
+            # 调用问财API获取数据，经共享的问财限流器和重试策略
+            raw_df = call_with_retry('wencai', pywencai.get, query=query_text, query_type='stock')
             logger.info(f"原始数据获取成功, 数据量: {len(raw_df)}")
             
-            # 数据处理
-            df = raw_df.copy()
-            df['交易日期'] = WencaiUtils.extract_trade_date(df)
-            df = WencaiUtils.remove_date_suffix(df)
+            result = WencaiUtils._normalize_top_stocks(raw_df, days)
+            return result
             
-            # 重命名列
-            column_mapping = {
-                '区间涨跌幅:前复权': '区间涨幅', 
+        except Exception as e:
+            logger.error(f"获取股票数据失败: {e}")
+            raise
+
+    @staticmethod
+    def get_window_ranking(days: int = 5, depth: int = 1000, trade_date: str = None) -> pd.DataFrame:
+        """
+        获取区间涨幅排名的前 depth 名（只用最宽松的条件：非新股、上市天数>5），
+        供股票池在本地按市值、ST、上市天数等条件筛选；同一区间和深度在一次运行内只查询一次
+
+        Args:
+            days: 统计天数
+            depth: 排名深度
+            trade_date: 区间截止交易日，默认最新交易日；历史日期用于回填
+
+        Returns:
+            按区间涨幅降序的DataFrame，列为 WINDOW_RANKING_COLUMNS，区间排名为全市场排名
+        """
+        window_text = WencaiUtils.get_window_text(days, trade_date)
+        conditions = ("非新股", "上市天数大于5", "自由流通市值大于0", f"{window_text}从大到小排序前{depth}")
+        request = WencaiRequest(f"window_{days}", conditions, WINDOW_RANKING_FIELDS,
+                                as_of=trade_date or trading_calendar.get_default_trade_date())
+        try:
+            df = planner.request(request)
+            if df.empty:
+                return pd.DataFrame(columns=WINDOW_RANKING_COLUMNS)
+            df = df.rename(columns={
+                '区间涨跌幅:前复权': '区间涨幅',
                 '区间涨跌幅:前复权排名': '区间排名',
                 '自由流通市值': '市值Z'
-            }
-            df.rename(columns=column_mapping, inplace=True)
-
-            df = WencaiUtils.clean_dataframe(df, ['市值Z','区间涨幅','区间排名','market_code', 'code'])
-
-            # 添加区间长度
-            df['区间长度'] = days            
-            # 数据类型转换
-            # 处理排名列（格式：1/4532 -> 1）
-            df['区间排名'] = (df['区间排名']
-                            .astype(str)
-                            .str.split('/')
-                            .str[0]
-                            .astype(int))
-            # 处理数值列
-            if '区间涨幅' in df.columns:
-                df['区间涨幅'] = df['区间涨幅'].astype(float).round(2)
-            
-            # 处理字符串列
+            })
+            df = WencaiUtils.clean_dataframe(df, ['市值Z', '区间涨幅', '区间排名', '上市天数', 'market_code', 'code'])
+            df['区间长度'] = days
+            df['区间排名'] = df['区间排名'].astype(str).str.split('/').str[0].astype(int)
+            df['区间涨幅'] = df['区间涨幅'].astype(float).round(2)
+            df['市值Z'] = df['市值Z'].astype(float).astype(int)
+            df['上市天数'] = df['上市天数'].astype(float).astype(int)
             for col in ['market_code', 'code']:
-                if col in df.columns:
-                    df[col] = df[col].astype(str)
-                    
-            for col in ['市值Z']:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).astype(int)
-            
-            # 选择需要的列
-            required_columns = ['交易日期', '股票简称', '区间长度', '区间涨幅', '区间排名','市值Z', 'market_code', 'code']
-            result = df[required_columns]        
-            return result
-            
+                df[col] = df[col].astype(str)
+            df = df.sort_values('区间排名', kind='stable').reset_index(drop=True)
+            logger.info(f"{days}日区间涨幅排名获取完成, 数据量: {len(df)}")
+            return df[WINDOW_RANKING_COLUMNS]
         except Exception as e:
-            logger.error(f"获取股票数据失败: {e}")
+            logger.error(f"获取{days}日区间涨幅排名失败: {e}")
             raise
 
     @staticmethod
-    def get_first_breakout_stocks(k = 11, use_filters: str = None) -> pd.DataFrame:
+    def _fetch_planned(query_text: str, query_type: str) -> pd.DataFrame:
+        """查询规划器的执行函数：分页获取（受 wencai_page 限流），逐页补上交易日期并去掉列名中的日期后缀"""
+        def normalize(raw_df: pd.DataFrame) -> pd.DataFrame:
+            df = raw_df.copy()
+            df['交易日期'] = WencaiUtils.extract_trade_date(df)
+            return WencaiUtils.remove_date_suffix(df)
+
+        df = fetch_normalized(pywencai, query_text, normalize, query_type=query_type)
+        return df if df is not None else pd.DataFrame()
+
+    @staticmethod
+    def first_breakout_requests(k: int = 11, trade_date: str = None) -> dict:
+        """
+        首板查询的两个请求：'all' 为涨幅>9.5%，'zj' 为自由流通市值>100亿且涨幅>7%
+        两者的问财端条件相同（取较宽松的 7%），只发出一条查询
+
+        Args:
+            k: 回看交易日数（含当日）
+            trade_date: 交易日期，默认最新交易日；历史日期用于回填
+        """
+        trade_dates = trading_calendar.get_recent_trading_days(k=k, end_date=trade_date) # 正序
+        if len(trade_dates) != k:
+            raise Exception("获取交易日期失败")
+
+        current_date = trade_dates[-1]
+        start_date = trade_dates[0]
+        end_date = trade_dates[-2]
+        change_text = '最新涨跌幅' if WencaiUtils.is_latest_trade_date(trade_date) else f"{current_date}涨跌幅"
+        conditions = (
+            "自由流通市值大于0",
+            f"{change_text}大于{FIRST_BREAKOUT_ZJ_CHANGE}%",
+            f"{start_date}至{end_date}的涨幅超过{FIRST_BREAKOUT_LIMIT}%的次数等于0",
+        )
+        change = lambda df: pd.to_numeric(df['涨跌幅:前复权'], errors='coerce')
+        market_value = lambda df: pd.to_numeric(df['自由流通市值'], errors='coerce')
+        return {
+            'all': WencaiRequest('first_breakout', conditions, FIRST_BREAKOUT_FIELDS, as_of=current_date,
+                                 select=lambda df: change(df) > FIRST_BREAKOUT_LIMIT),
+            'zj': WencaiRequest('first_breakout_zj', conditions, FIRST_BREAKOUT_FIELDS, as_of=current_date,
+                                select=lambda df: (market_value(df) > FIRST_BREAKOUT_ZJ_MARKET_VALUE)
+                                & (change(df) > FIRST_BREAKOUT_ZJ_CHANGE)),
+        }
+
+    @staticmethod
+    def get_first_breakout_stocks(k = 11, use_filters: str = None, trade_date: str = None) -> pd.DataFrame:
         """
         获取首次突破股票数据
+        
+        Args:
+            k: 回看交易日数（含当日）
+            use_filters: 是否只取自由流通市值大于100亿的股票
+            trade_date: 交易日期，默认最新交易日；历史日期用于回填
+
+        全量和100亿筛选两种结果由同一条合并查询切出，先调用的一种执行查询，另一种复用结果
         """
         try:
             logger.info(f"开始获取首次突破股票数据")
-            trade_dates = trading_calendar.get_recent_trading_days(k=k) # 正序
-            if len(trade_dates) != k:
-                raise Exception("获取交易日期失败")
-
-            current_date = trade_dates[-1]
-            start_date = trade_dates[0]
-            end_date = trade_dates[-2]
-            # print(f"current_date: {current_date}, start_date: {start_date}, end_date: {end_date}")
-            if use_filters == True:
-                query_text = f"自由流通市值大于100亿,最新涨跌幅大于7%,{start_date}至{end_date}的涨幅超过9.5%的次数等于0"
-            else:
-                query_text = f"自由流通市值大于0,最新涨跌幅大于9.5%,{start_date}至{end_date}的涨幅超过9.5%的次数等于0"
-            
-            logger.info(f"查询语句: {query_text}")
-        
-            df = pywencai.get(query=query_text, query_type='stock', loop = True)
-            logger.info(f"原始数据获取成功, 数据量: {len(df)}")
-            df['交易日期'] = WencaiUtils.extract_trade_date(df)
-            df = WencaiUtils.remove_date_suffix(df)
-            df.rename(columns={'涨跌幅:前复权': '涨跌幅', '自由流通市值': '市值Z'}, inplace=True)
+            requests = WencaiUtils.first_breakout_requests(k, trade_date)
+            request = requests['zj' if use_filters == True else 'all']
+            WencaiUtils.ensure_data_ready(trade_date)
+            df = planner.request(request)
+            output_columns = ['交易日期','股票简称','涨跌幅','市值Z','market_code','code']
+            if df.empty:
+                return pd.DataFrame(columns=output_columns)
+            df = df.rename(columns={'涨跌幅:前复权': '涨跌幅', '自由流通市值': '市值Z'})
             for col in ['涨跌幅']:
                 if col in df.columns:
                     df[col] = df[col].astype(float).round(2)
@@ -230,7 +709,6 @@ class WencaiUtils:
             for col in ['市值Z']:
                 if col in df.columns:
                     df[col] = df[col].astype(float).astype(int)
-            output_columns = ['交易日期','股票简称','涨跌幅','市值Z','market_code','code']
             df = df[output_columns]
             df = df.sort_values('市值Z', ascending=False)
             return df
@@ -263,99 +741,26 @@ class WencaiUtils:
             logger.info("开始获取A股市场全景数据(非北交所)")
             query_text = 'A股,非北交所,上市板块,上市天数,开盘价,最高价,最低价,收盘价,前复权:开盘价,前复权:最高价,前复权:最低价,前复权:收盘价,成交额,成交量,竞价涨幅,竞价金额,竞价量,dde大单净额,实际换手率,自由流通市值,自由流通股,个股热度排名,几天几板'
         
+        # 历史日期在查询语句前加上日期描述
+        if not WencaiUtils.is_latest_trade_date(trade_date):
+            query_text = f"{WencaiUtils.get_day_text(trade_date)},{query_text}"
+        
         logger.info(f"查询语句: {query_text}")
         
         try:
+            # 就绪检查同时确定交易日期，逐页规范化时不再重复查询
+            trade_date = WencaiUtils.ensure_data_ready(trade_date)
             # 调用问财API获取数据
-            raw_df = pywencai.get(query=query_text, query_type='stock', loop = loop)
-            logger.info(f"原始数据获取成功, 数据量: {len(raw_df)}")
-            
-            # 数据处理
-            df = raw_df.copy()
-            extract_trade_date = WencaiUtils.extract_trade_date(df)
-            if trade_date is None:
-                trade_date = trading_calendar.get_default_trade_date()            
-            if trade_date and trade_date != extract_trade_date:
-                raise Exception(f"获取行情数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")
-
-            df = WencaiUtils.remove_date_suffix(df)
-            # 列名映射
-            if is_bj_exchange:
-                df['dde大单净额'] = 0
-            column_mapping = {
-                '开盘价:前复权': '开盘价_前',
-                '收盘价:前复权': '收盘价_前',
-                '最高价:前复权': '最高价_前',
-                '最低价:前复权': '最低价_前',
-                '开盘价:不复权': '开盘价',
-                '收盘价:不复权': '收盘价',
-                '最高价:不复权': '最高价',
-                '最低价:不复权': '最低价',
-                '最新涨跌幅': '涨跌幅',
-                '自由流通市值': '市值Z',
-                '实际换手率': '换手Z',
-                'dde大单净额': '大单净额',
-                '个股热度排名': '热度排名'
-            }
-            df.rename(columns=column_mapping, inplace=True)
-            
-            # 定义数据类型处理列
-            int_columns = ['市值Z', '上市天数', '大单净额', '热度排名', '自由流通股', 
-                          '成交量', '成交额', '竞价量', '竞价金额']
-            float_columns = ['涨跌幅', '竞价涨幅', '换手Z', 
-                           '开盘价', '最高价', '最低价', '收盘价',
-                           '开盘价_前', '最高价_前', '最低价_前', '收盘价_前']
-            str_columns = ['market_code', 'code']
-            
-            # 数据清洗
-            df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
-            
-            # 数据类型转换
-            for col in int_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).astype(int)
-                    
-            for col in float_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).round(2)
-                    
-            for col in str_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(str)
-
-            # 几天几板
-            df['几天几板'] = df['几天几板'].fillna('其他')
-            
-            # 添加交易日期
-            df['交易日期'] = trade_date
-            
-            # 计算衍生指标
-            # 竞价换手率 = 竞价量 / 自由流通股 * 100
-            df['竞换手Z'] = df.apply(
-                lambda x: round(x['竞价量'] / x['自由流通股'] * 100, 3) 
-                if x['自由流通股'] > 0 else -1000, 
-                axis=1
-            )
-            
-            # 实体涨幅 = (收盘价 / 开盘价 - 1) * 100
-            df['实体涨幅'] = df.apply(
-                lambda x: round((x['收盘价'] / x['开盘价'] - 1) * 100, 2) 
-                if x['开盘价'] > 0 else -1000, 
-                axis=1
-            )
-            
-            # 选择输出列
-            output_columns = [
-                '交易日期', '股票简称', '涨跌幅', '实体涨幅', '大单净额', '热度排名',
-                '开盘价', '最高价', '最低价', '收盘价',
-                '成交额', '成交量', '市值Z', '换手Z',
-                '竞价涨幅', '竞价金额', '竞价量', '竞换手Z',
-                '开盘价_前', '最高价_前', '最低价_前', '收盘价_前',
-                '上市板块', '上市天数', '几天几板',
-                'market_code', 'code'
-            ]
-            
-            result = df[output_columns]
+            normalize = lambda raw: WencaiUtils._normalize_market_overview(raw, trade_date, is_bj_exchange)
+            if loop:
+                # 分页流式获取，逐页规范化
+                result = fetch_normalized(pywencai, query_text, normalize)
+                if result is None:
+                    raise Exception("未获取到市场全景数据")
+            else:
+                raw_df = pywencai.get(query=query_text, query_type='stock', loop=False)
+                logger.info(f"原始数据获取成功, 数据量: {len(raw_df)}")
+                result = normalize(raw_df)
             elapsed_time = time.time() - start_time
             logger.info(f"市场全景数据获取完成, 最终数据量: {len(result)}, 耗时: {elapsed_time:.2f}秒")
             
@@ -365,6 +770,24 @@ class WencaiUtils:
             logger.error(f"获取市场全景数据失败: {e}")
             raise
 
+    @staticmethod
+    def get_intraday_overview(top_n: int = 200) -> pd.DataFrame:
+        """
+        获取盘中精简行情：只查询热度排名前 top_n 的股票的涨跌幅和热度排名，供盘中轮询使用
+
+        Returns:
+            包含 股票简称、涨跌幅、热度排名、market_code、code 的DataFrame
+        """
+        query_text = f"A股,个股热度排名前{top_n},最新涨跌幅"
+        logger.info(f"查询语句: {query_text}")
+
+        try:
+            raw_df = pywencai.get(query=query_text, query_type='stock', loop=True)
+            return WencaiUtils._normalize_intraday_overview(raw_df)
+        except Exception as e:
+            logger.error(f"获取盘中行情数据失败: {e}")
+            raise
+
     @staticmethod
     def get_zt_stocks(trade_date: str = None) -> pd.DataFrame:
         """
@@ -386,68 +809,19 @@ class WencaiUtils:
         logger.info("开始获取今日涨停股票数据")
         start_time = time.time()
         
-        query_text = "今日涨停,涨跌幅,连续涨停次数,几天几板,涨停时间,涨停类型,涨停原因类别,封单金额,自由流通市值,上市板块"
+        query_text = f"{WencaiUtils.get_day_text(trade_date)}涨停,涨跌幅,连续涨停次数,几天几板,涨停时间,涨停类型,涨停原因类别,封单金额,自由流通市值,上市板块"
         
         logger.info(f"查询语句: {query_text}")
         
         try:
+            # 就绪检查同时确定交易日期，逐页规范化时不再重复查询
+            trade_date = WencaiUtils.ensure_data_ready(trade_date)
             # 调用问财API获取数据
-            raw_df = pywencai.get(query=query_text, query_type='stock', loop=True)
-            logger.info(f"原始数据获取成功, 数据量: {len(raw_df)}")
-            
-            # 数据处理
-            df = raw_df.copy()
-            extract_trade_date = WencaiUtils.extract_trade_date(df)
-            if trade_date is None:
-                trade_date = trading_calendar.get_default_trade_date()
-            if trade_date and trade_date != extract_trade_date:
-                raise Exception(f"获取涨停股票数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")
-
-            df = WencaiUtils.remove_date_suffix(df)
-            
-            # 列名映射
-            column_mapping = {
-                '涨跌幅:前复权': '涨跌幅',
-                '自由流通市值': '市值Z',
-                '连续涨停天数': '连板',
-                '涨停开板次数': '开板次数',
-                '涨停封单量占成交量比': '封成量比',
-                '涨停封单量占流通a股比': '封流量比'
-            }
-            df.rename(columns=column_mapping, inplace=True)
-            
-            # 定义数据类型处理列
-            int_columns = ['市值Z', '涨停封单额', '连板', '开板次数']
-            float_columns = ['涨跌幅', '封成量比', '封流量比']
-            str_columns = ['market_code', 'code']
-            
-            # 数据清洗
-            df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
-            
-            # 数据类型转换
-            for col in int_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).astype(int)
-                    
-            for col in float_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).round(2)
-                    
-            for col in str_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(str)
-            
-            # 添加交易日期
-            df['交易日期'] = trade_date
-            
-            # 选择输出列
-            output_columns = [
-                '交易日期', '股票简称', '上市板块', '市值Z', '涨跌幅', '连板', '几天几板',
-                '首次涨停时间', '涨停类型', '涨停原因类别', '涨停封单额', '最终涨停时间',
-                '开板次数', '封成量比', '封流量比', 'market_code', 'code'
-            ]
-            
-            result = df[output_columns]
+            result = fetch_normalized(pywencai, query_text,
+                                      lambda raw: WencaiUtils._normalize_zt_stocks(raw, trade_date))
+            if result is None:
+                logger.info("无涨停股票")
+                return pd.DataFrame(columns=ZT_OUTPUT_COLUMNS)
             elapsed_time = time.time() - start_time
             logger.info(f"涨停股票数据获取完成, 最终数据量: {len(result)}, 耗时: {elapsed_time:.2f}秒")
             
@@ -475,67 +849,19 @@ class WencaiUtils:
         logger.info("开始获取今日跌停股票数据")
         start_time = time.time()
         
-        query_text = "今日跌停,涨跌幅,连续跌停天数,跌停类型,跌停原因类型,跌停封单额,自由流通市值,上市板块,跌停时间"
+        query_text = f"{WencaiUtils.get_day_text(trade_date)}跌停,涨跌幅,连续跌停天数,跌停类型,跌停原因类型,跌停封单额,自由流通市值,上市板块,跌停时间"
         
         logger.info(f"查询语句: {query_text}")
         
         try:
+            # 就绪检查同时确定交易日期，逐页规范化时不再重复查询
+            trade_date = WencaiUtils.ensure_data_ready(trade_date)
             # 调用问财API获取数据
-            raw_df = pywencai.get(query=query_text, query_type='stock', loop=True)
-            logger.info(f"原始数据获取成功, 数据量: {len(raw_df)}")
-            
-            # 数据处理
-            df = raw_df.copy()
-            extract_trade_date = WencaiUtils.extract_trade_date(df)
-            if trade_date is None:
-                trade_date = trading_calendar.get_default_trade_date()            
-            if trade_date and trade_date != extract_trade_date:
-                raise Exception(f"获取跌停股票数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")
-            df = WencaiUtils.remove_date_suffix(df)
-            
-            # 列名映射
-            column_mapping = {
-                '涨跌幅:前复权': '涨跌幅',
-                '自由流通市值': '市值Z',
-                '连续跌停天数': '连板',
-                '跌停开板次数': '开板次数',
-                '跌停封单量占成交量比': '封成量比',
-                '跌停封单量占流通a股比': '封流量比'
-            }
-            df.rename(columns=column_mapping, inplace=True)
-            
-            # 定义数据类型处理列
-            int_columns = ['市值Z', '跌停封单额', '连板', '开板次数']
-            float_columns = ['涨跌幅', '封成量比', '封流量比']
-            str_columns = ['market_code', 'code']
-            
-            # 数据清洗
-            df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
-            
-            # 数据类型转换
-            for col in int_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).astype(int)
-                    
-            for col in float_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).round(2)
-                    
-            for col in str_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(str)
-            
-            # 添加交易日期
-            df['交易日期'] = trade_date
-            
-            # 选择输出列
-            output_columns = [
-                '交易日期', '股票简称', '上市板块', '市值Z', '涨跌幅', '连板',
-                '首次跌停时间', '跌停类型', '跌停原因类型', '跌停封单额', '最终跌停时间',
-                '开板次数', '封成量比', '封流量比', 'market_code', 'code'
-            ]
-            
-            result = df[output_columns]
+            result = fetch_normalized(pywencai, query_text,
+                                      lambda raw: WencaiUtils._normalize_dt_stocks(raw, trade_date))
+            if result is None:
+                logger.info("无跌停股票")
+                return pd.DataFrame(columns=DT_OUTPUT_COLUMNS)
             elapsed_time = time.time() - start_time
             logger.info(f"跌停股票数据获取完成, 最终数据量: {len(result)}, 耗时: {elapsed_time:.2f}秒")
             
@@ -560,61 +886,18 @@ class WencaiUtils:
         logger.info("开始获取今日炸板股票数据")
         start_time = time.time()
         
-        query_text = '上市板块,今日曾涨停,自由流通市值,涨跌幅'
+        query_text = f"上市板块,{WencaiUtils.get_day_text(trade_date)}曾涨停,自由流通市值,涨跌幅"
         logger.info(f"查询语句: {query_text}")
         
         try:
+            # 就绪检查同时确定交易日期，逐页规范化时不再重复查询
+            trade_date = WencaiUtils.ensure_data_ready(trade_date)
             # 调用问财API获取数据
-            raw_df = pywencai.get(query=query_text, query_type='stock', loop=True)
-            logger.info(f"原始数据获取成功, 数据量: {len(raw_df)}")
-            
-            # 数据处理
-            df = raw_df.copy()
-            extract_trade_date = WencaiUtils.extract_trade_date(df)
-            if trade_date is None:
-                trade_date = trading_calendar.get_default_trade_date()            
-            if trade_date and trade_date != extract_trade_date:
-                raise Exception(f"获取炸板股票数据失败, 交易日期不一致: 当前交易日期{trade_date} != 提取的交易日期{extract_trade_date}")    
-            df = WencaiUtils.remove_date_suffix(df)
-            
-            # 列名映射
-            column_mapping = {
-                '涨跌幅:前复权': '涨跌幅',
-                '自由流通市值': '市值Z'
-            }
-            df.rename(columns=column_mapping, inplace=True)
-            
-            # 定义数据类型处理列
-            int_columns = ['市值Z']
-            float_columns = ['涨跌幅']
-            str_columns = ['market_code', 'code']
-            
-            # 数据清洗
-            df = WencaiUtils.clean_dataframe(df, int_columns + float_columns + str_columns)
-            
-            # 数据类型转换
-            for col in int_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).astype(int)
-                    
-            for col in float_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(float).round(2)
-                    
-            for col in str_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(str)
-            
-            # 添加交易日期
-            df['交易日期'] = trade_date
-            
-            # 选择输出列
-            output_columns = [
-                '交易日期', '股票简称', '涨跌幅', '市值Z', '上市板块', 
-                'market_code', 'code'
-            ]
-            
-            result = df[output_columns]
+            result = fetch_normalized(pywencai, query_text,
+                                      lambda raw: WencaiUtils._normalize_zb_stocks(raw, trade_date))
+            if result is None:
+                logger.info("无炸板股票")
+                return pd.DataFrame(columns=ZB_OUTPUT_COLUMNS)
             elapsed_time = time.time() - start_time
             logger.info(f"炸板股票数据获取完成, 最终数据量: {len(result)}, 耗时: {elapsed_time:.2f}秒")
             
@@ -656,7 +939,7 @@ class WencaiUtils:
             
             if os.path.exists(latest_file):
                 # 读取现有数据
-                existing_df = pd.read_csv(latest_file, dtype={'交易日期': str})
+                existing_df = pd.read_csv(latest_file, dtype={'code': str, 'market_code': str, '交易日期': str})
                 
                 # 获取新数据中的日期
                 new_dates = set(new_data['交易日期'].unique())
@@ -668,8 +951,8 @@ class WencaiUtils:
                 # 合并数据
                 combined_df = pd.concat([existing_df, new_data], ignore_index=True)
                 
-                # 对每只股票只保留最新日期的记录
-                latest_df = combined_df.sort_values('交易日期', ascending=False).groupby('股票简称').first().reset_index()
+                # 对每只股票只保留最新日期的记录（按证券编号，改名前后视为同一只股票）
+                latest_df = latest_per_security(combined_df)
             else:
                 latest_df = new_data
             
@@ -685,28 +968,35 @@ class WencaiUtils:
             raise
 
     @staticmethod
-    def update_daily_zt_data(data_dir: str = None) -> None:
-        """保存每日涨停数据的主入口函数"""
+    def update_daily_zt_data(data_dir: str = None, trade_date: str = None, update_latest: bool = True) -> None:
+        """
+        保存每日涨停数据的主入口函数
+        
+        Args:
+            data_dir: 数据目录
+            trade_date: 交易日期，默认最新交易日
+            update_latest: 是否同时更新最新涨停汇总文件；并行回填时关闭，由回填流程按日期顺序更新
+        """
         try:
             # 设置默认数据目录
             if data_dir is None:
                 data_dir = DEFAULT_DATA_DIR
             
             # 获取当前交易日期
-            trading_date = trading_calendar.get_default_trade_date()
+            trading_date = trade_date or trading_calendar.get_default_trade_date()
             
             # 检查文件是否已存在且在16点后生成
             ths_dir = os.path.join(data_dir, "ths")
             file_path = os.path.join(ths_dir, f"ths_zt_{trading_date}.csv")
             
-            if check_file_exists_after_time(file_path, cutoff_hour=16):
+            if check_output_complete(file_path, trading_date, cutoff_hour=16):
                 logger.info(f"涨停数据文件已存在且在16点后生成，跳过更新: {file_path}")
                 return
             elif os.path.exists(file_path):
                 logger.info(f"涨停数据文件存在但在16点前生成，将重新更新: {file_path}")
             
             # 获取涨停数据
-            df = execute_with_retry(WencaiUtils.get_zt_stocks, trade_date=trading_date)
+            df = call_with_retry('wencai', WencaiUtils.get_zt_stocks, trade_date=trading_date)
             if df.empty:
                 logger.error("无涨停数据，跳过保存")
                 raise Exception("无涨停数据，跳过保存")
@@ -717,41 +1007,78 @@ class WencaiUtils:
             WencaiUtils._update_zt_stocks_data(df, trading_date = trading_date, data_dir = data_dir)
 
             # 2. 更新最新同花顺涨停股票数据文件
-            WencaiUtils._update_latest_zt_data(trading_date = trading_date, new_data = df, data_dir = data_dir)
+            if update_latest:
+                WencaiUtils._update_latest_zt_data(trading_date = trading_date, new_data = df, data_dir = data_dir)
             
             logger.info(f"完成{trading_date}同花顺涨停数据保存")
 
         except Exception as e:
             logger.error(f"保存每日同花顺涨停数据失败: {e}")
             raise
+    @staticmethod
+    def update_latest_zt_data(trade_date: str, data_dir: str = None) -> None:
+        """用已保存的当日涨停文件更新最新涨停汇总文件（回填时按日期顺序调用）"""
+        data_dir = data_dir or DEFAULT_DATA_DIR
+        df = pd.read_csv(os.path.join(data_dir, "ths", f"ths_zt_{trade_date}.csv"),
+                         dtype={'code': str, 'market_code': str, '交易日期': str})
+        WencaiUtils._update_latest_zt_data(trading_date = trade_date, new_data = df, data_dir = data_dir)
+
+    @staticmethod
+    def update_daily_dt_zb_data(data_dir: str = None, trade_date: str = None) -> None:
+        """
+        保存每日跌停和炸板数据到 ths_dt_YYYYMMDD.csv、ths_zb_YYYYMMDD.csv
+
+        Args:
+            data_dir: 数据目录
+            trade_date: 交易日期，默认最新交易日
+        """
+        data_dir = data_dir or DEFAULT_DATA_DIR
+        trading_date = trade_date or trading_calendar.get_default_trade_date()
+        ths_dir = os.path.join(data_dir, "ths")
+        os.makedirs(ths_dir, exist_ok=True)
+
+        for kind, name, getter in (('dt', '跌停', WencaiUtils.get_dt_stocks),
+                                   ('zb', '炸板', WencaiUtils.get_zb_stocks)):
+            file_path = os.path.join(ths_dir, f"ths_{kind}_{trading_date}.csv")
+            if check_output_complete(file_path, trading_date, cutoff_hour=16):
+                logger.info(f"{name}数据文件已存在且在16点后生成，跳过更新: {file_path}")
+                continue
+            try:
+                df = call_with_retry('wencai', getter, trade_date=trading_date)
+                df.to_csv(file_path, index=False, encoding='utf-8-sig')
+                logger.info(f"保存{trading_date}{name}数据到: {file_path}，共{len(df)}条记录")
+            except Exception as e:
+                logger.error(f"保存每日{name}数据失败: {e}")
+                raise
+
     # 每日更新行情数据到文件
     @staticmethod
-    def update_daily_market_overview_data(data_dir: str = None) -> None:
-        """保存每日行情数据的主入口函数"""
+    def update_daily_market_overview_data(data_dir: str = None, trade_date: str = None) -> None:
+        """保存每日行情数据的主入口函数，trade_date 默认最新交易日"""
         try:
             # 设置默认数据目录
             if data_dir is None:
                 data_dir = DEFAULT_DATA_DIR
             
             # 获取当前交易日期
-            trading_date = trading_calendar.get_default_trade_date()
+            trading_date = trade_date or trading_calendar.get_default_trade_date()
             
             # 检查文件是否已存在且在16点后生成
             ths_dir = os.path.join(data_dir, "ths")
             file_path = os.path.join(ths_dir, f"ths_market_overview_{trading_date}.csv")
             
-            if check_file_exists_after_time(file_path, cutoff_hour=16):
+            if check_output_complete(file_path, trading_date, cutoff_hour=16):
                 logger.info(f"行情数据文件已存在且在16点后生成，跳过更新: {file_path}")
                 return
             elif os.path.exists(file_path):
                 logger.info(f"行情数据文件存在但在16点前生成，将重新更新: {file_path}")
             
             # 获取行情数据（非北交所）
-            df = execute_with_retry(WencaiUtils.get_market_overview_data, trade_date=trading_date, loop=True)
+            df = call_with_retry('wencai', WencaiUtils.get_market_overview_data, trade_date=trading_date, loop=True)
             if df.empty:
                 logger.error("无行情数据（非北交所），跳过保存")
                 raise Exception("无行情数据（非北交所），跳过保存")
-            df_bj = execute_with_retry(WencaiUtils.get_market_overview_data, trade_date=trading_date, loop=True, is_bj_exchange=True)
+            df_bj = call_with_retry('wencai', WencaiUtils.get_market_overview_data, trade_date=trading_date, loop=True, is_bj_exchange=True)
             if df_bj.empty:
                 logger.error("无行情数据（北交所），跳过保存")
                 raise Exception("无行情数据（北交所），跳过保存")
@@ -801,9 +1128,27 @@ class WencaiUtils:
         return pd.read_csv(os.path.join(DEFAULT_DATA_DIR, "ths", f"ths_zt_{date_str}.csv"), dtype={'code': str, 'market_code': str, '交易日期': str})
     # 读取最新涨停数据
     @staticmethod
-    def read_latest_zt_stocks() -> pd.DataFrame:
-        """读取最新涨停数据"""
-        return pd.read_csv(os.path.join(DEFAULT_DATA_DIR, "ths", "ths_zt.csv"), dtype={'code': str, 'market_code': str, '交易日期': str})
+    def read_latest_zt_stocks(as_of: str = None) -> pd.DataFrame:
+        """
+        读取最新涨停数据（每只股票最近一次涨停记录）
+        
+        Args:
+            as_of: 截止交易日期；汇总文件比该日期新时，用不晚于该日期的每日涨停文件重建，用于回填历史数据
+        """
+        dtype = {'code': str, 'market_code': str, '交易日期': str}
+        latest_df = pd.read_csv(os.path.join(DEFAULT_DATA_DIR, "ths", "ths_zt.csv"), dtype=dtype)
+        if as_of is None or latest_df['交易日期'].max() <= as_of:
+            return latest_df
+        
+        ths_dir = os.path.join(DEFAULT_DATA_DIR, "ths")
+        daily_files = [f for f in os.listdir(ths_dir)
+                       if re.fullmatch(r'ths_zt_\d{8}\.csv', f) and f[7:15] <= as_of]
+        if not daily_files:
+            logger.warning(f"{as_of}及之前没有每日涨停文件, 返回空数据")
+            return latest_df.iloc[0:0]
+        daily_df = pd.concat([pd.read_csv(os.path.join(ths_dir, f), dtype=dtype) for f in daily_files],
+                             ignore_index=True)
+        return latest_per_security(daily_df)
     
     @staticmethod
     def get_us_top_stocks(days: int = 5, rank: int = 50) -> pd.DataFrame:
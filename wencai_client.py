@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+问财分页流式获取
+pywencai.get(loop=True) 会逐页顺序获取再拼成一个大表；这里拿到总行数后并发获取各页
+（并发数为 wencai_page 限流器的突发数，速率受该限流器约束），按页序交给调用方，
+每页规范化后写入预分配的列式缓冲区，首页即可校验交易日期并提前终止，
+最后检查代码是否重复或缺失；开启对冲（HEDGE_UPSTREAMS 含 wencai_page）时慢页会再请求一次
+
+用法:
+    from wencai_client import fetch_normalized
+    df = fetch_normalized(pywencai, query_text, lambda raw: normalize(raw, trade_date))
+"""
+
+import math
+import importlib
+import numpy as np
+import pandas as pd
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import get_limiter
+from hedging import hedged_call
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERPAGE = 100
+PAGE_LIMITER = 'wencai_page'
+MIN_BUFFER_CAPACITY = 256  # 总行数未知时缓冲区的初始容量，不够时翻倍
+
+
+def _open_shim(backend, query: str, query_type: str, perpage: int) -> tuple:
+    """替身后端：get_page 直接返回 (当页数据, 总行数)"""
+    first_page, row_count = backend.get_page(query, 1, perpage, query_type)
+
+    def fetch(page: int) -> pd.DataFrame:
+        return first_page if page == 1 else backend.get_page(query, page, perpage, query_type)[0]
+
+    return row_count, fetch
+
+
+def _open_pywencai(backend, query: str, query_type: str, perpage: int) -> tuple:
+    """
+    pywencai：先解析一次查询拿到分页参数和总行数，再逐页请求数据接口
+    （与 pywencai.get(loop=True) 内部的流程相同，只是不在内部拼接）
+    """
+    module = importlib.import_module(f"{backend.__name__}.wencai")
+    kwargs = {'query': query, 'query_type': query_type}
+    params = module.get_robot_data(**kwargs) or {}
+    data = params.get('data') or {}
+    if not isinstance(data, dict) or data.get('condition') is None:
+        return 0, None
+    url_params = params.get('url_params')
+    page_kwargs = {**kwargs, **data}
+
+    def fetch(page: int) -> pd.DataFrame:
+        # get_page 会修改传入的参数，每次传入新的字典
+        return module.get_page(url_params, **{**page_kwargs, 'page': page, 'perpage': perpage})
+
+    return int(params.get('row_count') or 0), fetch
+
+
+class PagedQuery:
+    """
+    分页查询，迭代时按页序返回原始 DataFrame，后续页在后台并发获取
+
+    - row_count: 总行数，第一次请求后可用
+    - concurrency: 同时获取的页数，默认取 wencai_page 限流器的突发数；为 1 时只预取下一页
+    """
+
+    def __init__(self, backend, query: str, query_type: str = 'stock', perpage: int = DEFAULT_PERPAGE,
+                 concurrency: int = None):
+        self.backend = backend
+        self.query = query
+        self.query_type = query_type
+        self.perpage = perpage
+        self.concurrency = max(1, concurrency or get_limiter(PAGE_LIMITER).burst)
+        self.row_count = None
+
+    def _open(self) -> tuple:
+        """返回 (总行数, 页数, 取第 page 页的函数)"""
+        if hasattr(self.backend, 'get_page'):
+            row_count, fetch = _open_shim(self.backend, self.query, self.query_type, self.perpage)
+        else:
+            try:
+                row_count, fetch = _open_pywencai(self.backend, self.query, self.query_type, self.perpage)
+            except (ImportError, AttributeError) as e:
+                # pywencai 内部接口变化时退化为一次取完
+                logger.warning(f"问财分页接口不可用，退化为一次获取全部数据: {e}")
+                df = self.backend.get(query=self.query, query_type=self.query_type, loop=True)
+                row_count = 0 if df is None else len(df)
+                return row_count, 1, lambda page: df
+        return row_count, math.ceil(row_count / self.perpage), fetch
+
+    def __iter__(self):
+        self.row_count, page_count, fetch = self._open()
+        if not self.row_count or fetch is None:
+            return
+        limiter = get_limiter(PAGE_LIMITER)
+
+        def fetch_page(page: int) -> pd.DataFrame:
+            limiter.acquire()
+            return hedged_call(PAGE_LIMITER, fetch, page)
+
+        workers = min(self.concurrency, page_count)
+        # 在途页数上限：保证下载不停顿，同时限制已下载未处理的原始页数
+        ahead = workers * 2 if workers > 1 else 2
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = {}
+        next_page = 1
+        try:
+            for page in range(1, page_count + 1):
+                while next_page <= page_count and next_page < page + ahead:
+                    futures[next_page] = executor.submit(fetch_page, next_page)
+                    next_page += 1
+                df = futures.pop(page).result()
+                if df is None or len(df) == 0:
+                    break
+                yield df
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ColumnBuffer:
+    """
+    预分配的列式缓冲区：按第一页的列和类型分配 capacity 行的数组，逐页写入，容量不够时翻倍
+    """
+
+    def __init__(self, capacity: int = MIN_BUFFER_CAPACITY):
+        self.capacity = max(1, int(capacity))
+        self.size = 0
+        self.columns = None
+        self.dtypes = {}
+        self.arrays = {}
+
+    @staticmethod
+    def _dtype(series: pd.Series):
+        return series.dtype if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM' else object
+
+    def _grow(self, needed: int) -> None:
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for col, array in self.arrays.items():
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[col] = grown
+        self.capacity = capacity
+
+    def append(self, df: pd.DataFrame) -> None:
+        """写入一页已规范化的数据，列与第一页不一致时按第一页的列对齐"""
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.dtypes = df.dtypes.to_dict()
+            self.arrays = {col: np.empty(self.capacity, dtype=self._dtype(df[col])) for col in self.columns}
+        n = len(df)
+        if self.size + n > self.capacity:
+            self._grow(self.size + n)
+        for col in self.columns:
+            values = df[col].to_numpy() if col in df.columns else np.full(n, None)
+            self.arrays[col][self.size:self.size + n] = values
+        self.size += n
+
+    def to_frame(self) -> pd.DataFrame:
+        if self.columns is None:
+            return pd.DataFrame()
+        df = pd.DataFrame({col: self.arrays[col][:self.size] for col in self.columns}, columns=self.columns)
+        # 字符串等扩展类型在缓冲区中按 object 保存，输出时还原
+        extension = {col: dtype for col, dtype in self.dtypes.items() if not isinstance(dtype, np.dtype)}
+        return df.astype(extension) if extension else df
+
+
+def fetch_normalized(backend, query: str, normalize, query_type: str = 'stock',
+                     perpage: int = DEFAULT_PERPAGE, concurrency: int = None):
+    """
+    分页获取并逐页规范化
+
+    Args:
+        backend: pywencai 模块或替身模块
+        query: 查询语句
+        normalize: 单页原始数据 -> 规范化后的 DataFrame，交易日期不一致时应抛出异常（首页即终止）
+        query_type: 查询类型
+        perpage: 每页行数
+        concurrency: 同时获取的页数，默认取 wencai_page 限流器的突发数
+
+    Returns:
+        pd.DataFrame: 规范化后的全部数据；查询没有结果时返回 None
+
+    Raises:
+        Exception: 获取到的不重复代码少于总行数（分页缺失）
+    """
+    paged = PagedQuery(backend, query, query_type, perpage, concurrency)
+    buffer = None
+    pages = 0
+    raw_rows = 0
+    codes = []
+    for raw in paged:
+        raw_rows += len(raw)
+        if 'code' in raw.columns:
+            codes.append(raw['code'].astype(str).to_numpy())
+        page_df = normalize(raw)
+        if buffer is None:
+            buffer = ColumnBuffer(paged.row_count or MIN_BUFFER_CAPACITY)
+        buffer.append(page_df)
+        pages += 1
+    if buffer is None:
+        return None
+
+    result = buffer.to_frame()
+    unique_count = raw_rows
+    if codes:
+        all_codes = np.concatenate(codes)
+        unique_count = len(np.unique(all_codes))
+        if unique_count < len(all_codes):
+            # 分页期间结果集变化会导致相邻页重复
+            logger.warning(f"分页数据有{len(all_codes) - unique_count}条重复代码，已去重: {query}")
+            if 'code' in result.columns:
+                result = result.drop_duplicates(subset=['code'], keep='first').reset_index(drop=True)
+    if unique_count < paged.row_count:
+        raise Exception(f"分页数据缺失: 总行数{paged.row_count}, 实际获取{unique_count}条不重复数据")
+    logger.info(f"分页获取完成, 总行数: {paged.row_count}, 页数: {pages}, 规范化后: {len(result)}")
+    return result
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+问财查询规划
+各环节声明需要的股票集合（问财端条件）、返回字段和本地筛选，规划器把条件相同的请求合并为一条查询，
+返回字段取并集，执行一次后按各请求的本地筛选切出结果；同一运行内后续请求的字段被已执行的查询覆盖时直接复用结果
+
+用法:
+    from wencai_planner import WencaiRequest, QueryPlanner
+    planner = QueryPlanner(fetch)  # fetch(query_text, query_type) -> 已去掉日期后缀的 DataFrame
+    planner.add(WencaiRequest('all', conditions, fields, select=lambda df: df['涨跌幅'] > 9.5))
+    planner.add(WencaiRequest('zj', conditions, fields, select=lambda df: df['自由流通市值'] > 1e10))
+    results = planner.execute()  # {'all': DataFrame, 'zj': DataFrame}，只发出一条查询
+
+只有“决定股票集合”的条件需要在问财端执行；阈值可以在本地判断的条件（市值、涨跌幅、上市天数等）
+应放宽到各请求中最宽松的一档写入 conditions，再由 select 在本地收紧
+"""
+
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import pandas as pd
+
+# 使用标准的logger命名方式，会自动继承主脚本的日志配置
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WencaiRequest:
+    """
+    一个环节对问财数据的需求
+
+    - consumer: 请求方名称，执行结果按此返回
+    - conditions: 问财端条件，决定返回的股票集合，相同条件（及 query_type、as_of）的请求合并为一条查询
+    - fields: 需要返回的字段（问财语句中的指标名）
+    - select: 本地筛选，输入合并查询的结果，返回布尔掩码；为 None 时返回全部
+    - as_of: 结果对应的交易日期，不同日期的结果不会互相复用
+    """
+    consumer: str
+    conditions: tuple
+    fields: tuple = ()
+    select: Optional[Callable[[pd.DataFrame], pd.Series]] = field(default=None, compare=False)
+    query_type: str = 'stock'
+    as_of: Optional[str] = None
+
+    @property
+    def group_key(self) -> tuple:
+        return (self.query_type, self.as_of, tuple(self.conditions))
+
+
+@dataclass
+class PlannedQuery:
+    """合并后的一条查询"""
+    query_type: str
+    as_of: Optional[str]
+    conditions: tuple
+    fields: list
+    consumers: list
+
+    @property
+    def text(self) -> str:
+        return ",".join(list(self.conditions) + self.fields)
+
+
+def _merge_fields(*field_lists) -> list:
+    """按出现顺序合并字段并去重"""
+    merged = []
+    for fields in field_lists:
+        for name in fields:
+            if name not in merged:
+                merged.append(name)
+    return merged
+
+
+class QueryPlanner:
+    """
+    问财查询规划器
+
+    Args:
+        fetch: 执行一条查询的函数 fetch(query_text, query_type) -> DataFrame，调用方负责重试和列名规范化
+    """
+
+    def __init__(self, fetch: Callable[[str, str], pd.DataFrame]):
+        self.fetch = fetch
+        self._pending = []
+        # 已执行的查询: group_key -> (返回字段, 结果)
+        self._results = {}
+        self._lock = threading.Lock()
+        self.queries_issued = 0
+        self.queries_saved = 0
+
+    def add(self, request: WencaiRequest) -> None:
+        with self._lock:
+            self._pending.append(request)
+
+    def _cached(self, request: WencaiRequest) -> Optional[pd.DataFrame]:
+        cached = self._results.get(request.group_key)
+        if cached is None:
+            return None
+        fields, df = cached
+        return df if set(request.fields) <= set(fields) else None
+
+    def plan(self, requests: list = None) -> list:
+        """把请求按条件分组，每组合并为一条查询；已被缓存结果覆盖的请求不再查询"""
+        requests = self._pending if requests is None else requests
+        groups = {}
+        for request in requests:
+            if self._cached(request) is not None:
+                continue
+            planned = groups.get(request.group_key)
+            if planned is None:
+                planned = PlannedQuery(request.query_type, request.as_of, tuple(request.conditions), [], [])
+                groups[request.group_key] = planned
+            planned.fields = _merge_fields(planned.fields, request.fields)
+            planned.consumers.append(request.consumer)
+        return list(groups.values())
+
+    def execute(self) -> dict:
+        """
+        执行所有待处理的请求
+
+        Returns:
+            dict: consumer -> 该请求筛选后的 DataFrame
+        """
+        with self._lock:
+            requests, self._pending = self._pending, []
+            frames = self._execute(requests)
+        return {request.consumer: df for request, df in zip(requests, frames)}
+
+    def _execute(self, requests: list) -> list:
+        """执行给定的请求，按请求顺序返回筛选后的结果；调用方需持有锁"""
+        if not requests:
+            return []
+        planned = self.plan(requests)
+        for query in planned:
+            key = (query.query_type, query.as_of, query.conditions)
+            # 扩充已缓存查询的字段时沿用原字段，保证旧请求仍被覆盖
+            previous = self._results.get(key)
+            if previous is not None:
+                query.fields = _merge_fields(previous[0], query.fields)
+            logger.info(f"执行合并查询({len(query.consumers)}个请求: {', '.join(query.consumers)}): {query.text}")
+            df = self.fetch(query.text, query.query_type)
+            self._results[key] = (query.fields, df)
+            self.queries_issued += 1
+        self.queries_saved += len(requests) - len(planned)
+        if len(requests) > len(planned):
+            logger.info(f"查询规划: {len(requests)}个请求合并为{len(planned)}条查询")
+
+        frames = []
+        for request in requests:
+            df = self._cached(request)
+            if request.select is not None and not df.empty:
+                df = df[request.select(df).to_numpy(dtype=bool)]
+            frames.append(df.reset_index(drop=True))
+        return frames
+
+    def request(self, request: WencaiRequest) -> pd.DataFrame:
+        """单个请求：能复用已执行查询的结果时不发出查询；不经过待处理队列，并发调用互不影响"""
+        with self._lock:
+            return self._execute([request])[0]
+
+    def clear(self) -> None:
+        """丢弃缓存的查询结果（开始新的一次运行时调用）"""
+        with self._lock:
+            self._results.clear()